@@ -94,6 +94,19 @@ def _get_marker_param(request):
     return request.GET['marker']
 
 
+def get_limit_and_marker(request, max_limit=CONF.osapi_max_limit):
+    """Return limit, marker tuple from request.
+
+    :param request: `wsgi.Request` possibly containing 'marker' and 'limit'
+                    GET variables. If 'limit' is not specified, 0, or
+                    > max_limit, we default to max_limit.
+    :kwarg max_limit: The maximum number of items to return
+    """
+    params = get_pagination_params(request)
+    limit = min(max_limit, params.get('limit') or max_limit)
+    return limit, params.get('marker')
+
+
 def limited(items, request, max_limit=CONF.osapi_max_limit):
     """Return a slice of items according to requested offset and limit.
 
@@ -211,6 +224,7 @@ class ViewBuilder(object):
     def _get_next_link(self, request, identifier):
         """Return href string with proper limit and marker params."""
         params = request.params.copy()
+        params.pop("offset", None)
         params["marker"] = identifier
         prefix = self._update_link_prefix(request.application_url,
                                           CONF.osapi_share_base_URL)
@@ -242,7 +256,8 @@ class ViewBuilder(object):
         """Retrieve 'next' link, if applicable."""
         links = []
         limit = int(request.params.get("limit", 0))
-        if limit and limit == len(items):
+        limit = min(CONF.osapi_max_limit, limit or CONF.osapi_max_limit)
+        if items and limit == len(items):
             last_item = items[-1]
             if id_key in last_item:
                 last_item_id = last_item[id_key]
@@ -55,9 +55,8 @@ class QuotaClassSetsController(object):
             if key in QUOTAS:
                 value = int(body['quota_class_set'][key])
                 try:
-                    db.quota_class_update(context, quota_class, key, value)
-                except exception.QuotaClassNotFound:
-                    db.quota_class_create(context, quota_class, key, value)
+                    QUOTAS.update_class_quota(context, quota_class, key,
+                                              value)
                 except exception.AdminRequired:
                     raise webob.exc.HTTPForbidden()
         return {'quota_class_set': QUOTAS.get_class_quotas(context,
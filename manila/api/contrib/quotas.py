@@ -19,7 +19,6 @@ from six.moves.urllib import parse
 import webob
 
 from manila.api import extensions
-from manila import db
 from manila.db.sqlalchemy import api as sqlalchemy_api
 from manila import exception
 from manila.i18n import _
@@ -184,11 +183,8 @@ class QuotaSetsController(object):
             maximum = settable_quotas[key]['maximum']
             self._validate_quota_limit(value, minimum, maximum, force_update)
             try:
-                db.quota_create(context, project_id, key, value,
-                                user_id=user_id)
-            except exception.QuotaExists:
-                db.quota_update(context, project_id, key, value,
-                                user_id=user_id)
+                QUOTAS.update_quota(context, project_id, key, value,
+                                    user_id=user_id)
             except exception.AdminRequired:
                 raise webob.exc.HTTPForbidden()
         return {'quota_set': self._get_quotas(context, id, user_id=user_id)}
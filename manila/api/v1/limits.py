@@ -17,15 +17,23 @@
 Module dedicated functions/classes dealing with rate limiting requests.
 """
 
-import collections
-import copy
+import abc
+import errno
+import fcntl
+import hashlib
 import httplib
 import math
+import mmap
+import os
 import re
+import socket
+import struct
 import time
 
 from oslo_serialization import jsonutils
+from oslo_utils import excutils
 from oslo_utils import importutils
+import six
 import webob.dec
 import webob.exc
 
@@ -118,32 +126,45 @@ class Limit(object):
         if self.verb != verb or not re.match(self.regex, url):
             return
 
-        now = self._get_time()
-
-        if self.last_request is None:
-            self.last_request = now
+        state = (self.water_level, self.last_request, self.next_request)
+        delay, state = self.consume(state, self._get_time())
+        self.water_level, self.last_request, self.next_request = state
+        if not delay:
+            self.remaining = self.get_remaining(self.water_level)
+        return delay
+
+    def consume(self, state, now):
+        """Account for a request made at 'now' in a bucket state.
+
+        @param state: tuple of water level, time of the last request and
+                      time of the next allowed request, or None for an
+                      empty bucket
+        @param now: time of the request
+        @return: tuple of delay (or None) and the new state
+        """
+        water_level, last_request, next_request = state or (0, None, None)
 
-        leak_value = now - self.last_request
+        if last_request is None:
+            last_request = now
 
-        self.water_level -= leak_value
-        self.water_level = max(self.water_level, 0)
-        self.water_level += self.request_value
+        leak_value = now - last_request
 
-        difference = self.water_level - self.capacity
+        water_level -= leak_value
+        water_level = max(water_level, 0)
+        water_level += self.request_value
 
-        self.last_request = now
+        difference = water_level - self.capacity
 
         if difference > 0:
-            self.water_level -= self.request_value
-            self.next_request = now + difference
-            return difference
+            water_level -= self.request_value
+            return difference, (water_level, now, now + difference)
 
-        cap = self.capacity
-        water = self.water_level
-        val = self.value
+        return None, (water_level, now, now)
 
-        self.remaining = math.floor(((cap - water) / cap) * val)
-        self.next_request = now
+    def get_remaining(self, water_level):
+        """Number of requests left in a bucket with a given water level."""
+        cap = self.capacity
+        return math.floor(((cap - water_level) / cap) * self.value)
 
     def _get_time(self):
         """Retrieve the current time. Broken out for testability."""
@@ -153,16 +174,26 @@ class Limit(object):
         """Display the string name of the unit."""
         return self.UNITS.get(self.unit, "UNKNOWN")
 
-    def display(self):
-        """Return a useful representation of this class."""
+    def display(self, state=None):
+        """Return a useful representation of this class.
+
+        @param state: bucket state to display instead of the one of this
+                      object, as kept by a `LimiterBackend`
+        """
+        if state is None:
+            remaining = self.remaining
+            next_request = self.next_request
+        else:
+            remaining = self.get_remaining(state[0])
+            next_request = state[2]
         return {
             "verb": self.verb,
             "URI": self.uri,
             "regex": self.regex,
             "value": self.value,
-            "remaining": int(self.remaining),
+            "remaining": int(remaining),
             "unit": self.display_unit(),
-            "resetTime": int(self.next_request or self._get_time()),
+            "resetTime": int(next_request or self._get_time()),
         }
 
 # "Limit" format is a dictionary with the HTTP verb, human-readable URI,
@@ -180,7 +211,8 @@ DEFAULT_LIMITS = [
 class RateLimitingMiddleware(base_wsgi.Middleware):
     """Rate-limits requests passing through this middleware.
 
-    All limit information is stored in memory for this implementation.
+    Limit information is kept by the backend of the limiter, in the memory
+    of the process unless another backend is configured.
     """
 
     def __init__(self, application, limits=None, limiter=None, **kwargs):
@@ -240,26 +272,185 @@ class RateLimitingMiddleware(base_wsgi.Middleware):
         return self.application
 
 
+class LimitMatcher(object):
+    """Finds the limits matching a request with one regex per verb."""
+
+    # Python 2 regexes can not have more than 100 groups, so limits are
+    # combined by chunks, leaving room for the groups of the limits.
+    max_combined = 25
+
+    def __init__(self, limits):
+        self.limits = limits
+        self._patterns = {}
+        for verb in set(limit.verb for limit in limits):
+            indexes = [i for i, limit in enumerate(limits)
+                       if limit.verb == verb]
+            self._patterns[verb] = [
+                self._compile(indexes[start:start + self.max_combined])
+                for start in range(0, len(indexes), self.max_combined)]
+
+    def _compile(self, indexes):
+        """Return the combined regex of some limits and their indexes.
+
+        The regex is None when the limits can not be combined, the indexes
+        are then given with the compiled regex of each limit.
+        """
+        limits = self.limits
+        # Each limit gets an optional lookahead, so a single match at the
+        # start of the URL tells which of the regexes match there, as
+        # re.match does for each of them.
+        pattern = ''.join('(?:(?=(?P<limit%d>%s)))?' %
+                          (i, limits[i].regex) for i in indexes)
+        # Group numbers change once regexes are combined, regexes with
+        # numbered back references are matched one by one instead.
+        if not any(re.search(r'\\[1-9]', limits[i].regex) for i in indexes):
+            try:
+                return re.compile(pattern), indexes
+            except (re.error, AssertionError):
+                # The same group name is used by several regexes, or there
+                # are too many groups, which Python 2 reports with an
+                # AssertionError.
+                pass
+        return None, [(i, re.compile(limits[i].regex)) for i in indexes]
+
+    def match(self, verb, url):
+        """Return the indexes of the limits matching a request."""
+        matches = []
+        for combined, patterns in self._patterns.get(verb, []):
+            if combined is None:
+                matches.extend(i for i, regex in patterns if regex.match(url))
+            else:
+                groups = combined.match(url).groupdict()
+                matches.extend(i for i in patterns
+                               if groups['limit%d' % i] is not None)
+        return matches
+
+
+@six.add_metaclass(abc.ABCMeta)
+class LimiterBackend(object):
+    """Storage of the bucket state of users for a `Limiter`.
+
+    States are tuples of water level, time of the last request and time of
+    the next allowed request, see `Limit.consume`.
+    """
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Return the state stored for a key, or None."""
+
+    @abc.abstractmethod
+    def update(self, key, func):
+        """Replace the state of a key with func(state), atomically.
+
+        @return: the value returned by func
+        """
+
+
+class InMemoryLimiterBackend(LimiterBackend):
+    """Keeps bucket states in the memory of the process."""
+
+    def __init__(self):
+        self._states = {}
+
+    def get(self, key):
+        return self._states.get(key)
+
+    def update(self, key, func):
+        result, self._states[key] = func(self._states.get(key))
+        return result
+
+
+class SharedMemoryLimiterBackend(LimiterBackend):
+    """Keeps bucket states in a file mapped in memory.
+
+    All API workers mapping the same file enforce the same limits. The file
+    is a fixed table of slots indexed by the hash of the key, a key taking
+    the slot of another one resets the state of the latter. Each update
+    only locks the slot it changes.
+    """
+
+    SLOT = struct.Struct('=Qddd')
+
+    def __init__(self, path, slots=65536):
+        self.slots = int(slots)
+        size = self.SLOT.size * self.slots
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    def _locate(self, key):
+        digest = hashlib.md5(key.encode('utf-8')).digest()
+        key_hash = struct.unpack('=Q', digest[:8])[0] or 1
+        return key_hash, (key_hash % self.slots) * self.SLOT.size
+
+    def _read(self, key_hash, offset):
+        slot_hash, water_level, last_request, next_request = (
+            self.SLOT.unpack_from(self._map, offset))
+        if slot_hash != key_hash:
+            return None
+        return water_level, last_request, next_request
+
+    def get(self, key):
+        return self._read(*self._locate(key))
+
+    def update(self, key, func):
+        key_hash, offset = self._locate(key)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, self.SLOT.size, offset)
+        try:
+            result, state = func(self._read(key_hash, offset))
+            self.SLOT.pack_into(self._map, offset, key_hash, *state)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, self.SLOT.size, offset)
+        return result
+
+
 class Limiter(object):
     """Rate-limit checking class which handles limits in memory."""
 
-    def __init__(self, limits, **kwargs):
+    def __init__(self, limits, backend=None, **kwargs):
         """Initialize the new `Limiter`.
 
         @param limits: List of `Limit` objects
+        @param backend: `LimiterBackend` instance or class name, keeps the
+                        state of users in memory by default. Other
+                        parameters starting with 'backend_' are passed to
+                        the constructor of the class.
         """
-        self.limits = copy.deepcopy(limits)
-        self.levels = collections.defaultdict(lambda: copy.deepcopy(limits))
+        self.limits = limits
+        self.levels = {}
+        backend_kwargs = {}
 
         # Pick up any per-user limit information
         for key, value in kwargs.items():
             if key.startswith('user:'):
                 username = key[5:]
                 self.levels[username] = self.parse_limits(value)
+            elif key.startswith('backend_'):
+                backend_kwargs[key[8:]] = value
+
+        if backend is None:
+            backend = InMemoryLimiterBackend()
+        elif isinstance(backend, six.string_types):
+            backend = importutils.import_object(backend, **backend_kwargs)
+        self.backend = backend
+
+        self._matchers = dict((username, LimitMatcher(limits))
+                              for username, limits in self.levels.items())
+        self._default_matcher = LimitMatcher(self.limits)
+
+    def _get_matcher(self, username):
+        return self._matchers.get(username, self._default_matcher)
+
+    @staticmethod
+    def _get_key(username, index):
+        return '%s:%d' % (username or '', index)
 
     def get_limits(self, username=None):
         """Return the limits for a given user."""
-        return [limit.display() for limit in self.levels[username]]
+        limits = self._get_matcher(username).limits
+        return [limit.display(self.backend.get(self._get_key(username, i)))
+                for i, limit in enumerate(limits)]
 
     def check_for_delay(self, verb, url, username=None):
         """Check the given verb/user/user triplet for limit.
@@ -267,9 +458,16 @@ class Limiter(object):
         @return: Tuple of delay (in seconds) and error message (or None, None)
         """
         delays = []
+        matcher = self._get_matcher(username)
+
+        for index in matcher.match(verb, url):
+            limit = matcher.limits[index]
+
+            def consume(state):
+                return limit.consume(state, limit._get_time())
 
-        for limit in self.levels[username]:
-            delay = limit(verb, url)
+            delay = self.backend.update(self._get_key(username, index),
+                                        consume)
             if delay:
                 delays.append((delay, limit.error_message))
 
@@ -401,24 +599,67 @@ class WsgiLimiterProxy(object):
         @param limiter_address: IP/port combination of where to request limit
         """
         self.limiter_address = limiter_address
+        # Idle connections, kept open between requests.
+        self._connections = []
 
     def check_for_delay(self, verb, path, username=None):
         body = jsonutils.dumps({"verb": verb, "path": path})
         headers = {"Content-Type": "application/json"}
-
-        conn = httplib.HTTPConnection(self.limiter_address)
-
-        if username:
-            conn.request("POST", "/%s" % (username), body, headers)
+        path = "/%s" % username if username else "/"
+
+        conn = self._connections.pop() if self._connections else None
+        while True:
+            reused = conn is not None
+            if not reused:
+                conn = httplib.HTTPConnection(self.limiter_address)
+            try:
+                conn.request("POST", path, body, headers)
+                resp = conn.getresponse()
+            except (httplib.HTTPException, socket.error) as e:
+                conn.close()
+                if reused and self._is_closed_while_idle(e):
+                    # The request was not processed, it is sent again on
+                    # a new connection.
+                    conn = None
+                    continue
+                raise
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    conn.close()
+            break
+        try:
+            # The response has to be read entirely before the connection
+            # can be used again.
+            content = resp.read()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                conn.close()
+
+        if resp.will_close:
+            conn.close()
         else:
-            conn.request("POST", "/", body, headers)
+            self._connections.append(conn)
 
-        resp = conn.getresponse()
-
-        if 200 >= resp.status < 300:
+        if 200 <= resp.status < 300:
             return None, None
 
-        return resp.getheader("X-Wait-Seconds"), resp.read() or None
+        return resp.getheader("X-Wait-Seconds"), content or None
+
+    @staticmethod
+    def _is_closed_while_idle(error):
+        """Tells if a reused connection failed as it was closed when idle.
+
+        The limiter then reset the connection or closed it without sending
+        a status line, before it read the request. Any other error, such as
+        a timeout, may happen after the request was counted.
+        """
+        if isinstance(error, httplib.BadStatusLine):
+            # Depending on the Python version, the empty status line itself
+            # or an explanation is reported.
+            return (error.line in ('', "''") or
+                    error.line.startswith('No status line received'))
+        return (isinstance(error, socket.error) and
+                error.errno in (errno.ECONNRESET, errno.EPIPE))
 
     # Note: This method gets called before the class is instantiated,
     # so this must be either a static method or a class method.  It is
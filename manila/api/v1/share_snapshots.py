@@ -23,6 +23,7 @@ from webob import exc
 from manila.api import common
 from manila.api.openstack import wsgi
 from manila.api.views import share_snapshots as snapshot_views
+from manila.common import constants
 from manila import exception
 from manila.i18n import _LI
 from manila import share
@@ -81,6 +82,7 @@ class ShareSnapshotsController(wsgi.Controller):
         # Remove keys that are not related to share attrs
         search_opts.pop('limit', None)
         search_opts.pop('offset', None)
+        search_opts.pop('marker', None)
         sort_key = search_opts.pop('sort_key', 'created_at')
         sort_dir = search_opts.pop('sort_dir', 'desc')
 
@@ -93,13 +95,37 @@ class ShareSnapshotsController(wsgi.Controller):
         common.remove_invalid_options(context, search_opts,
                                       self._get_snapshots_search_options())
 
-        snapshots = self.share_api.get_all_snapshots(
-            context,
-            search_opts=search_opts,
-            sort_key=sort_key,
-            sort_dir=sort_dir,
-        )
-        limited_list = common.limited(snapshots, req)
+        # Summary lists only show IDs and names, nothing else is loaded.
+        if is_detail:
+            profile = constants.QUERY_PROFILE_DETAIL
+        else:
+            profile = constants.QUERY_PROFILE_SUMMARY
+
+        if 'offset' in req.GET:
+            # Offset based pagination is kept for backward compatibility
+            # only, it can not be done by DB.
+            snapshots = self.share_api.get_all_snapshots(
+                context,
+                search_opts=search_opts,
+                sort_key=sort_key,
+                sort_dir=sort_dir,
+                profile=profile,
+            )
+            limited_list = common.limited(snapshots, req)
+        else:
+            limit, marker = common.get_limit_and_marker(req)
+            try:
+                limited_list = self.share_api.get_all_snapshots(
+                    context,
+                    search_opts=search_opts,
+                    sort_key=sort_key,
+                    sort_dir=sort_dir,
+                    limit=limit,
+                    marker=marker,
+                    profile=profile,
+                )
+            except exception.MarkerNotFound as e:
+                raise exc.HTTPBadRequest(explanation=six.text_type(e))
         if is_detail:
             snapshots = self._view_builder.detail_list(req, limited_list)
         else:
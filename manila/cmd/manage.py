@@ -71,6 +71,7 @@ from manila import context
 from manila import db
 from manila.db import migration
 from manila.i18n import _
+from manila import quota
 from manila import utils
 from manila import version
 
@@ -337,11 +338,28 @@ class ServiceCommands(object):
                                   svc['updated_at']))
 
 
+class QuotaCommands(object):
+    """Methods for maintaining quota usages."""
+
+    def expire(self):
+        """Roll back expired quota reservations."""
+        ctxt = context.get_admin_context()
+        count = quota.QUOTAS.expire(ctxt)
+        print(_("Rolled back %d expired reservations.") % count)
+
+    def refresh(self):
+        """Recompute the in_use counts of the usages of all projects."""
+        ctxt = context.get_admin_context()
+        count = quota.QUOTAS.usage_refresh(ctxt)
+        print(_("Updated %d quota usages.") % count)
+
+
 CATEGORIES = {
     'config': ConfigCommands,
     'db': DbCommands,
     'host': HostCommands,
     'logs': GetLogCommands,
+    'quota': QuotaCommands,
     'service': ServiceCommands,
     'shell': ShellCommands,
     'version': VersionCommands
@@ -79,6 +79,10 @@ ACCESS_LEVELS = (
     ACCESS_LEVEL_RO,
 )
 
+# Projection profiles of share and snapshot list queries
+QUERY_PROFILE_SUMMARY = 'summary'
+QUERY_PROFILE_DETAIL = 'detail'
+
 
 class ExtraSpecs(object):
     DRIVER_HANDLES_SHARE_SERVERS = "driver_handles_share_servers"
@@ -43,6 +43,8 @@ these objects be simple dictionaries.
 from oslo_config import cfg
 from oslo_db import api as db_api
 
+from manila.common import constants
+
 
 db_opts = [
     cfg.StrOpt('db_backend',
@@ -262,6 +264,30 @@ def reservation_rollback(context, reservations, project_id=None, user_id=None):
                                      user_id=user_id)
 
 
+def quota_reserve_atomic(context, resources, quotas, user_quotas, deltas,
+                         expire, project_id=None, user_id=None):
+    """Check quotas and create reservations with conditional updates."""
+    return IMPL.quota_reserve_atomic(context, resources, quotas, user_quotas,
+                                     deltas, expire, project_id=project_id,
+                                     user_id=user_id)
+
+
+def reservation_commit_atomic(context, reservations, project_id=None,
+                              user_id=None):
+    """Commit quota reservations with conditional updates."""
+    return IMPL.reservation_commit_atomic(context, reservations,
+                                          project_id=project_id,
+                                          user_id=user_id)
+
+
+def reservation_rollback_atomic(context, reservations, project_id=None,
+                                user_id=None):
+    """Roll back quota reservations with conditional updates."""
+    return IMPL.reservation_rollback_atomic(context, reservations,
+                                            project_id=project_id,
+                                            user_id=user_id)
+
+
 def quota_destroy_all_by_project_and_user(context, project_id, user_id):
     """Destroy all quotas associated with a given project and user."""
     return IMPL.quota_destroy_all_by_project_and_user(context,
@@ -273,9 +299,14 @@ def quota_destroy_all_by_project(context, project_id):
     return IMPL.quota_destroy_all_by_project(context, project_id)
 
 
-def reservation_expire(context):
-    """Roll back any expired reservations."""
-    return IMPL.reservation_expire(context)
+def reservation_expire(context, limit=None):
+    """Roll back expired reservations, at most limit of them if given."""
+    return IMPL.reservation_expire(context, limit=limit)
+
+
+def quota_usage_refresh_all(context):
+    """Recompute the in_use counts of all quota usages."""
+    return IMPL.quota_usage_refresh_all(context)
 
 
 ###################
@@ -301,44 +332,54 @@ def share_get(context, share_id):
     return IMPL.share_get(context, share_id)
 
 
-def share_get_all(context, filters=None, sort_key=None, sort_dir=None):
+def share_get_all(context, filters=None, sort_key=None, sort_dir=None,
+                  limit=None, marker=None,
+                  profile=constants.QUERY_PROFILE_DETAIL):
     """Get all shares."""
     return IMPL.share_get_all(
         context, filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+        limit=limit, marker=marker, profile=profile,
     )
 
 
 def share_get_all_by_host(context, host, filters=None, sort_key=None,
-                          sort_dir=None):
+                          sort_dir=None, limit=None, marker=None):
     """Returns all shares with given host."""
     return IMPL.share_get_all_by_host(
         context, host, filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+        limit=limit, marker=marker,
     )
 
 
 def share_get_all_by_project(context, project_id, filters=None,
-                             is_public=False, sort_key=None, sort_dir=None):
+                             is_public=False, sort_key=None, sort_dir=None,
+                             limit=None, marker=None,
+                             profile=constants.QUERY_PROFILE_DETAIL):
     """Returns all shares with given project ID."""
     return IMPL.share_get_all_by_project(
         context, project_id, filters=filters, is_public=is_public,
-        sort_key=sort_key, sort_dir=sort_dir,
+        sort_key=sort_key, sort_dir=sort_dir, limit=limit, marker=marker,
+        profile=profile,
     )
 
 
 def share_get_all_by_share_network(context, share_network_id, filters=None,
-                                   sort_key=None, sort_dir=None):
+                                   sort_key=None, sort_dir=None, limit=None,
+                                   marker=None):
     """Returns list of shares that belong to given share network."""
     return IMPL.share_get_all_by_share_network(
         context, share_network_id, filters=filters, sort_key=sort_key,
-        sort_dir=sort_dir)
+        sort_dir=sort_dir, limit=limit, marker=marker)
 
 
 def share_get_all_by_share_server(context, share_server_id, filters=None,
-                                  sort_key=None, sort_dir=None):
+                                  sort_key=None, sort_dir=None, limit=None,
+                                  marker=None,
+                                  profile=constants.QUERY_PROFILE_DETAIL):
     """Returns all shares with given share server ID."""
     return IMPL.share_get_all_by_share_server(
         context, share_server_id, filters=filters, sort_key=sort_key,
-        sort_dir=sort_dir,
+        sort_dir=sort_dir, limit=limit, marker=marker, profile=profile,
     )
 
 
@@ -365,6 +406,11 @@ def share_access_get_all_for_share(context, share_id):
     return IMPL.share_access_get_all_for_share(context, share_id)
 
 
+def share_access_get_all_for_host(context, host):
+    """Get access rules of all shares on a host."""
+    return IMPL.share_access_get_all_for_host(context, host)
+
+
 def share_access_get_all_by_type_and_access(context, share_id, access_type,
                                             access):
     """Returns share access by given type and access."""
@@ -406,28 +452,33 @@ def share_snapshot_get(context, snapshot_id):
 
 
 def share_snapshot_get_all(context, filters=None, sort_key=None,
-                           sort_dir=None):
+                           sort_dir=None, limit=None, marker=None,
+                           profile=constants.QUERY_PROFILE_DETAIL):
     """Get all snapshots."""
     return IMPL.share_snapshot_get_all(
         context, filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+        limit=limit, marker=marker, profile=profile,
     )
 
 
 def share_snapshot_get_all_by_project(context, project_id, filters=None,
-                                      sort_key=None, sort_dir=None):
+                                      sort_key=None, sort_dir=None,
+                                      limit=None, marker=None,
+                                      profile=constants.QUERY_PROFILE_DETAIL):
     """Get all snapshots belonging to a project."""
     return IMPL.share_snapshot_get_all_by_project(
         context, project_id, filters=filters, sort_key=sort_key,
-        sort_dir=sort_dir,
+        sort_dir=sort_dir, limit=limit, marker=marker, profile=profile,
     )
 
 
 def share_snapshot_get_all_for_share(context, share_id, filters=None,
-                                     sort_key=None, sort_dir=None):
+                                     sort_key=None, sort_dir=None, limit=None,
+                                     marker=None):
     """Get all snapshots for a share."""
     return IMPL.share_snapshot_get_all_for_share(
         context, share_id, filters=filters, sort_key=sort_key,
-        sort_dir=sort_dir,
+        sort_dir=sort_dir, limit=limit, marker=marker,
     )
 
 
@@ -0,0 +1,72 @@
+# Copyright 2015 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Add share lookup indexes
+
+Revision ID: 1f0bd302c1a6
+Revises: 533646c7af38
+Create Date: 2015-06-15 10:21:04.172936
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1f0bd302c1a6'
+down_revision = '533646c7af38'
+
+from alembic import op
+from oslo_log import log
+
+from manila.i18n import _LE
+
+LOG = log.getLogger(__name__)
+
+# Every lookup also filters out soft-deleted rows, so 'deleted' is part of
+# each index. It comes first in the host index because hosts are matched
+# with a range that covers their pools, and a range can only be used on the
+# last column of the lookup. drivers_private_data is not listed, its primary
+# key (host, entity_uuid, key) already covers its lookups.
+INDEXES = (
+    ('shares_project_id_deleted_idx', 'shares', ['project_id', 'deleted']),
+    ('shares_deleted_host_idx', 'shares', ['deleted', 'host']),
+    ('shares_share_server_id_deleted_idx', 'shares',
+     ['share_server_id', 'deleted']),
+    ('shares_share_network_id_deleted_idx', 'shares',
+     ['share_network_id', 'deleted']),
+    ('share_access_map_share_id_deleted_idx', 'share_access_map',
+     ['share_id', 'deleted']),
+    ('share_snapshots_share_id_deleted_idx', 'share_snapshots',
+     ['share_id', 'deleted']),
+    ('share_snapshots_project_id_deleted_idx', 'share_snapshots',
+     ['project_id', 'deleted']),
+    ('share_export_locations_share_id_deleted_idx', 'share_export_locations',
+     ['share_id', 'deleted']),
+)
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        try:
+            op.create_index(name, table, columns)
+        except Exception:
+            LOG.error(_LE("Index '%s' could not be created"), name)
+            raise
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        try:
+            op.drop_index(name, table)
+        except Exception:
+            LOG.error(_LE("Index '%s' could not be dropped"), name)
+            raise
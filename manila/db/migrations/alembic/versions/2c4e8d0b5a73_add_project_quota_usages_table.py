@@ -0,0 +1,67 @@
+# Copyright 2015 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Add project_quota_usages table
+
+Revision ID: 2c4e8d0b5a73
+Revises: 1f0bd302c1a6
+Create Date: 2015-06-22 09:12:45.318204
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2c4e8d0b5a73'
+down_revision = '1f0bd302c1a6'
+
+from alembic import op
+from oslo_log import log
+import sqlalchemy as sql
+
+from manila.i18n import _LE
+
+LOG = log.getLogger(__name__)
+
+project_quota_usages_table_name = 'project_quota_usages'
+
+
+def upgrade():
+    try:
+        op.create_table(
+            project_quota_usages_table_name,
+            sql.Column('created_at', sql.DateTime),
+            sql.Column('updated_at', sql.DateTime),
+            sql.Column('deleted_at', sql.DateTime),
+            sql.Column('deleted', sql.Integer, default=0),
+            sql.Column('id', sql.Integer, primary_key=True, nullable=False),
+            sql.Column('project_id', sql.String(255), nullable=False),
+            sql.Column('resource', sql.String(255), nullable=False),
+            sql.Column('total', sql.Integer, nullable=False, default=0),
+            sql.UniqueConstraint(
+                'project_id', 'resource', 'deleted',
+                name='uniq_project_quota_usages0project_id0resource0deleted'),
+            mysql_engine='InnoDB',
+        )
+    except Exception:
+        LOG.error(_LE("Table |%s| not created!"),
+                  project_quota_usages_table_name)
+        raise
+
+
+def downgrade():
+    try:
+        op.drop_table(project_quota_usages_table_name)
+    except Exception:
+        LOG.error(_LE("%s table not dropped"),
+                  project_quota_usages_table_name)
+        raise
@@ -18,7 +18,6 @@
 
 """Implementation of SQLAlchemy backend."""
 
-import copy
 import datetime
 import sys
 import uuid
@@ -32,8 +31,14 @@ from oslo_db.sqlalchemy import utils as db_utils
 from oslo_log import log
 from oslo_utils import timeutils
 import six
+from sqlalchemy import and_
+from sqlalchemy import case
 from sqlalchemy import or_
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm import noload
+from sqlalchemy.orm import subqueryload
+from sqlalchemy.sql.expression import false
 from sqlalchemy.sql.expression import literal_column
 from sqlalchemy.sql.expression import true
 from sqlalchemy.sql import func
@@ -244,6 +249,58 @@ def exact_filter(query, model, filters, legal_keys):
     return query
 
 
+def attrs_filter(query, model, filters):
+    """Applies exact match filtering by model columns to a query.
+
+    Filters naming a column of the model are compiled into the query.
+    Filters naming another attribute of the model, such as a property or
+    a relationship, can not be compiled and are returned so that the
+    caller matches them against the loaded rows with match_attrs. Any
+    other filter can not be satisfied by any row, so an empty result is
+    selected for it.
+
+    :param query: query to apply filters to
+    :param model: model object the query applies to
+    :param filters: dictionary of filters, see exact_filter
+    :returns: tuple of the updated query and the dictionary of filters
+              left to be matched in Python
+    """
+    filters = filters.copy()
+    query = exact_filter(query, model, filters,
+                         model.__table__.columns.keys())
+    attr_filters = dict((key, value) for key, value in filters.items()
+                        if hasattr(model, key))
+    unknown = sorted(set(filters) - set(attr_filters))
+    if unknown:
+        LOG.warning(_LW("Filters %(filters)s do not match any attribute "
+                        "of %(model)s, no rows are selected."),
+                    {'filters': unknown, 'model': model.__name__})
+        query = query.filter(false())
+    return query, attr_filters
+
+
+def match_attrs(rows, filters, limit=None, marker=None):
+    """Matches rows against the filters attrs_filter could not compile.
+
+    The rows have to be sorted and not paginated, the page defined by
+    'limit' and 'marker' is taken from the matching rows.
+
+    :raises: exception.MarkerNotFound
+    """
+    rows = [row for row in rows
+            if all(row.get(key) == value for key, value in filters.items())]
+    if marker is not None:
+        for i, row in enumerate(rows):
+            if row['id'] == marker:
+                rows = rows[i + 1:]
+                break
+        else:
+            raise exception.MarkerNotFound(marker=marker)
+    if limit is not None:
+        rows = rows[:limit]
+    return rows
+
+
 def _sync_shares(context, project_id, user_id, session):
     (shares, gigs) = share_data_get_for_project(context,
                                                 project_id,
@@ -1012,10 +1069,312 @@ def reservation_rollback(context, reservations, project_id=None, user_id=None):
                                  synchronize_session=False)
 
 
+# NOTE: The functions below implement the same reservation protocol with
+# conditional UPDATEs: limits are enforced by the WHERE clause of the UPDATE
+# that changes a counter instead of reading the counters and writing them
+# back. The usages of all the users of a project are summed up in one
+# project_quota_usages row per resource, which is checked and updated by a
+# single UPDATE, so only reservations of the same resource in the same
+# project wait for each other. Nothing is locked before the UPDATEs. Every
+# transaction updates the project rows first, in resource order, then the
+# usage rows in id order, so that they can not deadlock on each other.
+# The project rows are only kept by these functions and reservation_expire;
+# they are created from the usages of the project when first needed.
+
+def _project_quota_usages_get(context, project_id, resources):
+    """Return the IDs of the project usage rows of resources.
+
+    Missing rows are created from the usages of the project, each in its
+    own transaction; a row created concurrently is read back.
+    """
+    session = get_session()
+    rows = model_query(context, models.ProjectQuotaUsage,
+                       read_deleted="no", session=session).\
+        filter_by(project_id=project_id).\
+        filter(models.ProjectQuotaUsage.resource.in_(resources)).\
+        all()
+    ids = dict((row.resource, row.id) for row in rows)
+    for resource in sorted(set(resources) - set(ids)):
+        try:
+            with session.begin():
+                total = model_query(context, models.QuotaUsage,
+                                    func.coalesce(
+                                        func.sum(models.QuotaUsage.in_use +
+                                                 models.QuotaUsage.reserved),
+                                        0),
+                                    read_deleted="no", session=session).\
+                    filter_by(project_id=project_id).\
+                    filter_by(resource=resource).\
+                    scalar()
+                row = models.ProjectQuotaUsage()
+                row.project_id = project_id
+                row.resource = resource
+                row.total = total
+                row.save(session=session)
+                ids[resource] = row.id
+        except db_exception.DBDuplicateEntry:
+            ids[resource] = model_query(context, models.ProjectQuotaUsage,
+                                        read_deleted="no").\
+                filter_by(project_id=project_id).\
+                filter_by(resource=resource).\
+                one().id
+    return ids
+
+
+def _project_quota_usage_update(context, session, row_id, delta,
+                                project_quota=-1):
+    query = model_query(context, models.ProjectQuotaUsage,
+                        read_deleted="no",
+                        session=session).\
+        filter_by(id=row_id)
+    if delta > 0 and project_quota >= 0:
+        query = query.filter(models.ProjectQuotaUsage.total + delta <=
+                             project_quota)
+    return query.update(
+        {'total': models.ProjectQuotaUsage.total + delta},
+        synchronize_session=False)
+
+
+def _quota_usages_get(context, session, project_id, user_id):
+    rows = model_query(context, models.QuotaUsage,
+                       read_deleted="no",
+                       session=session).\
+        filter_by(project_id=project_id).\
+        filter(or_(models.QuotaUsage.user_id == user_id,
+                   models.QuotaUsage.user_id.is_(None))).\
+        all()
+    return dict((row.resource, row) for row in rows)
+
+
+def _quota_usage_reserve(context, session, usage, delta, user_quota):
+    # NOTE(Vek): We're only concerned about positive increments.
+    #            If a project has gone over quota, we want them to
+    #            be able to reduce their usage without any
+    #            problems.
+    if delta < 0:
+        return 1
+    query = model_query(context, models.QuotaUsage,
+                        read_deleted="no",
+                        session=session).\
+        filter_by(id=usage.id)
+    if user_quota >= 0:
+        query = query.filter(models.QuotaUsage.in_use +
+                             models.QuotaUsage.reserved + delta <= user_quota)
+    return query.update(
+        {'reserved': models.QuotaUsage.reserved + delta},
+        synchronize_session=False)
+
+
+@require_context
+def quota_reserve_atomic(context, resources, project_quotas, user_quotas,
+                         deltas, expire, project_id=None, user_id=None):
+    elevated = context.elevated()
+    if project_id is None:
+        project_id = context.project_id
+    if user_id is None:
+        user_id = context.user_id
+
+    project_ids = _project_quota_usages_get(elevated, project_id, deltas)
+    session = get_session()
+    with session.begin():
+        usages = _quota_usages_get(elevated, session, project_id, user_id)
+
+        # Usages are only synced when they are created or have gone
+        # negative, the counters are kept up to date by the UPDATEs below.
+        refresh = set(res for res in deltas
+                      if res not in usages or usages[res].in_use < 0)
+
+        # The project rows that change come first, see the NOTE above.
+        project_fits = {}
+        for res in sorted(deltas):
+            if deltas[res] > 0 or res in refresh:
+                project_fits[res] = _project_quota_usage_update(
+                    elevated, session, project_ids[res],
+                    max(deltas[res], 0), project_quotas[res])
+
+        for res in sorted(refresh):
+            if res not in usages:
+                usages[res] = _quota_usage_create(
+                    elevated,
+                    project_id,
+                    None if res in PER_PROJECT_QUOTAS else user_id,
+                    res,
+                    0, 0, None,
+                    session=session)
+            sync = QUOTA_SYNC_FUNCTIONS[resources[res].sync]
+            in_use = sync(elevated, project_id, user_id, session)[res]
+            change = in_use - usages[res].in_use
+            model_query(elevated, models.QuotaUsage,
+                        read_deleted="no",
+                        session=session).\
+                filter_by(id=usages[res].id).\
+                update({'in_use': in_use}, synchronize_session=False)
+            usages[res].in_use = in_use
+            if not change:
+                continue
+            # The project total checked above did not include the change
+            # yet, check it again now that it does.
+            if deltas[res] > 0 and project_fits[res]:
+                project_fits[res] = _project_quota_usage_update(
+                    elevated, session, project_ids[res], change,
+                    project_quotas[res])
+                if project_fits[res]:
+                    continue
+                _project_quota_usage_update(elevated, session,
+                                            project_ids[res],
+                                            -deltas[res])
+            _project_quota_usage_update(elevated, session, project_ids[res],
+                                        change)
+
+        unders = [res for res, delta in deltas.items()
+                  if delta < 0 and delta + usages[res].in_use < 0]
+
+        reserved = {}
+        for res in sorted(deltas, key=lambda res: usages[res].id):
+            if project_fits.get(res, True):
+                reserved[res] = _quota_usage_reserve(elevated, session,
+                                                     usages[res],
+                                                     deltas[res],
+                                                     user_quotas[res])
+            else:
+                reserved[res] = 0
+        overs = [res for res, count in reserved.items() if not count]
+
+        if overs:
+            # Give back what was reserved for the resources that did fit.
+            # Created and refreshed usages are kept, they are not
+            # invalidated by being over quota.
+            for res in sorted(deltas):
+                if deltas[res] > 0 and project_fits[res]:
+                    _project_quota_usage_update(elevated, session,
+                                                project_ids[res],
+                                                -deltas[res])
+            for res in sorted(deltas, key=lambda res: usages[res].id):
+                if reserved[res] and deltas[res] > 0:
+                    model_query(elevated, models.QuotaUsage,
+                                read_deleted="no",
+                                session=session).\
+                        filter_by(id=usages[res].id).\
+                        update({'reserved':
+                                models.QuotaUsage.reserved - deltas[res]},
+                               synchronize_session=False)
+        else:
+            reservations = [
+                _reservation_create(elevated, str(uuid.uuid4()),
+                                    usages[res], project_id, user_id,
+                                    res, delta, expire,
+                                    session=session).uuid
+                for res, delta in deltas.items()]
+
+    if unders:
+        LOG.warning(_LW("Change will make usage less than 0 for the following "
+                        "resources: %s"), unders)
+    if overs:
+        if project_quotas == user_quotas:
+            rows = model_query(elevated, models.QuotaUsage,
+                               read_deleted="no").\
+                filter_by(project_id=project_id).\
+                all()
+        else:
+            rows = _quota_usages_get(elevated, get_session(), project_id,
+                                     user_id).values()
+        usages = {}
+        for row in rows:
+            usage = usages.setdefault(row.resource,
+                                      dict(in_use=0, reserved=0))
+            usage['in_use'] += row.in_use
+            usage['reserved'] += row.reserved
+        raise exception.OverQuota(overs=sorted(overs), quotas=user_quotas,
+                                  usages=usages)
+
+    return reservations
+
+
+def _reservations_finish(context, reservations, commit):
+    session = get_session()
+    with session.begin():
+        rows = model_query(context, models.Reservation,
+                           read_deleted="no",
+                           session=session).\
+            filter(models.Reservation.uuid.in_(reservations)).\
+            order_by(models.Reservation.id).\
+            all()
+        project_updates = {}
+        usage_updates = {}
+        for reservation in rows:
+            # Only the caller that marks the reservation deleted applies it,
+            # so a reservation committed while it expires is counted once.
+            finished = model_query(context, models.Reservation,
+                                   read_deleted="no",
+                                   session=session).\
+                filter_by(id=reservation.id).\
+                update({'deleted': 1,
+                        'deleted_at': timeutils.utcnow(),
+                        'updated_at': literal_column('updated_at')},
+                       synchronize_session=False)
+            if not finished:
+                continue
+            key = (reservation.project_id, reservation.resource)
+            updates = usage_updates.setdefault(reservation.usage_id,
+                                               {'reserved': 0, 'in_use': 0})
+            if reservation.delta >= 0:
+                updates['reserved'] -= reservation.delta
+                if not commit:
+                    project_updates[key] = (project_updates.get(key, 0) -
+                                            reservation.delta)
+            elif commit:
+                project_updates[key] = (project_updates.get(key, 0) +
+                                        reservation.delta)
+            if commit:
+                updates['in_use'] += reservation.delta
+
+        # Same order as quota_reserve_atomic, see the NOTE above.
+        for (project_id, resource), delta in sorted(project_updates.items()):
+            if delta:
+                model_query(context, models.ProjectQuotaUsage,
+                            read_deleted="no",
+                            session=session).\
+                    filter_by(project_id=project_id).\
+                    filter_by(resource=resource).\
+                    update({'total': models.ProjectQuotaUsage.total + delta},
+                           synchronize_session=False)
+        for usage_id, updates in sorted(usage_updates.items()):
+            if not any(updates.values()):
+                continue
+            model_query(context, models.QuotaUsage,
+                        read_deleted="no",
+                        session=session).\
+                filter_by(id=usage_id).\
+                update({'reserved': models.QuotaUsage.reserved +
+                        updates['reserved'],
+                        'in_use': models.QuotaUsage.in_use +
+                        updates['in_use']},
+                       synchronize_session=False)
+
+
+@require_context
+def reservation_commit_atomic(context, reservations, project_id=None,
+                              user_id=None):
+    _reservations_finish(context, reservations, commit=True)
+
+
+@require_context
+def reservation_rollback_atomic(context, reservations, project_id=None,
+                                user_id=None):
+    _reservations_finish(context, reservations, commit=False)
+
+
 @require_admin_context
 def quota_destroy_all_by_project_and_user(context, project_id, user_id):
     session = get_session()
     with session.begin():
+        # The project totals are rebuilt from the usages that are left
+        # when they are needed again.
+        model_query(context, models.ProjectQuotaUsage, session=session,
+                    read_deleted="no").\
+            filter_by(project_id=project_id).\
+            delete(synchronize_session=False)
+
         model_query(context, models.ProjectUserQuota, session=session,
                     read_deleted="no").\
             filter_by(project_id=project_id).\
@@ -1048,6 +1407,13 @@ def quota_destroy_all_by_project_and_user(context, project_id, user_id):
 def quota_destroy_all_by_project(context, project_id):
     session = get_session()
     with session.begin():
+        # The project totals are rebuilt from the usages that are left
+        # when they are needed again.
+        model_query(context, models.ProjectQuotaUsage, session=session,
+                    read_deleted="no").\
+            filter_by(project_id=project_id).\
+            delete(synchronize_session=False)
+
         model_query(context, models.Quota, session=session,
                     read_deleted="no").\
             filter_by(project_id=project_id).\
@@ -1082,34 +1448,271 @@ def quota_destroy_all_by_project(context, project_id):
 
 
 @require_admin_context
-def reservation_expire(context):
+def reservation_expire(context, limit=None):
     session = get_session()
     with session.begin():
         current_time = timeutils.utcnow()
-        reservation_query = model_query(context, models.Reservation,
-                                        session=session, read_deleted="no").\
-            filter(models.Reservation.expire < current_time)
+        query = model_query(context, models.Reservation,
+                            models.Reservation.id,
+                            models.Reservation.usage_id,
+                            models.Reservation.project_id,
+                            models.Reservation.resource,
+                            models.Reservation.delta,
+                            session=session, read_deleted="no").\
+            filter(models.Reservation.expire < current_time).\
+            order_by(models.Reservation.id)
+        if limit:
+            query = query.limit(limit)
+        expired = query.all()
+        if not expired:
+            return 0
+        ids = [row.id for row in expired]
+
+        # Project totals are updated before the usages, like the atomic
+        # quota functions do.
+        totals = {}
+        for row in expired:
+            if row.delta > 0:
+                key = (row.project_id, row.resource)
+                totals[key] = totals.get(key, 0) + row.delta
+        for (project_id, resource), delta in sorted(totals.items()):
+            model_query(context, models.ProjectQuotaUsage,
+                        session=session, read_deleted="no").\
+                filter_by(project_id=project_id).\
+                filter_by(resource=resource).\
+                update({'total': models.ProjectQuotaUsage.total - delta},
+                       synchronize_session=False)
+
+        # Give the reserved quantities back with one UPDATE per usage
+        # row, summing the deltas of the expired reservations that are
+        # still there.
+        reserved = model_query(context, models.Reservation,
+                               func.coalesce(
+                                   func.sum(models.Reservation.delta), 0),
+                               session=session, read_deleted="no").\
+            filter(models.Reservation.id.in_(ids)).\
+            filter(models.Reservation.usage_id == models.QuotaUsage.id).\
+            filter(models.Reservation.delta > 0).\
+            as_scalar()
+        model_query(context, models.QuotaUsage,
+                    session=session, read_deleted="no").\
+            filter(models.QuotaUsage.id.in_(
+                set(row.usage_id for row in expired))).\
+            update({'reserved': models.QuotaUsage.reserved - reserved},
+                   synchronize_session=False)
 
-        for reservation in reservation_query.join(models.QuotaUsage).all():
-            if reservation.delta >= 0:
-                reservation.usage.reserved -= reservation.delta
-                session.add(reservation.usage)
+        return model_query(context, models.Reservation,
+                           session=session, read_deleted="no").\
+            filter(models.Reservation.id.in_(ids)).\
+            update({'deleted': 1,
+                    'deleted_at': timeutils.utcnow(),
+                    'updated_at': literal_column('updated_at')},
+                   synchronize_session=False)
+
+
+def _quota_usage_refresh_project(context, project_id):
+    """Recount the usages of a project in one transaction.
+
+    Usages with outstanding reservations are left alone: the resources
+    they reserve may already be counted, and committing the reservation
+    would count them again. Changed usages are written by one UPDATE.
+    """
+    session = get_session()
+    with session.begin():
+        actual = {}
+        for model, count_resource, size_resource in (
+                (models.Share, 'shares', 'gigabytes'),
+                (models.ShareSnapshot, 'snapshots', 'snapshot_gigabytes')):
+            rows = model_query(context, model, model.user_id,
+                               func.count(model.id), func.sum(model.size),
+                               session=session, read_deleted="no").\
+                filter_by(project_id=project_id).\
+                group_by(model.user_id).\
+                all()
+            for user_id, count, size in rows:
+                actual[(user_id, count_resource)] = count
+                actual[(user_id, size_resource)] = size or 0
+        rows = model_query(context, models.ShareNetwork,
+                           models.ShareNetwork.user_id,
+                           func.count(models.ShareNetwork.id),
+                           session=session, read_deleted="no").\
+            filter_by(project_id=project_id).\
+            group_by(models.ShareNetwork.user_id).\
+            all()
+        for user_id, count in rows:
+            actual[(user_id, 'share_networks')] = count
+
+        usages = model_query(context, models.QuotaUsage,
+                             models.QuotaUsage.id,
+                             models.QuotaUsage.user_id,
+                             models.QuotaUsage.resource,
+                             models.QuotaUsage.in_use,
+                             session=session, read_deleted="no").\
+            filter_by(project_id=project_id).\
+            all()
+        tracked = {}
+        in_use = {}
+        for usage_id, user_id, resource, tracked_use in usages:
+            actual_use = actual.get((user_id, resource), 0)
+            if tracked_use == actual_use:
+                continue
+            LOG.debug('quota_usages out of sync, updating. '
+                      'project_id: %(project_id)s, '
+                      'user_id: %(user_id)s, '
+                      'resource: %(res)s, '
+                      'tracked usage: %(tracked_use)s, '
+                      'actual usage: %(in_use)s',
+                      {'project_id': project_id,
+                       'user_id': user_id,
+                       'res': resource,
+                       'tracked_use': tracked_use,
+                       'in_use': actual_use})
+            tracked[usage_id] = tracked_use
+            in_use[usage_id] = actual_use
+        if not in_use:
+            return 0
+
+        reserving = model_query(context, models.Reservation,
+                                session=session, read_deleted="no").\
+            filter(models.Reservation.usage_id == models.QuotaUsage.id).\
+            exists()
+        # Leave rows changed by a concurrent commit, or reserved since they
+        # were counted, to the next run.
+        return model_query(context, models.QuotaUsage,
+                           session=session, read_deleted="no").\
+            filter(models.QuotaUsage.id.in_(list(in_use))).\
+            filter(models.QuotaUsage.in_use ==
+                   case(tracked, value=models.QuotaUsage.id)).\
+            filter(~reserving).\
+            update({'in_use': case(in_use, value=models.QuotaUsage.id)},
+                   synchronize_session=False)
 
-        reservation_query.update({'deleted': 1,
-                                  'deleted_at': timeutils.utcnow(),
-                                  'updated_at': literal_column('updated_at')},
-                                 synchronize_session=False)
+
+def _project_quota_usages_rebuild(context, project_id):
+    """Reset the project usage rows of a project to the sum of its usages.
+
+    Rows are read before the usages, so a row changed by a concurrent
+    reservation no longer matches its total and is skipped.
+    """
+    session = get_session()
+    with session.begin():
+        rows = model_query(context, models.ProjectQuotaUsage,
+                           models.ProjectQuotaUsage.id,
+                           models.ProjectQuotaUsage.resource,
+                           models.ProjectQuotaUsage.total,
+                           session=session, read_deleted="no").\
+            filter_by(project_id=project_id).\
+            all()
+        if not rows:
+            return
+        totals = dict(model_query(context, models.QuotaUsage,
+                                  models.QuotaUsage.resource,
+                                  func.sum(models.QuotaUsage.in_use +
+                                           models.QuotaUsage.reserved),
+                                  session=session, read_deleted="no").
+                      filter_by(project_id=project_id).
+                      group_by(models.QuotaUsage.resource).
+                      all())
+        # Same order as quota_reserve_atomic.
+        for row_id, resource, total in sorted(rows, key=lambda r: r[1]):
+            actual_total = totals.get(resource) or 0
+            if total == actual_total:
+                continue
+            model_query(context, models.ProjectQuotaUsage,
+                        session=session, read_deleted="no").\
+                filter_by(id=row_id, total=total).\
+                update({'total': actual_total}, synchronize_session=False)
+
+
+@require_admin_context
+def quota_usage_refresh_all(context):
+    """Recount the usages of every project, one project at a time."""
+    project_ids = [row[0] for row in
+                   model_query(context, models.QuotaUsage,
+                               models.QuotaUsage.project_id,
+                               read_deleted="no").distinct().all()]
+    updated = 0
+    for project_id in project_ids:
+        updated += _quota_usage_refresh_project(context, project_id)
+        _project_quota_usages_rebuild(context, project_id)
+    return updated
 
 
 ################
 
 
-def _share_get_query(context, session=None):
+def _sort_and_paginate_query(context, query, model, sort_key, sort_dir,
+                             limit=None, marker=None):
+    """Applies sorting and keyset pagination to a query.
+
+    Rows are ordered by the requested key with 'id' as a tie breaker, so
+    'marker' (the id of the last row of the previous page) unambiguously
+    identifies where the next page starts. Both the ordering and the
+    page boundary are evaluated by the database. The marker is looked up
+    through 'query', so rows the caller can not list are not found.
+
+    :param context: context to query under
+    :param query: query to be sorted and paginated
+    :param model: model class the query is built for
+    :param sort_key: attribute of 'model' to be used for sorting
+    :param sort_dir: desired direction of sorting, can be 'asc' and 'desc'
+    :param limit: maximum number of rows to return, all rows if None
+    :param marker: id of the last row seen by the caller
+    :returns: query with sorting and pagination criteria added
+    :raises: exception.InvalidInput, exception.MarkerNotFound
+    """
+    if not hasattr(model, sort_key):
+        msg = _("Wrong sorting key provided - '%s'.") % sort_key
+        raise exception.InvalidInput(reason=msg)
+    if sort_dir.lower() not in ('asc', 'desc'):
+        msg = _("Wrong sorting data provided: sort key is '%(sort_key)s' "
+                "and sort direction is '%(sort_dir)s'.") % {
+                    "sort_key": sort_key, "sort_dir": sort_dir}
+        raise exception.InvalidInput(reason=msg)
+
+    marker_ref = None
+    if marker is not None:
+        marker_ref = query.filter(model.id == marker).first()
+        if marker_ref is None:
+            raise exception.MarkerNotFound(marker=marker)
+
+    sort_keys = [sort_key]
+    if sort_key != 'id':
+        sort_keys.append('id')
+    try:
+        return db_utils.paginate_query(
+            query, model, limit, sort_keys, marker=marker_ref,
+            sort_dir=sort_dir.lower())
+    except db_exception.InvalidSortKey:
+        msg = _("Wrong sorting key provided - '%s'.") % sort_key
+        raise exception.InvalidInput(reason=msg)
+
+
+def _share_load_options(profile=None):
+    """Returns the loader options of a query of shares for a profile.
+
+    Without a profile, shares are loaded with their metadata and share
+    type joined, which suits single shares. Lists either load only the
+    columns of the summary views or load the relationships of all
+    listed shares with one query each.
+    """
+    if profile == constants.QUERY_PROFILE_SUMMARY:
+        return (load_only('id', 'display_name'),
+                noload('export_locations'))
+    elif profile == constants.QUERY_PROFILE_DETAIL:
+        return (subqueryload('share_metadata'),
+                subqueryload('share_type'),
+                subqueryload('export_locations'))
+    return (joinedload('share_metadata'),
+            joinedload('share_type'))
+
+
+def _share_get_query(context, session=None, profile=None):
+    """Returns a query of shares loading what the profile needs."""
     if session is None:
         session = get_session()
-    return model_query(context, models.Share, session=session).\
-        options(joinedload('share_metadata')).\
-        options(joinedload('share_type'))
+    query = model_query(context, models.Share, session=session)
+    return query.options(*_share_load_options(profile))
 
 
 def _metadata_refs(metadata_dict, meta_class):
@@ -1174,10 +1777,23 @@ def share_get(context, share_id, session=None):
     return result
 
 
+def _host_filter(host_attr, host):
+    """Returns a condition matching a host and all of its pools.
+
+    Pools are 'host#pool', they are matched with a single range rather than
+    LIKE so that the index on the host column is used and '_' or '%' in host
+    names are not taken as wildcards.
+    """
+    return and_(host_attr >= host, host_attr < host + '$',
+                or_(host_attr == host, host_attr >= host + '#'))
+
+
 @require_context
 def _share_get_all_with_filters(context, project_id=None, share_server_id=None,
                                 share_network_id=None, host=None, filters=None,
-                                is_public=False, sort_key=None, sort_dir=None):
+                                is_public=False, sort_key=None, sort_dir=None,
+                                limit=None, marker=None,
+                                profile=constants.QUERY_PROFILE_DETAIL):
     """Returns sorted list of shares that satisfies filters.
 
     :param context: context to query under
@@ -1185,19 +1801,27 @@ def _share_get_all_with_filters(context, project_id=None, share_server_id=None,
     :param share_server_id: share server that hosts shares
     :param share_network_id: share network that was used for shares
     :param host: host name where shares [and share servers] are located
-    :param filters: dict of filters to specify share selection
+    :param filters: dict of filters to specify share selection, 'metadata'
+                    and 'extra_specs' are dicts of key-value pairs that all
+                    should be matched, other keys are matched against share
+                    attributes
     :param is_public: public shares from other projects will be added
                       to result if True
     :param sort_key: key of models.Share to be used for sorting
     :param sort_dir: desired direction of sorting, can be 'asc' and 'desc'
+    :param limit: maximum number of shares to return
+    :param marker: ID of the last share of the previous page
+    :param profile: QUERY_PROFILE_SUMMARY to load only the ID and name of
+                    shares, QUERY_PROFILE_DETAIL to load them with their
+                    relationships
     :returns: list -- models.Share
-    :raises: exception.InvalidInput
+    :raises: exception.InvalidInput, exception.MarkerNotFound
     """
     if not sort_key:
         sort_key = 'created_at'
     if not sort_dir:
         sort_dir = 'desc'
-    query = _share_get_query(context)
+    query = model_query(context, models.Share)
     if project_id:
         if is_public:
             query = query.filter(or_(models.Share.project_id == project_id,
@@ -1209,45 +1833,40 @@ def _share_get_all_with_filters(context, project_id=None, share_server_id=None,
     if share_network_id:
         query = query.filter_by(share_network_id=share_network_id)
     if host and isinstance(host, six.string_types):
-        session = get_session()
-        with session.begin():
-            host_attr = getattr(models.Share, 'host')
-            conditions = [host_attr == host,
-                          host_attr.op('LIKE')(host + '#%')]
-            query = query.filter(or_(*conditions))
+        query = query.filter(_host_filter(models.Share.host, host))
 
     # Apply filters
-    if not filters:
-        filters = {}
-    if 'metadata' in filters:
-        for k, v in filters['metadata'].items():
-            query = query.filter(
-                or_(models.Share.share_metadata.any(  # pylint: disable=E1101
+    filters = dict(filters or {})
+    for k, v in filters.pop('metadata', {}).items():
+        query = query.filter(
+            models.Share.share_metadata.any(  # pylint: disable=E1101
+                key=k, value=v))
+    for k, v in filters.pop('extra_specs', {}).items():
+        # Each spec is checked with its own EXISTS clause, so shares are
+        # neither duplicated nor matched by a key and value that belong to
+        # different specs.
+        query = query.filter(
+            models.Share.share_type.has(  # pylint: disable=E1101
+                models.ShareTypes.extra_specs.any(  # pylint: disable=E1101
                     key=k, value=v)))
-    if 'extra_specs' in filters:
-        query = query.join(
-            models.ShareTypeExtraSpecs,
-            models.ShareTypeExtraSpecs.share_type_id ==
-            models.Share.share_type_id)
-        for k, v in filters['extra_specs'].items():
-            query = query.filter(or_(models.ShareTypeExtraSpecs.key == k,
-                                     models.ShareTypeExtraSpecs.value == v))
-
-    # Apply sorting
-    try:
-        attr = getattr(models.Share, sort_key)
-    except AttributeError:
-        msg = _("Wrong sorting key provided - '%s'.") % sort_key
-        raise exception.InvalidInput(reason=msg)
-    if sort_dir.lower() == 'desc':
-        query = query.order_by(attr.desc())
-    elif sort_dir.lower() == 'asc':
-        query = query.order_by(attr.asc())
-    else:
-        msg = _("Wrong sorting data provided: sort key is '%(sort_key)s' "
-                "and sort direction is '%(sort_dir)s'.") % {
-                    "sort_key": sort_key, "sort_dir": sort_dir}
-        raise exception.InvalidInput(reason=msg)
+    query, attr_filters = attrs_filter(query, models.Share, filters)
+    if attr_filters:
+        # The filters left are matched against the loaded shares, which
+        # may need more than the summary profile loads.
+        profile = constants.QUERY_PROFILE_DETAIL
+    query = query.options(*_share_load_options(profile))
+
+    if attr_filters:
+        # Page boundaries can only be found once these are matched.
+        query = _sort_and_paginate_query(
+            context, query, models.Share, sort_key, sort_dir)
+        return match_attrs(query.all(), attr_filters, limit=limit,
+                           marker=marker)
+
+    # Apply sorting and pagination
+    query = _sort_and_paginate_query(
+        context, query, models.Share, sort_key, sort_dir,
+        limit=limit, marker=marker)
 
     # Returns list of shares that satisfy filters.
     query = query.all()
@@ -1255,51 +1874,62 @@ def _share_get_all_with_filters(context, project_id=None, share_server_id=None,
 
 
 @require_admin_context
-def share_get_all(context, filters=None, sort_key=None, sort_dir=None):
+def share_get_all(context, filters=None, sort_key=None, sort_dir=None,
+                  limit=None, marker=None,
+                  profile=constants.QUERY_PROFILE_DETAIL):
     query = _share_get_all_with_filters(
-        context, filters=filters, sort_key=sort_key, sort_dir=sort_dir)
+        context, filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+        limit=limit, marker=marker, profile=profile)
     return query
 
 
 @require_admin_context
 def share_get_all_by_host(context, host, filters=None,
-                          sort_key=None, sort_dir=None):
+                          sort_key=None, sort_dir=None, limit=None,
+                          marker=None):
     """Retrieves all shares hosted on a host."""
     query = _share_get_all_with_filters(
         context, host=host, filters=filters,
-        sort_key=sort_key, sort_dir=sort_dir,
+        sort_key=sort_key, sort_dir=sort_dir, limit=limit, marker=marker,
     )
     return query
 
 
 @require_context
 def share_get_all_by_project(context, project_id, filters=None,
-                             is_public=False, sort_key=None, sort_dir=None):
+                             is_public=False, sort_key=None, sort_dir=None,
+                             limit=None, marker=None,
+                             profile=constants.QUERY_PROFILE_DETAIL):
     """Returns list of shares with given project ID."""
     query = _share_get_all_with_filters(
         context, project_id=project_id, filters=filters, is_public=is_public,
-        sort_key=sort_key, sort_dir=sort_dir,
+        sort_key=sort_key, sort_dir=sort_dir, limit=limit, marker=marker,
+        profile=profile,
     )
     return query
 
 
 @require_context
 def share_get_all_by_share_network(context, share_network_id, filters=None,
-                                   sort_key=None, sort_dir=None):
+                                   sort_key=None, sort_dir=None, limit=None,
+                                   marker=None):
     """Returns list of shares that belong to given share network."""
     query = _share_get_all_with_filters(
         context, share_network_id=share_network_id, filters=filters,
-        sort_key=sort_key, sort_dir=sort_dir)
+        sort_key=sort_key, sort_dir=sort_dir, limit=limit, marker=marker)
     return query
 
 
 @require_context
 def share_get_all_by_share_server(context, share_server_id, filters=None,
-                                  sort_key=None, sort_dir=None):
+                                  sort_key=None, sort_dir=None, limit=None,
+                                  marker=None,
+                                  profile=constants.QUERY_PROFILE_DETAIL):
     """Returns list of shares with given share server."""
     query = _share_get_all_with_filters(
         context, share_server_id=share_server_id, filters=filters,
-        sort_key=sort_key, sort_dir=sort_dir,
+        sort_key=sort_key, sort_dir=sort_dir, limit=limit, marker=marker,
+        profile=profile,
     )
     return query
 
@@ -1363,6 +1993,19 @@ def share_access_get_all_for_share(context, share_id):
                                    {'share_id': share_id}).all()
 
 
+@require_admin_context
+def share_access_get_all_for_host(context, host):
+    """Returns access rules of all shares hosted on a host."""
+    session = get_session()
+    query = model_query(context, models.ShareAccessMapping, session=session)
+    query = query.join(
+        models.Share,
+        models.Share.id == models.ShareAccessMapping.share_id)
+    return query.filter(
+        models.Share.deleted == 'False',
+        _host_filter(models.Share.host, host)).all()
+
+
 @require_context
 def share_access_get_all_by_type_and_access(context, share_id, access_type,
                                             access):
@@ -1456,9 +2099,10 @@ def share_snapshot_get(context, snapshot_id, session=None):
     return result
 
 
-def _share_snapshot_get_all_with_filters(context, project_id=None,
-                                         share_id=None, filters=None,
-                                         sort_key=None, sort_dir=None):
+def _share_snapshot_get_all_with_filters(
+        context, project_id=None, share_id=None, filters=None,
+        sort_key=None, sort_dir=None, limit=None, marker=None,
+        profile=constants.QUERY_PROFILE_DETAIL):
     # Init data
     sort_key = sort_key or 'share_id'
     sort_dir = sort_dir or 'desc'
@@ -1469,7 +2113,6 @@ def _share_snapshot_get_all_with_filters(context, project_id=None,
         query = query.filter_by(project_id=project_id)
     if share_id:
         query = query.filter_by(share_id=share_id)
-    query = query.options(joinedload('share'))
 
     # Apply filters
     if 'usage' in filters:
@@ -1488,22 +2131,31 @@ def _share_snapshot_get_all_with_filters(context, project_id=None,
                         'key': filters['usage'],
                         'ek': six.text_type(usage_filter_keys)}
             raise exception.InvalidInput(reason=msg)
-
-    # Apply sorting
-    try:
-        attr = getattr(models.ShareSnapshot, sort_key)
-    except AttributeError:
-        msg = _("Wrong sorting key provided - '%s'.") % sort_key
-        raise exception.InvalidInput(reason=msg)
-    if sort_dir.lower() == 'desc':
-        query = query.order_by(attr.desc())
-    elif sort_dir.lower() == 'asc':
-        query = query.order_by(attr.asc())
+    query, attr_filters = attrs_filter(
+        query, models.ShareSnapshot,
+        dict((k, v) for k, v in filters.items() if k != 'usage'))
+    if attr_filters:
+        # The filters left are matched against the loaded snapshots, which
+        # may need more than the summary profile loads.
+        profile = constants.QUERY_PROFILE_DETAIL
+    if profile == constants.QUERY_PROFILE_SUMMARY:
+        query = query.options(load_only('id', 'display_name'),
+                              noload('share'))
     else:
-        msg = _("Wrong sorting data provided: sort key is '%(sort_key)s' "
-                "and sort direction is '%(sort_dir)s'.") % {
-                    "sort_key": sort_key, "sort_dir": sort_dir}
-        raise exception.InvalidInput(reason=msg)
+        query = query.options(
+            subqueryload('share').subqueryload('export_locations'))
+
+    if attr_filters:
+        # Page boundaries can only be found once these are matched.
+        query = _sort_and_paginate_query(
+            context, query, models.ShareSnapshot, sort_key, sort_dir)
+        return match_attrs(query.all(), attr_filters, limit=limit,
+                           marker=marker)
+
+    # Apply sorting and pagination
+    query = _sort_and_paginate_query(
+        context, query, models.ShareSnapshot, sort_key, sort_dir,
+        limit=limit, marker=marker)
 
     # Returns list of shares that satisfy filters
     return query.all()
@@ -1511,28 +2163,35 @@ def _share_snapshot_get_all_with_filters(context, project_id=None,
 
 @require_admin_context
 def share_snapshot_get_all(context, filters=None, sort_key=None,
-                           sort_dir=None):
+                           sort_dir=None, limit=None, marker=None,
+                           profile=constants.QUERY_PROFILE_DETAIL):
     return _share_snapshot_get_all_with_filters(
         context, filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+        limit=limit, marker=marker, profile=profile,
     )
 
 
 @require_context
 def share_snapshot_get_all_by_project(context, project_id, filters=None,
-                                      sort_key=None, sort_dir=None):
+                                      sort_key=None, sort_dir=None,
+                                      limit=None, marker=None,
+                                      profile=constants.QUERY_PROFILE_DETAIL):
     authorize_project_context(context, project_id)
     return _share_snapshot_get_all_with_filters(
         context, project_id=project_id,
         filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+        limit=limit, marker=marker, profile=profile,
     )
 
 
 @require_context
 def share_snapshot_get_all_for_share(context, share_id, filters=None,
-                                     sort_key=None, sort_dir=None):
+                                     sort_key=None, sort_dir=None, limit=None,
+                                     marker=None):
     return _share_snapshot_get_all_with_filters(
         context, share_id=share_id,
         filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+        limit=limit, marker=marker,
     )
 
 
@@ -2108,46 +2767,50 @@ def driver_private_data_get(context, host, entity_id, key=None,
 @require_context
 def driver_private_data_update(context, host, entity_id, details,
                                delete_existing=False, session=None):
-    # NOTE(u_glide): following code modifies details dict, that's why we should
-    # copy it
-    new_details = copy.deepcopy(details)
+    new_details = dict((key, six.text_type(value))
+                       for key, value in details.items())
 
     if not session:
         session = get_session()
 
     with session.begin():
-        # Process existing data
-        # NOTE(u_glide): read_deleted=None means here 'read all'
-        original_data = _driver_private_data_query(
-            session, context, host, entity_id, read_deleted=None).all()
-
-        for data_ref in original_data:
-            in_new_details = data_ref['key'] in new_details
-
-            if in_new_details:
-                new_value = six.text_type(new_details.pop(data_ref['key']))
-                data_ref.update({
-                    "value": new_value,
-                    "deleted": 0,
-                    "deleted_at": None
-                })
-                data_ref.save(session=session)
-            elif delete_existing and data_ref['deleted'] != 1:
-                data_ref.update({
-                    "deleted": 1, "deleted_at": timeutils.utcnow()
-                })
-                data_ref.save(session=session)
-
-        # Add new data
-        for key, value in new_details.items():
-            data_ref = models.DriverPrivateData()
-            data_ref.update({
-                "host": host,
-                "entity_uuid": entity_id,
-                "key": key,
-                "value": six.text_type(value)
-            })
-            data_ref.save(session=session)
+        # NOTE: all keys are written with at most three statements, existing
+        # rows, including soft-deleted ones, are updated in place and the
+        # others are inserted at once.
+        existing_keys = set(
+            row.key for row in session.query(
+                models.DriverPrivateData.key).filter_by(
+                    host=host, entity_uuid=entity_id))
+        updated_keys = [key for key in new_details if key in existing_keys]
+
+        if updated_keys:
+            session.query(models.DriverPrivateData).filter_by(
+                host=host, entity_uuid=entity_id).filter(
+                    models.DriverPrivateData.key.in_(updated_keys)).update(
+                        {"value": case(
+                            dict((key, new_details[key])
+                                 for key in updated_keys),
+                            value=models.DriverPrivateData.key),
+                         "deleted": 0,
+                         "deleted_at": None},
+                        synchronize_session=False)
+
+        if delete_existing:
+            query = _driver_private_data_query(
+                session, context, host, entity_id)
+            if new_details:
+                query = query.filter(
+                    ~models.DriverPrivateData.key.in_(list(new_details)))
+            query.update({"deleted": 1, "deleted_at": timeutils.utcnow()},
+                         synchronize_session=False)
+
+        added = [{"host": host, "entity_uuid": entity_id,
+                  "key": key, "value": value}
+                 for key, value in new_details.items()
+                 if key not in existing_keys]
+        if added:
+            session.execute(models.DriverPrivateData.__table__.insert(),
+                            added)
 
         return details
 
@@ -138,6 +138,26 @@ class QuotaUsage(BASE, ManilaBase):
     until_refresh = Column(Integer, nullable=True)
 
 
+class ProjectQuotaUsage(BASE, ManilaBase):
+    """Represents the usage of a resource by all the users of a project.
+
+    Kept by the atomic quota driver, so that the project limit is checked
+    with a conditional update of one row.
+    """
+
+    __tablename__ = 'project_quota_usages'
+    __table_args__ = (schema.UniqueConstraint(
+        'project_id', 'resource', 'deleted',
+        name='uniq_project_quota_usages0project_id0resource0deleted'),
+    )
+    id = Column(Integer, primary_key=True)
+
+    project_id = Column(String(255), nullable=False)
+    resource = Column(String(255), nullable=False)
+
+    total = Column(Integer, nullable=False, default=0)
+
+
 class Reservation(BASE, ManilaBase):
     """Represents a resource reservation for quotas."""
 
@@ -164,6 +184,14 @@ class Reservation(BASE, ManilaBase):
 class Share(BASE, ManilaBase):
     """Represents an NFS and CIFS shares."""
     __tablename__ = 'shares'
+    __table_args__ = (
+        schema.Index('shares_project_id_deleted_idx', 'project_id', 'deleted'),
+        schema.Index('shares_deleted_host_idx', 'deleted', 'host'),
+        schema.Index('shares_share_server_id_deleted_idx',
+                     'share_server_id', 'deleted'),
+        schema.Index('shares_share_network_id_deleted_idx',
+                     'share_network_id', 'deleted'),
+    )
 
     @property
     def name(self):
@@ -207,6 +235,10 @@ class Share(BASE, ManilaBase):
 class ShareExportLocations(BASE, ManilaBase):
     """Represents export locations of shares."""
     __tablename__ = 'share_export_locations'
+    __table_args__ = (
+        schema.Index('share_export_locations_share_id_deleted_idx',
+                     'share_id', 'deleted'),
+    )
 
     id = Column(Integer, primary_key=True)
     share_id = Column(String(36), ForeignKey('shares.id'), nullable=False)
@@ -291,6 +323,10 @@ class ShareAccessMapping(BASE, ManilaBase):
     STATE_ERROR = 'error'
 
     __tablename__ = 'share_access_map'
+    __table_args__ = (
+        schema.Index('share_access_map_share_id_deleted_idx',
+                     'share_id', 'deleted'),
+    )
     id = Column(String(36), primary_key=True)
     deleted = Column(String(36), default='False')
     share_id = Column(String(36), ForeignKey('shares.id'))
@@ -306,6 +342,12 @@ class ShareAccessMapping(BASE, ManilaBase):
 class ShareSnapshot(BASE, ManilaBase):
     """Represents a snapshot of a share."""
     __tablename__ = 'share_snapshots'
+    __table_args__ = (
+        schema.Index('share_snapshots_share_id_deleted_idx',
+                     'share_id', 'deleted'),
+        schema.Index('share_snapshots_project_id_deleted_idx',
+                     'project_id', 'deleted'),
+    )
 
     @property
     def name(self):
@@ -173,6 +173,10 @@ class NotFound(ManilaException):
     safe = True
 
 
+class MarkerNotFound(NotFound):
+    message = _("Marker %(marker)s could not be found.")
+
+
 class InUse(ManilaException):
     message = _("Resource is in use.")
 
@@ -51,16 +51,29 @@ This module provides Manager, a base class for managers.
 
 """
 
+import time
+
+import eventlet
 from oslo_config import cfg
 from oslo_log import log
 import six
 
 from manila.db import base
 from manila.i18n import _LE
+from manila.i18n import _LW
 from manila.scheduler import rpcapi as scheduler_rpcapi
 from manila import version
 
+periodic_opts = [
+    cfg.IntOpt('periodic_task_timeout',
+               default=0,
+               help='Seconds after which a periodic task which is still '
+                    'running is interrupted, unless the task sets its own '
+                    'timeout. 0 means no timeout.'),
+]
+
 CONF = cfg.CONF
+CONF.register_opts(periodic_opts)
 LOG = log.getLogger(__name__)
 
 
@@ -74,10 +87,16 @@ def periodic_task(*args, **kwargs):
 
         2. With arguments, @periodic_task(ticks_between_runs=N), this will be
            run on every N ticks of the periodic scheduler.
+
+    Instead of ticks, 'spacing' sets the minimum number of seconds between
+    the starts of two runs, and 'timeout' the number of seconds after which
+    a run is interrupted, overriding the periodic_task_timeout option.
     """
     def decorator(f):
         f._periodic_task = True
         f._ticks_between_runs = kwargs.pop('ticks_between_runs', 0)
+        f._periodic_spacing = kwargs.pop('spacing', None)
+        f._periodic_timeout = kwargs.pop('timeout', None)
         return f
 
     # NOTE(sirp): The `if` is necessary to allow the decorator to be used with
@@ -149,33 +168,105 @@ class Manager(base.Base):
             host = CONF.host
         self.host = host
         self.additional_endpoints = []
+        self._periodic_last_run = {}
+        self._periodic_threads = {}
+        self._periodic_task_stats = {}
         super(Manager, self).__init__(db_driver)
 
     def periodic_tasks(self, context, raise_on_error=False):
-        """Tasks to be run at a periodic interval."""
+        """Tasks to be run at a periodic interval.
+
+        Each task which is due is run in its own greenthread, so that a slow
+        task does not hold back the others. A task whose previous run is
+        still in progress is skipped. With raise_on_error, tasks are run one
+        after another and the first error is raised.
+        """
         for task_name, task in self._periodic_tasks:
             full_task_name = '.'.join([self.__class__.__name__, task_name])
 
-            ticks_to_skip = self._ticks_to_skip[task_name]
-            if ticks_to_skip > 0:
-                LOG.debug("Skipping %(full_task_name)s, %(ticks_to_skip)s"
-                          " ticks left until next run",
-                          {'full_task_name': full_task_name,
-                           'ticks_to_skip': ticks_to_skip})
-                self._ticks_to_skip[task_name] -= 1
+            if not self._periodic_task_due(task_name, task, full_task_name):
+                continue
+
+            thread = self._periodic_threads.get(task_name)
+            if thread is not None and not thread.dead:
+                LOG.warning(_LW("Skipping %s, its previous run is still in "
+                                "progress."), full_task_name)
+                self._get_periodic_task_stats(task_name)['skipped'] += 1
                 continue
 
             self._ticks_to_skip[task_name] = task._ticks_between_runs
+            self._periodic_last_run[task_name] = time.time()
             LOG.debug("Running periodic task %(full_task_name)s",
                       {'full_task_name': full_task_name})
 
-            try:
-                task(self, context)
-            except Exception as e:
-                if raise_on_error:
-                    raise
-                LOG.exception(_LE("Error during %(full_task_name)s: %(e)s"),
-                              {'full_task_name': full_task_name, 'e': e})
+            if raise_on_error:
+                self._run_periodic_task(task_name, task, context, True)
+            else:
+                self._periodic_threads[task_name] = eventlet.spawn(
+                    self._run_periodic_task, task_name, task, context, False)
+
+    def _periodic_task_due(self, task_name, task, full_task_name):
+        if task._periodic_spacing is not None:
+            last_run = self._periodic_last_run.get(task_name)
+            return (last_run is None or
+                    time.time() - last_run >= task._periodic_spacing)
+
+        ticks_to_skip = self._ticks_to_skip[task_name]
+        if ticks_to_skip > 0:
+            LOG.debug("Skipping %(full_task_name)s, %(ticks_to_skip)s"
+                      " ticks left until next run",
+                      {'full_task_name': full_task_name,
+                       'ticks_to_skip': ticks_to_skip})
+            self._ticks_to_skip[task_name] -= 1
+            return False
+        return True
+
+    def _run_periodic_task(self, task_name, task, context, raise_on_error):
+        full_task_name = '.'.join([self.__class__.__name__, task_name])
+        stats = self._get_periodic_task_stats(task_name)
+        timeout = task._periodic_timeout
+        if timeout is None:
+            timeout = CONF.periodic_task_timeout
+
+        start = time.time()
+        timer = eventlet.Timeout(timeout or None)
+        try:
+            task(self, context)
+        except eventlet.Timeout as e:
+            if e is not timer:
+                raise
+            stats['timeouts'] += 1
+            if raise_on_error:
+                raise
+            LOG.error(_LE("%(full_task_name)s did not complete within "
+                          "%(timeout)s seconds and was interrupted."),
+                      {'full_task_name': full_task_name, 'timeout': timeout})
+        except Exception as e:
+            stats['failures'] += 1
+            if raise_on_error:
+                raise
+            LOG.exception(_LE("Error during %(full_task_name)s: %(e)s"),
+                          {'full_task_name': full_task_name, 'e': e})
+        finally:
+            timer.cancel()
+            duration = time.time() - start
+            stats['runs'] += 1
+            stats['last_duration'] = duration
+            stats['max_duration'] = max(stats['max_duration'], duration)
+            LOG.debug("Periodic task %(full_task_name)s took %(duration).3f "
+                      "seconds", {'full_task_name': full_task_name,
+                                  'duration': duration})
+
+    def _get_periodic_task_stats(self, task_name):
+        return self._periodic_task_stats.setdefault(
+            task_name, {'runs': 0, 'failures': 0, 'timeouts': 0,
+                        'skipped': 0, 'last_duration': None,
+                        'max_duration': 0.0})
+
+    def get_periodic_task_stats(self):
+        """Get run counters and durations of the periodic tasks, by name."""
+        return dict((name, dict(stats)) for name, stats
+                    in self._periodic_task_stats.items())
 
     def init_host(self):
         """Handle initialization if this is a standalone service.
@@ -32,6 +32,7 @@ import manila.compute.nova
 import manila.db.api
 import manila.db.base
 import manila.exception
+import manila.manager
 import manila.network
 import manila.network.linux.interface
 import manila.network.neutron.api
@@ -85,6 +86,7 @@ _global_opt_lists = [
     manila.db.api.db_opts,
     [manila.db.base.db_driver_opt],
     manila.exception.exc_log_opts,
+    manila.manager.periodic_opts,
     manila.network.linux.interface.OPTS,
     manila.network.network_opts,
     manila.network.neutron.api.neutron_opts,
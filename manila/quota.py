@@ -17,6 +17,7 @@
 """Quotas for shares."""
 
 import datetime
+import time
 
 from oslo_config import cfg
 from oslo_log import log
@@ -27,6 +28,7 @@ import six
 from manila import db
 from manila import exception
 from manila.i18n import _LE
+from manila.i18n import _LW
 
 LOG = log.getLogger(__name__)
 
@@ -49,6 +51,16 @@ quota_opts = [
     cfg.IntOpt('reservation_expire',
                default=86400,
                help='Number of seconds until a reservation expires.'),
+    cfg.IntOpt('reservation_expire_batch_size',
+               default=1000,
+               help='Number of expired reservations rolled back per '
+                    'database transaction. 0 rolls all of them back at '
+                    'once.'),
+    cfg.IntOpt('reservation_expire_time_budget',
+               default=60,
+               help='Number of seconds a run of reservation expiry may '
+                    'last, the remaining reservations are left for the '
+                    'next run. 0 means no limit.'),
     cfg.IntOpt('until_refresh',
                default=0,
                help='Count of reservations until usage is refreshed.'),
@@ -57,7 +69,13 @@ quota_opts = [
                help='Number of seconds between subsequent usage refreshes.'),
     cfg.StrOpt('quota_driver',
                default='manila.quota.DbQuotaDriver',
-               help='Default driver to use for quota checks.'), ]
+               help='Default driver to use for quota checks.'),
+    cfg.IntOpt('quota_limits_cache_ttl',
+               default=5,
+               help='Number of seconds the quota limits of a project or '
+                    'user are cached for by the quota checks of a process. '
+                    'Changes made through other processes may take that '
+                    'long to be enforced. 0 disables the cache.'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(quota_opts)
@@ -70,6 +88,13 @@ class DbQuotaDriver(object):
     quota information.  The default driver utilizes the local
     database.
     """
+
+    # Limits cache entries are dropped once there are more than that many.
+    _limits_cache_size = 1024
+
+    def __init__(self):
+        self._limits = {}
+
     def get_by_project_and_user(self, context, project_id, user_id, resource):
         """Get a specific quota by project and user."""
 
@@ -318,19 +343,88 @@ class DbQuotaDriver(object):
             unknown = desired - set(sub_resources.keys())
             raise exception.QuotaResourceUnknown(unknown=sorted(unknown))
 
+        limits = self._get_limits(context, resources, project_id, user_id)
+        return dict((k, limits[k]) for k in sub_resources)
+
+    def _get_limits(self, context, resources, project_id, user_id):
+        """Retrieve the limits of all resources for a project or user.
+
+        Limits are cached for quota_limits_cache_ttl seconds, keyed by
+        project, user and quota class.
+        """
+        key = (project_id or context.project_id, user_id,
+               context.quota_class)
+        now = time.time()
+        cached = self._limits.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
         if user_id:
             # Grab and return the quotas (without usages)
-            quotas = self.get_user_quotas(context, sub_resources,
+            quotas = self.get_user_quotas(context, resources,
                                           project_id, user_id,
                                           context.quota_class, usages=False)
         else:
             # Grab and return the quotas (without usages)
-            quotas = self.get_project_quotas(context, sub_resources,
+            quotas = self.get_project_quotas(context, resources,
                                              project_id,
                                              context.quota_class,
                                              usages=False)
+        limits = dict((k, v['limit']) for k, v in quotas.items())
+
+        if CONF.quota_limits_cache_ttl > 0:
+            if len(self._limits) >= self._limits_cache_size:
+                self._limits = dict(item for item in self._limits.items()
+                                    if item[1][0] > now)
+            self._limits[key] = (now + CONF.quota_limits_cache_ttl, limits)
+        return limits
+
+    def update_quota(self, context, project_id, resource, limit,
+                     user_id=None):
+        """Set the limit of a resource for a project or a user.
+
+        :param context: The request context, for access checks.
+        :param project_id: The ID of the project.
+        :param resource: The name of the resource.
+        :param limit: The new limit.
+        :param user_id: The ID of the user, None for the project quota.
+        """
+
+        try:
+            db.quota_create(context, project_id, resource, limit,
+                            user_id=user_id)
+        except exception.QuotaExists:
+            db.quota_update(context, project_id, resource, limit,
+                            user_id=user_id)
+        self.invalidate_limits(project_id)
+
+    def update_class_quota(self, context, quota_class, resource, limit):
+        """Set the limit of a resource for a quota class.
 
-        return dict((k, v['limit']) for k, v in quotas.items())
+        :param context: The request context, for access checks.
+        :param quota_class: The name of the quota class.
+        :param resource: The name of the resource.
+        :param limit: The new limit.
+        """
+
+        try:
+            db.quota_class_update(context, quota_class, resource, limit)
+        except exception.QuotaClassNotFound:
+            db.quota_class_create(context, quota_class, resource, limit)
+        self.invalidate_limits()
+
+    def invalidate_limits(self, project_id=None):
+        """Drop the cached quota limits of a project or of all projects.
+
+        :param project_id: The ID of the project whose quotas changed,
+                           None if quota classes changed.
+        """
+        if project_id is None:
+            self._limits = {}
+        else:
+            for key in list(self._limits):
+                if key[0] == project_id:
+                    self._limits.pop(key, None)
 
     def limit_check(self, context, resources, values, project_id=None,
                     user_id=None):
@@ -460,6 +554,11 @@ class DbQuotaDriver(object):
         #            which means access to the session.  Since the
         #            session isn't available outside the DBAPI, we
         #            have to do the work there.
+        return self._reserve(context, resources, quotas, user_quotas, deltas,
+                             expire, project_id, user_id)
+
+    def _reserve(self, context, resources, quotas, user_quotas, deltas,
+                 expire, project_id, user_id):
         return db.quota_reserve(context, resources, quotas, user_quotas,
                                 deltas, expire,
                                 CONF.until_refresh, CONF.max_age,
@@ -553,6 +652,7 @@ class DbQuotaDriver(object):
         """
 
         db.quota_destroy_all_by_project(context, project_id)
+        self.invalidate_limits(project_id)
 
     def destroy_all_by_project_and_user(self, context, project_id, user_id):
         """Destroy metadata associated with a project and user.
@@ -566,6 +666,7 @@ class DbQuotaDriver(object):
         """
 
         db.quota_destroy_all_by_project_and_user(context, project_id, user_id)
+        self.invalidate_limits(project_id)
 
     def expire(self, context):
         """Expire reservations.
@@ -573,10 +674,68 @@ class DbQuotaDriver(object):
         Explores all currently existing reservations and rolls back
         any that have expired.
 
+        Reservations are rolled back in batches of
+        reservation_expire_batch_size until none is left or
+        reservation_expire_time_budget is exhausted.  Returns the number
+        of reservations rolled back.
+
+        :param context: The request context, for access checks.
+        """
+
+        batch_size = CONF.reservation_expire_batch_size
+        deadline = None
+        if CONF.reservation_expire_time_budget > 0:
+            deadline = time.time() + CONF.reservation_expire_time_budget
+
+        expired = 0
+        while True:
+            count = db.reservation_expire(context, limit=batch_size or None)
+            expired += count
+            if not batch_size or count < batch_size:
+                break
+            if deadline and time.time() >= deadline:
+                LOG.warning(_LW("Reservation expiry stopped after rolling "
+                                "back %d reservations, the remaining ones "
+                                "are left for the next run."), expired)
+                break
+        return expired
+
+    def usage_refresh(self, context):
+        """Recompute the in_use counts of the usages of all projects.
+
         :param context: The request context, for access checks.
         """
 
-        db.reservation_expire(context)
+        return db.quota_usage_refresh_all(context)
+
+
+class AtomicDbQuotaDriver(DbQuotaDriver):
+    """Database Quota driver using conditional updates.
+
+    Quota limits are checked by the UPDATE statements changing the
+    reserved and in_use counters, so concurrent reservations of a
+    project do not hold locks on all of its usages for the whole
+    transaction.  The project limit is checked against one total per
+    project and resource, kept in the project_quota_usages table.
+    Usages are only refreshed when they are created or have been reset;
+    until_refresh and max_age are not used.
+    """
+
+    def _reserve(self, context, resources, quotas, user_quotas, deltas,
+                 expire, project_id, user_id):
+        return db.quota_reserve_atomic(context, resources, quotas,
+                                       user_quotas, deltas, expire,
+                                       project_id=project_id,
+                                       user_id=user_id)
+
+    def commit(self, context, reservations, project_id=None, user_id=None):
+        db.reservation_commit_atomic(context, reservations,
+                                     project_id=project_id, user_id=user_id)
+
+    def rollback(self, context, reservations, project_id=None, user_id=None):
+        db.reservation_rollback_atomic(context, reservations,
+                                       project_id=project_id,
+                                       user_id=user_id)
 
 
 class BaseResource(object):
@@ -1055,6 +1214,45 @@ class QuotaEngine(object):
 
         self._driver.destroy_all_by_project(context, project_id)
 
+    def update_quota(self, context, project_id, resource, limit,
+                     user_id=None):
+        """Set the limit of a resource for a project or a user.
+
+        :param context: The request context, for access checks.
+        :param project_id: The ID of the project.
+        :param resource: The name of the resource.
+        :param limit: The new limit.
+        :param user_id: The ID of the user, None for the project quota.
+        """
+
+        self._driver.update_quota(context, project_id, resource, limit,
+                                  user_id=user_id)
+
+    def update_class_quota(self, context, quota_class, resource, limit):
+        """Set the limit of a resource for a quota class.
+
+        :param context: The request context, for access checks.
+        :param quota_class: The name of the quota class.
+        :param resource: The name of the resource.
+        :param limit: The new limit.
+        """
+
+        self._driver.update_class_quota(context, quota_class, resource,
+                                        limit)
+
+    def invalidate_limits(self, project_id=None):
+        """Drop cached quota limits after quotas have been changed.
+
+        Drivers without a limits cache are left alone.
+
+        :param project_id: The ID of the project whose quotas changed,
+                           None if quota classes changed.
+        """
+
+        invalidate_limits = getattr(self._driver, 'invalidate_limits', None)
+        if invalidate_limits:
+            invalidate_limits(project_id)
+
     def expire(self, context):
         """Expire reservations.
 
@@ -1064,7 +1262,15 @@ class QuotaEngine(object):
         :param context: The request context, for access checks.
         """
 
-        self._driver.expire(context)
+        return self._driver.expire(context)
+
+    def usage_refresh(self, context):
+        """Recompute the in_use counts of the usages of all projects.
+
+        :param context: The request context, for access checks.
+        """
+
+        return self._driver.usage_refresh(context)
 
     @property
     def resources(self):
@@ -19,12 +19,17 @@
 Scheduler base class that all Schedulers should inherit from
 """
 
+import copy
+
 from oslo_config import cfg
+from oslo_log import log
 from oslo_utils import importutils
 from oslo_utils import timeutils
 
 from manila import db
+from manila import exception
 from manila.i18n import _
+from manila.i18n import _LE
 from manila.share import rpcapi as share_rpcapi
 from manila import utils
 
@@ -39,6 +44,7 @@ scheduler_driver_opts = [
 
 CONF = cfg.CONF
 CONF.register_opts(scheduler_driver_opts)
+LOG = log.getLogger(__name__)
 
 
 def share_update_db(context, share_id, host):
@@ -89,6 +95,27 @@ class Scheduler(object):
         """Must override schedule method for scheduler to work."""
         raise NotImplementedError(_("Must implement schedule_create_share"))
 
+    def schedule_create_shares(self, context, request_specs,
+                               filter_properties):
+        """Schedule a batch of shares one by one.
+
+        Schedulers able to place several shares at once should override it.
+
+        :returns: list of (request_spec, exception) tuples for the shares
+                  that could not be scheduled.
+        """
+        failures = []
+        for request_spec in request_specs:
+            try:
+                self.schedule_create_share(
+                    context, request_spec, copy.deepcopy(filter_properties))
+            except Exception as ex:
+                if not isinstance(ex, exception.NoValidHost):
+                    LOG.exception(_LE("Failed to schedule share %s."),
+                                  request_spec.get('share_id'))
+                failures.append((request_spec, ex))
+        return failures
+
     def get_pools(self, context, filters):
         """Must override schedule method for scheduler to work."""
         raise NotImplementedError(_("Must implement get_pools"))
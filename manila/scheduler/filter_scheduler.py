@@ -20,6 +20,9 @@ You can customize this scheduler by specifying your own share Filters and
 Weighing Functions.
 """
 
+import collections
+import copy
+
 from oslo_config import cfg
 from oslo_log import log
 
@@ -91,6 +94,94 @@ class FilterScheduler(driver.Scheduler):
         if not weighed_host:
             raise exception.NoValidHost(reason="")
 
+        self._create_share_on_host(context, request_spec, filter_properties,
+                                   weighed_host)
+
+    def schedule_create_shares(self, context, request_specs,
+                               filter_properties):
+        """Place a batch of shares in one filtering and weighing pass.
+
+        Shares requesting the same share type, availability zone and
+        protocol are filtered and weighed together. Each share of the
+        group then takes the next weighed pool that still fits it, and
+        its size is virtually consumed from that pool before the next
+        share is placed.
+        """
+        groups = collections.OrderedDict()
+        for request_spec in request_specs:
+            share_properties = request_spec['share_properties']
+            key = (share_properties.get('share_type_id'),
+                   share_properties.get('availability_zone'),
+                   share_properties.get('share_proto'))
+            groups.setdefault(key, []).append(request_spec)
+
+        failures = []
+        for group in groups.values():
+            failures.extend(
+                self._schedule_share_group(context, group, filter_properties))
+        return failures
+
+    def _schedule_share_group(self, context, request_specs,
+                              filter_properties):
+        failures = []
+        scheduled = []
+        for request_spec in request_specs:
+            try:
+                properties = self._get_share_filter_properties(
+                    context, request_spec, copy.deepcopy(filter_properties))
+            except exception.NoValidHost as ex:
+                failures.append((request_spec, ex))
+            else:
+                scheduled.append((request_spec, properties))
+        if not scheduled:
+            return failures
+
+        # Pools able to host the smallest share of the group are the only
+        # candidates for the rest of it.
+        smallest = min((properties for request_spec, properties in scheduled),
+                       key=lambda properties: properties['size'])
+        hosts = self.host_manager.get_all_host_states_share(
+            context.elevated())
+        hosts = self.host_manager.get_filtered_hosts(hosts, smallest)
+        weighed_hosts = collections.deque(
+            self.host_manager.get_weighed_hosts(hosts, smallest)
+            if hosts else [])
+        LOG.debug("Choosing for %(count)d shares from: %(hosts)s",
+                  {"count": len(scheduled), "hosts": list(weighed_hosts)})
+
+        for request_spec, properties in scheduled:
+            weighed_host = self._get_fitting_host(weighed_hosts, properties)
+            if not weighed_host:
+                failures.append(
+                    (request_spec, exception.NoValidHost(reason="")))
+                continue
+            weighed_host.obj.consume_from_share(
+                request_spec['share_properties'])
+            try:
+                self._create_share_on_host(context, request_spec, properties,
+                                           weighed_host)
+            except Exception as ex:
+                LOG.exception(_LE("Failed to schedule share %s."),
+                              request_spec['share_id'])
+                failures.append((request_spec, ex))
+        return failures
+
+    def _get_fitting_host(self, weighed_hosts, filter_properties):
+        """Return the first weighed host passing the filters of a share.
+
+        Hosts are rotated as they are tried, so that consecutive shares of
+        a batch are spread over the pools in the order of their weight.
+        """
+        for i in range(len(weighed_hosts)):
+            weighed_host = weighed_hosts[0]
+            weighed_hosts.rotate(-1)
+            if self.host_manager.get_filtered_hosts([weighed_host.obj],
+                                                    filter_properties):
+                return weighed_host
+        return None
+
+    def _create_share_on_host(self, context, request_spec, filter_properties,
+                              weighed_host):
         host = weighed_host.obj.host
         share_id = request_spec['share_id']
         snapshot_id = request_spec['snapshot_id']
@@ -113,7 +204,38 @@ class FilterScheduler(driver.Scheduler):
         The list is ordered by their fitness.
         """
         elevated = context.elevated()
+        share_properties = request_spec['share_properties']
+        filter_properties = self._get_share_filter_properties(
+            context, request_spec, filter_properties)
+
+        # Find our local list of acceptable hosts by filtering and
+        # weighing our options. we virtually consume resources on
+        # it so subsequent selections can adjust accordingly.
+
+        # Note: remember, we are using an iterator here. So only
+        # traverse this list once.
+        hosts = self.host_manager.get_all_host_states_share(elevated)
+
+        # Filter local hosts based on requirements ...
+        hosts = self.host_manager.get_filtered_hosts(hosts,
+                                                     filter_properties)
+        if not hosts:
+            return None
+
+        LOG.debug("Filtered share %(hosts)s", {"hosts": hosts})
+        # weighted_host = WeightedHost() ... the best
+        # host for the job.
+        weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                                                            filter_properties)
+        best_host = weighed_hosts[0]
+        LOG.debug("Choosing for share: %(best_host)s",
+                  {"best_host": best_host})
+        # NOTE(rushiagr): updating the available space parameters at same place
+        best_host.obj.consume_from_share(share_properties)
+        return best_host
 
+    def _get_share_filter_properties(self, context, request_spec,
+                                     filter_properties):
         share_properties = request_spec['share_properties']
         # Since Manila is using mixed filters from Oslo and it's own, which
         # takes 'resource_XX' and 'volume_XX' as input respectively, copying
@@ -148,32 +270,7 @@ class FilterScheduler(driver.Scheduler):
                                   })
 
         self.populate_filter_properties_share(request_spec, filter_properties)
-
-        # Find our local list of acceptable hosts by filtering and
-        # weighing our options. we virtually consume resources on
-        # it so subsequent selections can adjust accordingly.
-
-        # Note: remember, we are using an iterator here. So only
-        # traverse this list once.
-        hosts = self.host_manager.get_all_host_states_share(elevated)
-
-        # Filter local hosts based on requirements ...
-        hosts = self.host_manager.get_filtered_hosts(hosts,
-                                                     filter_properties)
-        if not hosts:
-            return None
-
-        LOG.debug("Filtered share %(hosts)s", {"hosts": hosts})
-        # weighted_host = WeightedHost() ... the best
-        # host for the job.
-        weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
-                                                            filter_properties)
-        best_host = weighed_hosts[0]
-        LOG.debug("Choosing for share: %(best_host)s",
-                  {"best_host": best_host})
-        # NOTE(rushiagr): updating the available space parameters at same place
-        best_host.obj.consume_from_share(share_properties)
-        return best_host
+        return filter_properties
 
     def _populate_retry_share(self, filter_properties, properties):
         """Populate filter properties with retry history.
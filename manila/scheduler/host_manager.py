@@ -32,6 +32,7 @@ from manila import exception
 from manila.i18n import _LI, _LW
 from manila.openstack.common.scheduler import filters
 from manila.openstack.common.scheduler import weights
+from manila.scheduler import vectorized
 from manila.share import utils as share_utils
 from manila import utils
 
@@ -48,7 +49,20 @@ host_manager_opts = [
                 default=[
                     'CapacityWeigher'
                 ],
-                help='Which weigher class names to use for weighing hosts.')
+                help='Which weigher class names to use for weighing hosts.'),
+    cfg.IntOpt('scheduler_service_cache_ttl',
+               default=10,
+               help='Number of seconds the scheduler keeps the list of share '
+                    'services before reading it from the DB again. Backend '
+                    'capabilities are applied as soon as they are reported '
+                    'regardless of this value. Should be lower than '
+                    'service_down_time. 0 means the list is read for each '
+                    'scheduling request.'),
+    cfg.BoolOpt('scheduler_use_vectorized_engine',
+                default=False,
+                help='Evaluate CapacityFilter, RetryFilter and '
+                     'CapacityWeigher on NumPy arrays instead of once per '
+                     'pool. Requires NumPy to be installed.'),
 ]
 
 CONF = cfg.CONF
@@ -327,12 +341,22 @@ class HostManager(object):
     def __init__(self):
         self.service_states = {}  # { <host>: {<service>: {cap k : v}}}
         self.host_state_map = {}
+        self._services = {}  # { <host>: <service> } of active services
+        self._services_updated_at = None
         self.filter_handler = filters.HostFilterHandler('manila.scheduler.'
                                                         'filters')
         self.filter_classes = self.filter_handler.get_all_classes()
         self.weight_handler = weights.HostWeightHandler('manila.scheduler.'
                                                         'weights')
         self.weight_classes = self.weight_handler.get_all_classes()
+        self.vectorized_engine = None
+        if CONF.scheduler_use_vectorized_engine:
+            if vectorized.is_available():
+                self.vectorized_engine = vectorized.VectorizedEngine(
+                    self.filter_handler, self.weight_handler)
+            else:
+                LOG.warning(_LW("NumPy is not installed, falling back to "
+                                "per-host filtering and weighing."))
 
     def _choose_host_filters(self, filter_cls_names):
         """Choose acceptable filters.
@@ -395,6 +419,9 @@ class HostManager(object):
                            filter_class_names=None):
         """Filter hosts and return only ones passing all filters."""
         filter_classes = self._choose_host_filters(filter_class_names)
+        if self.vectorized_engine:
+            return self.vectorized_engine.get_filtered_hosts(
+                filter_classes, hosts, filter_properties)
         return self.filter_handler.get_filtered_objects(filter_classes,
                                                         hosts,
                                                         filter_properties)
@@ -403,6 +430,9 @@ class HostManager(object):
                           weigher_class_names=None):
         """Weigh the hosts."""
         weigher_classes = self._choose_host_weighers(weigher_class_names)
+        if self.vectorized_engine:
+            return self.vectorized_engine.get_weighed_hosts(
+                weigher_classes, hosts, weight_properties)
         return self.weight_handler.get_weighed_objects(weigher_classes,
                                                        hosts,
                                                        weight_properties)
@@ -420,17 +450,40 @@ class HostManager(object):
         capability_copy["timestamp"] = timeutils.utcnow()  # Reported time
         self.service_states[host] = capability_copy
 
+        # Apply the update to the known host right away, so scheduling
+        # requests do not need to rebuild host states on their own.
+        host_state = self.host_state_map.get(host)
+        if host_state:
+            host_state.update_from_share_capability(
+                capability_copy, service=self._services.get(host))
+
         LOG.debug("Received %(service_name)s service update from "
                   "%(host)s: %(cap)s" %
                   {'service_name': service_name, 'host': host,
                    'cap': capabilities})
 
+    def _services_cache_expired(self):
+        ttl = CONF.scheduler_service_cache_ttl
+        if ttl <= 0 or self._services_updated_at is None:
+            return True
+        return timeutils.is_older_than(self._services_updated_at, ttl)
+
     def _update_host_state_map(self, context):
+        """Syncs host state map with the list of active share services.
+
+        The list is read from the DB at most once per
+        scheduler_service_cache_ttl seconds, capability updates in between
+        are applied by update_service_capabilities.
+        """
+        if not self._services_cache_expired():
+            return
 
         # Get resource usage across the available share nodes:
         topic = CONF.share_topic
         share_services = db.service_get_all_by_topic(context, topic)
+        self._services_updated_at = timeutils.utcnow()
 
+        active_services = {}
         for service in share_services:
             host = service['host']
 
@@ -442,6 +495,9 @@ class HostManager(object):
                                  "scheduler cache.") % host)
                 continue
 
+            service = dict(six.iteritems(service))
+            active_services[host] = service
+
             # Create and register host_state if not in host_state_map
             capabilities = self.service_states.get(host, None)
             host_state = self.host_state_map.get(host)
@@ -449,12 +505,19 @@ class HostManager(object):
                 host_state = self.host_state_cls(
                     host,
                     capabilities=capabilities,
-                    service=dict(six.iteritems(service)))
+                    service=service)
                 self.host_state_map[host] = host_state
 
             # Update capabilities and attributes in host_state
             host_state.update_from_share_capability(
-                capabilities, service=dict(six.iteritems(service)))
+                capabilities, service=service)
+
+        # Remove hosts whose services do not exist anymore
+        for host in set(self.host_state_map) - set(active_services):
+            LOG.info(_LI("Removing non-active host: %s from "
+                         "scheduler cache."), host)
+            del self.host_state_map[host]
+        self._services = active_services
 
     def get_all_host_states_share(self, context):
         """Returns a dict of all the hosts the HostManager knows about.
@@ -46,7 +46,7 @@ CONF.register_opt(scheduler_driver_opt)
 class SchedulerManager(manager.Manager):
     """Chooses a host to create shares."""
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.2'
 
     def __init__(self, scheduler_driver=None, service_name=None,
                  *args, **kwargs):
@@ -90,6 +90,14 @@ class SchedulerManager(manager.Manager):
                                                        context, ex,
                                                        request_spec)
 
+    def create_shares(self, context, topic, request_specs,
+                      filter_properties=None):
+        failures = self.driver.schedule_create_shares(context, request_specs,
+                                                      filter_properties)
+        for request_spec, ex in failures:
+            self._set_share_error_state_and_notify('create_share',
+                                                   context, ex, request_spec)
+
     def get_pools(self, context, filters=None):
         """Get active pools from the scheduler's cache."""
         return self.driver.get_pools(context, filters)
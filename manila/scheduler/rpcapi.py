@@ -32,15 +32,16 @@ class SchedulerAPI(object):
 
         1.0 - Initial version.
         1.1 - Add get_pools method
+        1.2 - Add create_shares method
     '''
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.2'
 
     def __init__(self):
         super(SchedulerAPI, self).__init__()
         target = messaging.Target(topic=CONF.scheduler_topic,
                                   version=self.RPC_API_VERSION)
-        self.client = rpc.get_client(target, version_cap='1.1')
+        self.client = rpc.get_client(target, version_cap='1.2')
 
     def create_share(self, ctxt, topic, share_id, snapshot_id=None,
                      request_spec=None, filter_properties=None):
@@ -56,6 +57,18 @@ class SchedulerAPI(object):
             filter_properties=filter_properties,
         )
 
+    def create_shares(self, ctxt, topic, request_specs,
+                      filter_properties=None):
+        request_specs_p = jsonutils.to_primitive(request_specs)
+        cctxt = self.client.prepare(version='1.2')
+        return cctxt.cast(
+            ctxt,
+            'create_shares',
+            topic=topic,
+            request_specs=request_specs_p,
+            filter_properties=filter_properties,
+        )
+
     def update_service_capabilities(self, ctxt,
                                     service_name, host,
                                     capabilities):
@@ -0,0 +1,182 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Vectorized implementation of the most used scheduler filters and weighers.
+
+Instead of calling a filter or weigher once per pool, the attributes they
+look at are laid out as NumPy arrays and evaluated for all pools at once.
+CapacityFilter, RetryFilter and CapacityWeigher are supported, any other
+filter is run the usual way on the pools left by the vectorized ones.
+Results are the same as the ones of the per-object handlers.
+
+NumPy is an optional dependency, the engine is only used when it can be
+imported and 'scheduler_use_vectorized_engine' is enabled.
+"""
+
+from oslo_log import log
+from oslo_utils import importutils
+
+from manila.i18n import _LE
+from manila.scheduler.filters import capacity_filter
+from manila.scheduler.filters import retry_filter
+from manila.scheduler.weights import capacity
+
+numpy = importutils.try_import('numpy')
+
+LOG = log.getLogger(__name__)
+
+UNLIMITED_CAPACITY = ('infinite', 'unknown')
+
+
+def is_available():
+    return numpy is not None
+
+
+class PoolColumns(object):
+    """Capacity attributes of a list of pools laid out as arrays."""
+
+    def __init__(self, hosts):
+        self.hosts = hosts
+        self.names = [host.host for host in hosts]
+
+        free = numpy.array([host.free_capacity_gb for host in hosts],
+                           dtype=object)
+        self.free_unset = numpy.equal(free, None)
+        self.free_unlimited = numpy.zeros(len(hosts), dtype=bool)
+        for value in UNLIMITED_CAPACITY:
+            self.free_unlimited |= numpy.equal(free, value)
+        self.free_known = ~(self.free_unset | self.free_unlimited)
+
+        free_capacity_gb = numpy.zeros(len(hosts))
+        free_capacity_gb[self.free_known] = free[self.free_known]
+        reserved = numpy.array([host.reserved_percentage for host in hosts],
+                               dtype=float) / 100
+        # Same as math.floor(free_space * (1 - reserved)) in the filter and
+        # the weigher.
+        self.usable_capacity_gb = numpy.floor(
+            free_capacity_gb * (1 - reserved))
+
+
+def capacity_filter_mask(columns, filter_properties):
+    """Array version of CapacityFilter.host_passes."""
+    size = filter_properties.get('size')
+    if columns.free_unset.any():
+        LOG.error(_LE("Free capacity not set: "
+                      "volume node info collection broken."))
+    if size is None:
+        fits = columns.free_known
+    else:
+        fits = columns.free_known & (columns.usable_capacity_gb >= size)
+    mask = columns.free_unlimited | fits
+    LOG.debug("CapacityFilter: %(count)d host(s) have less than "
+              "%(size)sG free.",
+              {'count': columns.free_known.sum() - fits.sum(), 'size': size})
+    return mask
+
+
+def retry_filter_mask(columns, filter_properties):
+    """Array version of RetryFilter.host_passes."""
+    retry = filter_properties.get('retry', None)
+    if not retry:
+        return None
+    tried = set(retry.get('hosts', []))
+    return numpy.array([name not in tried for name in columns.names],
+                       dtype=bool)
+
+
+def capacity_weights(columns, weight_properties):
+    """Array version of CapacityWeigher._weigh_object."""
+    return columns.usable_capacity_gb
+
+
+class VectorizedEngine(object):
+    """Runs filtering and weighing of pools on NumPy arrays."""
+
+    filter_masks = {
+        capacity_filter.CapacityFilter: capacity_filter_mask,
+        retry_filter.RetryFilter: retry_filter_mask,
+    }
+    weighers = {
+        capacity.CapacityWeigher: capacity_weights,
+    }
+
+    def __init__(self, filter_handler, weight_handler):
+        self.filter_handler = filter_handler
+        self.weight_handler = weight_handler
+
+    def get_filtered_hosts(self, filter_classes, hosts, filter_properties):
+        hosts = list(hosts)
+        vectorized = [cls for cls in filter_classes
+                      if cls in self.filter_masks]
+        others = [cls for cls in filter_classes
+                  if cls not in self.filter_masks]
+
+        if vectorized and hosts:
+            columns = PoolColumns(hosts)
+            mask = numpy.ones(len(hosts), dtype=bool)
+            for cls in vectorized:
+                cls_mask = self.filter_masks[cls](columns, filter_properties)
+                if cls_mask is not None:
+                    mask &= cls_mask
+            hosts = [hosts[i] for i in numpy.flatnonzero(mask)]
+            LOG.debug("Vectorized filters %(filters)s returned %(count)d "
+                      "host(s)",
+                      {'filters': [cls.__name__ for cls in vectorized],
+                       'count': len(hosts)})
+
+        # Filters do not depend on each other, so the remaining ones only
+        # need to look at what is left.
+        if others and hosts:
+            return self.filter_handler.get_filtered_objects(
+                others, hosts, filter_properties)
+        return hosts
+
+    def get_weighed_hosts(self, weigher_classes, hosts, weight_properties):
+        hosts = list(hosts)
+        if not hosts:
+            return []
+        if not all(cls in self.weighers for cls in weigher_classes):
+            return self.weight_handler.get_weighed_objects(
+                weigher_classes, hosts, weight_properties)
+
+        columns = PoolColumns(hosts)
+        if not columns.free_known.all():
+            # Unlimited capacity is weighed as infinity, which the
+            # normalization of the object path turns into NaN. Leave those
+            # requests to it rather than trying to reproduce the ordering.
+            return self.weight_handler.get_weighed_objects(
+                weigher_classes, hosts, weight_properties)
+
+        total = numpy.zeros(len(hosts))
+        for cls in weigher_classes:
+            weigher = cls()
+            weights = self.weighers[cls](columns, weight_properties)
+            minval = weights.min()
+            maxval = weights.max()
+            if weigher.minval is not None:
+                minval = min(minval, weigher.minval)
+            if weigher.maxval is not None:
+                maxval = max(maxval, weigher.maxval)
+            if minval != maxval:
+                weights = (weights - float(minval)) / (
+                    float(maxval) - float(minval))
+                total += weigher.weight_multiplier() * weights
+
+        # A stable sort keeps pools with the same weight in their original
+        # order, as sorted() does in the object path.
+        order = numpy.argsort(-total, kind='mergesort')
+        return [self.weight_handler.object_class(hosts[i], float(total[i]))
+                for i in order]
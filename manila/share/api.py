@@ -70,6 +70,101 @@ class API(base.Base):
         """Create new share."""
         policy.check_policy(context, 'share', 'create')
 
+        options, share_type = self._get_share_options(
+            context, share_proto, size, name, description, snapshot=snapshot,
+            availability_zone=availability_zone, metadata=metadata,
+            share_network_id=share_network_id, share_type=share_type,
+            is_public=is_public)
+
+        reservations = self._reserve_share_quota(
+            context, 1, options['size'])
+        share = self._create_share_records(
+            context, [options], reservations)[0]
+
+        request_spec = self._get_share_request_spec(
+            share, options, share_type)
+        filter_properties = {}
+
+        if (snapshot and not CONF.use_scheduler_creating_share_from_snapshot):
+            share = self._create_share_on_snapshot_host(
+                context, share, snapshot, request_spec, filter_properties)
+        else:
+            # Shares from scratch and from snapshots when source host is not
+            # the only allowed, it is possible, for example, in multibackend
+            # installation with Generic drivers only.
+            self.scheduler_rpcapi.create_share(
+                context,
+                CONF.share_topic,
+                share['id'],
+                options['snapshot_id'],
+                request_spec=request_spec,
+                filter_properties=filter_properties,
+            )
+
+        return share
+
+    def create_shares(self, context, shares):
+        """Create several shares and schedule them with one request.
+
+        Quota for the whole batch is reserved at once and all shares that
+        need scheduling are sent to the scheduler in a single message, so
+        that it can place them in one filtering and weighing pass.
+
+        Shares that can not be sent to the host of their snapshot are put
+        in error state, the rest of the batch is still scheduled.
+
+        :param shares: list of dicts with the keyword arguments of create().
+        :returns: list of created shares, in the order they were requested.
+        """
+        policy.check_policy(context, 'share', 'create')
+
+        prepared = [self._get_share_options(context, **kwargs)
+                    for kwargs in shares]
+        all_options = [options for options, share_type in prepared]
+
+        reservations = self._reserve_share_quota(
+            context, len(all_options),
+            sum(options['size'] for options in all_options))
+        created = self._create_share_records(
+            context, all_options, reservations)
+
+        request_specs = []
+        for i, (options, share_type) in enumerate(prepared):
+            request_spec = self._get_share_request_spec(
+                created[i], options, share_type)
+            snapshot = shares[i].get('snapshot')
+            if (snapshot and
+                    not CONF.use_scheduler_creating_share_from_snapshot):
+                # A failure here must not keep the rest of the batch from
+                # being scheduled, their records and quota already exist.
+                try:
+                    created[i] = self._create_share_on_snapshot_host(
+                        context, created[i], snapshot, request_spec, {})
+                except Exception:
+                    LOG.exception(_LE("Failed to send share %s to the host "
+                                      "of its snapshot."), created[i]['id'])
+                    created[i] = self.db.share_update(
+                        context, created[i]['id'],
+                        {'status': constants.STATUS_ERROR})
+            else:
+                request_specs.append(request_spec)
+
+        if request_specs:
+            self.scheduler_rpcapi.create_shares(
+                context, CONF.share_topic, request_specs,
+                filter_properties={})
+
+        return created
+
+    def _get_share_options(self, context, share_proto, size, name,
+                           description, snapshot=None,
+                           availability_zone=None, metadata=None,
+                           share_network_id=None, share_type=None,
+                           is_public=False):
+        """Validate share create arguments and build the DB values.
+
+        :returns: tuple of share values and share type of the new share.
+        """
         self._check_metadata_properties(context, metadata)
 
         if snapshot is not None:
@@ -133,8 +228,35 @@ class API(base.Base):
                          supported=CONF.enabled_share_protocols))
             raise exception.InvalidInput(reason=msg)
 
+        if availability_zone is None:
+            availability_zone = CONF.storage_availability_zone
+
+        try:
+            is_public = strutils.bool_from_string(is_public, strict=True)
+        except ValueError as e:
+            raise exception.InvalidParameterValue(e.message)
+
+        options = {'size': size,
+                   'user_id': context.user_id,
+                   'project_id': context.project_id,
+                   'snapshot_id': snapshot_id,
+                   'share_network_id': share_network_id,
+                   'availability_zone': availability_zone,
+                   'metadata': metadata,
+                   'status': "creating",
+                   'scheduled_at': timeutils.utcnow(),
+                   'display_name': name,
+                   'display_description': description,
+                   'share_proto': share_proto,
+                   'share_type_id': share_type_id,
+                   'is_public': is_public,
+                   }
+        return options, share_type
+
+    def _reserve_share_quota(self, context, shares, gigabytes):
         try:
-            reservations = QUOTAS.reserve(context, shares=1, gigabytes=size)
+            return QUOTAS.reserve(context, shares=shares,
+                                  gigabytes=gigabytes)
         except exception.OverQuota as e:
             overs = e.kwargs['overs']
             usages = e.kwargs['usages']
@@ -148,7 +270,7 @@ class API(base.Base):
                              "%(s_size)sG share (%(d_consumed)dG of "
                              "%(d_quota)dG already consumed)"), {
                                  's_pid': context.project_id,
-                                 's_size': size,
+                                 's_size': gigabytes,
                                  'd_consumed': _consumed('gigabytes'),
                                  'd_quota': quotas['gigabytes']})
                 raise exception.ShareSizeExceedsAvailableQuota()
@@ -160,75 +282,45 @@ class API(base.Base):
                                  'd_consumed': _consumed('shares')})
                 raise exception.ShareLimitExceeded(allowed=quotas['shares'])
 
-        if availability_zone is None:
-            availability_zone = CONF.storage_availability_zone
-
+    def _create_share_records(self, context, all_options, reservations):
+        shares = []
         try:
-            is_public = strutils.bool_from_string(is_public, strict=True)
-        except ValueError as e:
-            raise exception.InvalidParameterValue(e.message)
-
-        options = {'size': size,
-                   'user_id': context.user_id,
-                   'project_id': context.project_id,
-                   'snapshot_id': snapshot_id,
-                   'share_network_id': share_network_id,
-                   'availability_zone': availability_zone,
-                   'metadata': metadata,
-                   'status': "creating",
-                   'scheduled_at': timeutils.utcnow(),
-                   'display_name': name,
-                   'display_description': description,
-                   'share_proto': share_proto,
-                   'share_type_id': share_type_id,
-                   'is_public': is_public,
-                   }
-
-        try:
-            share = self.db.share_create(context, options)
+            for options in all_options:
+                shares.append(self.db.share_create(context, options))
             QUOTAS.commit(context, reservations)
         except Exception:
             with excutils.save_and_reraise_exception():
                 try:
-                    self.db.share_delete(context, share['id'])
+                    for share in shares:
+                        self.db.share_delete(context, share['id'])
                 finally:
                     QUOTAS.rollback(context, reservations)
+        return shares
 
-        request_spec = {
+    @staticmethod
+    def _get_share_request_spec(share, options, share_type):
+        return {
             'share_properties': options,
-            'share_proto': share_proto,
+            'share_proto': options['share_proto'],
             'share_id': share['id'],
-            'snapshot_id': snapshot_id,
+            'snapshot_id': options['snapshot_id'],
             'share_type': share_type,
         }
-        filter_properties = {}
-
-        if (snapshot and not CONF.use_scheduler_creating_share_from_snapshot):
-            # Shares from snapshots with restriction - source host only.
-            # It is common situation for different types of backends.
-            host = snapshot['share']['host']
-            share = self.db.share_update(context, share['id'], {'host': host})
-            self.share_rpcapi.create_share(
-                context,
-                share,
-                host,
-                request_spec=request_spec,
-                filter_properties=filter_properties,
-                snapshot_id=snapshot_id,
-            )
-        else:
-            # Shares from scratch and from snapshots when source host is not
-            # the only allowed, it is possible, for example, in multibackend
-            # installation with Generic drivers only.
-            self.scheduler_rpcapi.create_share(
-                context,
-                CONF.share_topic,
-                share['id'],
-                snapshot_id,
-                request_spec=request_spec,
-                filter_properties=filter_properties,
-            )
 
+    def _create_share_on_snapshot_host(self, context, share, snapshot,
+                                       request_spec, filter_properties):
+        # Shares from snapshots with restriction - source host only.
+        # It is common situation for different types of backends.
+        host = snapshot['share']['host']
+        share = self.db.share_update(context, share['id'], {'host': host})
+        self.share_rpcapi.create_share(
+            context,
+            share,
+            host,
+            request_spec=request_spec,
+            filter_properties=filter_properties,
+            snapshot_id=snapshot['id'],
+        )
         return share
 
     def manage(self, context, share_data, driver_options):
@@ -440,7 +532,8 @@ class API(base.Base):
         return rv
 
     def get_all(self, context, search_opts=None, sort_key='created_at',
-                sort_dir='desc'):
+                sort_dir='desc', limit=None, marker=None,
+                profile=constants.QUERY_PROFILE_DETAIL):
         policy.check_policy(context, 'share', 'get_all')
 
         if search_opts is None:
@@ -477,31 +570,30 @@ class API(base.Base):
         is_public = search_opts.pop('is_public', False)
         is_public = strutils.bool_from_string(is_public, strict=True)
 
+        # 'all_tenants' and 'share_server_id' opts are not share attrs to
+        # be matched, all the rest are compiled into DB filters.
+        all_tenants = 'all_tenants' in search_opts
+        search_opts.pop('all_tenants', None)
+        share_server_id = search_opts.pop('share_server_id', None)
+        filters.update(search_opts)
+
         # Get filtered list of shares
-        if 'share_server_id' in search_opts:
+        if share_server_id is not None:
             # NOTE(vponomaryov): this is project_id independent
             policy.check_policy(context, 'share', 'list_by_share_server_id')
             shares = self.db.share_get_all_by_share_server(
-                context, search_opts.pop('share_server_id'), filters=filters,
-                sort_key=sort_key, sort_dir=sort_dir)
-        elif (context.is_admin and 'all_tenants' in search_opts):
+                context, share_server_id, filters=filters,
+                sort_key=sort_key, sort_dir=sort_dir,
+                limit=limit, marker=marker, profile=profile)
+        elif (context.is_admin and all_tenants):
             shares = self.db.share_get_all(
-                context, filters=filters, sort_key=sort_key, sort_dir=sort_dir)
+                context, filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+                limit=limit, marker=marker, profile=profile)
         else:
             shares = self.db.share_get_all_by_project(
                 context, project_id=context.project_id, filters=filters,
-                is_public=is_public, sort_key=sort_key, sort_dir=sort_dir)
-
-        # NOTE(vponomaryov): we do not need 'all_tenants' opt anymore
-        search_opts.pop('all_tenants', None)
-
-        if search_opts:
-            results = []
-            for s in shares:
-                # values in search_opts can be only strings
-                if all(s.get(k, None) == v for k, v in search_opts.items()):
-                    results.append(s)
-            shares = results
+                is_public=is_public, sort_key=sort_key, sort_dir=sort_dir,
+                limit=limit, marker=marker, profile=profile)
         return shares
 
     def get_snapshot(self, context, snapshot_id):
@@ -510,7 +602,8 @@ class API(base.Base):
         return dict(six.iteritems(rv))
 
     def get_all_snapshots(self, context, search_opts=None,
-                          sort_key='share_id', sort_dir='desc'):
+                          sort_key='share_id', sort_dir='desc', limit=None,
+                          marker=None, profile=constants.QUERY_PROFILE_DETAIL):
         policy.check_policy(context, 'share', 'get_all_snapshots')
 
         search_opts = search_opts or {}
@@ -530,25 +623,13 @@ class API(base.Base):
         if (context.is_admin and all_tenants):
             snapshots = self.db.share_snapshot_get_all(
                 context, filters=search_opts,
-                sort_key=sort_key, sort_dir=sort_dir)
+                sort_key=sort_key, sort_dir=sort_dir,
+                limit=limit, marker=marker, profile=profile)
         else:
             snapshots = self.db.share_snapshot_get_all_by_project(
                 context, context.project_id, filters=search_opts,
-                sort_key=sort_key, sort_dir=sort_dir)
-
-        # Remove key 'usage' if provided
-        search_opts.pop('usage', None)
-
-        if search_opts:
-            results = []
-            not_found = object()
-            for snapshot in snapshots:
-                for opt, value in six.iteritems(search_opts):
-                    if snapshot.get(opt, not_found) != value:
-                        break
-                else:
-                    results.append(snapshot)
-            snapshots = results
+                sort_key=sort_key, sort_dir=sort_dir,
+                limit=limit, marker=marker, profile=profile)
         return snapshots
 
     def allow_access(self, ctx, share, access_type, access_to,
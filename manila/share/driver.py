@@ -22,6 +22,7 @@ import time
 
 from oslo_config import cfg
 from oslo_log import log
+import six
 
 from manila import exception
 from manila.i18n import _LE
@@ -76,6 +77,22 @@ ssh_opts = [
         'ssh_max_pool_conn',
         default=10,
         help='Maximum number of connections in the SSH pool.'),
+    cfg.IntOpt(
+        'ssh_idle_timeout',
+        default=0,
+        help='Seconds after which an unused SSH pool connection is '
+             'replaced. 0 means no limit.'),
+    cfg.IntOpt(
+        'ssh_max_lifetime',
+        default=0,
+        help='Seconds after which an SSH pool connection is replaced. '
+             '0 means no limit.'),
+    cfg.IntOpt(
+        'ssh_keepalive_interval',
+        default=0,
+        help='Interval in seconds at which free SSH pool connections are '
+             'probed, broken ones are evicted and the pool is refilled up '
+             'to ssh_min_pool_conn. 0 disables probing.'),
 ]
 
 ganesha_opts = [
@@ -104,6 +121,14 @@ ganesha_opts = [
                default='$ganesha_config_dir/export.d',
                help='Path to directory containing Ganesha export '
                     'configuration. (Ganesha module only.)'),
+    cfg.BoolOpt('ganesha_native_mode',
+                default=False,
+                help='Manage Ganesha export files and the export id '
+                     'database from within the share service instead of '
+                     'running commands for them. Requires Ganesha to run on '
+                     'the node of the share service, which must be able to '
+                     'write to ganesha_export_dir and ganesha_db_path. '
+                     '(Ganesha module only.)'),
     cfg.StrOpt('ganesha_export_template_dir',
                default='/etc/manila/ganesha-export-templ.d',
                help='Path to directory containing Ganesha export '
@@ -277,10 +302,67 @@ class ShareDriver(object):
         """
         raise NotImplementedError()
 
+    def ensure_shares(self, context, shares, share_server=None):
+        """Invoked to ensure that several shares are exported.
+
+        Drivers able to check many shares in one backend operation should
+        override it. By default ensure_share is called for each share.
+
+        :param shares: list of shares hosted on share_server.
+        :return dict mapping ids of the ensured shares to None or their
+            list of export locations. Shares that could not be ensured are
+            left out.
+        """
+        result = {}
+        for share in shares:
+            try:
+                result[share['id']] = self.ensure_share(
+                    context, share, share_server=share_server)
+            except Exception as e:
+                LOG.error(_LE("Caught exception trying ensure share "
+                              "'%(s_id)s'. Exception: \n%(e)s."),
+                          {'s_id': share['id'], 'e': six.text_type(e)})
+        return result
+
     def allow_access(self, context, share, access, share_server=None):
         """Allow access to the share."""
         raise NotImplementedError()
 
+    def update_access(self, context, share, add_rules, delete_rules,
+                      share_server=None):
+        """Apply several access rule changes to the share.
+
+        Drivers able to apply many rules in one backend operation should
+        override it. By default deny_access and allow_access are called
+        for each rule, rules that already exist are skipped.
+
+        :return list of rules that could not be applied.
+        """
+        failed = []
+        for access in delete_rules:
+            try:
+                self.deny_access(context, share, access,
+                                 share_server=share_server)
+            except Exception as e:
+                LOG.error(_LE("Failed to deny access %(access)s to share "
+                              "%(s_id)s: %(e)s."),
+                          {'access': access['id'], 's_id': share['id'],
+                           'e': six.text_type(e)})
+                failed.append(access)
+        for access in add_rules:
+            try:
+                self.allow_access(context, share, access,
+                                  share_server=share_server)
+            except exception.ShareAccessExists:
+                pass
+            except Exception as e:
+                LOG.error(_LE("Failed to allow access %(access)s to share "
+                              "%(s_id)s: %(e)s."),
+                          {'access': access['id'], 's_id': share['id'],
+                           'e': six.text_type(e)})
+                failed.append(access)
+        return failed
+
     def deny_access(self, context, share, access, share_server=None):
         """Deny access to the share."""
         raise NotImplementedError()
@@ -301,6 +383,13 @@ class ShareDriver(object):
 
         return self._stats
 
+    def get_connection_pool_stats(self):
+        """Get counters of the connection pools used by the driver.
+
+        :return dict of counters dicts, by pool name.
+        """
+        return {}
+
     def get_network_allocations_number(self):
         """Returns number of network allocations for creating VIFs.
 
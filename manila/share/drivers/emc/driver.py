@@ -54,6 +54,15 @@ EMC_NAS_OPTS = [
     cfg.StrOpt('emc_nas_pool_name',
                default=None,
                help='EMC pool name.'),
+    cfg.IntOpt('emc_nas_connection_pool_size',
+               default=4,
+               help='Number of keep-alive connections kept open to the EMC '
+                    'server.'),
+    cfg.IntOpt('emc_nas_lookup_cache_ttl',
+               default=300,
+               help='Seconds a Data Mover, VDM, storage pool or file system '
+                    'lookup is cached by the VNX plugin. Set to 0 to '
+                    'disable the cache.'),
 ]
 
 CONF = cfg.CONF
@@ -120,6 +129,17 @@ class EMCShareDriver(driver.ShareDriver):
         self.plugin.deny_access(self, context, share, access,
                                 share_server)
 
+    def update_access(self, context, share, add_rules, delete_rules,
+                      share_server=None):
+        """Apply several access rule changes to the share."""
+        try:
+            return self.plugin.update_access(self, context, share, add_rules,
+                                             delete_rules, share_server)
+        except NotImplementedError:
+            return super(EMCShareDriver, self).update_access(
+                context, share, add_rules, delete_rules,
+                share_server=share_server)
+
     def check_for_setup_error(self):
         """Check for setup error."""
         pass
@@ -61,6 +61,18 @@ class StorageConnection(object):
                     access, share_server):
         """Deny access to the share."""
 
+    def update_access(self, emc_share_driver, context, share, add_rules,
+                      delete_rules, share_server):
+        """Apply several access rule changes to the share.
+
+        Plugins able to apply many rules in one backend operation should
+        override it, the driver calls allow_access and deny_access for each
+        rule otherwise.
+
+        :returns: list of rules that could not be applied.
+        """
+        raise NotImplementedError()
+
     def raise_connect_error(self, emc_share_driver):
         """Check for setup error."""
         pass
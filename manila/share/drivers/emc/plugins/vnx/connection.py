@@ -397,6 +397,39 @@ class VNXStorageConnection(driver.StorageConnection):
             LOG.error(message)
             raise exception.EMCVnxXMLAPIError(err=message)
 
+    def update_access(self, emc_share_driver, context, share, add_rules,
+                      delete_rules, share_server=None):
+        """Apply several access rule changes to the share.
+
+        The hosts of all the NFS rules are changed with one server_export
+        call, CIFS rules are left to allow_access and deny_access.
+        """
+        if share['share_proto'] != 'NFS':
+            return super(VNXStorageConnection, self).update_access(
+                emc_share_driver, context, share, add_rules, delete_rules,
+                share_server)
+
+        failed = [access for access in add_rules + delete_rules
+                  if access['access_type'] != 'ip']
+        add_rules = [access for access in add_rules if access not in failed]
+        delete_rules = [access for access in delete_rules
+                        if access not in failed]
+        if not add_rules and not delete_rules:
+            return failed
+
+        mover_name = self._get_vdm_name(share_server)
+        status, reason = self._NASCmd_helper.modify_nfs_share_access(
+            '/' + share['name'], mover_name,
+            add_hosts=[access['access_to'] for access in add_rules],
+            remove_hosts=[access['access_to'] for access in delete_rules])
+        if constants.STATUS_OK != status:
+            LOG.error(_LE("Could not update access to NFS share %(share)s. "
+                          "Reason: %(reason)s."),
+                      {'share': share['name'], 'reason': reason})
+            return failed + add_rules + delete_rules
+
+        return failed
+
     def deny_access(self, emc_share_driver, context, share, access,
                     share_server=None):
         """Deny access to the share."""
@@ -12,17 +12,18 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
-import cookielib
+import copy
 import random
 import re
+import time
 
 from eventlet import greenthread
 from lxml import builder
 from lxml import etree as ET
 from oslo_log import log
+import requests
+from requests import adapters
 import six
-from six.moves.urllib import error as url_error  # pylint: disable=E0611
-from six.moves.urllib import request as url_request  # pylint: disable=E0611
 
 import manila.exception
 from manila.i18n import _
@@ -47,37 +48,37 @@ class XMLAPIConnector(object):
         self.auth_url = 'https://' + self.storage_ip + '/Login'
         self._url = ('https://' + self.storage_ip
                      + '/servlets/CelerraManagementServices')
-        https_handler = url_request.HTTPSHandler()
-        cookie_jar = cookielib.CookieJar()
-        cookie_handler = url_request.HTTPCookieProcessor(cookie_jar)
-        self.url_opener = url_request.build_opener(https_handler,
-                                                   cookie_handler)
+        # The session keeps the login cookie and a pool of keep-alive
+        # connections, so requests do not pay for a new TLS handshake.
+        self.session = requests.Session()
+        self.session.mount('https://', adapters.HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=configuration.emc_nas_connection_pool_size))
         self._do_setup()
 
     def _do_setup(self):
         credential = ('user=' + self.user_name
                       + '&password=' + self.pass_word
                       + '&Login=Login')
-        req = url_request.Request(self.auth_url, credential,
-                                  constants.CONTENT_TYPE_URLENCODE)
-        resp = self.url_opener.open(req)
-        resp_body = resp.read()
-        self._http_log_resp(resp, resp_body)
+        resp = self.session.post(self.auth_url, data=credential,
+                                 headers=constants.CONTENT_TYPE_URLENCODE)
+        self._http_log_resp(resp, resp.content)
+        resp.raise_for_status()
 
-    def _http_log_req(self, req):
+    def _http_log_req(self, method, body, headers):
         if not self.debug:
             return
 
         string_parts = ['curl -i']
-        string_parts.append(' -X %s' % req.get_method())
+        string_parts.append(' -X %s' % method)
 
-        for k in req.headers:
-            header = ' -H "%s: %s"' % (k, req.headers[k])
+        for k in headers:
+            header = ' -H "%s: %s"' % (k, headers[k])
             string_parts.append(header)
 
-        if req.data:
-            string_parts.append(" -d '%s'" % req.data)
-        string_parts.append(' ' + req.get_full_url())
+        if body:
+            string_parts.append(" -d '%s'" % body)
+        string_parts.append(' ' + self._url)
         LOG.debug("\nREQ: %s\n", "".join(string_parts))
 
     def _http_log_resp(self, resp, body, failed_req=None):
@@ -92,11 +93,11 @@ class XMLAPIConnector(object):
                     'RESP: [%(code)s] %(resp_hdrs)s\n'
                     'RESP BODY: %(resp_b)s\n'),
                 {
-                    'method': failed_req.get_method(),
-                    'url': failed_req.get_full_url(),
+                    'method': failed_req.method,
+                    'url': failed_req.url,
                     'req_hdrs': failed_req.headers,
-                    'req_b': failed_req.data,
-                    'code': resp.getcode(),
+                    'req_b': failed_req.body,
+                    'code': resp.status_code,
                     'resp_hdrs': headers,
                     'resp_b': body,
                 }
@@ -106,7 +107,7 @@ class XMLAPIConnector(object):
                 'RESP: [%(code)s] %(resp_hdrs)s\n'
                 'RESP BODY: %(resp_b)s\n',
                 {
-                    'code': resp.getcode(),
+                    'code': resp.status_code,
                     'resp_hdrs': headers,
                     'resp_b': body,
                 }
@@ -114,26 +115,26 @@ class XMLAPIConnector(object):
 
     def _request(self, req_body=None, method=None,
                  header=constants.CONTENT_TYPE_URLENCODE):
-        req = url_request.Request(self._url, req_body, header)
-        if method not in (None, 'GET', 'POST'):
-            req.get_method = lambda: method
-        self._http_log_req(req)
-        try:
-            resp = self.url_opener.open(req)
-            resp_body = resp.read()
-            self._http_log_resp(resp, resp_body)
-        except url_error.HTTPError as http_err:
+        if method is None:
+            method = 'GET' if req_body is None else 'POST'
+        self._http_log_req(method, req_body, header)
+        resp = self.session.request(method, self._url, data=req_body,
+                                    headers=header)
+        resp_body = resp.content
+        if resp.status_code >= 400:
             err = {'errorCode': -1,
-                   'httpStatusCode': http_err.code,
-                   'messages': six.text_type(http_err),
+                   'httpStatusCode': resp.status_code,
+                   'messages': resp.reason,
                    'request': req_body}
             msg = (_("The request is invalid. Reason: %(reason)s") %
                    {'reason': err})
-            if '403' == six.text_type(http_err.code):
+            if 403 == resp.status_code:
                 raise manila.exception.NotAuthorized()
             else:
+                self._http_log_resp(resp, resp_body, failed_req=resp.request)
                 raise manila.exception.ManilaException(message=msg)
 
+        self._http_log_resp(resp, resp_body)
         return resp_body
 
     def request(self, req_body=None, method=None,
@@ -149,12 +150,47 @@ class XMLAPIConnector(object):
         return resp_body
 
 
+class LookupCache(object):
+    """Results of XML API lookups, kept for a limited time.
+
+    Entries are grouped by kind so that a request changing the objects of a
+    kind can drop all of them at once.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+
+    def get(self, kind, key):
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            return None
+
+        expires, value = entry
+        if expires < time.time():
+            del self._entries[(kind, key)]
+            return None
+
+        return copy.deepcopy(value)
+
+    def set(self, kind, key, value):
+        if self.ttl > 0:
+            self._entries[(kind, key)] = (time.time() + self.ttl,
+                                          copy.deepcopy(value))
+
+    def invalidate(self, *kinds):
+        for entry_key in list(self._entries):
+            if entry_key[0] in kinds:
+                del self._entries[entry_key]
+
+
 @vnx_utils.decorate_all_methods(vnx_utils.log_enter_exit,
                                 debug_only=True)
 class XMLAPIHelper(object):
     def __init__(self, configuration):
         super(XMLAPIHelper, self).__init__()
         self._conn = XMLAPIConnector(configuration)
+        self._cache = LookupCache(configuration.emc_nas_lookup_cache_ttl)
 
         self.elt_maker = builder.ElementMaker(
             nsmap={None: constants.XML_NAMESPACE})
@@ -275,6 +311,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self._send_request(request)
+        self._cache.invalidate('filesystem', 'pool')
         return status, msg
 
     def delete_file_system(self, fs_id):
@@ -283,9 +320,13 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self._send_request(request)
+        self._cache.invalidate('filesystem', 'pool')
         return status, msg
 
     def get_file_system_by_name(self, fs_name, need_capacity=True):
+        cached = self._cache.get('filesystem', (fs_name, need_capacity))
+        if cached is not None:
+            return constants.STATUS_OK, cached
 
         data = {
             'name': '',
@@ -334,6 +375,8 @@ class XMLAPIHelper(object):
 
         if data['id'] == '':
             status = constants.STATUS_NOT_FOUND
+        elif constants.STATUS_OK == status:
+            self._cache.set('filesystem', (fs_name, need_capacity), data)
 
         return status, data
 
@@ -486,9 +529,7 @@ class XMLAPIHelper(object):
         req_xml = constants.XML_HEADER + ET.tostring(req)
         rsp_xml = self._conn.request(req_xml)
 
-        result = parser.parse_xml_api(
-            parser.xml_to_tupletree(rsp_xml)
-        )
+        result = parser.parse_xml_api_stream(rsp_xml)
 
         status, msg_info = self._verify_response(result)
         return status, msg_info, result
@@ -530,6 +571,7 @@ class XMLAPIHelper(object):
         request = self._build_task_package(new_ckpt)
 
         status, msg, result = self._send_request(request)
+        self._cache.invalidate('pool')
 
         return status, msg
 
@@ -540,6 +582,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self._send_request(request)
+        self._cache.invalidate('pool')
 
         return status, msg
 
@@ -591,6 +634,10 @@ class XMLAPIHelper(object):
         return status, check_point
 
     def list_storage_pool(self):
+        cached = self._cache.get('pool', None)
+        if cached is not None:
+            return constants.STATUS_OK, cached
+
         pools = []
 
         request = self._build_query_package(
@@ -639,10 +686,15 @@ class XMLAPIHelper(object):
 
         if not pools:
             status = constants.STATUS_ERROR
+        elif constants.STATUS_OK == status:
+            self._cache.set('pool', None, pools)
 
         return status, pools
 
     def get_mover_ref_by_name(self, name):
+        cached = self._cache.get('mover_ref', name)
+        if cached is not None:
+            return constants.STATUS_OK, cached
 
         mover = {
             'name': '',
@@ -667,6 +719,8 @@ class XMLAPIHelper(object):
                 break
         if mover['id'] == '':
             status = constants.STATUS_NOT_FOUND
+        elif constants.STATUS_OK == status:
+            self._cache.set('mover_ref', name, mover)
         return status, mover
 
     def get_mover_by_id(self, mover_id):
@@ -780,6 +834,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self._send_request(request)
+        self._cache.invalidate('filesystem', 'pool')
 
         return status, msg
 
@@ -790,6 +845,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self._send_request(request)
+        self._cache.invalidate('vdm', 'pool')
 
         return status, msg
 
@@ -800,10 +856,15 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self._send_request(request)
+        self._cache.invalidate('vdm', 'pool')
 
         return status, msg
 
     def get_vdm_by_name(self, name):
+        cached = self._cache.get('vdm', name)
+        if cached is not None:
+            return constants.STATUS_OK, cached
+
         vdm = {
             "name": '',
             "id": '',
@@ -829,6 +890,8 @@ class XMLAPIHelper(object):
 
         if vdm['id'] == '':
             status = constants.STATUS_NOT_FOUND
+        elif constants.STATUS_OK == status:
+            self._cache.set('vdm', name, vdm)
 
         return status, vdm
 
@@ -856,6 +919,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self._send_request(request)
+        self._cache.invalidate('vdm')
 
         if constants.STATUS_OK != status:
             return status, msg
@@ -872,6 +936,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self._send_request(request)
+        self._cache.invalidate('vdm')
 
         return status, msg
 
@@ -1332,83 +1397,59 @@ class NASCommandHelper(object):
         return status, data
 
     def allow_nfs_share_access(self, path, host_ip, mover_name):
-        sharename = path.strip('/')
-
-        @utils.synchronized('emc-shareaccess-' + sharename)
-        def do_allow_access(path, host_ip, mover_name):
-            ok = (constants.STATUS_OK, '')
-            status, share = self.get_nfs_share_by_path(path, mover_name)
-            if constants.STATUS_OK != status:
-                return constants.STATUS_ERROR, ('Query nfs share %(path)s '
-                                                'failed. Reason %(err)s'
-                                                % {'path': path, 'err': share})
-
-            mover_name = share['mover_name']
-            changed = False
-            rwhosts = share['RwHosts']
-            if host_ip not in rwhosts:
-                rwhosts.append(host_ip)
-                changed = True
-            roothosts = share['RootHosts']
-            if host_ip not in roothosts:
-                roothosts.append(host_ip)
-                changed = True
-            accesshosts = share['AccessHosts']
-            if host_ip not in accesshosts:
-                accesshosts.append(host_ip)
-                changed = True
-
-            if not changed:
-                LOG.debug("%(host)s already in access list of share %(path)s",
-                          {'host': host_ip, 'path': path})
-                return ok
-            else:
-                return self.set_nfs_share_access(path,
-                                                 mover_name,
-                                                 rwhosts,
-                                                 roothosts,
-                                                 accesshosts)
-
-        return do_allow_access(path, host_ip, mover_name)
+        return self.modify_nfs_share_access(path, mover_name,
+                                            add_hosts=[host_ip])
 
     def deny_nfs_share_access(self, path, host_ip, mover_name):
+        return self.modify_nfs_share_access(path, mover_name,
+                                            remove_hosts=[host_ip])
+
+    def modify_nfs_share_access(self, path, mover_name, add_hosts=(),
+                                remove_hosts=()):
+        """Add and remove many hosts of a share with one server_export.
+
+        Hosts are removed first, so a host given in both lists keeps its
+        access. The export is read from the array right before being
+        written, so changes made by other hosts or by an administrator
+        are kept.
+        """
         sharename = path.strip('/')
 
         @utils.synchronized('emc-shareaccess-' + sharename)
-        def do_deny_access(path, host_ip, mover_name):
+        def do_modify_access(path, mover_name, add_hosts, remove_hosts):
             ok = (constants.STATUS_OK, '')
             status, share = self.get_nfs_share_by_path(path, mover_name)
             if constants.STATUS_OK != status:
-                return constants.STATUS_ERROR, ('Query nfs share %(path)s '
-                                                'failed. Reason %(err)s'
-                                                % {'path': path, 'err': share})
+                return constants.STATUS_ERROR, ('Query nfs share '
+                                                '%(path)s failed. '
+                                                'Reason %(err)s'
+                                                % {'path': path,
+                                                   'err': share})
 
-            mover_name = share['mover_name']
             changed = False
-            rwhosts = set(share['RwHosts'])
-            if host_ip in rwhosts:
-                rwhosts.remove(host_ip)
-                changed = True
-            roothosts = set(share['RootHosts'])
-            if host_ip in roothosts:
-                roothosts.remove(host_ip)
-                changed = True
-            accesshosts = set(share['AccessHosts'])
-            if host_ip in accesshosts:
-                accesshosts.remove(host_ip)
-                changed = True
+            for key in ('RwHosts', 'RootHosts', 'AccessHosts'):
+                hosts = [host for host in share[key]
+                         if host not in remove_hosts]
+                hosts.extend(host for host in add_hosts
+                             if host not in hosts)
+                if hosts != share[key]:
+                    share[key] = hosts
+                    changed = True
 
             if not changed:
-                LOG.debug("%(host)s already in access list of share %(path)s",
-                          {'host': host_ip, 'path': path})
+                LOG.debug("Access list of share %(path)s is up to date "
+                          "for %(hosts)s",
+                          {'hosts': list(add_hosts) + list(remove_hosts),
+                           'path': path})
                 return ok
-            else:
-                return self.set_nfs_share_access(path, mover_name,
-                                                 rwhosts,
-                                                 roothosts,
-                                                 accesshosts)
 
-        return do_deny_access(path, host_ip, mover_name)
+            return self.set_nfs_share_access(path,
+                                             share['mover_name'],
+                                             share['RwHosts'],
+                                             share['RootHosts'],
+                                             share['AccessHosts'])
+
+        return do_modify_access(path, mover_name, add_hosts, remove_hosts)
 
     def set_nfs_share_access(self, path, mover_name,
                              rw_hosts,
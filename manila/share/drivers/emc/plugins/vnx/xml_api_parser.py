@@ -13,9 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 import types
-import xml.dom.minidom
 
+from lxml import etree
 from oslo_log import log
+import six
 
 from manila.i18n import _LW
 
@@ -55,33 +56,35 @@ def parse_xml_api(tt):
     return child
 
 
+RESPONSE_CHILDREN = [
+    'QueryStatus',
+    'FileSystem',
+    'FileSystemCapabilities',
+    'FileSystemCapacityInfo',
+    'Mount',
+    'CifsShare',
+    'CifsServer',
+    'Volume',
+    'StoragePool',
+    'Fault',
+    'TaskResponse',
+    'Checkpoint',
+    'NfsExport',
+    'Mover',
+    'MoverStatus',
+    'MoverDnsDomain',
+    'MoverInterface',
+    'MoverRoute',
+    'LogicalNetworkDevice',
+    'MoverDeduplicationSettings',
+    'Vdm',
+]
+
+
 def parse_response(tt):
     check_node(tt, 'Response')
 
-    list_child = [
-        'QueryStatus',
-        'FileSystem',
-        'FileSystemCapabilities',
-        'FileSystemCapacityInfo',
-        'Mount',
-        'CifsShare',
-        'CifsServer',
-        'Volume',
-        'StoragePool',
-        'Fault',
-        'TaskResponse',
-        'Checkpoint',
-        'NfsExport',
-        'Mover',
-        'MoverStatus',
-        'MoverDnsDomain',
-        'MoverInterface',
-        'MoverRoute',
-        'LogicalNetworkDevice',
-        'MoverDeduplicationSettings',
-        'Vdm',
-    ]
-    return list_of_various(tt, list_child)
+    return list_of_various(tt, RESPONSE_CHILDREN)
 
 
 def parse_querystatus(tt):
@@ -960,41 +963,101 @@ def list_of_various(tt, acceptable):
     return r
 
 
-def dom_to_tupletree(node):
-    """Convert a DOM object to a pyRXP-style tuple tree.
+def element_to_tupletree(element):
+    """Convert an lxml element to a pyRXP-style tuple tree.
 
     Each element is a 4-tuple of (NAME, ATTRS, CONTENTS, None).
-
-    Very nice for processing complex nested trees.
     """
+    contents = []
+    if element.text:
+        contents.append(element.text)
 
-    if node.nodeType == node.DOCUMENT_NODE:
-        # boring; pop down one level
-        return dom_to_tupletree(node.firstChild)
-    assert node.nodeType == node.ELEMENT_NODE
+    for child in element:
+        # Comments and processing instructions are skipped.
+        if isinstance(child.tag, six.string_types):
+            contents.append(element_to_tupletree(child))
+        if child.tail:
+            contents.append(child.tail)
 
-    node_name = node.nodeName
-    attributes = {}
-    contents = []
+    return (etree.QName(element).localname, dict(element.attrib), contents,
+            None)
 
-    for child in node.childNodes:
-        if child.nodeType == child.ELEMENT_NODE:
-            contents.append(dom_to_tupletree(child))
-        elif child.nodeType == child.TEXT_NODE:
-            msg = "text node %s is not a string" % repr(child)
-            assert isinstance(child.nodeValue, types.StringTypes), msg
-            contents.append(child.nodeValue)
-        else:
-            raise RuntimeError("can't handle %s" % child)
 
-    for i in range(node.attributes.length):
-        attr_node = node.attributes.item(i)
-        attributes[attr_node.nodeName] = attr_node.nodeValue
+def _release(element):
+    """Drop an element which has been parsed, with its earlier siblings."""
+    element.clear()
+    parent = element.getparent()
+    while element.getprevious() is not None:
+        del parent[0]
+
 
-    return node_name, attributes, contents, None
+def parse_xml_api_stream(xml_string):
+    """Parse an XML API response packet in a single streaming pass.
 
+    Gives the same result as parse_xml_api() on the tuple tree of the whole
+    packet, but each record under the Response is parsed as soon as it has
+    been read and then dropped, so neither a DOM nor a tuple tree of the
+    packet is ever built.
+    """
+    if isinstance(xml_string, six.text_type):
+        xml_string = xml_string.encode('utf-8')
+
+    records = []
+    result = None
+    packet_children = 0
+    depth = 0
+
+    for event, element in etree.iterparse(six.BytesIO(xml_string),
+                                          events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            continue
+
+        depth -= 1
+        if not isinstance(element.tag, six.string_types):
+            continue
+
+        node_name = etree.QName(element).localname
+        if depth == 2 and etree.QName(element.getparent()).localname == (
+                'Response'):
+            if node_name not in RESPONSE_CHILDREN:
+                LOG.warn(_LW('Expected one of %(expected)s under'
+                             ' %(parent)s, got %(actual)s.'),
+                         {'expected': RESPONSE_CHILDREN,
+                          'parent': 'Response',
+                          'actual': repr(node_name)})
+            record = parse_any(element_to_tupletree(element))
+            if record is not None:
+                records.append(record)
+            _release(element)
+        elif depth == 1:
+            packet_children += 1
+            if node_name not in ('Response', 'PacketFault'):
+                LOG.warn(_LW('Expected one of %(item)s, got %(child)s '
+                             'under %(parent)s.'),
+                         {'item': ['Response', 'PacketFault'],
+                          'child': node_name,
+                          'parent': 'ResponsePacket'})
+            if node_name == 'Response':
+                # The records have already been parsed and released.
+                check_node((node_name, dict(element.attrib), [], None),
+                           'Response')
+                result = records
+            else:
+                result = parse_any(element_to_tupletree(element))
+            _release(element)
+        elif depth == 0:
+            packet_attrs = dict(element.attrib)
+            if element.nsmap.get(None):
+                packet_attrs['xmlns'] = element.nsmap[None]
+            check_node((node_name, packet_attrs, [], None),
+                       'ResponsePacket', ['xmlns'])
+
+    if packet_children > 1:
+        LOG.warn(_LW('Expected either zero or one of %(node)s '
+                     'under %(parent)s.'),
+                 {'node': ['Response', 'PacketFault'],
+                  'parent': 'ResponsePacket'})
+        return None
 
-def xml_to_tupletree(xml_string):
-    """Parse XML straight into tupletree."""
-    dom_xml = xml.dom.minidom.parseString(xml_string)
-    return dom_to_tupletree(dom_xml)
+    return result
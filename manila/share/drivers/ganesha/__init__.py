@@ -81,7 +81,11 @@ class GaneshaNASHelper(NASHelperBase):
 
     def init_helper(self):
         """Initializes protocol-specific NAS drivers."""
-        self.ganesha = ganesha_manager.GaneshaManager(
+        if self.configuration.ganesha_native_mode:
+            manager_class = ganesha_manager.NativeGaneshaManager
+        else:
+            manager_class = ganesha_manager.GaneshaManager
+        self.ganesha = manager_class(
             self._execute,
             self.tag,
             ganesha_config_path=self.configuration.ganesha_config_path,
@@ -13,13 +13,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import errno
 import os
 import pipes
 import re
+import sqlite3
 import sys
+import tempfile
 
 from oslo_log import log
 from oslo_serialization import jsonutils
+from oslo_utils import excutils
 import six
 
 from manila import exception
@@ -195,10 +199,19 @@ class GaneshaManager(object):
                     cmd=e.cmd)
         self.execute = _execute
         self.ganesha_export_dir = kwargs['ganesha_export_dir']
-        self.execute('mkdir', '-p', self.ganesha_export_dir)
         self.ganesha_db_path = kwargs['ganesha_db_path']
-        self.execute('mkdir', '-p', os.path.dirname(self.ganesha_db_path))
         self.ganesha_service = kwargs['ganesha_service_name']
+        self._init_storage()
+        self.get_export_id(bump=False)
+        # Starting from empty state. State will be rebuilt in a later
+        # stage of service initalization.
+        self.reset_exports()
+        self.restart_service()
+
+    def _init_storage(self):
+        """Create the export directory and the export id database."""
+        self.execute('mkdir', '-p', self.ganesha_export_dir)
+        self.execute('mkdir', '-p', os.path.dirname(self.ganesha_db_path))
         # Here we are to make sure that an SQLite database of the
         # required scheme exists at self.ganesha_db_path.
         # The following command gets us there -- provided the file
@@ -210,11 +223,6 @@ class GaneshaManager(object):
                      'create table ganesha(key varchar(20) primary key, '
                      'value int); insert into ganesha values("exportid", '
                      '100);', run_as_root=False, check_exit_code=False)
-        self.get_export_id(bump=False)
-        # Starting from empty state. State will be rebuilt in a later
-        # stage of service initalization.
-        self.reset_exports()
-        self.restart_service()
 
     def _getpath(self, name):
         """Get the path of config file for name."""
@@ -343,3 +351,89 @@ class GaneshaManager(object):
         self.execute('sh', '-c',
                      'rm -f %s/*.conf' % pipes.quote(self.ganesha_export_dir))
         self._mkindex()
+
+
+class NativeGaneshaManager(GaneshaManager):
+    """Ganesha instrumentation for a Ganesha node local to Manila.
+
+    Export files and the export id database are handled from within the
+    Manila process: files are written atomically with a rename, export ids
+    are kept in a persistent sqlite3 connection and the export directory
+    is listed directly. Only Ganesha itself is driven by commands.
+    """
+
+    def _init_storage(self):
+        """Create the export directory and the export id database."""
+        for path in (self.ganesha_export_dir,
+                     os.path.dirname(self.ganesha_db_path)):
+            try:
+                os.makedirs(path)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+        self.db = sqlite3.connect(self.ganesha_db_path)
+        with self.db:
+            self.db.execute('create table if not exists ganesha('
+                            'key varchar(20) primary key, value int)')
+            self.db.execute('insert or ignore into ganesha '
+                            'values("exportid", 100)')
+
+    def _write_file(self, path, data):
+        """Write data to path atomically."""
+        dirpath, fname = os.path.split(path)
+        fd, tmpf = tempfile.mkstemp(prefix=fname + '.', dir=dirpath)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                # Same content as written by echo.
+                f.write(data + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(tmpf, path)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                utils.delete_if_exists(tmpf)
+
+    def _mkindex(self):
+        """Generate the index file for current exports."""
+        @utils.synchronized("ganesha-index-" + self.tag, external=True)
+        def _mkindex():
+            files = sorted(f for f in os.listdir(self.ganesha_export_dir)
+                           if self.confrx.search(f) and f != "INDEX.conf")
+            index = "".join("%include " + os.path.join(
+                self.ganesha_export_dir, f) + "\n" for f in files)
+            self._write_conf_file("INDEX", index)
+        _mkindex()
+
+    def _read_export_file(self, name):
+        """Return the dict of the export identified by name."""
+        with open(self._getpath(name)) as f:
+            return parseconf(f.read())
+
+    def _rm_export_file(self, name):
+        """Remove export file of name."""
+        os.remove(self._getpath(name))
+
+    def get_export_id(self, bump=True):
+        """Get a new export id."""
+        try:
+            with self.db:
+                if bump:
+                    self.db.execute('update ganesha set value = value + 1 '
+                                    'where key = "exportid"')
+                row = self.db.execute('select value from ganesha where '
+                                      'key = "exportid"').fetchone()
+        except sqlite3.Error:
+            row = None
+        if not row:
+            LOG.error(_LE("Invalid export database on "
+                      "Ganesha node %(tag)s: %(db)s."),
+                      {'tag': self.tag, 'db': self.ganesha_db_path})
+            raise exception.InvalidSqliteDB()
+        return int(row[0])
+
+    def reset_exports(self):
+        """Delete all export files."""
+        for fname in os.listdir(self.ganesha_export_dir):
+            if self.confrx.search(fname):
+                os.remove(os.path.join(self.ganesha_export_dir, fname))
+        self._mkindex()
@@ -15,8 +15,8 @@
 
 """Generic Driver for shares."""
 
+import collections
 import os
-import re
 import time
 
 from oslo_concurrency import processutils
@@ -75,6 +75,12 @@ share_opts = [
                default='ext4',
                choices=['ext4', 'ext3'],
                help='Filesystem type of the share volume.'),
+    cfg.BoolOpt('nfs_exports_cache',
+                default=False,
+                help='Keep the exports of each service instance cached '
+                     'instead of reading them before every access change. '
+                     'Enable it only if exports are not changed outside of '
+                     'Manila.'),
     cfg.StrOpt('cinder_volume_type',
                default=None,
                help='Name or id of cinder volume type which will be used '
@@ -137,30 +143,35 @@ class GenericShareDriver(driver.ExecuteMixin, driver.ShareDriver):
         self.private_storage = kwargs.get('private_storage')
 
     def _ssh_exec(self, server, command):
-        connection = self.ssh_connections.get(server['instance_id'])
-        if not connection:
-            ssh_pool = utils.SSHPool(server['ip'],
-                                     22,
-                                     None,
-                                     server['username'],
-                                     server.get('password'),
-                                     server.get('pk_path'),
-                                     max_size=1)
-            ssh = ssh_pool.create()
-            self.ssh_connections[server['instance_id']] = (ssh_pool, ssh)
-        else:
-            ssh_pool, ssh = connection
-
-        if not ssh.get_transport().is_active():
-            ssh_pool.remove(ssh)
-            ssh = ssh_pool.create()
-            self.ssh_connections[server['instance_id']] = (ssh_pool, ssh)
-        return processutils.ssh_execute(ssh, ' '.join(command))
+        ssh_pool = self.ssh_connections.get(server['instance_id'])
+        if not ssh_pool:
+            ssh_pool = utils.SSHPool(
+                server['ip'],
+                22,
+                None,
+                server['username'],
+                server.get('password'),
+                server.get('pk_path'),
+                idle_timeout=self.configuration.ssh_idle_timeout,
+                max_lifetime=self.configuration.ssh_max_lifetime,
+                keepalive_interval=self.configuration.ssh_keepalive_interval,
+                max_size=1)
+            self.ssh_connections[server['instance_id']] = ssh_pool
+
+        # NOTE: SSHPool.get() replaces closed, idle and expired clients, so
+        # there is no need to check the transport here.
+        with ssh_pool.item() as ssh:
+            return processutils.ssh_execute(ssh, ' '.join(command))
 
     def check_for_setup_error(self):
         """Returns an error if prerequisites aren't met."""
         pass
 
+    def get_connection_pool_stats(self):
+        return dict((instance_id, ssh_pool.get_stats())
+                    for instance_id, ssh_pool
+                    in self.ssh_connections.items())
+
     def do_setup(self, context):
         """Any initialization the generic driver does while starting."""
         super(GenericShareDriver, self).do_setup(context)
@@ -640,6 +651,18 @@ class GenericShareDriver(driver.ExecuteMixin, driver.ShareDriver):
         self._get_helper(share).deny_access(
             share_server['backend_details'], share['name'], access)
 
+    @ensure_server
+    def update_access(self, context, share, add_rules, delete_rules,
+                      share_server=None):
+        """Apply several access rule changes to the share at once."""
+        failed = [access for access in add_rules
+                  if access['access_level'] not in (const.ACCESS_LEVEL_RW,
+                                                    const.ACCESS_LEVEL_RO)]
+        add_rules = [access for access in add_rules if access not in failed]
+        return failed + self._get_helper(share).update_access(
+            share_server['backend_details'], share['name'], add_rules,
+            delete_rules)
+
     def _get_helper(self, share):
         helper = self._helpers.get(share['share_proto'])
         if helper:
@@ -805,6 +828,34 @@ class NASHelperBase(object):
         """Deny access to the host."""
         raise NotImplementedError()
 
+    def update_access(self, server, share_name, add_rules, delete_rules):
+        """Apply several access rule changes.
+
+        Calls deny_access and allow_access for each rule, helpers able to
+        apply all of them at once should override it.
+
+        :returns: list of rules that could not be applied.
+        """
+        failed = []
+        for access in delete_rules:
+            try:
+                self.deny_access(server, share_name, access)
+            except Exception as e:
+                LOG.error(_LE("Failed to deny access %(access)s: %(e)s."),
+                          {'access': access['id'], 'e': six.text_type(e)})
+                failed.append(access)
+        for access in add_rules:
+            try:
+                self.allow_access(server, share_name, access['access_type'],
+                                  access['access_level'], access['access_to'])
+            except exception.ShareAccessExists:
+                pass
+            except Exception as e:
+                LOG.error(_LE("Failed to allow access %(access)s: %(e)s."),
+                          {'access': access['id'], 'e': six.text_type(e)})
+                failed.append(access)
+        return failed
+
     @staticmethod
     def _verify_server_has_public_address(server):
         if 'public_address' not in server:
@@ -837,6 +888,11 @@ def nfs_synchronized(f):
 class NFSHelper(NASHelperBase):
     """Interface to work with share."""
 
+    def __init__(self, *args, **kwargs):
+        super(NFSHelper, self).__init__(*args, **kwargs)
+        # Parsed exports by service instance id, see _get_exports.
+        self._exports = {}
+
     def create_export(self, server, share_name, recreate=False):
         """Create new export, delete old one if exists."""
         return ':'.join([server['public_address'],
@@ -844,6 +900,7 @@ class NFSHelper(NASHelperBase):
                              self.configuration.share_mount_path, share_name)])
 
     def init_helper(self, server):
+        self._exports.pop(server['instance_id'], None)
         try:
             self._ssh_exec(server, ['sudo', 'exportfs'])
         except exception.ProcessExecutionError as e:
@@ -868,39 +925,108 @@ class NFSHelper(NASHelperBase):
             raise exception.InvalidShareAccess(reason)
 
         # check if presents in export
-        out, _ = self._ssh_exec(server, ['sudo', 'exportfs'])
-        out = re.search(
-            re.escape(local_path) + '[\s\n]*' + re.escape(access_to), out)
-        if out is not None:
+        if access_to in self._get_exports(server).get(local_path, ()):
             raise exception.ShareAccessExists(access_type=access_type,
                                               access=access_to)
-        self._ssh_exec(
-            server,
-            ['sudo', 'exportfs', '-o', '%s,no_subtree_check' % access_level,
-             ':'.join([access_to, local_path])])
-        self._sync_nfs_temp_and_perm_files(server)
+        self._apply_exports(server, local_path, [(access_to, access_level)],
+                            [])
 
     @nfs_synchronized
     def deny_access(self, server, share_name, access, force=False):
         """Deny access to the host."""
         local_path = os.path.join(self.configuration.share_mount_path,
                                   share_name)
-        self._ssh_exec(server, ['sudo', 'exportfs', '-u',
-                                ':'.join([access['access_to'], local_path])])
-        self._sync_nfs_temp_and_perm_files(server)
+        self._apply_exports(server, local_path, [], [access['access_to']])
 
-    def _sync_nfs_temp_and_perm_files(self, server):
-        """Sync changes of exports with permanent NFS config file.
+    @nfs_synchronized
+    def update_access(self, server, share_name, add_rules, delete_rules):
+        """Apply the difference with current exports in one remote call."""
+        local_path = os.path.join(self.configuration.share_mount_path,
+                                  share_name)
+        failed = [access for access in add_rules
+                  if access['access_type'] != 'ip']
+        exported = set(self._get_exports(server).get(local_path, ()))
+
+        delete = [access['access_to'] for access in delete_rules
+                  if access['access_to'] in exported]
+        exported.difference_update(delete)
+        add = []
+        for access in add_rules:
+            if access not in failed and access['access_to'] not in exported:
+                add.append((access['access_to'], access['access_level']))
+                exported.add(access['access_to'])
+
+        if add or delete:
+            self._apply_exports(server, local_path, add, delete)
+        return failed
+
+    def _get_exports(self, server):
+        """Return exported hosts by local path of the service instance.
+
+        The parsed table is kept between calls when 'nfs_exports_cache'
+        is enabled, it is then only kept up to date by this helper.
+        """
+        exports = self._exports.get(server['instance_id'])
+        if exports is None:
+            out, _ = self._ssh_exec(server, ['sudo', 'exportfs'])
+            exports = self._parse_exports(out)
+            if self.configuration.nfs_exports_cache:
+                self._exports[server['instance_id']] = exports
+        return exports
+
+    @staticmethod
+    def _parse_exports(out):
+        """Parse output of 'exportfs' into sets of hosts by path.
+
+        Each export is printed as its path followed by the host, on the
+        same line or on the next one for long paths.
+        """
+        exports = collections.defaultdict(set)
+        items = out.split()
+        for path, host in zip(items[::2], items[1::2]):
+            exports[path].add(host)
+        return exports
+
+    def _apply_exports(self, server, local_path, add, delete):
+        """Export and unexport hosts and sync exports in one remote call.
+
+        :param add: list of (host, access level) tuples to export to.
+        :param delete: list of hosts to unexport from.
+        """
+        commands = [':']  # : is just placeholder
+        for host in delete:
+            commands.extend(['&&', 'sudo', 'exportfs', '-u',
+                             ':'.join([host, local_path])])
+        for host, access_level in add:
+            commands.extend(['&&', 'sudo', 'exportfs', '-o',
+                             '%s,no_subtree_check' % access_level,
+                             ':'.join([host, local_path])])
+        commands.extend(['&&'] + self._get_sync_nfs_command())
+        try:
+            self._ssh_exec(server, commands)
+        except Exception:
+            # Some of the commands may have been run, read exports again
+            # next time.
+            with excutils.save_and_reraise_exception():
+                self._exports.pop(server['instance_id'], None)
+
+        exports = self._exports.get(server['instance_id'])
+        if exports is not None:
+            exports[local_path].difference_update(delete)
+            exports[local_path].update(host for host, level in add)
+
+    @staticmethod
+    def _get_sync_nfs_command():
+        """Command syncing exports with permanent NFS config file.
 
         This is required to ensure, that after share server reboot, exports
         still exist.
         """
-        sync_cmd = [
+        return [
             'sudo', 'cp ', const.NFS_EXPORTS_FILE_TEMP, const.NFS_EXPORTS_FILE,
             '&&',
             'sudo', 'exportfs', '-a',
         ]
-        self._ssh_exec(server, sync_cmd)
 
     def get_exports_for_share(self, server, old_export_location):
         self._verify_server_has_public_address(server)
@@ -1011,6 +1137,22 @@ class CIFSHelper(NASHelperBase):
             if not force:
                 raise
 
+    def update_access(self, server, share_name, add_rules, delete_rules):
+        """Update the allowed hosts of the share with one get and set."""
+        failed = [access for access in add_rules
+                  if access['access_type'] != 'ip' or
+                  access['access_level'] != const.ACCESS_LEVEL_RW]
+        denied = set(access['access_to'] for access in delete_rules
+                     if access['access_level'] == const.ACCESS_LEVEL_RW)
+        hosts = self._get_allow_hosts(server, share_name)
+        new_hosts = [host for host in hosts if host not in denied]
+        for access in add_rules:
+            if access not in failed and access['access_to'] not in new_hosts:
+                new_hosts.append(access['access_to'])
+        if new_hosts != hosts:
+            self._set_allow_hosts(server, new_hosts, share_name)
+        return failed
+
     def _get_allow_hosts(self, server, share_name):
         (out, _) = self._ssh_exec(server, ['sudo', 'net', 'conf', 'getparm',
                                            share_name, '\"hosts allow\"'])
@@ -89,6 +89,15 @@ NFS_EXPORT_VOL = 'nfs.export-volumes'
 GLUSTERFS_VERSION_MIN = (3, 5)
 
 
+def ssh_pool_options(configuration):
+    """Return the SSHPool keyword arguments set by the ssh_* options."""
+    return {
+        'idle_timeout': configuration.ssh_idle_timeout,
+        'max_lifetime': configuration.ssh_max_lifetime,
+        'keepalive_interval': configuration.ssh_keepalive_interval,
+    }
+
+
 class GlusterManager(object):
     """Interface with a GlusterFS volume."""
 
@@ -97,7 +106,8 @@ class GlusterManager(object):
                         '(?::/(?P<vol>.+))?')
 
     def __init__(self, address, execf, path_to_private_key=None,
-                 remote_server_password=None, has_volume=True):
+                 remote_server_password=None, has_volume=True,
+                 ssh_pool_options=None):
         """Initialize a GlusterManager instance.
 
         :param address: the Gluster URI (in [<user>@]<host>:/<vol> format).
@@ -108,6 +118,8 @@ class GlusterManager(object):
                            with the optional volume part (True: require its
                            presence, False: require its absence, None: don't
                            require anything about volume).
+        :param ssh_pool_options: extra keyword arguments for the SSH pool
+                                 of remote servers (see ssh_pool_options()).
         """
         m = self.scheme.search(address)
         if m:
@@ -127,6 +139,7 @@ class GlusterManager(object):
             self.export = None
         self.path_to_private_key = path_to_private_key
         self.remote_server_password = remote_server_password
+        self.ssh_pool_options = ssh_pool_options or {}
         self.gluster_call = self.make_gluster_call(execf)
 
     def make_gluster_call(self, execf):
@@ -135,9 +148,12 @@ class GlusterManager(object):
             gluster_execf = ganesha_utils.SSHExecutor(
                 self.host, 22, None, self.remote_user,
                 password=self.remote_server_password,
-                privatekey=self.path_to_private_key)
+                privatekey=self.path_to_private_key,
+                **self.ssh_pool_options)
+            self.ssh_pool = gluster_execf.pool
         else:
             gluster_execf = ganesha_utils.RootExecutor(execf)
+            self.ssh_pool = None
         return lambda *args, **kwargs: gluster_execf(*(('gluster',) + args),
                                                      **kwargs)
 
@@ -247,6 +263,7 @@ class GlusterfsShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
             self._execute,
             self.configuration.glusterfs_path_to_private_key,
             self.configuration.glusterfs_server_password,
+            ssh_pool_options=ssh_pool_options(self.configuration),
         )
         self.gluster_manager.check_gluster_version(GLUSTERFS_VERSION_MIN)
         try:
@@ -357,6 +374,12 @@ class GlusterfsShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
             free_capacity_gb=(smpv.f_bavail * smpv.f_frsize) >> 30)
         super(GlusterfsShareDriver, self)._update_share_stats(data)
 
+    def get_connection_pool_stats(self):
+        if not (self.gluster_manager and self.gluster_manager.ssh_pool):
+            return {}
+        return {self.gluster_manager.host:
+                self.gluster_manager.ssh_pool.get_stats()}
+
     def get_network_allocations_number(self):
         return 0
 
@@ -557,7 +580,8 @@ class GaneshaNFSHelper(ganesha.GaneshaNASHelper):
                 config_object.glusterfs_ganesha_server_ip, 22, None,
                 config_object.glusterfs_ganesha_server_username,
                 password=config_object.glusterfs_ganesha_server_password,
-                privatekey=config_object.glusterfs_path_to_private_key)
+                privatekey=config_object.glusterfs_path_to_private_key,
+                **ssh_pool_options(config_object))
         else:
             execute = ganesha_utils.RootExecutor(execute)
         super(GaneshaNFSHelper, self).__init__(execute, config_object,
@@ -229,7 +229,8 @@ class GlusterfsNativeShareDriver(driver.ExecuteMixin, driver.ShareDriver):
             gluster_address, self._execute,
             self.configuration.glusterfs_native_path_to_private_key,
             self.configuration.glusterfs_native_server_password,
-            has_volume=has_volume)
+            has_volume=has_volume,
+            ssh_pool_options=glusterfs.ssh_pool_options(self.configuration))
 
     def _fetch_gluster_volumes(self):
         """Do a 'gluster volume list | grep <volume pattern>'.
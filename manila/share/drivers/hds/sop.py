@@ -21,6 +21,9 @@ import base64
 import socket
 import time
 
+import eventlet
+from eventlet import event
+from eventlet import pools
 import httplib2
 from oslo_config import cfg
 from oslo_log import log
@@ -29,7 +32,7 @@ from oslo_utils import units
 import six
 
 from manila import exception
-from manila.i18n import _LW
+from manila.i18n import _, _LW
 from manila.share import driver
 
 LOG = log.getLogger(__name__)
@@ -42,13 +45,117 @@ hdssop_share_opts = [
                help='Specifies the sop admin user'),
     cfg.StrOpt('hdssop_adminpassword',
                help='Specifies the sop admin user password',
-               secret=True)
+               secret=True),
+    cfg.IntOpt('hdssop_connection_pool_size',
+               default=4,
+               help='Maximum number of HTTP connections kept open to the '
+               'SOPAPI cluster for share operations.'),
+    cfg.FloatOpt('hdssop_job_poll_interval',
+                 default=1.0,
+                 help='Seconds to wait before the first status poll of a '
+                 'SOPAPI job. The interval doubles after each poll.'),
+    cfg.FloatOpt('hdssop_job_max_poll_interval',
+                 default=16.0,
+                 help='Maximum number of seconds between two status polls '
+                 'of a SOPAPI job.'),
+    cfg.IntOpt('hdssop_job_timeout',
+               default=300,
+               help='Seconds to wait for a SOPAPI job to complete.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(hdssop_share_opts)
 
 
+def _new_http_client():
+    return httplib2.Http(disable_ssl_certificate_validation=True,
+                         timeout=None)
+
+
+class SopJobTracker(object):
+    """Polls all the outstanding SOPAPI jobs of a backend together.
+
+    A single greenthread and HTTP client poll every tracked job, waiting
+    poll_interval seconds before the first poll of a job and doubling
+    the wait after each poll up to max_poll_interval.
+    """
+
+    def __init__(self, httpclient, get_headers, poll_interval=1,
+                 max_poll_interval=16, timeout=300):
+        self.httpclient = httpclient
+        self.get_headers = get_headers
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.timeout = timeout
+        self._jobs = {}
+        self._poller = None
+
+    def track(self, job_uri):
+        """Start tracking a job.
+
+        :returns: an event sent the job once it completes, or the error
+                  raised if it fails or times out.
+        """
+        job = self._jobs.get(job_uri)
+        if job is None:
+            now = time.time()
+            job = {
+                'event': event.Event(),
+                'interval': self.poll_interval,
+                'next_poll': now + self.poll_interval,
+                'deadline': now + self.timeout,
+            }
+            self._jobs[job_uri] = job
+        if self._poller is None:
+            self._poller = eventlet.spawn_n(self._run)
+        return job['event']
+
+    def _run(self):
+        try:
+            while self._jobs:
+                delay = min(job['next_poll']
+                            for job in self._jobs.values()) - time.time()
+                if delay > 0:
+                    # Jobs added meanwhile are due after poll_interval.
+                    eventlet.sleep(min(delay, self.poll_interval))
+                else:
+                    self._poll_once()
+        finally:
+            self._poller = None
+
+    def _poll_once(self):
+        """Poll the jobs that are due and finish the completed ones."""
+        now = time.time()
+        for job_uri, job in list(self._jobs.items()):
+            if job['next_poll'] > now:
+                continue
+            try:
+                result = self._get_job(job_uri)
+                status = result['properties']['completion-status']
+                if status == 'ERROR':
+                    raise exception.SopAPIError(err=_('job errored out'))
+                if status != 'COMPLETE' and now >= job['deadline']:
+                    raise exception.SopAPIError(err=_('job timed out'))
+            except Exception as e:
+                del self._jobs[job_uri]
+                job['event'].send_exception(e)
+                continue
+            if status == 'COMPLETE':
+                del self._jobs[job_uri]
+                job['event'].send(result)
+            else:
+                job['interval'] = min(job['interval'] * 2,
+                                      self.max_poll_interval)
+                job['next_poll'] = time.time() + job['interval']
+
+    def _get_job(self, job_uri):
+        resp_headers, resp_content = self.httpclient.request(
+            job_uri, 'GET', body='', headers=self.get_headers())
+        if int(resp_headers['status']) != 200:
+            raise exception.SopAPIError(err=_('error getting job status'))
+        return json.loads(resp_content)
+
+
 class SopShareDriver(driver.ShareDriver):
     """Execute commands relating to Shares."""
 
@@ -60,82 +167,78 @@ class SopShareDriver(driver.ShareDriver):
         self.sop_target = self.configuration.safe_get('hdssop_target')
         self.sopuser = self.configuration.safe_get('hdssop_adminuser')
         self.soppassword = self.configuration.safe_get('hdssop_adminpassword')
+        self._http_pool = pools.Pool(
+            max_size=self.configuration.hdssop_connection_pool_size,
+            create=_new_http_client)
+        self.job_tracker = SopJobTracker(
+            _new_http_client(),
+            lambda: dict(Authorization=self.get_sop_auth_header()),
+            poll_interval=self.configuration.hdssop_job_poll_interval,
+            max_poll_interval=(
+                self.configuration.hdssop_job_max_poll_interval),
+            timeout=self.configuration.hdssop_job_timeout)
+        self._sop_ids = {}
 
     def get_sop_auth_header(self):
         return 'Basic ' + base64.b64encode(
             self.sopuser + ':' +
             self.soppassword).encode('utf-8').decode('ascii')
 
-    def _wait_for_job_completion(self, httpclient, job_uri):
-        """Wait for job identified by job_uri to complete."""
-        count = 0
-        headers = dict(Authorization=self.get_sop_auth_header())
+    def _sop_request(self, method, sopuri, body=''):
+        """Send a SOPAPI request with an HTTP client from the pool.
 
-        # NOTE(jasonsb): timeout logic here needs be revisited after
-        # load testing results are in.
-        while True:
-            if count > 300:
-                raise exception.SopAPIError(err=_('job timed out'))
+        The client goes back to the pool once the response is read, so
+        it is not held while the caller waits for the resulting job.
+        """
+        headers = dict(Authorization=self.get_sop_auth_header())
+        uri = self.sop_target + '/sopapi' + sopuri
+        with self._http_pool.item() as httpclient:
+            return httpclient.request(uri, method, body=body,
+                                      headers=headers)
 
-            resp_headers, resp_content = httpclient.request(job_uri, 'GET',
-                                                            body='',
-                                                            headers=headers)
-            if int(resp_headers['status']) != 200:
-                raise exception.SopAPIError(err=_('error getting job status'))
+    def _wait_for_job_completion(self, job_uri):
+        """Wait for job identified by job_uri to complete.
 
-            job = json.loads(resp_content)
-            if job['properties']['completion-status'] == 'ERROR':
-                raise exception.SopAPIError(err=_('job errored out'))
-            if job['properties']['completion-status'] == 'COMPLETE':
-                return job
-            time.sleep(1)
-            count += 1
+        The job is polled by the job tracker along with the other
+        outstanding jobs.
+        """
+        return self.job_tracker.track(job_uri).wait()
 
-    def _add_file_system_sopapi(self, httpclient, payload):
+    def _add_file_system_sopapi(self, payload):
         """Add a new filesystem via SOPAPI."""
-        sopuri = '/file-systems/'
-        headers = dict(Authorization=self.get_sop_auth_header())
-        uri = self.sop_target + '/sopapi' + sopuri
-        payload_json = json.dumps(payload)
-        resp_headers, resp_content = httpclient.request(uri, 'POST',
-                                                        body=payload_json,
-                                                        headers=headers)
+        resp_headers, resp_content = self._sop_request(
+            'POST', '/file-systems/', body=json.dumps(payload))
         resp_code = int(resp_headers['status'])
         if resp_code == 202:
             job_loc = resp_headers['location']
-            self._wait_for_job_completion(httpclient, job_loc)
+            self._wait_for_job_completion(job_loc)
         else:
             raise exception.SopAPIError(
                 err=(_('received error: %s') %
                      resp_content['messages'][0]['message']))
 
-    def _add_share_sopapi(self, httpclient, payload):
+    def _add_share_sopapi(self, payload):
         """Add a new filesystem via SOPAPI."""
-        sopuri = '/shares/'
-        headers = dict(Authorization=self.get_sop_auth_header())
-        payload_json = json.dumps(payload)
-        uri = self.sop_target + '/sopapi' + sopuri
-        resp_headers, resp_content = httpclient.request(uri, 'POST',
-                                                        body=payload_json,
-                                                        headers=headers)
+        resp_headers, resp_content = self._sop_request(
+            'POST', '/shares/', body=json.dumps(payload))
         resp_code = int(resp_headers['status'])
         if resp_code == 202:
             job_loc = resp_headers['location']
-            job = self._wait_for_job_completion(httpclient, job_loc)
+            job = self._wait_for_job_completion(job_loc)
             if job['properties']['completion-status'] == 'COMPLETE':
                 return job['properties']['resource-name']
         else:
+            self._sop_ids.pop(('file-systems', payload['name']), None)
             raise exception.SopAPIError(err=_('received error: %s') %
                                         resp_headers['status'])
 
-    def _get_file_system_id_by_name(self, httpclient, fsname):
+    def _get_file_system_id_by_name(self, fsname):
+        key = ('file-systems', fsname)
+        if key in self._sop_ids:
+            return self._sop_ids[key]
 
-        sopuri = '/file-systems/list?name=' + fsname
-        headers = dict(Authorization=self.get_sop_auth_header())
-        uri = self.sop_target + '/sopapi' + sopuri
-        resp_headers, resp_content = httpclient.request(uri, 'GET',
-                                                        body='',
-                                                        headers=headers)
+        resp_headers, resp_content = self._sop_request(
+            'GET', '/file-systems/list?name=' + fsname)
 
         response = json.loads(resp_content)
         num_of_resources = 0
@@ -148,16 +251,17 @@ class SopShareDriver(driver.ShareDriver):
         num_of_resources = len(resource_list)
         if num_of_resources <= 0:
             return ''
+        self._sop_ids[key] = resource_list[0]['id']
         return resource_list[0]['id']
 
-    def _get_share_id_by_name(self, httpclient, share_name):
+    def _get_share_id_by_name(self, share_name):
         """Look up share given the share name."""
-        sopuri = '/shares/list?name=' + share_name
-        headers = dict(Authorization=self.get_sop_auth_header())
-        uri = self.sop_target + '/sopapi' + sopuri
-        resp_headers, resp_content = httpclient.request(uri, 'GET',
-                                                        body='',
-                                                        headers=headers)
+        key = ('shares', share_name)
+        if key in self._sop_ids:
+            return self._sop_ids[key]
+
+        resp_headers, resp_content = self._sop_request(
+            'GET', '/shares/list?name=' + share_name)
         response = json.loads(resp_content)
         num_of_resources = 0
         if int(resp_headers['status']) != 200 and 'messages' in response:
@@ -168,15 +272,13 @@ class SopShareDriver(driver.ShareDriver):
         num_of_resources = len(resource_list)
         if num_of_resources == 0:
             return ''
+        self._sop_ids[key] = resource_list[0]['id']
         return resource_list[0]['id']
 
     def create_share(self, ctx, share, share_server=None):
         """Create new share on HDS Scale-out Platform."""
         sharesize = int(six.text_type(share['size']))
 
-        httpclient = httplib2.Http(disable_ssl_certificate_validation=True,
-                                   timeout=None)
-
         if share['share_proto'] != 'NFS':
             raise exception.InvalidShare(
                 reason=(_('Invalid NAS protocol supplied: %s.') %
@@ -192,47 +294,37 @@ class SopShareDriver(driver.ShareDriver):
             'space-lwm': 70,
             'name': share['id'],
         }
-        self._add_file_system_sopapi(httpclient, payload)
+        self._add_file_system_sopapi(payload)
         payload = {
             'description': '',
             'type': 'NFS',
             'enabled': True,
             'tags': '',
             'name': share['id'],
-            'file-system-id': self._get_file_system_id_by_name(
-                httpclient, share['id']),
+            'file-system-id': self._get_file_system_id_by_name(share['id']),
         }
-        return self.sop_target + ':/' + self._add_share_sopapi(
-            httpclient, payload)
+        return self.sop_target + ':/' + self._add_share_sopapi(payload)
 
-    def _delete_file_system_sopapi(self, httpclient, fs_id):
+    def _delete_file_system_sopapi(self, fs_id):
         """Delete filesystem on SOP."""
-        sopuri = '/file-systems/' + fs_id
-        headers = dict(Authorization=self.get_sop_auth_header())
-        uri = self.sop_target + '/sopapi' + sopuri
-        resp_headers, resp_content = httpclient.request(uri, 'DELETE',
-                                                        body='',
-                                                        headers=headers)
+        resp_headers, resp_content = self._sop_request(
+            'DELETE', '/file-systems/' + fs_id)
         resp_code = int(resp_headers['status'])
         if resp_code == 202:
             job_loc = resp_headers['location']
-            self._wait_for_job_completion(httpclient, job_loc)
+            self._wait_for_job_completion(job_loc)
         else:
             raise exception.SopAPIError(err=_('received error: %s') %
                                         resp_headers['status'])
 
-    def _delete_share_sopapi(self, httpclient, share_id):
+    def _delete_share_sopapi(self, share_id):
         """Delete share on SOP."""
-        sopuri = '/shares/' + share_id
-        headers = dict(Authorization=self.get_sop_auth_header())
-        uri = self.sop_target + '/sopapi' + sopuri
-        resp_headers, resp_content = httpclient.request(uri, 'DELETE',
-                                                        body='',
-                                                        headers=headers)
+        resp_headers, resp_content = self._sop_request(
+            'DELETE', '/shares/' + share_id)
         resp_code = int(resp_headers['status'])
         if resp_code == 202:
             job_loc = resp_headers['location']
-            self._wait_for_job_completion(httpclient, job_loc)
+            self._wait_for_job_completion(job_loc)
         else:
             raise exception.SopAPIError(err=_('received error: %s') %
                                         resp_headers['status'])
@@ -240,14 +332,12 @@ class SopShareDriver(driver.ShareDriver):
     def delete_share(self, context, share, share_server=None):
         """Remove a share from Sop volume."""
 
-        httpclient = httplib2.Http(disable_ssl_certificate_validation=True,
-                                   timeout=None)
-        self._delete_share_sopapi(
-            httpclient,
-            self._get_share_id_by_name(httpclient, share['id']))
-        self._delete_file_system_sopapi(
-            httpclient,
-            self._get_file_system_id_by_name(httpclient, share['id']))
+        share_id = self._get_share_id_by_name(share['id'])
+        self._sop_ids.pop(('shares', share['id']), None)
+        self._delete_share_sopapi(share_id)
+        fs_id = self._get_file_system_id_by_name(share['id'])
+        self._sop_ids.pop(('file-systems', share['id']), None)
+        self._delete_file_system_sopapi(fs_id)
 
     def create_snapshot(self, context, snapshot, share_server=None):
         """Not currently supported on HDS Scale-out Platform."""
@@ -272,10 +362,6 @@ class SopShareDriver(driver.ShareDriver):
             raise exception.InvalidShareAccess(
                 reason=_('only IP access type allowed'))
 
-        httpclient = httplib2.Http(disable_ssl_certificate_validation=True,
-                                   timeout=None)
-        sop_share_id = self._get_share_id_by_name(httpclient, share['id'])
-
         if access['access_level'] == 'rw':
             access_level = True
         elif access['access_level'] == 'ro':
@@ -284,6 +370,8 @@ class SopShareDriver(driver.ShareDriver):
             raise exception.InvalidShareAccess(
                 reason=(_('Unsupported level of access was provided - %s') %
                         access['access_level']))
+
+        sop_share_id = self._get_share_id_by_name(share['id'])
         payload = {
             'action': 'add-access-rule',
             'all-squash': True,
@@ -296,18 +384,20 @@ class SopShareDriver(driver.ShareDriver):
             'tags': 'nfs',
             'name': '%s-%s' % (share['id'], access['access_to']),
         }
-        sopuri = '/shares/'
-        headers = dict(Authorization=self.get_sop_auth_header())
-        uri = self.sop_target + '/sopapi' + sopuri + sop_share_id
-        resp_headers, resp_content = httpclient.request(
-            uri, 'POST',
-            body=json.dumps(payload),
-            headers=headers)
+        self._share_access_sopapi(share['id'], sop_share_id, payload)
+
+    def _share_access_sopapi(self, share_name, share_id, payload):
+        """Add or delete an access rule of a share via SOPAPI."""
+        resp_headers, resp_content = self._sop_request(
+            'POST', '/shares/' + share_id, body=json.dumps(payload))
         resp_code = int(resp_headers['status'])
         if resp_code == 202:
             job_loc = resp_headers['location']
-            self._wait_for_job_completion(httpclient, job_loc)
+            self._wait_for_job_completion(job_loc)
         else:
+            # The share may have been deleted or re-created since its ID
+            # was cached, look it up again next time.
+            self._sop_ids.pop(('shares', share_name), None)
             raise exception.SopAPIError(err=_('received error: %s') %
                                         resp_headers['status'])
 
@@ -320,28 +410,12 @@ class SopShareDriver(driver.ShareDriver):
             LOG.warn(_LW('Only ip access type allowed.'))
             return
 
-        httpclient = httplib2.Http(disable_ssl_certificate_validation=True,
-                                   timeout=None)
-        sop_share_id = self._get_share_id_by_name(httpclient, share['id'])
+        sop_share_id = self._get_share_id_by_name(share['id'])
         payload = {
             'action': 'delete-access-rule',
             'name': '%s-%s' % (share['id'], access['access_to']),
         }
-
-        sopuri = '/shares/' + sop_share_id
-        headers = dict(Authorization=self.get_sop_auth_header())
-        uri = self.sop_target + '/sopapi' + sopuri
-        resp_headers, resp_content = httpclient.request(
-            uri, 'POST',
-            body=json.dumps(payload),
-            headers=headers)
-        resp_code = int(resp_headers['status'])
-        if resp_code == 202:
-            job_loc = resp_headers['location']
-            self._wait_for_job_completion(httpclient, job_loc)
-        else:
-            raise exception.SopAPIError(err=_('received error: %s') %
-                                        resp_headers['status'])
+        self._share_access_sopapi(share['id'], sop_share_id, payload)
 
     def check_for_setup_error(self):
         """Check for setup error.
@@ -373,25 +447,24 @@ class SopShareDriver(driver.ShareDriver):
         """Calculate cluster storage capacity and return in GiB."""
         headers = dict(Authorization=self.get_sop_auth_header())
         uri = self.sop_target + '/sopapi/clusters'
-        httpclient = httplib2.Http(disable_ssl_certificate_validation=True,
-                                   timeout=None)
-        resp_headers, resp_content = httpclient.request(uri, 'GET',
-                                                        body='',
-                                                        headers=headers)
-        response = json.loads(resp_content)
-        if resp_content is not None:
-            for cluster in response['element-links']:
-                (resp_headers, resp_content) = httpclient.request(
-                    cluster,
-                    'GET',
-                    body='',
-                    headers=headers)
-                response = json.loads(resp_content)
-                totalspace = int(response['properties']
-                                 ['total-storage-capacity']) / units.Gi
-                spaceavail = int(response['properties']
-                                 ['total-storage-available']) / units.Gi
-                return (totalspace, spaceavail)
+        with self._http_pool.item() as httpclient:
+            resp_headers, resp_content = httpclient.request(uri, 'GET',
+                                                            body='',
+                                                            headers=headers)
+            response = json.loads(resp_content)
+            if resp_content is not None:
+                for cluster in response['element-links']:
+                    (resp_headers, resp_content) = httpclient.request(
+                        cluster,
+                        'GET',
+                        body='',
+                        headers=headers)
+                    response = json.loads(resp_content)
+                    totalspace = int(response['properties']
+                                     ['total-storage-capacity']) / units.Gi
+                    spaceavail = int(response['properties']
+                                     ['total-storage-available']) / units.Gi
+                    return (totalspace, spaceavail)
 
     def _update_share_stats(self):
         """Retrieve stats info from SOPAPI."""
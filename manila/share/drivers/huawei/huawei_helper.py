@@ -14,14 +14,15 @@
 #    under the License.
 
 import base64
+import os
 from xml.etree import ElementTree as ET
 
 from oslo_log import log
 from oslo_serialization import jsonutils
+from oslo_utils import excutils
 from oslo_utils import units
+import requests
 import six
-from six.moves import http_cookiejar
-from six.moves.urllib import request as urlreq  # pylint: disable=E0611
 
 from manila import exception
 from manila.i18n import _, _LE, _LW
@@ -36,12 +37,18 @@ class RestHelper():
 
     def __init__(self, configuration):
         self.configuration = configuration
-        self.cookie = http_cookiejar.CookieJar()
+        # The session keeps the login cookie and reuses its connections.
+        self.session = requests.Session()
         self.url = None
         self.headers = {
             "Connection": "keep-alive",
             "Content-Type": "application/json",
         }
+        self._xml_cache = None
+        # Share path to share ID and FSID, per share type.
+        self._share_index = {}
+        # Client name to access ID, per client type and share ID.
+        self._access_index = {}
 
     def call(self, url, data=None, method=None):
         """Send requests to server.
@@ -56,15 +63,15 @@ class RestHelper():
                       {'url': url,
                        'method': method,
                        'data': data})
-        opener = urlreq.build_opener(urlreq.HTTPCookieProcessor(self.cookie))
-        urlreq.install_opener(opener)
+        if not method:
+            method = "GET" if data is None else "POST"
 
         try:
-            req = urlreq.Request(url, data, self.headers)
-            if method:
-                req.get_method = lambda: method
-            res_temp = urlreq.urlopen(req, timeout=constants.SOCKET_TIMEOUT)
-            res = res_temp.read().decode("utf-8")
+            res_temp = self.session.request(method, url, data=data,
+                                            headers=self.headers,
+                                            timeout=constants.SOCKET_TIMEOUT)
+            res_temp.raise_for_status()
+            res = res_temp.content.decode("utf-8")
 
             LOG.debug('Response Data: %(res)s.', {'res': res})
 
@@ -201,12 +208,18 @@ class RestHelper():
         self._assert_rest_result(result, msg)
         self._assert_data_in_result(result, msg)
 
-        return result['data']['ID']
+        share_id = result['data']['ID']
+        if share_type in self._share_index:
+            self._share_index[share_type][share_path] = {'ID': share_id,
+                                                         'FSID': fs_id}
+        return share_id
 
     def _delete_share(self, share_name, share_proto):
         """Delete share."""
         share_type = self._get_share_type(share_proto)
-        share = self._get_share_by_name(share_name, share_type)
+        share = self._call_with_share(
+            share_name, share_type,
+            lambda share: self._delete_share_by_id(share['ID'], share_type))
 
         if not share:
             LOG.warn(_LW('The share was not found. share_name:%s'), share_name)
@@ -220,8 +233,10 @@ class RestHelper():
         share_id = share['ID']
         share_fs_id = share['FSID']
 
-        if share_id:
-            self._delete_share_by_id(share_id, share_type)
+        self._share_index[share_type].pop(
+            self._get_share_path(share_name), None)
+        self._access_index.pop(
+            (self._get_share_client_type(share_proto), share_id), None)
 
         if share_fs_id:
             self._delete_fs(share_fs_id)
@@ -344,9 +359,16 @@ class RestHelper():
         return pool_capacity
 
     def _read_xml(self):
-        """Open xml file and parse the content."""
+        """Open xml file and parse the content.
+
+        The parsed file is kept until the file name or its modification
+        time change.
+        """
         filename = self.configuration.manila_huawei_conf_file
         try:
+            key = (filename, os.path.getmtime(filename))
+            if self._xml_cache and self._xml_cache[0] == key:
+                return self._xml_cache[1]
             tree = ET.parse(filename)
             root = tree.getroot()
         except Exception as err:
@@ -355,6 +377,7 @@ class RestHelper():
                       {'filename': filename,
                        'err': err})
             raise err
+        self._xml_cache = (key, root)
         return root
 
     def _init_filesys_para(self, name, size):
@@ -408,19 +431,38 @@ class RestHelper():
             return
 
         access_to = access['access_to']
-        share = self._get_share_by_name(share_name, share_type)
+        share = self._call_with_share(
+            share_name, share_type,
+            lambda share: self._deny_access_rest(share['ID'], access_to,
+                                                 share_client_type))
         if not share:
             LOG.warn(_LW('Can not get share. share_name: %s'), share_name)
-            return
 
-        access_id = self._get_access_from_share(share['ID'], access_to,
+    def _deny_access_rest(self, share_id, access_to, share_client_type):
+        """Remove the access rule of a client from the share."""
+        access_id = self._get_access_from_share(share_id, access_to,
                                                 share_client_type)
         if not access_id:
-            LOG.warn(_LW('Can not get access id from share. share_name: %s'),
-                     share_name)
+            LOG.warn(_LW('Can not get access id from share. share_id: %s'),
+                     share_id)
             return
 
-        self._remove_access_from_share(access_id, share_client_type)
+        try:
+            self._remove_access_from_share(access_id, share_client_type)
+        except Exception:
+            with excutils.save_and_reraise_exception() as ctxt:
+                # The rule may have been removed or re-added by someone
+                # else since the index was loaded.
+                self._access_index.pop((share_client_type, share_id), None)
+                access_id_new = self._get_access_from_share(
+                    share_id, access_to, share_client_type)
+                if access_id_new != access_id:
+                    ctxt.reraise = False
+            if access_id_new:
+                self._remove_access_from_share(access_id_new,
+                                               share_client_type)
+
+        self._access_index[(share_client_type, share_id)].pop(access_to, None)
 
     def _remove_access_from_share(self, access_id, access_type):
         url = self.url + "/" + access_type + "/" + access_id
@@ -440,25 +482,30 @@ class RestHelper():
         return int(result['data']['COUNT'])
 
     def _get_access_from_share(self, share_id, access_to, share_client_type):
-        """Segments to find access for a period of 100."""
+        """Find the access ID of a client in the index of the share."""
+        index = self._access_index.get((share_client_type, share_id))
+        if index is None or access_to not in index:
+            # The rule may have been added by someone else since the index
+            # was loaded.
+            index = self._load_access_index(share_id, share_client_type)
+
+        return index.get(access_to)
+
+    def _load_access_index(self, share_id, share_client_type):
+        """Read all the access rules of a share, 100 at a time."""
         count = self._get_access_from_count(share_id, share_client_type)
 
-        access_id = None
-        range_begin = 0
-        while True:
-            if count < 0 or access_id:
-                break
-            access_id = self._get_access_from_share_range(share_id,
-                                                          access_to,
+        index = {}
+        for range_begin in six.moves.range(0, count, 100):
+            for item in self._get_access_from_share_range(share_id,
                                                           range_begin,
-                                                          share_client_type)
-            range_begin += 100
-            count -= 100
+                                                          share_client_type):
+                index[item['NAME']] = item['ID']
 
-        return access_id
+        self._access_index[(share_client_type, share_id)] = index
+        return index
 
-    def _get_access_from_share_range(self, share_id,
-                                     access_to, range_begin,
+    def _get_access_from_share_range(self, share_id, range_begin,
                                      share_client_type):
         range_end = range_begin + 100
         url = (self.url + "/" + share_client_type + "?filter=PARENTID::"
@@ -467,10 +514,7 @@ class RestHelper():
         result = self.call(url, None, "GET")
         self._assert_rest_result(result, 'Get access id by share error!')
 
-        if "data" in result:
-            for item in result['data']:
-                if access_to == item['NAME']:
-                    return item['ID']
+        return result.get('data', [])
 
     def _allow_access(self, share_name, access, share_proto):
         """Allow access to the share."""
@@ -487,15 +531,15 @@ class RestHelper():
 
         access_to = access['access_to']
 
-        share = self._get_share_by_name(share_name, share_type)
+        share = self._call_with_share(
+            share_name, share_type,
+            lambda share: self._allow_access_rest(share['ID'], access_to,
+                                                  share_proto))
         if not share:
             err_msg = (_('Can not get share.'))
             LOG.error(err_msg)
             raise exception.InvalidShareAccess(reason=err_msg)
 
-        share_id = share['ID']
-        self._allow_access_rest(share_id, access_to, share_proto)
-
     def _allow_access_rest(self, share_id, access_to, share_proto):
         """Allow access to the share."""
         access_type = self._get_share_client_type(share_proto)
@@ -525,6 +569,13 @@ class RestHelper():
         msg = 'Allow access error.'
         self._assert_rest_result(result, msg)
 
+        index = self._access_index.get((access_type, share_id))
+        if index is not None:
+            if 'ID' in result.get('data', {}):
+                index[access_to] = result['data']['ID']
+            else:
+                del self._access_index[(access_type, share_id)]
+
     def _get_share_client_type(self, share_proto):
         share_client_type = None
         if share_proto == 'NFS':
@@ -585,21 +636,54 @@ class RestHelper():
         return result['data']['ID']
 
     def _get_share_by_name(self, share_name, share_type):
-        """Segments to find share for a period of 100."""
+        """Find the ID and FSID of a share in the index of its type."""
+        share_path = self._get_share_path(share_name)
+        index = self._share_index.get(share_type)
+        if index is None or share_path not in index:
+            # The share may have been created by someone else since the
+            # index was loaded.
+            index = self._load_share_index(share_type)
+
+        return dict(index.get(share_path, {}))
+
+    def _call_with_share(self, share_name, share_type, func):
+        """Look a share up in the index and call func with it.
+
+        A failed call on an indexed share ID may mean the share was deleted
+        or re-created since the index was loaded, so the index is reloaded
+        and, if the ID of the share changed, the call is retried once.
+        Returns the share func was called with, or {} if there is none.
+        """
+        share = self._get_share_by_name(share_name, share_type)
+        if not share:
+            return share
+
+        try:
+            func(share)
+            return share
+        except Exception:
+            with excutils.save_and_reraise_exception() as ctxt:
+                self._share_index.pop(share_type, None)
+                share_new = self._get_share_by_name(share_name, share_type)
+                if share_new.get('ID') != share['ID']:
+                    ctxt.reraise = False
+
+        if share_new:
+            func(share_new)
+        return share_new
+
+    def _load_share_index(self, share_type):
+        """Read the paths and IDs of all the shares, 100 at a time."""
         count = self._get_share_count(share_type)
 
-        share = {}
-        range_begin = 0
-        while True:
-            if count < 0 or share:
-                break
-            share = self._get_share_by_name_range(share_name,
-                                                  range_begin,
-                                                  share_type)
-            range_begin += 100
-            count -= 100
+        index = {}
+        for range_begin in six.moves.range(0, count, 100):
+            for item in self._get_share_range(range_begin, share_type):
+                index[item['SHAREPATH']] = {'ID': item['ID'],
+                                            'FSID': item['FSID']}
 
-        return share
+        self._share_index[share_type] = index
+        return index
 
     def _get_share_count(self, share_type):
         """Get share count."""
@@ -609,9 +693,8 @@ class RestHelper():
 
         return int(result['data']['COUNT'])
 
-    def _get_share_by_name_range(self, share_name,
-                                 range_begin, share_type):
-        """Get share by share name."""
+    def _get_share_range(self, range_begin, share_type):
+        """Get a range of 100 shares."""
         range_end = range_begin + 100
         url = (self.url + "/" + share_type + "?range=["
                + six.text_type(range_begin) + "-"
@@ -619,17 +702,7 @@ class RestHelper():
         result = self.call(url, None, "GET")
         self._assert_rest_result(result, 'Get share by name error!')
 
-        share_path = self._get_share_path(share_name)
-
-        share = {}
-        if "data" in result:
-            for item in result['data']:
-                if share_path == item['SHAREPATH']:
-                    share['ID'] = item['ID']
-                    share['FSID'] = item['FSID']
-                    break
-
-        return share
+        return result.get('data', [])
 
     def _get_share_type(self, share_proto):
         share_type = None
@@ -36,6 +36,7 @@ import pipes
 import re
 import socket
 
+import eventlet
 from oslo_config import cfg
 from oslo_log import log
 from oslo_utils import excutils
@@ -129,7 +130,7 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
         self.configuration.append_config_values(gpfs_share_opts)
         self.backend_name = self.configuration.safe_get(
             'share_backend_name') or "IBM Storage System"
-        self.sshpool = None
+        self.sshpools = {}
         self.ssh_connections = {}
         self._gpfs_execute = None
 
@@ -160,26 +161,9 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
     def _run_ssh(self, host, cmd_list, ignore_exit_codes=None,
                  check_exit_code=True):
         command = ' '.join(pipes.quote(cmd_arg) for cmd_arg in cmd_list)
-
-        if not self.sshpool:
-            gpfs_ssh_login = self.configuration.gpfs_ssh_login
-            password = self.configuration.gpfs_ssh_password
-            privatekey = self.configuration.gpfs_ssh_private_key
-            gpfs_ssh_port = self.configuration.gpfs_ssh_port
-            ssh_conn_timeout = self.configuration.ssh_conn_timeout
-            min_size = self.configuration.ssh_min_pool_conn
-            max_size = self.configuration.ssh_max_pool_conn
-
-            self.sshpool = utils.SSHPool(host,
-                                         gpfs_ssh_port,
-                                         ssh_conn_timeout,
-                                         gpfs_ssh_login,
-                                         password=password,
-                                         privatekey=privatekey,
-                                         min_size=min_size,
-                                         max_size=max_size)
+        sshpool = self._get_sshpool(host)
         try:
-            with self.sshpool.item() as ssh:
+            with sshpool.item() as ssh:
                 return self._gpfs_ssh_execute(
                     ssh,
                     command,
@@ -194,6 +178,31 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
                 LOG.error(msg)
                 raise exception.GPFSException(msg)
 
+    def _get_sshpool(self, host):
+        """Returns the SSH connection pool of a host, creating it once."""
+        if host not in self.sshpools:
+            gpfs_ssh_login = self.configuration.gpfs_ssh_login
+            password = self.configuration.gpfs_ssh_password
+            privatekey = self.configuration.gpfs_ssh_private_key
+            gpfs_ssh_port = self.configuration.gpfs_ssh_port
+            ssh_conn_timeout = self.configuration.ssh_conn_timeout
+            min_size = self.configuration.ssh_min_pool_conn
+            max_size = self.configuration.ssh_max_pool_conn
+
+            self.sshpools[host] = utils.SSHPool(
+                host,
+                gpfs_ssh_port,
+                ssh_conn_timeout,
+                gpfs_ssh_login,
+                password=password,
+                privatekey=privatekey,
+                idle_timeout=self.configuration.ssh_idle_timeout,
+                max_lifetime=self.configuration.ssh_max_lifetime,
+                keepalive_interval=self.configuration.ssh_keepalive_interval,
+                min_size=min_size,
+                max_size=max_size)
+        return self.sshpools[host]
+
     def _gpfs_ssh_execute(self, ssh, cmd, ignore_exit_codes=None,
                           check_exit_code=True):
         sanitized_cmd = strutils.mask_password(cmd)
@@ -275,8 +284,9 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
         for helper_str in self.configuration.gpfs_share_helpers:
             share_proto, _, import_str = helper_str.partition('=')
             helper = importutils.import_class(import_str)
-            self._helpers[share_proto.upper()] = helper(self._gpfs_execute,
-                                                        self.configuration)
+            self._helpers[share_proto.upper()] = helper(
+                self._gpfs_execute, self.configuration,
+                ssh_execute=self._run_ssh)
 
     def _local_path(self, sharename):
         """Get local path for a share or share snapshot by name."""
@@ -496,6 +506,13 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
                                             access['access_type'],
                                             access['access_to'])
 
+    def update_access(self, ctx, share, add_rules, delete_rules,
+                      share_server=None):
+        """Apply several access rule changes to the share at once."""
+        location = self._get_share_path(share)
+        return self._get_helper(share).update_access(location, share,
+                                                     add_rules, delete_rules)
+
     def check_for_setup_error(self):
         """Returns an error if prerequisites aren't met."""
         if not self._check_gpfs_state():
@@ -554,6 +571,10 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
 
         super(GPFSShareDriver, self)._update_share_stats(data)
 
+    def get_connection_pool_stats(self):
+        return dict((pool.ip, pool.get_stats())
+                    for pool in self.sshpools.values())
+
     def _get_helper(self, share):
         if share['share_proto'] == 'NFS':
             return self._helpers[self.configuration.gpfs_nfs_server_type]
@@ -580,9 +601,10 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
 class NASHelperBase(object):
     """Interface to work with share."""
 
-    def __init__(self, execute, config_object):
+    def __init__(self, execute, config_object, ssh_execute=None):
         self.configuration = config_object
         self._execute = execute
+        self._ssh_execute = ssh_execute
 
     def create_export(self, local_path):
         """Construct location of new export."""
@@ -601,13 +623,43 @@ class NASHelperBase(object):
                     force=False):
         """Deny access to the host."""
 
+    def update_access(self, local_path, share, add_rules, delete_rules):
+        """Apply several access rule changes.
+
+        Calls deny_access and allow_access for each rule, helpers able to
+        apply all of them at once should override it.
+
+        :returns: list of rules that could not be applied.
+        """
+        failed = []
+        for access in delete_rules:
+            try:
+                self.deny_access(local_path, share, access['access_type'],
+                                 access['access_to'])
+            except Exception as e:
+                LOG.error(_LE("Failed to deny access %(access)s: %(e)s."),
+                          {'access': access['id'], 'e': six.text_type(e)})
+                failed.append(access)
+        for access in add_rules:
+            try:
+                self.allow_access(local_path, share, access['access_type'],
+                                  access['access_to'])
+            except exception.ShareAccessExists:
+                pass
+            except Exception as e:
+                LOG.error(_LE("Failed to allow access %(access)s: %(e)s."),
+                          {'access': access['id'], 'e': six.text_type(e)})
+                failed.append(access)
+        return failed
+
 
 class KNFSHelper(NASHelperBase):
     """Wrapper for Kernel NFS Commands."""
 
-    def __init__(self, execute, config_object):
-        super(KNFSHelper, self).__init__(execute, config_object)
-        self._execute = execute
+    def __init__(self, execute, config_object, ssh_execute=None):
+        super(KNFSHelper, self).__init__(execute, config_object,
+                                         ssh_execute=ssh_execute)
+        self._local_ips = None
         try:
             self._execute('exportfs', check_exit_code=True, run_as_root=True)
         except exception.ProcessExecutionError as e:
@@ -615,22 +667,66 @@ class KNFSHelper(NASHelperBase):
             LOG.error(msg)
             raise exception.GPFSException(msg)
 
-    def _publish_access(self, *cmd):
-        for server in self.configuration.gpfs_nfs_server_list:
-            localserver_iplist = socket.gethostbyname_ex(
-                socket.gethostname())[2]
-            run_local = True
-            if server not in localserver_iplist:
-                sshlogin = self.configuration.gpfs_ssh_login
-                remote_login = sshlogin + '@' + server
-                cmd = ['ssh', remote_login] + list(cmd)
-                run_local = False
+    def _get_local_ips(self):
+        if self._local_ips is None:
+            self._local_ips = set(
+                socket.gethostbyname_ex(socket.gethostname())[2])
+        return self._local_ips
+
+    def _run_on_server(self, server, commands):
+        """Run the commands on a NFS server, in one go if it is remote."""
+        if server in self._get_local_ips():
+            for cmd in commands:
+                utils.execute(*cmd, run_as_root=True, check_exit_code=True)
+            return
+
+        if len(commands) == 1:
+            cmd = list(commands[0])
+        else:
+            cmd = ['sh', '-c', ' && '.join(
+                ' '.join(pipes.quote(arg) for arg in command)
+                for command in commands)]
+        if self._ssh_execute:
+            self._ssh_execute(server, cmd)
+        else:
+            sshlogin = self.configuration.gpfs_ssh_login
+            remote_login = sshlogin + '@' + server
+            utils.execute('ssh', remote_login, *cmd,
+                          run_as_root=False, check_exit_code=True)
+
+    def _publish_commands(self, commands):
+        """Run the commands on all the NFS servers at the same time."""
+        servers = self.configuration.gpfs_nfs_server_list
+        threads = [eventlet.spawn(self._run_on_server, server, commands)
+                   for server in servers]
+        error = None
+        for server, thread in zip(servers, threads):
             try:
-                utils.execute(*cmd,
-                              run_as_root=run_local,
-                              check_exit_code=True)
-            except exception.ProcessExecutionError:
-                raise
+                thread.wait()
+            except Exception as e:
+                LOG.error(_LE("Failed to update exports on %(server)s: "
+                              "%(e)s."), {'server': server, 'e': e})
+                error = error or e
+        if error is not None:
+            raise error
+
+    def _publish_access(self, *cmd):
+        self._publish_commands([cmd])
+
+    def _list_exports(self):
+        try:
+            out, __ = self._execute('exportfs', run_as_root=True)
+        except exception.ProcessExecutionError as e:
+            msg = (_('Failed to check exports on the systems. '
+                     ' Error: %s.') % e)
+            LOG.error(msg)
+            raise exception.GPFSException(msg)
+        return out
+
+    @staticmethod
+    def _has_access(exports, local_path, access):
+        return re.search(re.escape(local_path) + '[\s\n]*' +
+                         re.escape(access), exports) is not None
 
     def _get_export_options(self, share):
         """Set various export attributes for share."""
@@ -660,17 +756,7 @@ class KNFSHelper(NASHelperBase):
                                                'supported.')
 
         # check if present in export
-        try:
-            out, __ = self._execute('exportfs', run_as_root=True)
-        except exception.ProcessExecutionError as e:
-            msg = (_('Failed to check exports on the systems. '
-                     ' Error: %s.') % e)
-            LOG.error(msg)
-            raise exception.GPFSException(msg)
-
-        out = re.search(re.escape(local_path) + '[\s\n]*' + re.escape(access),
-                        out)
-        if out is not None:
+        if self._has_access(self._list_exports(), local_path, access):
             raise exception.ShareAccessExists(access_type=access_type,
                                               access=access)
 
@@ -702,12 +788,45 @@ class KNFSHelper(NASHelperBase):
             LOG.error(msg)
             raise exception.GPFSException(msg)
 
+    def update_access(self, local_path, share, add_rules, delete_rules):
+        """Apply several access rule changes to the share at once.
+
+        Exports are listed once, then every NFS server gets a single
+        exportfs run for the removed hosts and one for the added ones.
+        """
+        failed = [access for access in add_rules
+                  if access['access_type'] != 'ip']
+        add_rules = [access for access in add_rules if access not in failed]
+        try:
+            exports = self._list_exports()
+            add_rules = [access for access in add_rules
+                         if not self._has_access(exports, local_path,
+                                                 access['access_to'])]
+            commands = []
+            if delete_rules:
+                commands.append(['exportfs', '-u'] + [
+                    ':'.join([access['access_to'], local_path])
+                    for access in delete_rules])
+            if add_rules:
+                commands.append(
+                    ['exportfs', '-o', self._get_export_options(share)] + [
+                        ':'.join([access['access_to'], local_path])
+                        for access in add_rules])
+            if commands:
+                self._publish_commands(commands)
+        except Exception as e:
+            LOG.error(_LE("Failed to update access for share %(share)s: "
+                          "%(e)s."), {'share': share['name'], 'e': e})
+            return failed + list(delete_rules) + add_rules
+        return failed
+
 
 class GNFSHelper(NASHelperBase):
     """Wrapper for Ganesha NFS Commands."""
 
-    def __init__(self, execute, config_object):
-        super(GNFSHelper, self).__init__(execute, config_object)
+    def __init__(self, execute, config_object, ssh_execute=None):
+        super(GNFSHelper, self).__init__(execute, config_object,
+                                         ssh_execute=ssh_execute)
         self.default_export_options = dict()
         for m in AVPATTERN.finditer(
             self.configuration.ganesha_nfs_export_options
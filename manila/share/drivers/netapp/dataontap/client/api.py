@@ -18,8 +18,13 @@ NetApp API for Data ONTAP and OnCommand DFM.
 Contains classes required to issue API calls to Data ONTAP and OnCommand DFM.
 """
 
+import base64
+import collections
 import copy
-import urllib2
+import errno
+import httplib
+import socket
+import time
 
 from lxml import etree
 from oslo_log import log
@@ -43,6 +48,91 @@ EVOL_NOT_MOUNTED = '14716'
 ESIS_CLONE_NOT_LICENSED = '14956'
 EOBJECTNOTFOUND = '15661'
 
+DEFAULT_POOL_SIZE = 4
+
+
+class HTTPConnectionPool(object):
+    """Keep-alive connections to a storage system.
+
+    The pool is shared by all NaServer instances talking to the same
+    endpoint, e.g. the clients of the vservers of a cluster. Any number of
+    connections can be in use at the same time, at most 'size' of them are
+    kept open once released.
+    """
+
+    def __init__(self, protocol, host, port, size=DEFAULT_POOL_SIZE):
+        self.host = host
+        self.port = int(port)
+        self.size = size
+        if protocol == NaServer.TRANSPORT_TYPE_HTTPS:
+            self._connection_class = httplib.HTTPSConnection
+        else:
+            self._connection_class = httplib.HTTPConnection
+        self._free = collections.deque()
+        self.stats = {'created': 0, 'reused': 0, 'discarded': 0}
+        # Latency counters by API name, only filled when tracing is on.
+        self.api_stats = {}
+
+    def get(self, timeout=None):
+        """Return a connection and whether it was used before."""
+        if self._free:
+            conn = self._free.pop()
+            self.stats['reused'] += 1
+            reused = True
+        else:
+            conn = self._connection_class(self.host, self.port)
+            self.stats['created'] += 1
+            reused = False
+        if timeout is not None:
+            conn.timeout = timeout
+            if conn.sock:
+                conn.sock.settimeout(timeout)
+        return conn, reused
+
+    def put(self, conn):
+        """Release a connection which can be used again."""
+        if len(self._free) < self.size:
+            self._free.append(conn)
+        else:
+            self.discard(conn)
+
+    def discard(self, conn):
+        """Close a connection which can not be used anymore."""
+        self.stats['discarded'] += 1
+        conn.close()
+
+    def record(self, api_name, elapsed, failed=False):
+        """Account for the duration of an API call."""
+        stats = self.api_stats.setdefault(
+            api_name, {'calls': 0, 'errors': 0, 'time_total': 0.0,
+                       'time_max': 0.0})
+        stats['calls'] += 1
+        if failed:
+            stats['errors'] += 1
+        stats['time_total'] += elapsed
+        stats['time_max'] = max(stats['time_max'], elapsed)
+
+    def get_stats(self):
+        """Return counters of the pool."""
+        stats = dict(self.stats, size=self.size, free=len(self._free))
+        if self.api_stats:
+            stats['apis'] = dict(
+                (name, dict(api, time_avg=api['time_total'] / api['calls']))
+                for name, api in self.api_stats.items())
+        return stats
+
+
+_connection_pools = {}
+
+
+def get_connection_pool(protocol, host, port, size=DEFAULT_POOL_SIZE):
+    """Return the connection pool shared by the clients of an endpoint."""
+    key = (protocol, host, int(port))
+    if key not in _connection_pools:
+        _connection_pools[key] = HTTPConnectionPool(protocol, host, port,
+                                                    size)
+    return _connection_pools[key]
+
 
 class NaServer(object):
     """Encapsulates server connection logic."""
@@ -60,8 +150,10 @@ class NaServer(object):
     def __init__(self, host, server_type=SERVER_TYPE_FILER,
                  transport_type=TRANSPORT_TYPE_HTTP,
                  style=STYLE_LOGIN_PASSWORD, username=None,
-                 password=None, port=None, trace=False):
+                 password=None, port=None, trace=False,
+                 pool_size=DEFAULT_POOL_SIZE):
         self._host = host
+        self._pool_size = pool_size
         self.set_server_type(server_type)
         self.set_transport_type(transport_type)
         self.set_style(style)
@@ -71,7 +163,6 @@ class NaServer(object):
         self._password = password
         self._trace = trace
         self._refresh_conn = True
-        self._trace = trace
 
         LOG.debug('Using NetApp controller: %s', self._host)
 
@@ -219,20 +310,17 @@ class NaServer(object):
         if self._trace:
             LOG.debug("Request: %s", request_element.to_string(pretty=True))
 
-        if not hasattr(self, '_opener') or not self._opener \
-                or self._refresh_conn:
-            self._build_opener()
+        pool = self.get_connection_pool()
+        start = time.time()
         try:
-            if hasattr(self, '_timeout'):
-                response = self._opener.open(request, timeout=self._timeout)
-            else:
-                response = self._opener.open(request)
-        except urllib2.HTTPError as e:
-            raise NaApiError(e.code, e.msg)
-        except Exception as e:
-            raise NaApiError('Unexpected error', e)
+            response_xml = self._send_request(pool, request)
+        except NaApiError:
+            if self._trace:
+                pool.record(na_element.get_name(), time.time() - start, True)
+            raise
+        if self._trace:
+            pool.record(na_element.get_name(), time.time() - start)
 
-        response_xml = response.read()
         response_element = self._get_result(response_xml)
 
         if self._trace:
@@ -240,6 +328,90 @@ class NaServer(object):
 
         return response_element
 
+    def invoke_iter(self, na_element, enable_tunneling=False):
+        """Invoke a *-get-iter API, parsing the response as it is read.
+
+        Returns the records of the page as dicts and the tag to pass to
+        get the next page, which is None on the last page.
+        """
+        request, request_element = self._create_request(na_element,
+                                                        enable_tunneling)
+
+        if self._trace:
+            LOG.debug("Request: %s", request_element.to_string(pretty=True))
+
+        pool = self.get_connection_pool()
+        start = time.time()
+        try:
+            records, next_tag = self._send_request(
+                pool, request, parse=self._parse_iter_response)
+        except NaApiError:
+            if self._trace:
+                pool.record(na_element.get_name(), time.time() - start, True)
+            raise
+        if self._trace:
+            pool.record(na_element.get_name(), time.time() - start)
+            LOG.debug("Response: %(count)d records, next tag: %(tag)s",
+                      {'count': len(records), 'tag': next_tag})
+
+        return records, next_tag
+
+    def get_connection_pool(self):
+        """Get the pool of connections to the server."""
+        if not hasattr(self, '_pool') or self._refresh_conn:
+            self._pool = get_connection_pool(self._protocol, self._host,
+                                             self._port, self._pool_size)
+            self._refresh_conn = False
+        return self._pool
+
+    def _send_request(self, pool, request, parse=None):
+        headers = {'Content-Type': 'text/xml', 'charset': 'utf-8'}
+        headers.update(self._get_auth_headers())
+        while True:
+            conn, reused = pool.get(self.get_timeout())
+            sent = False
+            try:
+                conn.request('POST', '/' + self._url, request, headers)
+                sent = True
+                response = conn.getresponse()
+                if parse is None or response.status >= 300:
+                    response_xml = response.read()
+                else:
+                    response_xml = parse(response)
+            except (httplib.HTTPException, socket.error) as e:
+                pool.discard(conn)
+                if reused and self._is_closed_while_idle(e, sent):
+                    continue
+                raise NaApiError('Unexpected error', e)
+            except NaApiError:
+                pool.discard(conn)
+                raise
+            except Exception as e:
+                pool.discard(conn)
+                raise NaApiError('Unexpected error', e)
+
+            if response.will_close:
+                pool.discard(conn)
+            else:
+                pool.put(conn)
+            if response.status >= 300:
+                raise NaApiError(response.status, response.reason)
+            return response_xml
+
+    @staticmethod
+    def _is_closed_while_idle(error, sent):
+        """Tells if a reused connection failed as it was closed when idle.
+
+        The request can then be sent again safely: the server either reset
+        the connection while it was being sent, or closed it without
+        answering anything. Any other error, timeouts included, may happen
+        after the server started to process the request.
+        """
+        if isinstance(error, httplib.BadStatusLine):
+            return True
+        return (not sent and isinstance(error, socket.error) and
+                error.errno in (errno.ECONNRESET, errno.EPIPE))
+
     def invoke_successfully(self, na_element, enable_tunneling=False):
         """Invokes API and checks execution status as success.
 
@@ -249,8 +421,14 @@ class NaServer(object):
         otherwise tunneling remains disabled.
         """
         result = self.invoke_elem(na_element, enable_tunneling)
+        self._check_result(result)
+        return result
+
+    @staticmethod
+    def _check_result(result):
+        """Raises NaApiError if the execution status is not passed."""
         if result.has_attr('status') and result.get_attr('status') == 'passed':
-            return result
+            return
         code = result.get_attr('errno')\
             or result.get_child_content('errorno')\
             or 'ESTATUSFAILED'
@@ -272,10 +450,7 @@ class NaServer(object):
             self._enable_tunnel_request(netapp_elem)
         netapp_elem.add_child_elem(na_element)
         request_d = netapp_elem.to_string()
-        request = urllib2.Request(
-            self._get_url(), data=request_d,
-            headers={'Content-Type': 'text/xml', 'charset': 'utf-8'})
-        return request, netapp_elem
+        return request_d, netapp_elem
 
     def _enable_tunnel_request(self, netapp_elem):
         """Enables vserver or vfiler tunneling."""
@@ -310,27 +485,40 @@ class NaServer(object):
         processed_response = self._parse_response(response)
         return processed_response.get_child_by_name('results')
 
+    def _parse_iter_response(self, source):
+        """Parses the records of a *-get-iter response incrementally.
+
+        Each record under attributes-list is turned into a dict and dropped
+        from the tree once read, so only one record is held as elements at
+        any time whatever the size of the page.
+        """
+        records = []
+        next_tag = None
+        for event, element in etree.iterparse(source):
+            name = etree.QName(element.tag).localname
+            parent = element.getparent()
+            parent_name = (etree.QName(parent.tag).localname
+                           if parent is not None else None)
+            if parent_name == 'attributes-list':
+                records.append(_element_to_dict(element))
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+            elif parent_name == 'results' and name == 'next-tag':
+                next_tag = element.text
+            elif name == 'results':
+                self._check_result(NaElement(element))
+        return records, next_tag
+
     def _get_url(self):
         return '%s://%s:%s/%s' % (self._protocol, self._host, self._port,
                                   self._url)
 
-    def _build_opener(self):
-        if self._auth_style == NaServer.STYLE_LOGIN_PASSWORD:
-            auth_handler = self._create_basic_auth_handler()
-        else:
-            auth_handler = self._create_certificate_auth_handler()
-        opener = urllib2.build_opener(auth_handler)
-        self._opener = opener
-
-    def _create_basic_auth_handler(self):
-        password_man = urllib2.HTTPPasswordMgrWithDefaultRealm()
-        password_man.add_password(None, self._get_url(), self._username,
-                                  self._password)
-        auth_handler = urllib2.HTTPBasicAuthHandler(password_man)
-        return auth_handler
-
-    def _create_certificate_auth_handler(self):
-        raise NotImplementedError()
+    def _get_auth_headers(self):
+        if self._auth_style != NaServer.STYLE_LOGIN_PASSWORD:
+            raise NotImplementedError()
+        credentials = '%s:%s' % (self._username, self._password)
+        return {'Authorization': 'Basic %s' % base64.b64encode(credentials)}
 
     def __str__(self):
         return "server: %s" % (self._host)
@@ -529,6 +717,27 @@ class NaElement(object):
             raise ValueError(_('Type cannot be converted into NaElement.'))
 
 
+def _element_to_dict(element):
+    """Converts an element to its text, or a dict of its children.
+
+    Children found more than once, like the entries of a list, are grouped
+    in a list.
+    """
+    if not len(element):
+        return element.text
+    result = {}
+    for child in element.iterchildren():
+        name = etree.QName(child.tag).localname
+        value = _element_to_dict(child)
+        if name not in result:
+            result[name] = value
+        elif isinstance(result[name], list):
+            result[name].append(value)
+        else:
+            result[name] = [result[name], value]
+    return result
+
+
 class NaApiError(Exception):
     """Base exception class for NetApp API errors."""
 
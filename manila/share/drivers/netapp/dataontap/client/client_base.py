@@ -23,6 +23,8 @@ from manila.share.drivers.netapp import utils as na_utils
 
 LOG = log.getLogger(__name__)
 
+DEFAULT_MAX_PAGE_LENGTH = 100
+
 
 class NetAppBaseClient(object):
 
@@ -33,7 +35,9 @@ class NetAppBaseClient(object):
             port=kwargs['port'],
             username=kwargs['username'],
             password=kwargs['password'],
-            trace=kwargs.get('trace', False))
+            trace=kwargs.get('trace', False),
+            pool_size=kwargs.get('pool_size',
+                                 netapp_api.DEFAULT_POOL_SIZE))
 
     def get_ontapi_version(self, cached=True):
         """Gets the supported ontapi version."""
@@ -59,6 +63,26 @@ class NetAppBaseClient(object):
             request.translate_struct(api_args)
         return self.connection.invoke_successfully(request, enable_tunneling)
 
+    def get_iter(self, api_name, api_args=None, enable_tunneling=True,
+                 max_page_length=DEFAULT_MAX_PAGE_LENGTH):
+        """Yields the records of a *-get-iter API as dicts.
+
+        Pages of max_page_length records are requested one at a time,
+        following next-tag until the last one.
+        """
+        api_args = dict(api_args or {})
+        api_args['max-records'] = max_page_length
+        while True:
+            request = netapp_api.NaElement(api_name)
+            request.translate_struct(api_args)
+            records, next_tag = self.connection.invoke_iter(
+                request, enable_tunneling)
+            for record in records:
+                yield record
+            if not next_tag:
+                return
+            api_args['tag'] = next_tag
+
     @na_utils.trace
     def get_licenses(self):
         try:
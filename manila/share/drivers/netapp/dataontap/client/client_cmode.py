@@ -314,22 +314,19 @@ class NetAppCmodeClient(client_base.NetAppBaseClient):
     @na_utils.trace
     def list_aggregates(self):
         """Get names of all aggregates."""
-        try:
-            api_args = {
-                'desired-attributes': {
-                    'aggr-attributes': {
-                        'aggregate-name': None,
-                    },
+        api_args = {
+            'desired-attributes': {
+                'aggr-attributes': {
+                    'aggregate-name': None,
                 },
-            }
-            result = self.send_request('aggr-get-iter', api_args)
-            aggr_list = result.get_child_by_name(
-                'attributes-list').get_children()
-        except AttributeError:
+            },
+        }
+        aggr_names = [aggr['aggregate-name'] for aggr
+                      in self.get_iter('aggr-get-iter', api_args)]
+        if not aggr_names:
             msg = _("Could not list aggregates.")
             raise exception.NetAppException(msg)
-        return [aggr.get_child_content('aggregate-name') for aggr
-                in aggr_list]
+        return aggr_names
 
     @na_utils.trace
     def list_vserver_aggregates(self):
@@ -430,11 +427,8 @@ class NetAppCmodeClient(client_base.NetAppBaseClient):
                 },
             },
         }
-        result = self.send_request('net-interface-get-iter', api_args)
-        lif_info_list = result.get_child_by_name(
-            'attributes-list') or netapp_api.NaElement('none')
-        return [lif_info.get_child_content('interface-name') for lif_info
-                in lif_info_list.get_children()]
+        return [lif_info['interface-name'] for lif_info
+                in self.get_iter('net-interface-get-iter', api_args)]
 
     @na_utils.trace
     def get_network_interfaces(self, protocols=None):
@@ -452,20 +446,16 @@ class NetAppCmodeClient(client_base.NetAppBaseClient):
             }
         } if protocols else None
 
-        result = self.send_request('net-interface-get-iter', api_args)
-        lif_info_list = result.get_child_by_name(
-            'attributes-list') or netapp_api.NaElement('none')
-
         interfaces = []
-        for lif_info in lif_info_list.get_children():
+        for lif_info in self.get_iter('net-interface-get-iter', api_args):
             lif = {
-                'address': lif_info.get_child_content('address'),
-                'home-node': lif_info.get_child_content('home-node'),
-                'home-port': lif_info.get_child_content('home-port'),
-                'interface-name': lif_info.get_child_content('interface-name'),
-                'netmask': lif_info.get_child_content('netmask'),
-                'role': lif_info.get_child_content('role'),
-                'vserver': lif_info.get_child_content('vserver'),
+                'address': lif_info.get('address'),
+                'home-node': lif_info.get('home-node'),
+                'home-port': lif_info.get('home-port'),
+                'interface-name': lif_info.get('interface-name'),
+                'netmask': lif_info.get('netmask'),
+                'role': lif_info.get('role'),
+                'vserver': lif_info.get('vserver'),
             }
             interfaces.append(lif)
 
@@ -505,16 +495,13 @@ class NetAppCmodeClient(client_base.NetAppBaseClient):
                                      desired_attributes=desired_attributes)
         aggr_space_dict = dict()
         for aggr in aggrs:
-            aggr_name = aggr.get_child_content('aggregate-name')
-            aggr_space_attrs = aggr.get_child_by_name('aggr-space-attributes')
+            aggr_name = aggr['aggregate-name']
+            aggr_space_attrs = aggr['aggr-space-attributes']
 
             aggr_space_dict[aggr_name] = {
-                'available':
-                int(aggr_space_attrs.get_child_content('size-available')),
-                'total':
-                int(aggr_space_attrs.get_child_content('size-total')),
-                'used':
-                int(aggr_space_attrs.get_child_content('size-used')),
+                'available': int(aggr_space_attrs['size-available']),
+                'total': int(aggr_space_attrs['size-total']),
+                'used': int(aggr_space_attrs['size-used']),
             }
         return aggr_space_dict
 
@@ -585,11 +572,7 @@ class NetAppCmodeClient(client_base.NetAppBaseClient):
         if desired_attributes:
             api_args['desired-attributes'] = desired_attributes
 
-        result = self.send_request('aggr-get-iter', api_args)
-        if not self._has_records(result):
-            return []
-        else:
-            return result.get_child_by_name('attributes-list').get_children()
+        return list(self.get_iter('aggr-get-iter', api_args))
 
     @na_utils.trace
     def setup_security_services(self, security_services, vserver_client,
@@ -1284,17 +1267,10 @@ class NetAppCmodeClient(client_base.NetAppBaseClient):
                 },
             },
         }
-        result = self.send_request('export-policy-get-iter', api_args)
-
-        attributes_list = result.get_child_by_name(
-            'attributes-list') or netapp_api.NaElement('none')
-
         policy_map = {}
-        for export_info in attributes_list.get_children():
-            vserver = export_info.get_child_content('vserver')
-            policies = policy_map.get(vserver, [])
-            policies.append(export_info.get_child_content('policy-name'))
-            policy_map[vserver] = policies
+        for export_info in self.get_iter('export-policy-get-iter', api_args):
+            policies = policy_map.setdefault(export_info['vserver'], [])
+            policies.append(export_info['policy-name'])
 
         return policy_map
 
@@ -1352,11 +1328,8 @@ class NetAppCmodeClient(client_base.NetAppBaseClient):
 
         aggr_raid_dict = {}
         for aggr in aggr_list:
-            aggr_name = aggr.get_child_content('aggregate-name')
-            aggr_raid_attrs = aggr.get_child_by_name('aggr-raid-attributes')
-
-            aggr_raid_dict[aggr_name] = aggr_raid_attrs.get_child_content(
-                'raid-type')
+            aggr_raid_dict[aggr['aggregate-name']] = (
+                aggr['aggr-raid-attributes']['raid-type'])
 
         return aggr_raid_dict
 
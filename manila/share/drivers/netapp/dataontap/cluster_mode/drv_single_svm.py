@@ -75,6 +75,9 @@ class NetAppCmodeSingleSvmShareDriver(driver.ShareDriver):
         super(NetAppCmodeSingleSvmShareDriver, self)._update_share_stats(
             data=data)
 
+    def get_connection_pool_stats(self):
+        return self.library.get_connection_pool_stats()
+
     def get_network_allocations_number(self):
         return self.library.get_network_allocations_number()
 
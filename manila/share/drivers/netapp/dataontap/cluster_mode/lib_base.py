@@ -113,7 +113,8 @@ class NetAppCmodeFileStorageLibrary(object):
                 hostname=self.configuration.netapp_server_hostname,
                 port=self.configuration.netapp_server_port,
                 vserver=vserver,
-                trace=na_utils.TRACE_API)
+                trace=na_utils.TRACE_API,
+                pool_size=self.configuration.netapp_connection_pool_size)
             self._clients[vserver] = client
 
         return client
@@ -232,6 +233,13 @@ class NetAppCmodeFileStorageLibrary(object):
         data['pools'] = pools
         return data
 
+    def get_connection_pool_stats(self):
+        """Get counters of the connection pool shared by the API clients."""
+        if not self._client:
+            return {}
+        pool = self._client.connection.get_connection_pool()
+        return {'%s:%s' % (pool.host, pool.port): pool.get_stats()}
+
     @na_utils.trace
     def _handle_ems_logging(self):
         """Build and send an EMS log message."""
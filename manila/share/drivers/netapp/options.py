@@ -46,7 +46,12 @@ netapp_transport_opts = [
                default='http',
                help=('The transport protocol used when communicating with '
                      'the storage system or proxy server. Valid values are '
-                     'http or https.')), ]
+                     'http or https.')),
+    cfg.IntOpt('netapp_connection_pool_size',
+               default=4,
+               help=('The number of keep-alive HTTP connections to the '
+                     'storage system kept open for reuse. The pool is '
+                     'shared by all the clients of the backend.')), ]
 
 netapp_basicauth_opts = [
     cfg.StrOpt('netapp_login',
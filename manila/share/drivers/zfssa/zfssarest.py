@@ -215,6 +215,13 @@ class ZFSSAApi(object):
         val = jsonutils.loads(ret.data)
         return val['filesystem']
 
+    def get_shares(self, pool, project):
+        """Return properties of all shares of the project."""
+        svc = self.shares_path % (pool, project)
+        ret = self.rest_get(svc, restclient.Status.OK)
+        val = jsonutils.loads(ret.data)
+        return val['filesystems']
+
     def modify_share(self, pool, project, share, arg):
         """Modify a set of properties of a share."""
         svc = self.share_path % (pool, project, share)
@@ -326,14 +333,52 @@ class ZFSSAApi(object):
             reason = _('Only ip access type allowed.')
             raise exception.InvalidShareAccess(reason)
 
-        ip = access['access_to']
         details = self.get_share(pool, project, share)
-        sharenfs = details['sharenfs']
+        sharenfs = self._allow_ip_nfs(share, details['sharenfs'],
+                                      access['access_to'])
+        if sharenfs != details['sharenfs']:
+            self.modify_share(pool, project, share, {'sharenfs': sharenfs})
+
+    def deny_access_nfs(self, pool, project, share, access):
+        """Denies access of an IP to a share through NFS."""
+        if access['access_type'] != 'ip':
+            reason = _('Only ip access type allowed.')
+            raise exception.InvalidShareAccess(reason)
+
+        details = self.get_share(pool, project, share)
+        sharenfs = self._deny_ip_nfs(share, details['sharenfs'],
+                                     access['access_to'])
+        if sharenfs != details['sharenfs']:
+            self.modify_share(pool, project, share, {'sharenfs': sharenfs})
 
+    def update_access_nfs(self, pool, project, share, add_rules,
+                          delete_rules):
+        """Apply several NFS access changes with one share update.
+
+        :returns: list of rules which are not of ip type.
+        """
+        failed = [access for access in add_rules + delete_rules
+                  if access['access_type'] != 'ip']
+        details = self.get_share(pool, project, share)
+        sharenfs = details['sharenfs']
+        for access in delete_rules:
+            if access not in failed:
+                sharenfs = self._deny_ip_nfs(share, sharenfs,
+                                             access['access_to'])
+        for access in add_rules:
+            if access not in failed:
+                sharenfs = self._allow_ip_nfs(share, sharenfs,
+                                              access['access_to'])
+        if sharenfs != details['sharenfs']:
+            self.modify_share(pool, project, share, {'sharenfs': sharenfs})
+        return failed
+
+    def _allow_ip_nfs(self, share, sharenfs, ip):
+        """Return the sharenfs property value granting access to ip."""
         if sharenfs == 'on' or sharenfs == 'rw':
             LOG.debug('Share %s has read/write permission'
                       'open to all.', share)
-            return
+            return sharenfs
         if sharenfs == 'off':
             sharenfs = 'sec=sys'
         if ip in sharenfs:
@@ -341,16 +386,15 @@ class ZFSSAApi(object):
                       'already granted to %(ip)s.',
                       {'share': share,
                        'ip': ip})
-            return
+            return sharenfs
 
         entry = (',rw=@%s' % ip)
         if '/' not in ip:
             entry = "%s/32" % entry
-        arg = {'sharenfs': sharenfs + entry}
-        self.modify_share(pool, project, share, arg)
+        return sharenfs + entry
 
-    def deny_access_nfs(self, pool, project, share, access):
-        """Denies access of an IP to a share through NFS.
+    def _deny_ip_nfs(self, share, sharenfs, ip):
+        """Return the sharenfs property value without access of ip.
 
         Since sharenfs property allows a combination of mutiple syntaxes:
         sharenfs="sec=sys,rw=@first_ip,rw=@second_ip"
@@ -358,23 +402,17 @@ class ZFSSAApi(object):
         sharenfs="sec=sys,rw=@first_ip:@second_ip,rw=@third_ip"
         The function checks what syntax is used and remove the IP accordingly.
         """
-        if access['access_type'] != 'ip':
-            reason = _('Only ip access type allowed.')
-            raise exception.InvalidShareAccess(reason)
-
-        ip = access['access_to']
         entry = ('@%s' % ip)
         if '/' not in ip:
             entry = "%s/32" % entry
-        details = self.get_share(pool, project, share)
-        if entry not in details['sharenfs']:
+        if entry not in sharenfs:
             LOG.debug('IP %(ip)s does not have access '
                       'to Share %(share)s via NFS.',
                       {'ip': ip,
                        'share': share})
-            return
+            return sharenfs
 
-        sharenfs = str(details['sharenfs'])
+        sharenfs = str(sharenfs)
         argval = ''
         if sharenfs.find((',rw=%s:' % entry)) >= 0:
             argval = sharenfs.replace(('%s:' % entry), '')
@@ -382,6 +420,5 @@ class ZFSSAApi(object):
             argval = sharenfs.replace((',rw=%s' % entry), '')
         elif sharenfs.find((':%s' % entry)) >= 0:
             argval = sharenfs.replace((':%s' % entry), '')
-        arg = {'sharenfs': argval}
         LOG.debug('deny_access: %s', argval)
-        self.modify_share(pool, project, share, arg)
+        return argval
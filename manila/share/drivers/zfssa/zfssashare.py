@@ -277,6 +277,19 @@ class ZFSSAShareDriver(driver.ShareDriver):
             msg = (_("Share %s doesn't exists.") % share['id'])
             raise exception.ManilaException(msg)
 
+    def ensure_shares(self, context, shares, share_server=None):
+        """Check that shares exist with one listing of the project."""
+        lcfg = self.configuration
+        existing = set(details['name'] for details in self.zfssa.get_shares(
+            lcfg.zfssa_pool, lcfg.zfssa_project))
+        result = {}
+        for share in shares:
+            if share['id'] in existing:
+                result[share['id']] = None
+            else:
+                LOG.error(_LE("Share %s doesn't exist."), share['id'])
+        return result
+
     def allow_access(self, context, share, access, share_server=None):
         """Allows access to an NFS share for the specified IP."""
         LOG.debug("ZFSSAShareDriver.allow_access: share=%s", share['id'])
@@ -299,6 +312,19 @@ class ZFSSAShareDriver(driver.ShareDriver):
         elif share['share_proto'] == 'CIFS':
             return
 
+    def update_access(self, context, share, add_rules, delete_rules,
+                      share_server=None):
+        """Update NFS access of the share with one modification."""
+        LOG.debug("ZFSSAShareDriver.update_access: share=%s", share['id'])
+        lcfg = self.configuration
+        if share['share_proto'] != 'NFS':
+            return []
+        return self.zfssa.update_access_nfs(lcfg.zfssa_pool,
+                                            lcfg.zfssa_project,
+                                            share['id'],
+                                            add_rules,
+                                            delete_rules)
+
     def _update_share_stats(self):
         """Retrieve stats info from a share."""
         backend_name = self.configuration.safe_get('share_backend_name')
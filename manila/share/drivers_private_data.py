@@ -19,6 +19,8 @@ related to common Manila models like Share or Snapshot.
 """
 
 import abc
+import contextlib
+import threading
 
 from oslo_config import cfg
 from oslo_utils import importutils
@@ -33,6 +35,12 @@ private_data_opts = [
         'drivers_private_storage_class',
         default='manila.share.drivers_private_data.SqlStorageDriver',
         help='The full class name of the Private Data Driver class to use.'),
+    cfg.IntOpt(
+        'drivers_private_data_cache_size',
+        default=0,
+        help='Number of entities whose private data is kept in memory by '
+             'the share service, 0 disables the cache. Only enable it when '
+             'no other process changes private data of the backend.'),
 ]
 
 CONF = cfg.CONF
@@ -110,14 +118,14 @@ class DriverPrivateData(object):
 
         config_group_name = kwargs.get('config_group')
         CONF.register_opts(private_data_opts, group=config_group_name)
+        if config_group_name:
+            conf = getattr(CONF, config_group_name)
+        else:
+            conf = CONF
 
         if storage is not None:
             self._storage = storage
         elif 'context' in kwargs and 'backend_host' in kwargs:
-            if config_group_name:
-                conf = getattr(CONF, config_group_name)
-            else:
-                conf = CONF
             storage_class = conf.drivers_private_storage_class
             cls = importutils.import_class(storage_class)
             self._storage = cls(kwargs.get('context'),
@@ -127,6 +135,12 @@ class DriverPrivateData(object):
                     " 'context' and 'backend_host' parameters.")
             raise ValueError(msg)
 
+        self._cache_size = conf.drivers_private_data_cache_size
+        # All keys of recently used entities, dropped on every write.
+        self._cache = {}
+        # Writes buffered by batch(), per green thread.
+        self._local = threading.local()
+
     def get(self, entity_id, key=None, default=None):
         """Get one, list or all key-value pairs.
 
@@ -136,7 +150,28 @@ class DriverPrivateData(object):
         :returns: string or dict
         """
         self._validate_entity_id(entity_id)
-        return self._storage.get(entity_id, key, default)
+        pending = self._get_pending(entity_id)
+        if not self._cache_size and pending is None:
+            return self._storage.get(entity_id, key, default)
+
+        data = self._get_all(entity_id)
+        if pending is not None:
+            details, delete_existing = pending
+            data = {} if delete_existing else dict(data)
+            data.update(details)
+        if key is None or isinstance(key, list):
+            keys = data if key is None else key
+            return dict((k, data[k]) for k in keys if k in data)
+        return data.get(key, default)
+
+    def _get_all(self, entity_id):
+        if not self._cache_size:
+            return self._storage.get(entity_id, None, None)
+        if entity_id not in self._cache:
+            if len(self._cache) >= self._cache_size:
+                self._cache.clear()
+            self._cache[entity_id] = self._storage.get(entity_id, None, None)
+        return self._cache[entity_id]
 
     def update(self, entity_id, details, delete_existing=False):
         """Update or create specified key-value pairs.
@@ -156,8 +191,19 @@ class DriverPrivateData(object):
                    % six.text_type(details))
             raise ValueError(msg)
 
-        return self._storage.update(
-            entity_id, details, delete_existing)
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            if delete_existing or entity_id not in pending:
+                pending[entity_id] = (dict(details), delete_existing)
+            else:
+                pending[entity_id][0].update(details)
+            return details
+
+        try:
+            return self._storage.update(
+                entity_id, details, delete_existing)
+        finally:
+            self._cache.pop(entity_id, None)
 
     def delete(self, entity_id, key=None):
         """Delete one, list or all key-value pairs.
@@ -166,7 +212,50 @@ class DriverPrivateData(object):
         :param key: Key string or list of keys
         """
         self._validate_entity_id(entity_id)
-        return self._storage.delete(entity_id, key)
+        self._flush(entity_id)
+        try:
+            return self._storage.delete(entity_id, key)
+        finally:
+            self._cache.pop(entity_id, None)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Buffer updates made in the block and write them when it ends.
+
+        Several updates of an entity are merged into one write. Reads in the
+        block see the buffered updates. Writes are done even if the block
+        raises, as they usually describe changes already made on the
+        backend.
+        """
+        if getattr(self._local, 'pending', None) is not None:
+            yield
+            return
+
+        self._local.pending = {}
+        try:
+            yield
+        finally:
+            try:
+                self._flush()
+            finally:
+                self._local.pending = None
+
+    def _get_pending(self, entity_id):
+        pending = getattr(self._local, 'pending', None)
+        return pending.get(entity_id) if pending else None
+
+    def _flush(self, entity_id=None):
+        pending = getattr(self._local, 'pending', None)
+        if not pending:
+            return
+        entity_ids = list(pending) if entity_id is None else [entity_id]
+        for entity_id in entity_ids:
+            if entity_id in pending:
+                details, delete_existing = pending.pop(entity_id)
+                try:
+                    self._storage.update(entity_id, details, delete_existing)
+                finally:
+                    self._cache.pop(entity_id, None)
 
     @staticmethod
     def _validate_entity_id(entity_id):
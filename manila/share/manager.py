@@ -19,8 +19,11 @@
 :share_driver: Used by :class:`ShareManager`.
 """
 
+import collections
 import datetime
+import time
 
+import eventlet
 from oslo_config import cfg
 from oslo_log import log
 from oslo_serialization import jsonutils
@@ -76,6 +79,10 @@ share_manager_opts = [
                     'will wait for a share server to go unutilized before '
                     'deleting it.',
                deprecated_group='DEFAULT'),
+    cfg.IntOpt('share_ensure_workers',
+               default=8,
+               help='Maximum number of shares re-exported at the same time '
+                    'when the share service starts.'),
 ]
 
 CONF = cfg.CONF
@@ -154,6 +161,7 @@ class ShareManager(manager.SchedulerDependentManager):
 
         shares = self.db.share_get_all_by_host(ctxt, self.host)
         LOG.debug("Re-exporting %s shares", len(shares))
+        available_shares = []
         for share in shares:
             if share['status'] != 'available':
                 LOG.info(
@@ -162,48 +170,102 @@ class ShareManager(manager.SchedulerDependentManager):
                     {'name': share['name'], 'status': share['status']},
                 )
                 continue
+            available_shares.append(share)
 
-            self._ensure_share_has_pool(ctxt, share)
-            share_server = self._get_share_server(ctxt, share)
-            try:
-                export_locations = self.driver.ensure_share(
-                    ctxt, share, share_server=share_server)
-            except Exception as e:
-                LOG.error(
-                    _LE("Caught exception trying ensure share '%(s_id)s'. "
-                        "Exception: \n%(e)s."),
-                    {'s_id': share['id'], 'e': six.text_type(e)},
-                )
-                continue
+        if available_shares:
+            self._ensure_shares(ctxt, available_shares)
 
-            if export_locations:
-                self.db.share_export_locations_update(
-                    ctxt, share['id'], export_locations)
+        self.publish_service_capabilities(ctxt)
 
-            rules = self.db.share_access_get_all_for_share(ctxt, share['id'])
-            for access_ref in rules:
-                if access_ref['state'] != access_ref.STATE_ACTIVE:
-                    continue
+    def _ensure_shares(self, ctxt, shares):
+        """Re-export shares and their access rules concurrently.
 
-                try:
-                    self.driver.allow_access(ctxt, share, access_ref,
-                                             share_server=share_server)
-                except exception.ShareAccessExists:
-                    pass
-                except Exception as e:
-                    LOG.error(
-                        _LE("Unexpected exception during share access"
-                            " allow operation. Share id is '%(s_id)s'"
-                            ", access rule type is '%(ar_type)s', "
-                            "access rule id is '%(ar_id)s', exception"
-                            " is '%(e)s'."),
-                        {'s_id': share['id'],
-                         'ar_type': access_ref['access_type'],
-                         'ar_id': access_ref['id'],
-                         'e': six.text_type(e)},
-                    )
+        Shares of each share server are split into batches, one per worker,
+        and every batch is handed to the driver in one call.
+        """
+        rules = {}
+        for access_ref in self.db.share_access_get_all_for_host(ctxt,
+                                                                self.host):
+            rules.setdefault(access_ref['share_id'], []).append(access_ref)
 
-        self.publish_service_capabilities(ctxt)
+        workers = self.configuration.share_ensure_workers
+        server_shares = collections.OrderedDict()
+        for share in shares:
+            server_shares.setdefault(share.get('share_server_id'),
+                                     []).append(share)
+        batches = []
+        for server_id, batch in server_shares.items():
+            count = min(workers, len(batch))
+            batches.extend(batch[i::count] for i in range(count))
+
+        progress = {'done': 0, 'failed': 0, 'total': len(shares),
+                    'step': max(1, len(shares) // 10)}
+        start = time.time()
+        pool = eventlet.GreenPool(workers)
+        for batch in batches:
+            pool.spawn_n(self._ensure_share_batch, ctxt, batch, rules,
+                         progress)
+        pool.waitall()
+
+        LOG.info(_LI("Re-exported %(done)d shares in %(time).2f seconds, "
+                     "%(failed)d of them failed."),
+                 {'done': progress['done'], 'failed': progress['failed'],
+                  'time': time.time() - start})
+
+    def _ensure_share_batch(self, ctxt, shares, rules, progress):
+        try:
+            ensured = self._ensure_shares_on_init(ctxt, shares, rules)
+        except Exception:
+            LOG.exception(_LE("Unexpected error re-exporting shares %s."),
+                          [share['id'] for share in shares])
+            ensured = 0
+        step = progress['step']
+        previous = progress['done']
+        progress['done'] += len(shares)
+        progress['failed'] += len(shares) - ensured
+        if progress['done'] // step > previous // step:
+            LOG.info(_LI("Re-exported %(done)d of %(total)d shares."),
+                     progress)
+
+    def _ensure_shares_on_init(self, ctxt, shares, rules):
+        """Ensure shares of one share server and restore their rules.
+
+        :returns: number of shares ensured.
+        """
+        for share in shares:
+            self._ensure_share_has_pool(ctxt, share)
+        share_server = self._get_share_server(ctxt, shares[0])
+        export_locations = self.driver.ensure_shares(
+            ctxt, shares, share_server=share_server)
+
+        for share in shares:
+            if share['id'] not in export_locations:
+                continue
+            if export_locations[share['id']]:
+                self.db.share_export_locations_update(
+                    ctxt, share['id'], export_locations[share['id']])
+
+            active_rules = [access_ref
+                            for access_ref in rules.get(share['id'], [])
+                            if access_ref['state'] == access_ref.STATE_ACTIVE]
+            if not active_rules:
+                continue
+            try:
+                failed_rules = self.driver.update_access(
+                    ctxt, share, active_rules, [], share_server=share_server)
+            except Exception as e:
+                failed_rules = active_rules
+                LOG.error(_LE("Unexpected exception during share access "
+                              "update. Share id is '%(s_id)s', exception "
+                              "is '%(e)s'."),
+                          {'s_id': share['id'], 'e': six.text_type(e)})
+            if failed_rules:
+                LOG.error(_LE("Failed to restore access rules %(rules)s of "
+                              "share %(s_id)s."),
+                          {'rules': [access_ref['id']
+                                     for access_ref in failed_rules],
+                           's_id': share['id']})
+        return len(export_locations)
 
     def _provide_share_server_for_share(self, context, share_network_id,
                                         share_id):
@@ -515,7 +577,7 @@ class ShareManager(manager.SchedulerDependentManager):
                           "deletion of last share.", share_server['id'])
                 self.delete_share_server(context, share_server)
 
-    @manager.periodic_task(ticks_between_runs=600 / CONF.periodic_interval)
+    @manager.periodic_task(spacing=600)
     def delete_free_share_servers(self, ctxt):
         if not (self.driver.driver_handles_share_servers and
                 self.configuration.automatic_share_server_cleanup):
@@ -640,6 +702,9 @@ class ShareManager(manager.SchedulerDependentManager):
         share_stats = self.driver.get_share_stats(refresh=True)
         if share_stats:
             self.update_service_capabilities(share_stats)
+        pool_stats = self.driver.get_connection_pool_stats()
+        if pool_stats:
+            LOG.debug("Connection pools of share driver: %s", pool_stats)
 
     def publish_service_capabilities(self, context):
         """Collect driver status and then publish it."""
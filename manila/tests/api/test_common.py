@@ -190,6 +190,20 @@ class PaginationParamsTest(test.TestCase):
         self.assertEqual(common.get_pagination_params(req),
                          {'marker': marker, 'limit': 20})
 
+    def test_get_limit_and_marker(self):
+        """Test limit and marker are extracted from request."""
+        marker = '263abb28-1de6-412f-b00b-f0ee0c4333c2'
+        req = webob.Request.blank('/?limit=20&marker=%s' % marker)
+        self.assertEqual((20, marker),
+                         common.get_limit_and_marker(req, max_limit=1000))
+
+    def test_get_limit_and_marker_defaults_to_max_limit(self):
+        """Test limit falls back to max_limit if not given or too big."""
+        for url in ('/', '/?limit=0', '/?limit=3000'):
+            req = webob.Request.blank(url)
+            self.assertEqual((1000, None),
+                             common.get_limit_and_marker(req, max_limit=1000))
+
 
 class MiscFunctionsTest(test.TestCase):
 
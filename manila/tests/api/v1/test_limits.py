@@ -17,8 +17,14 @@
 Tests dealing with HTTP rate-limiting.
 """
 
+import errno
 import httplib
+import re
+import socket
+import tempfile
 
+import ddt
+import mock
 from oslo_serialization import jsonutils
 import six
 from six import moves
@@ -524,6 +530,99 @@ class LimiterTest(BaseLimitTestSuite):
         self.assertEqual(expected, results)
 
 
+@ddt.ddt
+class LimitMatcherTest(test.TestCase):
+    """Tests for the `limits.LimitMatcher` class."""
+
+    @ddt.data(("PUT", "/anything"), ("PUT", "/volumes/1"),
+              ("POST", "/volumes"), ("POST", "/shares"), ("GET", "/"),
+              ("GET", "/delayed/1"), ("DELETE", "/delayed"))
+    @ddt.unpack
+    def test_match(self, verb, url):
+        matcher = limits.LimitMatcher(TEST_LIMITS)
+
+        expected = [i for i, limit in enumerate(TEST_LIMITS)
+                    if limit.verb == verb and re.match(limit.regex, url)]
+        self.assertEqual(expected, matcher.match(verb, url))
+
+    def test_match_back_reference(self):
+        test_limits = [
+            limits.Limit("GET", "*", "^/(a|b)", 1, limits.PER_MINUTE),
+            limits.Limit("GET", "*", "^/(a|b)/\\1", 1, limits.PER_MINUTE),
+        ]
+        matcher = limits.LimitMatcher(test_limits)
+
+        self.assertEqual([0, 1], matcher.match("GET", "/a/a"))
+        self.assertEqual([0], matcher.match("GET", "/a/b"))
+
+    def test_match_many_limits(self):
+        test_limits = [
+            limits.Limit("GET", "*", "^/(s|v)%d" % i, 1, limits.PER_MINUTE)
+            for i in range(150)]
+        matcher = limits.LimitMatcher(test_limits)
+
+        self.assertEqual(6, len(matcher._patterns["GET"]))
+        self.assertEqual([1, 10, 101], matcher.match("GET", "/v101"))
+
+    def test_match_too_many_groups(self):
+        groups = "(a)" * 90
+        test_limits = [
+            limits.Limit("GET", "*", "^/%s%d" % (groups, i), 1,
+                         limits.PER_MINUTE)
+            for i in range(2)]
+        matcher = limits.LimitMatcher(test_limits)
+
+        self.assertIsNone(matcher._patterns["GET"][0][0])
+        self.assertEqual([1], matcher.match("GET", "/" + "a" * 90 + "1"))
+
+
+class SharedMemoryLimiterBackendTest(BaseLimitTestSuite):
+    """Tests for the `limits.SharedMemoryLimiterBackend` class."""
+
+    def setUp(self):
+        super(SharedMemoryLimiterBackendTest, self).setUp()
+        state_file = tempfile.NamedTemporaryFile()
+        self.addCleanup(state_file.close)
+        self.path = state_file.name
+
+    def _get_limiter(self, **kwargs):
+        return limits.Limiter(
+            TEST_LIMITS,
+            backend='manila.api.v1.limits.SharedMemoryLimiterBackend',
+            backend_path=self.path, **kwargs)
+
+    def test_limiters_share_state(self):
+        workers = [self._get_limiter(), self._get_limiter()]
+
+        results = [workers[i % 2].check_for_delay("PUT", "/anything")[0]
+                   for i in range(11)]
+
+        self.assertEqual([None] * 10 + [6.0], results)
+        self.assertEqual(0, workers[1].get_limits()[3]['remaining'])
+        self.assertEqual(6, workers[0].get_limits()[3]['resetTime'])
+
+    def test_users(self):
+        limiter = self._get_limiter()
+
+        for i in range(10):
+            limiter.check_for_delay("PUT", "/anything", "user1")
+
+        self.assertEqual(6.0, limiter.check_for_delay(
+            "PUT", "/anything", "user1")[0])
+        self.assertEqual((None, None), limiter.check_for_delay(
+            "PUT", "/anything", "user2"))
+
+    def test_slot_taken_by_another_key(self):
+        backend = limits.SharedMemoryLimiterBackend(self.path, slots=1)
+        backend.update('key1', lambda state: (None, (1.0, 2.0, 3.0)))
+
+        self.assertEqual((1.0, 2.0, 3.0), backend.get('key1'))
+        backend.update('key2', lambda state: (state, (4.0, 5.0, 6.0)))
+
+        self.assertIsNone(backend.get('key1'))
+        self.assertEqual((4.0, 5.0, 6.0), backend.get('key2'))
+
+
 class WsgiLimiterTest(BaseLimitTestSuite):
     """Tests for `limits.WsgiLimiter` class."""
 
@@ -610,10 +709,13 @@ class FakeHttplibSocket(object):
 class FakeHttplibConnection(object):
     """Fake `httplib.HTTPConnection`."""
 
+    http_version = "1.0"
+
     def __init__(self, app, host):
         """Initialize `FakeHttplibConnection`."""
         self.app = app
         self.host = host
+        self.closed = False
 
     def request(self, method, path, body="", headers=None):
         """Translate request to WSGI app.
@@ -632,7 +734,7 @@ class FakeHttplibConnection(object):
         req.body = body
 
         resp = str(req.get_response(self.app))
-        resp = "HTTP/1.0 %s" % resp
+        resp = "HTTP/%s %s" % (self.http_version, resp)
         sock = FakeHttplibSocket(resp)
         self.http_response = httplib.HTTPResponse(sock)
         self.http_response.begin()
@@ -641,6 +743,9 @@ class FakeHttplibConnection(object):
         """Return our generated response from the request."""
         return self.http_response
 
+    def close(self):
+        self.closed = True
+
 
 def wire_HTTPConnection_to_WSGI(host, app):
     """Wire HTTPConnection to WSGI app.
@@ -685,6 +790,7 @@ def wire_HTTPConnection_to_WSGI(host, app):
     return oldHTTPConnection
 
 
+@ddt.ddt
 class WsgiLimiterProxyTest(BaseLimitTestSuite):
     """Tests for the `limits.WsgiLimiterProxy` class."""
 
@@ -718,6 +824,68 @@ class WsgiLimiterProxyTest(BaseLimitTestSuite):
 
         self.assertEqual((delay, error), expected)
 
+    def test_connection_closed_by_limiter(self):
+        self.proxy.check_for_delay("GET", "/anything")
+
+        self.assertEqual([], self.proxy._connections)
+
+    def test_connection_reused(self):
+        self.mock_object(FakeHttplibConnection, 'http_version', '1.1')
+
+        self.proxy.check_for_delay("GET", "/anything")
+        connections = list(self.proxy._connections)
+        delay, error = self.proxy.check_for_delay("GET", "/delayed")
+        self.proxy.check_for_delay("GET", "/delayed")
+
+        self.assertEqual(1, len(connections))
+        self.assertEqual(connections, self.proxy._connections)
+        self.assertEqual((None, None), (delay, error))
+
+    def test_idle_connection_lost(self):
+        self.mock_object(FakeHttplibConnection, 'http_version', '1.1')
+        self.proxy.check_for_delay("GET", "/anything")
+        lost = self.proxy._connections[0]
+        self.mock_object(lost, 'request', mock.Mock(
+            side_effect=socket.error(errno.EPIPE, 'Broken pipe')))
+
+        delay = self.proxy.check_for_delay("GET", "/anything")
+
+        self.assertEqual((None, None), delay)
+        self.assertTrue(lost.closed)
+        self.assertEqual(1, len(self.proxy._connections))
+        self.assertNotEqual(lost, self.proxy._connections[0])
+
+    @ddt.data(httplib.BadStatusLine(''),
+              httplib.BadStatusLine('No status line received - the server '
+                                    'has closed the connection'),
+              socket.error(errno.ECONNRESET, 'Connection reset by peer'))
+    def test_idle_connection_closed_before_response(self, error):
+        self.mock_object(FakeHttplibConnection, 'http_version', '1.1')
+        self.proxy.check_for_delay("GET", "/anything")
+        lost = self.proxy._connections[0]
+        self.mock_object(lost, 'getresponse', mock.Mock(side_effect=error))
+
+        delay = self.proxy.check_for_delay("GET", "/anything")
+
+        self.assertEqual((None, None), delay)
+        self.assertTrue(lost.closed)
+        self.assertEqual(1, len(self.proxy._connections))
+        self.assertNotEqual(lost, self.proxy._connections[0])
+
+    def test_no_retry_once_request_sent(self):
+        self.mock_object(FakeHttplibConnection, 'http_version', '1.1')
+        self.proxy.check_for_delay("GET", "/anything")
+        conn = self.proxy._connections[0]
+        self.mock_object(conn, 'getresponse',
+                         mock.Mock(side_effect=socket.timeout('timed out')))
+
+        # A retry on a new connection would have returned a response.
+        self.assertRaises(socket.timeout,
+                          self.proxy.check_for_delay, "GET", "/anything")
+
+        self.assertTrue(conn.closed)
+        self.assertEqual([], self.proxy._connections)
+
     def tearDown(self):
         # restore original HTTPConnection object
         httplib.HTTPConnection = self.oldHTTPConnection
@@ -19,6 +19,8 @@ import mock
 import webob
 
 from manila.api.v1 import share_snapshots
+from manila.common import constants
+from manila import exception
 from manila.share import api as share_api
 from manila import test
 from manila.tests.api.contrib import stubs
@@ -210,6 +212,7 @@ class ShareSnapshotApiTest(test.TestCase):
             sort_key=search_opts['sort_key'],
             sort_dir=search_opts['sort_dir'],
             search_opts=search_opts_expected,
+            profile=constants.QUERY_PROFILE_SUMMARY,
         )
         self.assertEqual(1, len(result['snapshots']))
         self.assertEqual(snapshots[1]['id'], result['snapshots'][0]['id'])
@@ -266,6 +269,7 @@ class ShareSnapshotApiTest(test.TestCase):
             sort_key=search_opts['sort_key'],
             sort_dir=search_opts['sort_dir'],
             search_opts=search_opts_expected,
+            profile=constants.QUERY_PROFILE_DETAIL,
         )
         self.assertEqual(1, len(result['snapshots']))
         self.assertEqual(snapshots[1]['id'], result['snapshots'][0]['id'])
@@ -282,6 +286,32 @@ class ShareSnapshotApiTest(test.TestCase):
     def test_share_list_detail_with_search_opts_by_admin(self):
         self._snapshot_list_detail_with_search_opts(use_admin_context=True)
 
+    def test_snapshot_list_with_limit_and_marker(self):
+        snapshots = [{'id': 'id2', 'display_name': 'n2'}]
+        self.mock_object(share_api.API, 'get_all_snapshots',
+                         mock.Mock(return_value=snapshots))
+        req = fakes.HTTPRequest.blank('/snapshots?limit=1&marker=id1')
+
+        result = self.controller.index(req)
+
+        share_api.API.get_all_snapshots.assert_called_once_with(
+            req.environ['manila.context'], search_opts={},
+            sort_key='created_at', sort_dir='desc', limit=1, marker='id1',
+            profile=constants.QUERY_PROFILE_SUMMARY)
+        self.assertEqual(['id2'],
+                         [snapshot['id'] for snapshot in result['snapshots']])
+        self.assertEqual('next', result['share_snapshots_links'][0]['rel'])
+        self.assertIn('marker=id2',
+                      result['share_snapshots_links'][0]['href'])
+
+    def test_snapshot_list_marker_not_found(self):
+        self.mock_object(share_api.API, 'get_all_snapshots', mock.Mock(
+            side_effect=exception.MarkerNotFound(marker='fake_marker')))
+        req = fakes.HTTPRequest.blank('/snapshots?marker=fake_marker')
+
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.controller.index, req)
+
     def test_snapshot_list_detail(self):
         env = {'QUERY_STRING': 'name=Share+Test+Name'}
         req = fakes.HTTPRequest.blank('/shares/detail', environ=env)
@@ -22,6 +22,7 @@ import webob
 
 from manila.api import common
 from manila.api.v1 import shares
+from manila.common import constants
 from manila import context
 from manila import exception
 from manila.share import api as share_api
@@ -417,6 +418,7 @@ class ShareApiTest(test.TestCase):
             sort_key=search_opts['sort_key'],
             sort_dir=search_opts['sort_dir'],
             search_opts=search_opts_expected,
+            profile=constants.QUERY_PROFILE_SUMMARY,
         )
         self.assertEqual(1, len(result['shares']))
         self.assertEqual(shares[1]['id'], result['shares'][0]['id'])
@@ -514,6 +516,7 @@ class ShareApiTest(test.TestCase):
             sort_key=search_opts['sort_key'],
             sort_dir=search_opts['sort_dir'],
             search_opts=search_opts_expected,
+            profile=constants.QUERY_PROFILE_DETAIL,
         )
         self.assertEqual(1, len(result['shares']))
         self.assertEqual(shares[1]['id'], result['shares'][0]['id'])
@@ -539,6 +542,59 @@ class ShareApiTest(test.TestCase):
     def test_share_list_detail_with_search_opts_by_admin(self):
         self._share_list_detail_with_search_opts(use_admin_context=True)
 
+    def test_share_list_with_limit_and_marker(self):
+        shares = [{'id': 'id2', 'display_name': 'n2'},
+                  {'id': 'id3', 'display_name': 'n3'}]
+        self.mock_object(share_api.API, 'get_all',
+                         mock.Mock(return_value=shares))
+        req = fakes.HTTPRequest.blank('/shares?limit=2&marker=id1')
+
+        result = self.controller.index(req)
+
+        share_api.API.get_all.assert_called_once_with(
+            req.environ['manila.context'], search_opts={},
+            sort_key='created_at', sort_dir='desc', limit=2, marker='id1',
+            profile=constants.QUERY_PROFILE_SUMMARY)
+        self.assertEqual(['id2', 'id3'],
+                         [share['id'] for share in result['shares']])
+        self.assertEqual('next', result['shares_links'][0]['rel'])
+        self.assertIn('marker=id3', result['shares_links'][0]['href'])
+
+    def test_share_list_limit_is_capped_by_max_limit(self):
+        self.mock_object(share_api.API, 'get_all', mock.Mock(return_value=[]))
+        req = fakes.HTTPRequest.blank(
+            '/shares?limit=%s' % (CONF.osapi_max_limit + 1))
+
+        result = self.controller.index(req)
+
+        share_api.API.get_all.assert_called_once_with(
+            req.environ['manila.context'], search_opts={},
+            sort_key='created_at', sort_dir='desc',
+            limit=CONF.osapi_max_limit, marker=None,
+            profile=constants.QUERY_PROFILE_SUMMARY)
+        self.assertEqual({'shares': []}, result)
+
+    def test_share_list_filter_by_volume_type_id(self):
+        self.mock_object(share_api.API, 'get_all', mock.Mock(return_value=[]))
+        req = fakes.HTTPRequest.blank('/shares?volume_type_id=fake_type')
+
+        self.controller.index(req)
+
+        share_api.API.get_all.assert_called_once_with(
+            req.environ['manila.context'],
+            search_opts={'share_type_id': 'fake_type'},
+            sort_key='created_at', sort_dir='desc',
+            limit=CONF.osapi_max_limit, marker=None,
+            profile=constants.QUERY_PROFILE_SUMMARY)
+
+    def test_share_list_marker_not_found(self):
+        self.mock_object(share_api.API, 'get_all', mock.Mock(
+            side_effect=exception.MarkerNotFound(marker='fake_marker')))
+        req = fakes.HTTPRequest.blank('/shares?marker=fake_marker')
+
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.controller.index, req)
+
     def test_share_list_detail(self):
         self.mock_object(share_api.API, 'get_all',
                          stubs.stub_share_get_all_by_project)
@@ -45,6 +45,7 @@ class ManilaCmdManageTestCase(test.TestCase):
         self.config_commands = manila_manage.ConfigCommands()
         self.get_log_cmds = manila_manage.GetLogCommands()
         self.service_cmds = manila_manage.ServiceCommands()
+        self.quota_cmds = manila_manage.QuotaCommands()
 
     def test_param2id_is_uuid_like(self):
         obj_id = '12345678123456781234567812345678'
@@ -318,6 +319,29 @@ class ManilaCmdManageTestCase(test.TestCase):
             service_get_all.assert_called_with(ctxt)
             service_is_up.assert_called_with(service)
 
+    @mock.patch('manila.quota.QUOTAS')
+    @mock.patch('manila.context.get_admin_context')
+    def test_quota_commands_expire(self, get_admin_context, quotas):
+        get_admin_context.return_value = 'fake_context'
+        quotas.expire.return_value = 3
+        with mock.patch('sys.stdout', new=StringIO.StringIO()) as fake_out:
+            self.quota_cmds.expire()
+
+        quotas.expire.assert_called_once_with('fake_context')
+        self.assertEqual('Rolled back 3 expired reservations.\n',
+                         fake_out.getvalue())
+
+    @mock.patch('manila.quota.QUOTAS')
+    @mock.patch('manila.context.get_admin_context')
+    def test_quota_commands_refresh(self, get_admin_context, quotas):
+        get_admin_context.return_value = 'fake_context'
+        quotas.usage_refresh.return_value = 2
+        with mock.patch('sys.stdout', new=StringIO.StringIO()) as fake_out:
+            self.quota_cmds.refresh()
+
+        quotas.usage_refresh.assert_called_once_with('fake_context')
+        self.assertEqual('Updated 2 quota usages.\n', fake_out.getvalue())
+
     def test_methods_of(self):
         obj = type('Fake', (object,),
                    {name: lambda: 'fake_' for name in ('_a', 'b', 'c')})
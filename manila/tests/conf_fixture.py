@@ -41,6 +41,7 @@ def set_defaults(conf):
     _safe_set_of_opts(conf, 'share_driver',
                       'manila.tests.fake_driver.FakeShareDriver')
     _safe_set_of_opts(conf, 'auth_strategy', 'noauth')
+    _safe_set_of_opts(conf, 'quota_limits_cache_ttl', 0)
 
 
 def _safe_set_of_opts(conf, *args, **kwargs):
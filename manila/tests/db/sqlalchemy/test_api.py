@@ -15,12 +15,19 @@
 
 """Testing of SQLAlchemy backend."""
 
+import datetime
+
 import ddt
+from oslo_utils import timeutils
 from oslo_utils import uuidutils
 import six
+import sqlalchemy
 
+from manila.common import constants
 from manila import context
 from manila.db.sqlalchemy import api
+from manila.db.sqlalchemy import models
+from manila import exception
 from manila import test
 
 
@@ -82,6 +89,370 @@ class SQLAlchemyAPIShareTestCase(test.TestCase):
 
         self.assertTrue(actual_result == [initial_location])
 
+    @ddt.data('asc', 'desc')
+    def test_share_get_all_paginated(self, sort_dir):
+        share_ids = sorted(
+            api.share_create(self.ctxt, {'size': 1})['id'] for i in range(5))
+        if sort_dir == 'desc':
+            share_ids.reverse()
+
+        first_page = api.share_get_all(
+            self.ctxt, sort_key='size', sort_dir=sort_dir, limit=2)
+        second_page = api.share_get_all(
+            self.ctxt, sort_key='size', sort_dir=sort_dir, limit=2,
+            marker=first_page[-1]['id'])
+        last_page = api.share_get_all(
+            self.ctxt, sort_key='size', sort_dir=sort_dir, limit=2,
+            marker=second_page[-1]['id'])
+
+        self.assertEqual(share_ids[0:2], [s['id'] for s in first_page])
+        self.assertEqual(share_ids[2:4], [s['id'] for s in second_page])
+        self.assertEqual(share_ids[4:], [s['id'] for s in last_page])
+
+    def test_share_get_all_marker_not_found(self):
+        api.share_create(self.ctxt, {'size': 1})
+
+        self.assertRaises(exception.MarkerNotFound,
+                          api.share_get_all, self.ctxt, marker='fake')
+
+    def test_share_get_all_by_project_marker_of_other_project(self):
+        api.share_create(self.ctxt, {'project_id': 'fake_project'})
+        other = api.share_create(self.ctxt, {'project_id': 'other_project'})
+
+        self.assertRaises(exception.MarkerNotFound,
+                          api.share_get_all_by_project, self.ctxt,
+                          'fake_project', marker=other['id'])
+
+    def test_share_snapshot_get_all_by_project_marker_of_other_project(self):
+        share = api.share_create(self.ctxt, {'project_id': 'other_project'})
+        other = api.share_snapshot_create(
+            self.ctxt, {'share_id': share['id'],
+                        'project_id': 'other_project'})
+
+        self.assertRaises(exception.MarkerNotFound,
+                          api.share_snapshot_get_all_by_project, self.ctxt,
+                          'fake_project', marker=other['id'])
+
+    def test_share_get_all_filter_by_attrs(self):
+        share = api.share_create(
+            self.ctxt, {'display_name': 'foo', 'status': 'available'})
+        api.share_create(
+            self.ctxt, {'display_name': 'foo', 'status': 'error'})
+        api.share_create(
+            self.ctxt, {'display_name': 'bar', 'status': 'available'})
+
+        result = api.share_get_all(
+            self.ctxt, filters={'display_name': 'foo', 'status': 'available'})
+
+        self.assertEqual([share['id']], [s['id'] for s in result])
+
+    def test_share_get_all_filter_by_unknown_attr(self):
+        api.share_create(self.ctxt, {'display_name': 'foo'})
+
+        result = api.share_get_all(self.ctxt, filters={'fake_key': 'foo'})
+
+        self.assertEqual([], result)
+
+    def test_share_get_all_filter_by_property(self):
+        shares = [api.share_create(self.ctxt, {'display_name': 'foo'})
+                  for i in range(3)]
+
+        result = api.share_get_all(
+            self.ctxt, filters={'display_name': 'foo',
+                                'name': shares[1]['name']})
+
+        self.assertEqual([shares[1]['id']], [s['id'] for s in result])
+
+    def test_share_get_all_filter_by_property_paginated(self):
+        share_ids = sorted(api.share_create(self.ctxt, {})['id']
+                           for i in range(4))
+        for share_id in share_ids:
+            api.share_export_locations_update(self.ctxt, share_id, ['fake'],
+                                              False)
+        other = api.share_create(self.ctxt, {})
+        api.share_export_locations_update(self.ctxt, other['id'], ['other'],
+                                          False)
+
+        result = api.share_get_all(
+            self.ctxt, filters={'export_location': 'fake'}, sort_key='id',
+            sort_dir='asc', limit=2, marker=share_ids[0])
+
+        self.assertEqual(share_ids[1:3], [s['id'] for s in result])
+
+    def test_share_get_all_summary_filter_by_property(self):
+        share = api.share_create(self.ctxt, {'display_name': 'foo'})
+        api.share_export_locations_update(self.ctxt, share['id'], ['fake'],
+                                          False)
+        api.share_create(self.ctxt, {})
+
+        result = api.share_get_all(
+            self.ctxt, filters={'export_location': 'fake'},
+            profile=constants.QUERY_PROFILE_SUMMARY)
+
+        self.assertEqual([(share['id'], 'foo')],
+                         [(s['id'], s['display_name']) for s in result])
+
+    def test_share_get_all_filter_by_metadata(self):
+        share = api.share_create(
+            self.ctxt, {'metadata': {'k1': 'v1', 'k2': 'v2'}})
+        api.share_create(self.ctxt, {'metadata': {'k1': 'v1'}})
+
+        result = api.share_get_all(
+            self.ctxt, filters={'metadata': {'k1': 'v1', 'k2': 'v2'}})
+
+        self.assertEqual([share['id']], [s['id'] for s in result])
+
+    def test_share_get_all_filter_by_extra_specs(self):
+        share_type = api.share_type_create(
+            self.ctxt, {'name': 'foo', 'extra_specs': {'k1': 'v1',
+                                                       'k2': 'v2'}})
+        crossed_share_type = api.share_type_create(
+            self.ctxt, {'name': 'bar', 'extra_specs': {'k1': 'v2',
+                                                       'k2': 'v1'}})
+        share = api.share_create(
+            self.ctxt, {'share_type_id': share_type['id']})
+        api.share_create(
+            self.ctxt, {'share_type_id': crossed_share_type['id']})
+
+        result = api.share_get_all(
+            self.ctxt, filters={'extra_specs': {'k1': 'v1', 'k2': 'v2'}})
+
+        self.assertEqual([share['id']], [s['id'] for s in result])
+
+    def _count_queries(self, func, *args, **kwargs):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = api.get_engine()
+        sqlalchemy.event.listen(engine, 'before_cursor_execute',
+                                before_cursor_execute)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            sqlalchemy.event.remove(engine, 'before_cursor_execute',
+                                    before_cursor_execute)
+        return result, len(statements)
+
+    def test_share_get_all_summary_profile(self):
+        share = api.share_create(self.ctxt, {'display_name': 'foo',
+                                             'metadata': {'k1': 'v1'}})
+        api.share_export_locations_update(self.ctxt, share['id'],
+                                          ['fake1/1'], False)
+
+        result = api.share_get_all(
+            self.ctxt, profile=constants.QUERY_PROFILE_SUMMARY)
+
+        self.assertEqual([(share['id'], 'foo')],
+                         [(s['id'], s['display_name']) for s in result])
+        unloaded = sqlalchemy.inspect(result[0]).unloaded
+        self.assertIn('host', unloaded)
+        self.assertIn('share_metadata', unloaded)
+        self.assertEqual([], result[0].export_locations)
+
+    def test_share_get_all_detail_profile_query_count(self):
+        def create_share():
+            share = api.share_create(self.ctxt, {'metadata': {'k1': 'v1'}})
+            api.share_export_locations_update(self.ctxt, share['id'],
+                                              ['fake1/1', 'fake2/2'], False)
+
+        create_share()
+        result, one_share = self._count_queries(
+            api.share_get_all, self.ctxt,
+            profile=constants.QUERY_PROFILE_DETAIL)
+        self.assertEqual(1, len(result))
+        for i in range(4):
+            create_share()
+        result, five_shares = self._count_queries(
+            api.share_get_all, self.ctxt,
+            profile=constants.QUERY_PROFILE_DETAIL)
+
+        self.assertEqual(5, len(result))
+        self.assertEqual(one_share, five_shares)
+        for share in result:
+            self.assertEqual(2, len(share['export_locations']))
+            self.assertEqual('v1', share['share_metadata'][0]['value'])
+
+    def test_share_snapshot_get_all_summary_profile(self):
+        share = api.share_create(self.ctxt, {'size': 1})
+        snapshot = api.share_snapshot_create(
+            self.ctxt, {'share_id': share['id'], 'display_name': 'foo'})
+
+        result = api.share_snapshot_get_all(
+            self.ctxt, profile=constants.QUERY_PROFILE_SUMMARY)
+
+        self.assertEqual([(snapshot['id'], 'foo')],
+                         [(s['id'], s['display_name']) for s in result])
+        self.assertIn('status', sqlalchemy.inspect(result[0]).unloaded)
+        self.assertIsNone(result[0].share)
+
+    def test_share_snapshot_get_all_filter_by_attrs(self):
+        share = api.share_create(self.ctxt, {'size': 1})
+        snapshot = api.share_snapshot_create(
+            self.ctxt, {'share_id': share['id'], 'status': 'available'})
+        api.share_snapshot_create(
+            self.ctxt, {'share_id': share['id'], 'status': 'error'})
+
+        result = api.share_snapshot_get_all(
+            self.ctxt, filters={'status': 'available', 'usage': 'any'})
+
+        self.assertEqual([snapshot['id']], [s['id'] for s in result])
+
+    def test_share_snapshot_get_all_filter_by_property(self):
+        share = api.share_create(self.ctxt, {'size': 1})
+        snapshot = api.share_snapshot_create(
+            self.ctxt, {'share_id': share['id']})
+        other_share = api.share_create(self.ctxt, {'size': 1})
+        api.share_snapshot_create(self.ctxt, {'share_id': other_share['id']})
+
+        result = api.share_snapshot_get_all(
+            self.ctxt, filters={'share_name': share['name']})
+
+        self.assertEqual([snapshot['id']], [s['id'] for s in result])
+
+    def test_share_snapshot_get_all_summary_filter_by_property(self):
+        share = api.share_create(self.ctxt, {'size': 1})
+        snapshot = api.share_snapshot_create(
+            self.ctxt, {'share_id': share['id']})
+        other_share = api.share_create(self.ctxt, {'size': 1})
+        api.share_snapshot_create(self.ctxt, {'share_id': other_share['id']})
+
+        result = api.share_snapshot_get_all(
+            self.ctxt, filters={'share_name': share['name']},
+            profile=constants.QUERY_PROFILE_SUMMARY)
+
+        self.assertEqual([snapshot['id']], [s['id'] for s in result])
+
+    def test_share_snapshot_get_all_paginated(self):
+        share = api.share_create(self.ctxt, {'size': 1})
+        snapshot_ids = sorted(
+            api.share_snapshot_create(
+                self.ctxt, {'share_id': share['id']})['id']
+            for i in range(3))
+
+        first_page = api.share_snapshot_get_all(
+            self.ctxt, sort_key='id', sort_dir='asc', limit=2)
+        last_page = api.share_snapshot_get_all(
+            self.ctxt, sort_key='id', sort_dir='asc', limit=2,
+            marker=first_page[-1]['id'])
+
+        self.assertEqual(snapshot_ids[0:2], [s['id'] for s in first_page])
+        self.assertEqual(snapshot_ids[2:], [s['id'] for s in last_page])
+
+    def test_share_access_get_all_for_host(self):
+        shares = [api.share_create(self.ctxt, {'host': host})
+                  for host in ('foo', 'foo#pool0', 'foobar')]
+        rules = [api.share_access_create(self.ctxt,
+                                         {'share_id': share['id'],
+                                          'access_to': 'fake_ip'})
+                 for share in shares]
+        api.share_delete(self.ctxt, shares[1]['id'])
+
+        result = api.share_access_get_all_for_host(self.ctxt, 'foo')
+
+        self.assertEqual([rules[0]['id']], [r['id'] for r in result])
+
+    def test_share_get_all_by_host_does_not_match_wildcards(self):
+        shares = [api.share_create(self.ctxt, {'host': host})
+                  for host in ('foo_1', 'foo_1#', 'foo_1#pool0')]
+        for host in ('fooa1', 'fooa1#pool0', 'foo_10', 'foo_1$pool0'):
+            api.share_create(self.ctxt, {'host': host})
+
+        result = api.share_get_all_by_host(self.ctxt, 'foo_1')
+
+        self.assertEqual(sorted(s['id'] for s in shares),
+                         sorted(s['id'] for s in result))
+
+    def _create_reservations(self, usage, *deltas):
+        expire = timeutils.utcnow() - datetime.timedelta(seconds=1)
+        return [api._reservation_create(self.ctxt, uuidutils.generate_uuid(),
+                                        usage, 'fake_project', 'fake_user',
+                                        usage['resource'], delta, expire,
+                                        session=api.get_session())
+                for delta in deltas]
+
+    def _get_usages(self):
+        usages = api.quota_usage_get_all_by_project(self.ctxt, 'fake_project')
+        usages.pop('project_id')
+        return usages
+
+    def test_reservation_expire(self):
+        shares = api.quota_usage_create(self.ctxt, 'fake_project',
+                                        'fake_user', 'shares', 1, 5, None)
+        gigabytes = api.quota_usage_create(self.ctxt, 'fake_project',
+                                           'fake_user', 'gigabytes', 1, 7,
+                                           None)
+        self._create_reservations(shares, 2, 3, -1)
+        self._create_reservations(gigabytes, 7)
+        api._reservation_create(
+            self.ctxt, 'fake_uuid', gigabytes, 'fake_project', 'fake_user',
+            'gigabytes', 2,
+            timeutils.utcnow() + datetime.timedelta(seconds=3600),
+            session=api.get_session())
+
+        self.assertEqual(2, api.reservation_expire(self.ctxt, limit=2))
+        self.assertEqual({'shares': {'in_use': 1, 'reserved': 0},
+                          'gigabytes': {'in_use': 1, 'reserved': 7}},
+                         self._get_usages())
+        self.assertEqual(2, api.reservation_expire(self.ctxt))
+        self.assertEqual(0, api.reservation_expire(self.ctxt))
+        self.assertEqual({'shares': {'in_use': 1, 'reserved': 0},
+                          'gigabytes': {'in_use': 1, 'reserved': 0}},
+                         self._get_usages())
+        api.reservation_get(self.ctxt, 'fake_uuid')
+
+    def test_quota_usage_refresh_all(self):
+        for resource, in_use in (('shares', 5), ('gigabytes', 3),
+                                 ('snapshots', 0)):
+            api.quota_usage_create(self.ctxt, 'fake_project', 'fake_user',
+                                   resource, in_use, 0, None)
+        for size in (1, 2):
+            api.share_create(self.ctxt, {'project_id': 'fake_project',
+                                         'user_id': 'fake_user',
+                                         'size': size})
+        api.share_create(self.ctxt, {'project_id': 'other_project',
+                                     'user_id': 'fake_user', 'size': 4})
+
+        self.assertEqual(1, api.quota_usage_refresh_all(self.ctxt))
+        self.assertEqual({'shares': {'in_use': 2, 'reserved': 0},
+                          'gigabytes': {'in_use': 3, 'reserved': 0},
+                          'snapshots': {'in_use': 0, 'reserved': 0}},
+                         self._get_usages())
+
+    def test_quota_usage_refresh_all_skips_reserved_usages(self):
+        shares = api.quota_usage_create(self.ctxt, 'fake_project',
+                                        'fake_user', 'shares', 5, 1, None)
+        api.quota_usage_create(self.ctxt, 'fake_project', 'fake_user',
+                               'gigabytes', 9, 0, None)
+        api._reservation_create(
+            self.ctxt, 'fake_uuid', shares, 'fake_project', 'fake_user',
+            'shares', 1,
+            timeutils.utcnow() + datetime.timedelta(seconds=3600),
+            session=api.get_session())
+        api.share_create(self.ctxt, {'project_id': 'fake_project',
+                                     'user_id': 'fake_user', 'size': 1})
+
+        self.assertEqual(1, api.quota_usage_refresh_all(self.ctxt))
+        self.assertEqual({'shares': {'in_use': 5, 'reserved': 1},
+                          'gigabytes': {'in_use': 1, 'reserved': 0}},
+                         self._get_usages())
+
+    def test_quota_usage_refresh_all_rebuilds_project_totals(self):
+        for project_id in ('fake_project', 'other_project'):
+            api.quota_usage_create(self.ctxt, project_id, 'fake_user',
+                                   'shares', 5, 1, None)
+            api._project_quota_usages_get(self.ctxt, project_id, ['shares'])
+        api.share_create(self.ctxt, {'project_id': 'other_project',
+                                     'user_id': 'fake_user', 'size': 1})
+
+        self.assertEqual(2, api.quota_usage_refresh_all(self.ctxt))
+        totals = dict(
+            api.model_query(self.ctxt, models.ProjectQuotaUsage,
+                            models.ProjectQuotaUsage.project_id,
+                            models.ProjectQuotaUsage.total).all())
+        self.assertEqual({'fake_project': 1, 'other_project': 2}, totals)
+
     def _get_driver_test_data(self):
         return ("fake@host", uuidutils.generate_uuid())
 
@@ -129,6 +500,37 @@ class SQLAlchemyAPIShareTestCase(test.TestCase):
 
         self.assertEqual(details_update, actual_result)
 
+    def test_driver_private_data_update_deleted_key(self):
+        test_host, test_id = self._get_driver_test_data()
+        api.driver_private_data_update(self.ctxt, test_host, test_id,
+                                       {"foo": "bar", "tee": "too"})
+        api.driver_private_data_delete(self.ctxt, test_host, test_id, "foo")
+
+        api.driver_private_data_update(self.ctxt, test_host, test_id,
+                                       {"foo": "new_bar"})
+
+        self.assertEqual(
+            {"foo": "new_bar", "tee": "too"},
+            api.driver_private_data_get(self.ctxt, test_host, test_id))
+
+    def test_driver_private_data_update_query_count(self):
+        def update(count):
+            test_host, test_id = self._get_driver_test_data()
+            api.driver_private_data_update(self.ctxt, test_host, test_id,
+                                           {"key0": "old", "stale": "old"})
+            details = dict(("key%d" % i, "val%d" % i) for i in range(count))
+
+            result, queries = self._count_queries(
+                api.driver_private_data_update, self.ctxt, test_host,
+                test_id, details, delete_existing=True)
+
+            self.assertEqual(details, result)
+            self.assertEqual(details, api.driver_private_data_get(
+                self.ctxt, test_host, test_id))
+            return queries
+
+        self.assertEqual(update(2), update(20))
+
     def test_driver_private_data_get(self):
         test_host, test_id = self._get_driver_test_data()
         test_key = "foo"
@@ -172,3 +574,123 @@ class SQLAlchemyAPIShareTestCase(test.TestCase):
             self.ctxt, test_host, test_id)
 
         self.assertEqual({}, actual_result)
+
+
+@ddt.ddt
+class SQLAlchemyAPIQueryPlanTestCase(test.TestCase):
+    """Checks that hot lookups are served by indexes.
+
+    SQLite is asked for the plan of every statement a lookup runs, a full
+    scan of one of the tables below means an index is missing or can not
+    be used by the query.
+    """
+
+    TABLES = ('shares', 'share_access_map', 'share_snapshots',
+              'share_export_locations', 'drivers_private_data')
+
+    def setUp(self):
+        super(SQLAlchemyAPIQueryPlanTestCase, self).setUp()
+        self.ctxt = context.get_admin_context()
+        self.share = api.share_create(
+            self.ctxt, {'host': 'foo#pool0', 'project_id': 'fake_project',
+                        'share_server_id': 'fake_server_id',
+                        'share_network_id': 'fake_network_id',
+                        'metadata': {'k1': 'v1'}})
+        api.share_export_locations_update(self.ctxt, self.share['id'],
+                                          ['fake1/1'], False)
+        api.share_access_create(self.ctxt, {'share_id': self.share['id'],
+                                            'access_to': 'fake_ip'})
+        api.share_snapshot_create(self.ctxt, {'share_id': self.share['id'],
+                                              'project_id': 'fake_project'})
+        api.driver_private_data_update(self.ctxt, 'foo', self.share['id'],
+                                       {'k1': 'v1'})
+
+    def _get_plans(self, func, *args, **kwargs):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters,
+                                  *args):
+            if statement.lstrip().upper().startswith('SELECT'):
+                statements.append((statement, parameters))
+
+        engine = api.get_engine()
+        sqlalchemy.event.listen(engine, 'before_cursor_execute',
+                                before_cursor_execute)
+        try:
+            func(self.ctxt, *args, **kwargs)
+        finally:
+            sqlalchemy.event.remove(engine, 'before_cursor_execute',
+                                    before_cursor_execute)
+
+        plans = []
+        connection = engine.raw_connection()
+        try:
+            for statement, parameters in statements:
+                cursor = connection.cursor()
+                cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+                plans.append(
+                    (statement, [row[-1] for row in cursor.fetchall()]))
+        finally:
+            connection.close()
+        return plans
+
+    def _assert_no_table_scans(self, func, *args, **kwargs):
+        plans = self._get_plans(func, *args, **kwargs)
+
+        self.assertTrue(plans)
+        for statement, plan in plans:
+            for step in plan:
+                words = step.replace(' TABLE ', ' ').split()
+                if words[0] == 'SCAN' and words[1] in self.TABLES:
+                    self.fail('Full scan of %(table)s in %(statement)s: '
+                              '%(plan)s' % {'table': words[1],
+                                            'statement': statement,
+                                            'plan': plan})
+
+    @ddt.data(constants.QUERY_PROFILE_SUMMARY,
+              constants.QUERY_PROFILE_DETAIL)
+    def test_share_get_all_by_project(self, profile):
+        self._assert_no_table_scans(api.share_get_all_by_project,
+                                    'fake_project', profile=profile)
+
+    def test_share_get_all_by_host(self):
+        self._assert_no_table_scans(api.share_get_all_by_host, 'foo')
+
+    def test_share_get_all_by_share_server(self):
+        self._assert_no_table_scans(api.share_get_all_by_share_server,
+                                    'fake_server_id')
+
+    def test_share_get_all_by_share_network(self):
+        self._assert_no_table_scans(api.share_get_all_by_share_network,
+                                    'fake_network_id')
+
+    def test_share_access_get_all_for_share(self):
+        self._assert_no_table_scans(api.share_access_get_all_for_share,
+                                    self.share['id'])
+
+    def test_share_access_get_all_for_host(self):
+        self._assert_no_table_scans(api.share_access_get_all_for_host, 'foo')
+
+    def test_share_snapshot_get_all_for_share(self):
+        self._assert_no_table_scans(api.share_snapshot_get_all_for_share,
+                                    self.share['id'])
+
+    def test_share_snapshot_get_all_by_project(self):
+        self._assert_no_table_scans(api.share_snapshot_get_all_by_project,
+                                    'fake_project')
+
+    def test_share_export_locations_get(self):
+        self._assert_no_table_scans(api.share_export_locations_get,
+                                    self.share['id'])
+
+    def test_driver_private_data_get(self):
+        self._assert_no_table_scans(api.driver_private_data_get, 'foo',
+                                    self.share['id'])
+
+    def test_full_scan_is_detected(self):
+        def share_get_all_with_deleted(ctxt):
+            return api.model_query(ctxt, models.Share,
+                                   read_deleted='yes').all()
+
+        self.assertRaises(self.failureException, self._assert_no_table_scans,
+                          share_get_all_with_deleted)
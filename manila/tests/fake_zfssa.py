@@ -45,6 +45,9 @@ class FakeZFSSA(object):
     def get_share(self, pool, project, share):
         pass
 
+    def get_shares(self, pool, project):
+        return []
+
     def create_share(self, pool, project, share):
         pass
 
@@ -72,6 +75,10 @@ class FakeZFSSA(object):
     def deny_access_nfs(self, pool, project, share, access):
         pass
 
+    def update_access_nfs(self, pool, project, share, add_rules,
+                          delete_rules):
+        return []
+
 
 class FakeRestClient(object):
     """Fake ZFSSA Rest Client."""
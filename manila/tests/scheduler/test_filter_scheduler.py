@@ -19,6 +19,7 @@ import mock
 
 from manila import context
 from manila import exception
+from manila.scheduler import driver
 from manila.scheduler import filter_scheduler
 from manila.scheduler import host_manager
 from manila.tests.scheduler import fakes
@@ -84,6 +85,87 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.assertIsNotNone(weighed_host.obj)
         self.assertTrue(_mock_service_get_all_by_topic.called)
 
+    def _get_request_specs(self, *sizes, **share_properties):
+        return [
+            {
+                'share_id': 'fake-id%d' % i,
+                'snapshot_id': None,
+                'share_type': {'name': 'NFS'},
+                'share_properties': dict(share_properties, project_id=1,
+                                         size=size),
+            } for i, size in enumerate(sizes)
+        ]
+
+    @mock.patch('manila.db.service_get_all_by_topic')
+    def test_schedule_create_shares(self, _mock_service_get_all_by_topic):
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = fakes.FakeHostManager()
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
+        self.mock_object(sched.host_manager, 'get_all_host_states_share',
+                         mock.Mock(wraps=(sched.host_manager.
+                                          get_all_host_states_share)))
+        self.mock_object(driver, 'share_update_db')
+        self.mock_object(sched.share_rpcapi, 'create_share')
+        request_specs = self._get_request_specs(1, 1, 1)
+
+        failures = sched.schedule_create_shares(fake_context, request_specs,
+                                                {})
+
+        self.assertEqual([], failures)
+        sched.host_manager.get_all_host_states_share.assert_called_once_with(
+            mock.ANY)
+        calls = driver.share_update_db.call_args_list
+        self.assertEqual(['fake-id0', 'fake-id1', 'fake-id2'],
+                         [call[0][1] for call in calls])
+        self.assertEqual(3, len(set(call[0][2] for call in calls)))
+        self.assertEqual(3, sched.share_rpcapi.create_share.call_count)
+
+    @mock.patch('manila.db.service_get_all_by_topic')
+    def test_schedule_create_shares_consumes_capacity(
+            self, _mock_service_get_all_by_topic):
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = fakes.FakeHostManager()
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
+        self.mock_object(driver, 'share_update_db')
+        self.mock_object(sched.share_rpcapi, 'create_share')
+        # Only host1 can take a 700G share, and only once.
+        request_specs = self._get_request_specs(700, 700)
+
+        failures = sched.schedule_create_shares(fake_context, request_specs,
+                                                {})
+
+        self.assertEqual([request_specs[1]],
+                         [request_spec for request_spec, ex in failures])
+        self.assertIsInstance(failures[0][1], exception.NoValidHost)
+        driver.share_update_db.assert_called_once_with(
+            fake_context, 'fake-id0', 'host1#_pool0')
+
+    @mock.patch('manila.db.service_get_all_by_topic')
+    def test_schedule_create_shares_groups(self,
+                                           _mock_service_get_all_by_topic):
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = fakes.FakeHostManager()
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
+        self.mock_object(sched, '_schedule_share_group',
+                         mock.Mock(return_value=[]))
+        request_specs = (self._get_request_specs(1, 2, share_proto='NFS') +
+                         self._get_request_specs(1, share_proto='CIFS'))
+
+        failures = sched.schedule_create_shares(fake_context, request_specs,
+                                                {})
+
+        self.assertEqual([], failures)
+        sched._schedule_share_group.assert_has_calls([
+            mock.call(fake_context, request_specs[:2], {}),
+            mock.call(fake_context, request_specs[2:], {}),
+        ])
+
     def test_max_attempts(self):
         self.flags(scheduler_max_attempts=4)
         sched = fakes.FakeFilterScheduler()
@@ -162,6 +162,66 @@ class HostManagerTestCase(test.TestCase):
                 self.assertEqual(share_node, host_state_map[host].service)
             db.service_get_all_by_topic.assert_called_once_with(context, topic)
 
+    def test_get_all_host_states_share_cached_services(self):
+        context = 'fake_context'
+        self.mock_object(
+            db, 'service_get_all_by_topic',
+            mock.Mock(return_value=fakes.SHARE_SERVICES_WITH_POOLS))
+        self.mock_object(timeutils, 'is_older_than',
+                         mock.Mock(return_value=False))
+
+        with mock.patch.dict(self.host_manager.service_states,
+                             fakes.SHARE_SERVICE_STATES_WITH_POOLS):
+            self.host_manager.get_all_host_states_share(context)
+            self.host_manager.get_all_host_states_share(context)
+
+        db.service_get_all_by_topic.assert_called_once_with(
+            context, CONF.share_topic)
+        self.assertEqual(4, len(self.host_manager.host_state_map))
+
+    def test_get_all_host_states_share_expired_services(self):
+        context = 'fake_context'
+        self.mock_object(
+            db, 'service_get_all_by_topic',
+            mock.Mock(side_effect=[fakes.SHARE_SERVICES_WITH_POOLS,
+                                   fakes.SHARE_SERVICES_WITH_POOLS[:2]]))
+        self.mock_object(timeutils, 'is_older_than',
+                         mock.Mock(return_value=True))
+
+        with mock.patch.dict(self.host_manager.service_states,
+                             fakes.SHARE_SERVICE_STATES_WITH_POOLS):
+            self.host_manager.get_all_host_states_share(context)
+            self.host_manager.get_all_host_states_share(context)
+
+        self.assertEqual(2, db.service_get_all_by_topic.call_count)
+        self.assertEqual(
+            sorted(s['host'] for s in fakes.SHARE_SERVICES_WITH_POOLS[:2]),
+            sorted(self.host_manager.host_state_map.keys()))
+
+    def test_update_service_capabilities_updates_known_host(self):
+        context = 'fake_context'
+        self.mock_object(utils, 'service_is_up', mock.Mock(return_value=True))
+        self.mock_object(
+            db, 'service_get_all_by_topic',
+            mock.Mock(return_value=fakes.SHARE_SERVICES_NO_POOLS))
+        self.mock_object(timeutils, 'is_older_than',
+                         mock.Mock(return_value=False))
+        with mock.patch.dict(self.host_manager.service_states,
+                             fakes.SERVICE_STATES_NO_POOLS):
+            self.host_manager.get_all_host_states_share(context)
+        capabilities = dict(fakes.SERVICE_STATES_NO_POOLS['host1'],
+                            free_capacity_gb=100)
+
+        self.host_manager.update_service_capabilities(
+            'share', 'host1', capabilities)
+        pools = list(self.host_manager.get_all_host_states_share(context))
+
+        db.service_get_all_by_topic.assert_called_once_with(
+            context, CONF.share_topic)
+        host1_pools = [pool for pool in pools if pool.host == 'host1#AAA']
+        self.assertEqual(1, len(host1_pools))
+        self.assertEqual(100, host1_pools[0].free_capacity_gb)
+
     def test_get_pools_no_pools(self):
         context = 'fake_context'
         self.mock_object(utils, 'service_is_up', mock.Mock(return_value=True))
@@ -335,6 +395,7 @@ class HostManagerTestCase(test.TestCase):
             self.assertEqual(sorted(expected), sorted(res))
 
     def test_get_pools_host_down(self):
+        self.flags(scheduler_service_cache_ttl=0)
         context = 'fake_context'
         mock_service_is_up = self.mock_object(utils, 'service_is_up')
         self.mock_object(
@@ -90,6 +90,14 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  filter_properties='filter_properties',
                                  version='1.0')
 
+    def test_create_shares(self):
+        self._test_scheduler_api('create_shares',
+                                 rpc_method='cast',
+                                 topic='topic',
+                                 request_specs=['fake_request_spec'],
+                                 filter_properties='filter_properties',
+                                 version='1.2')
+
     def test_get_pools(self):
         self._test_scheduler_api('get_pools',
                                  rpc_method='call',
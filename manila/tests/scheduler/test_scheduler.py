@@ -97,6 +97,21 @@ class SchedulerManagerTestCase(test.TestCase):
             self.manager.driver.schedule_create_share.assert_called_once_with(
                 self.context, request_spec, {})
 
+    @mock.patch.object(db, 'share_update', mock.Mock())
+    def test_create_shares_puts_failed_shares_in_error_state(self):
+        request_specs = [{'share_id': 1}, {'share_id': 2}]
+        failures = [(request_specs[1], exception.NoValidHost(reason=""))]
+        self.mock_object(self.manager.driver, 'schedule_create_shares',
+                         mock.Mock(return_value=failures))
+
+        self.manager.create_shares(self.context, 'fake_topic', request_specs,
+                                   filter_properties={})
+
+        self.manager.driver.schedule_create_shares.assert_called_once_with(
+            self.context, request_specs, {})
+        db.share_update.assert_called_once_with(
+            self.context, 2, {'status': 'error'})
+
     def test_get_pools(self):
         """Ensure get_pools exists and calls driver.get_pools."""
         mock_get_pools = self.mock_object(self.manager.driver, 'get_pools',
@@ -165,6 +180,20 @@ class SchedulerDriverBaseTestCase(SchedulerTestCase):
                           self.context, self.topic, 'schedule_something',
                           *fake_args, **fake_kwargs)
 
+    def test_schedule_create_shares_one_by_one(self):
+        request_specs = [{'share_id': 1}, {'share_id': 2}, {'share_id': 3}]
+        errors = [None, exception.NoValidHost(reason=""), Exception()]
+        self.mock_object(self.driver, 'schedule_create_share',
+                         mock.Mock(side_effect=errors))
+
+        failures = self.driver.schedule_create_shares(
+            self.context, request_specs, {})
+
+        self.assertEqual(3, self.driver.schedule_create_share.call_count)
+        self.assertEqual([request_specs[1], request_specs[2]],
+                         [request_spec for request_spec, ex in failures])
+        self.assertEqual(errors[1:], [ex for request_spec, ex in failures])
+
 
 class SchedulerDriverModuleTestCase(test.TestCase):
     """Test case for scheduler driver module methods."""
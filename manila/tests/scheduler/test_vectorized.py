@@ -0,0 +1,177 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the vectorized filter and weigher engine.
+"""
+
+import ddt
+import mock
+import testtools
+
+from manila.openstack.common.scheduler.filters import availability_zone_filter
+from manila.scheduler.filters import capacity_filter
+from manila.scheduler.filters import retry_filter
+from manila.scheduler import host_manager
+from manila.scheduler import vectorized
+from manila.scheduler.weights import capacity
+from manila import test
+from manila.tests.scheduler import fakes
+
+
+FILTERS = [capacity_filter.CapacityFilter, retry_filter.RetryFilter]
+
+
+@ddt.ddt
+@testtools.skipIf(not vectorized.is_available(), 'NumPy is not installed')
+class VectorizedEngineTestCase(test.TestCase):
+
+    def setUp(self):
+        super(VectorizedEngineTestCase, self).setUp()
+        self.host_manager = host_manager.HostManager()
+        self.engine = vectorized.VectorizedEngine(
+            self.host_manager.filter_handler,
+            self.host_manager.weight_handler)
+
+    def _get_hosts(self, *capacities):
+        return [
+            fakes.FakeHostState('host%d' % i,
+                                {'free_capacity_gb': free,
+                                 'reserved_percentage': reserved,
+                                 'service': {'availability_zone': 'zone%d' %
+                                             (i % 2)}})
+            for i, (free, reserved) in enumerate(capacities)
+        ]
+
+    def _assert_same_filtering(self, filter_classes, hosts, properties):
+        expected = self.host_manager.filter_handler.get_filtered_objects(
+            filter_classes, hosts, properties)
+        actual = self.engine.get_filtered_hosts(filter_classes, hosts,
+                                                properties)
+        self.assertEqual(expected, actual)
+        return actual
+
+    def _assert_same_weighing(self, hosts):
+        weigher_classes = [capacity.CapacityWeigher]
+        expected = self.host_manager.weight_handler.get_weighed_objects(
+            weigher_classes, hosts, {})
+        actual = self.engine.get_weighed_hosts(weigher_classes, hosts, {})
+        self.assertEqual([(w.obj, w.weight) for w in expected],
+                         [(w.obj, w.weight) for w in actual])
+        return actual
+
+    @ddt.data(None, 1, 100, 400, 1000)
+    def test_capacity_filter(self, size):
+        hosts = self._get_hosts((1024, 10), (300, 10), (512, 0), (100, 0),
+                                ('infinite', 0), ('unknown', 5), (None, 0),
+                                (101, 1))
+
+        self._assert_same_filtering(FILTERS, hosts, {'size': size})
+
+    @ddt.data(None, {}, {'hosts': []}, {'hosts': ['host1', 'host3']})
+    def test_retry_filter(self, retry):
+        hosts = self._get_hosts((1024, 10), (300, 10), (512, 0), (100, 0))
+
+        self._assert_same_filtering(FILTERS, hosts,
+                                    {'size': 1, 'retry': retry})
+
+    def test_object_filters_run_on_remaining_hosts(self):
+        hosts = self._get_hosts((1024, 10), (300, 10), (512, 0), (100, 0))
+        filter_classes = FILTERS + [
+            availability_zone_filter.AvailabilityZoneFilter]
+        properties = {'size': 400,
+                      'resource_properties': {'availability_zone': 'zone0'}}
+        self.mock_object(self.host_manager.filter_handler,
+                         'get_filtered_objects',
+                         mock.Mock(side_effect=(self.host_manager.
+                                                filter_handler.
+                                                get_filtered_objects)))
+
+        result = self.engine.get_filtered_hosts(filter_classes, hosts,
+                                                properties)
+
+        self.assertEqual([hosts[0], hosts[2]], result)
+        (self.host_manager.filter_handler.get_filtered_objects.
+            assert_called_once_with(
+                [availability_zone_filter.AvailabilityZoneFilter],
+                [hosts[0], hosts[2]], properties))
+
+    def test_no_hosts(self):
+        self.assertEqual([], self.engine.get_filtered_hosts(
+            FILTERS, [], {'size': 1}))
+        self.assertEqual([], self.engine.get_weighed_hosts(
+            [capacity.CapacityWeigher], [], {}))
+
+    def test_capacity_weigher(self):
+        hosts = self._get_hosts((1024, 10), (300, 10), (512, 0), (200, 5),
+                                (512, 0), (1024, 10))
+
+        result = self._assert_same_weighing(hosts)
+
+        self.assertEqual(hosts[0], result[0].obj)
+
+    def test_capacity_weigher_same_capacity(self):
+        hosts = self._get_hosts((100, 0), (100, 0), (100, 0))
+
+        result = self._assert_same_weighing(hosts)
+
+        self.assertEqual(hosts, [w.obj for w in result])
+
+    def test_capacity_weigher_stacking(self):
+        self.flags(capacity_weight_multiplier=-1.0)
+        hosts = self._get_hosts((1024, 10), (300, 10), (512, 0), (200, 5))
+
+        result = self._assert_same_weighing(hosts)
+
+        self.assertEqual(hosts[3], result[0].obj)
+
+    def test_capacity_weigher_unlimited_capacity(self):
+        hosts = self._get_hosts((1024, 10), ('infinite', 0), (512, 0))
+        self.mock_object(self.host_manager.weight_handler,
+                         'get_weighed_objects')
+
+        self.engine.get_weighed_hosts([capacity.CapacityWeigher], hosts, {})
+
+        (self.host_manager.weight_handler.get_weighed_objects.
+            assert_called_once_with([capacity.CapacityWeigher], hosts, {}))
+
+    def test_host_manager_uses_engine(self):
+        self.flags(scheduler_use_vectorized_engine=True)
+        manager = host_manager.HostManager()
+        hosts = self._get_hosts((1024, 10), (300, 10), (512, 0))
+        self.mock_object(manager.filter_handler, 'get_filtered_objects')
+        self.mock_object(manager.weight_handler, 'get_weighed_objects')
+
+        filtered = manager.get_filtered_hosts(
+            hosts, {'size': 400}, filter_class_names=['CapacityFilter'])
+        weighed = manager.get_weighed_hosts(filtered, {})
+
+        self.assertIsInstance(manager.vectorized_engine,
+                              vectorized.VectorizedEngine)
+        self.assertEqual([hosts[0], hosts[2]], filtered)
+        self.assertEqual([hosts[0], hosts[2]], [w.obj for w in weighed])
+        self.assertFalse(manager.filter_handler.get_filtered_objects.called)
+        self.assertFalse(manager.weight_handler.get_weighed_objects.called)
+
+
+class VectorizedEngineUnavailableTestCase(test.TestCase):
+
+    def test_host_manager_without_numpy(self):
+        self.flags(scheduler_use_vectorized_engine=True)
+        self.mock_object(vectorized, 'is_available',
+                         mock.Mock(return_value=False))
+
+        manager = host_manager.HostManager()
+
+        self.assertIsNone(manager.vectorized_engine)
@@ -20,17 +20,23 @@ from lxml import doctestcompare
 import mock
 from oslo_log import log
 from oslo_utils import units
+import requests_mock
 
 import manila.db
 from manila import exception
 from manila.share import configuration as conf
 from manila.share.drivers.emc import driver as emc_driver
 from manila.share.drivers.emc.plugins.vnx import helper
+from manila.share.drivers.emc.plugins.vnx import xml_api_parser
 from manila import test
 from manila.tests import fake_share
 
 LOG = log.getLogger(__name__)
 
+# The driver tests below replace these on the class.
+CONNECTOR_DO_SETUP = helper.XMLAPIConnector._do_setup
+CONNECTOR_REQUEST = helper.XMLAPIConnector.request
+
 
 def query(func):
     def inner(*args, **kwargs):
@@ -1201,29 +1207,26 @@ class EMCShareDriverVNXTestCase(test.TestCase):
         if_ip1 = if_data1['ip_address']
         if_name2 = 'if-' + if_data2['id'][-12:]
         if_ip2 = if_data2['ip_address']
-        hook.append(TD.resp_get_mover_ref())
         hook.append(TD.resp_get_vdm_not_exist())
         hook.append(TD.resp_task_succeed())
         hook.append(TD.resp_get_created_vdm())
         hook.append(TD.resp_get_mover_by_id())
         hook.append(TD.resp_task_succeed())
         hook.append(TD.resp_task_succeed())
-        hook.append(TD.resp_get_mover_ref())
         hook.append(TD.resp_task_succeed())
         hook.append(TD.resp_task_succeed())
         ssh_hook.append('', '')
         helper.XMLAPIConnector.request = EMCMock(side_effect=hook)
         helper.SSHConnector.run_ssh = mock.Mock(side_effect=ssh_hook)
         self.driver.setup_server(network_info, None)
+        # The Data Mover was looked up by do_setup and comes from the cache.
         expected_calls = [
-            mock.call(TD.req_get_mover_ref()),
             mock.call(TD.req_get_vdm_by_name()),
             mock.call(TD.req_create_vdm()),
             mock.call(TD.req_get_vdm_by_name()),
             mock.call(TD.req_get_mover_by_id()),
             mock.call(TD.req_create_mover_interface(if_name1, if_ip1)),
             mock.call(TD.req_create_mover_interface(if_name2, if_ip2)),
-            mock.call(TD.req_get_mover_ref()),
             mock.call(TD.req_create_dns_domain()),
             mock.call(TD.req_create_cifs_server(if_ip1)),
         ]
@@ -1482,6 +1485,43 @@ class EMCShareDriverVNXTestCase(test.TestCase):
         ]
         helper.XMLAPIConnector.request.assert_has_calls(expected_calls)
 
+    def test_create_snapshot_uses_cached_file_system(self):
+        snap = TD.fake_snapshot()
+        hook = RequestSideEffect()
+        hook.append(TD.resp_get_filesystem(snap['share_name']))
+        hook.append(TD.resp_task_succeed())
+        hook.append(TD.resp_task_succeed())
+        helper.XMLAPIConnector.request = EMCMock(side_effect=hook)
+        self.driver.create_snapshot(None, snap)
+        self.driver.create_snapshot(None, snap)
+        expected_calls = [
+            mock.call(TD.req_get_filesystem(snap['share_name'],
+                                            need_capacity=True)),
+            mock.call(TD.req_create_snapshot(snap['name'])),
+            mock.call(TD.req_create_snapshot(snap['name'])),
+        ]
+        helper.XMLAPIConnector.request.assert_has_calls(expected_calls)
+
+    def test_update_share_stats_after_create_share(self):
+        share = TD.fake_share(share_proto='NFS')
+        share_server = TD.fake_share_server()
+        hook = RequestSideEffect()
+        hook.append(TD.resp_task_succeed())
+        hook.append(TD.resp_get_storage_pools())
+        helper.XMLAPIConnector.request = EMCMock(side_effect=hook)
+        helper.SSHConnector.run_ssh = mock.Mock(
+            return_value=(TD.CREATE_NFS_EXPORT_OUT, TD.FAKE_ERROR))
+        self.driver.plugin.update_share_stats({})
+        self.driver.create_share(None, share, share_server)
+        self.driver.plugin.update_share_stats({})
+        # The pools listed by do_setup are cached until a file system is
+        # created.
+        expected_calls = [
+            mock.call(TD.req_create_file_system_on_vdm(share['name'])),
+            mock.call(TD.req_get_storage_pools()),
+        ]
+        helper.XMLAPIConnector.request.assert_has_calls(expected_calls)
+
     def test_create_snapshot_error(self):
         snap = TD.fake_snapshot()
         hook = RequestSideEffect()
@@ -1635,6 +1675,74 @@ class EMCShareDriverVNXTestCase(test.TestCase):
         ]
         helper.SSHConnector.run_ssh.assert_has_calls(expected_calls)
 
+    def test_nfs_update_access(self):
+        share = TD.fake_share(share_proto='NFS')
+        share_server = TD.fake_share_server()
+        mover_name = share_server['backend_details']['share_server_name']
+        path = '/' + share['name']
+        add_rules = [fake_share.fake_access(access_to=host)
+                     for host in ('10.0.0.3', '10.0.0.4')]
+        delete_rules = [TD.fake_access_subnet()]
+        sshHook = SSHSideEffect()
+        sshHook.append(TD.resp_get_nfs_share_by_path(
+            mover_name, path, ['10.0.0.2/24']))
+        sshHook.append(TD.resp_change_nfs_share_success(mover_name))
+        # Another host added 10.0.0.5 in the meantime.
+        sshHook.append(TD.resp_get_nfs_share_by_path(
+            mover_name, path, ['10.0.0.3', '10.0.0.4', '10.0.0.5']))
+        sshHook.append(TD.resp_change_nfs_share_success(mover_name))
+        helper.SSHConnector.run_ssh = mock.Mock(side_effect=sshHook)
+
+        failed = self.driver.update_access(None, share, add_rules,
+                                           delete_rules, share_server)
+        failed += self.driver.update_access(None, share, [],
+                                            [add_rules[0]], share_server)
+
+        # Each update reads the export before writing it.
+        expected_calls = [
+            mock.call(TD.req_get_nfs_share_by_path(mover_name, path)),
+            mock.call(TD.req_set_nfs_share_access(
+                path, mover_name, ['10.0.0.3', '10.0.0.4'])),
+            mock.call(TD.req_get_nfs_share_by_path(mover_name, path)),
+            mock.call(TD.req_set_nfs_share_access(
+                path, mover_name, ['10.0.0.4', '10.0.0.5'])),
+        ]
+        helper.SSHConnector.run_ssh.assert_has_calls(expected_calls)
+        self.assertEqual([], failed)
+
+    def test_nfs_update_access_error(self):
+        share = TD.fake_share(share_proto='NFS')
+        share_server = TD.fake_share_server()
+        mover_name = share_server['backend_details']['share_server_name']
+        path = '/' + share['name']
+        add_rules = [TD.fake_access(), TD.fake_access(access_type='user')]
+        sshHook = SSHSideEffect()
+        sshHook.append(TD.resp_get_nfs_share_by_path(mover_name, path))
+        sshHook.append(TD.FAKE_ERROR)
+        helper.SSHConnector.run_ssh = mock.Mock(side_effect=sshHook)
+
+        failed = self.driver.update_access(None, share, add_rules, [],
+                                           share_server)
+
+        self.assertEqual([add_rules[1], add_rules[0]], failed)
+        self.assertEqual(2, helper.SSHConnector.run_ssh.call_count)
+
+    def test_cifs_update_access(self):
+        share = TD.fake_share(share_proto='CIFS')
+        share_server = TD.fake_share_server()
+        access = TD.fake_access(access_type='user')
+        self.mock_object(self.driver.plugin, 'allow_access')
+        self.mock_object(self.driver.plugin, 'deny_access')
+
+        failed = self.driver.update_access(None, share, [access], [access],
+                                           share_server)
+
+        self.assertEqual([], failed)
+        self.driver.plugin.allow_access.assert_called_once_with(
+            self.driver, None, share, access, share_server)
+        self.driver.plugin.deny_access.assert_called_once_with(
+            self.driver, None, share, access, share_server)
+
     @mock.patch('manila.db.share_network_get',
                 mock.Mock(return_value=TD.fake_share_network()))
     def test_cifs_allow_access(self):
@@ -1752,3 +1860,112 @@ class EMCShareDriverVNXTestCase(test.TestCase):
         elif value == 'driver_handles_share_servers':
             return True
         return None
+
+
+class XMLAPIConnectorTestCase(test.TestCase):
+    def setUp(self):
+        super(XMLAPIConnectorTestCase, self).setUp()
+        self.mock_object(helper.XMLAPIConnector, '_do_setup',
+                         CONNECTOR_DO_SETUP)
+        self.mock_object(helper.XMLAPIConnector, 'request', CONNECTOR_REQUEST)
+        self.configuration = conf.Configuration(None)
+        self.configuration.emc_nas_login = 'fakename'
+        self.configuration.emc_nas_password = 'fakepwd'
+        self.configuration.emc_nas_server = TD.emc_nas_server_default
+        self.login_url = 'https://%s/Login' % TD.emc_nas_server_default
+        self.api_url = ('https://%s/servlets/CelerraManagementServices' %
+                        TD.emc_nas_server_default)
+
+    @requests_mock.mock()
+    def test_request(self, m):
+        m.post(self.login_url)
+        m.post(self.api_url, text=TD.resp_task_succeed())
+
+        connector = helper.XMLAPIConnector(self.configuration)
+        body = connector.request(TD.req_create_vdm())
+
+        self.assertEqual(TD.resp_task_succeed(), body)
+        self.assertEqual(2, m.call_count)
+        self.assertEqual(TD.req_create_vdm(), m.request_history[1].body)
+        self.assertEqual(4, connector.session.get_adapter(
+            self.api_url)._pool_maxsize)
+
+    @requests_mock.mock()
+    def test_request_login_again(self, m):
+        m.post(self.login_url)
+        m.post(self.api_url, [{'status_code': 403},
+                              {'text': TD.resp_task_succeed()}])
+
+        connector = helper.XMLAPIConnector(self.configuration)
+        body = connector.request(TD.req_create_vdm())
+
+        self.assertEqual(TD.resp_task_succeed(), body)
+        self.assertEqual([self.login_url, self.api_url,
+                          self.login_url, self.api_url],
+                         [r.url for r in m.request_history])
+
+    @requests_mock.mock()
+    def test_request_error(self, m):
+        m.post(self.login_url)
+        m.post(self.api_url, status_code=500)
+
+        connector = helper.XMLAPIConnector(self.configuration, debug=False)
+
+        self.assertRaises(exception.ManilaException,
+                          connector.request, TD.req_create_vdm())
+
+
+class XMLAPIParserTestCase(test.TestCase):
+    def test_parse_xml_api_stream(self):
+        result = xml_api_parser.parse_xml_api_stream(TD.resp_get_vdm_by_name())
+
+        self.assertEqual(3, len(result))
+        self.assertEqual(('QueryStatus', {'maxSeverity': 'ok'}), result[0])
+        self.assertEqual('Vdm', result[2][0])
+        self.assertEqual({'name': 'vdm_name',
+                          'state': 'loaded',
+                          'mover': '1',
+                          'rootFileSystem': '396',
+                          'vdm': 'vdm_id',
+                          'Interfaces': ['if-9941bc3673a6']},
+                         result[2][1])
+
+    def test_parse_xml_api_stream_packet_fault(self):
+        packet = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<ResponsePacket xmlns="http://www.emc.com/schemas/celerra/'
+            'xml_api"><PacketFault maxSeverity="error">'
+            '<Problem messageCode="14227341322" component="API"'
+            ' message="Invalid request." severity="error">'
+            '<Description>The request is not valid.</Description>'
+            '</Problem></PacketFault></ResponsePacket>')
+
+        result = xml_api_parser.parse_xml_api_stream(packet)
+
+        self.assertEqual('PacketFault', result[0])
+        self.assertEqual({'maxSeverity': 'error'}, result[1])
+        self.assertEqual('Problem', result[2][0][0])
+        self.assertEqual('The request is not valid.',
+                         result[2][0][1]['description'])
+
+    def test_parse_xml_api_stream_releases_records(self):
+        element_to_tupletree = xml_api_parser.element_to_tupletree
+        previous = []
+
+        def fake_element_to_tupletree(element):
+            parent = element.getparent()
+            if parent is not None and parent.tag.endswith('}Response'):
+                # At most the cleared record read before this one is left.
+                sibling = element.getprevious()
+                previous.append(None if sibling is None else
+                                (dict(sibling.attrib),
+                                 sibling.getprevious()))
+            return element_to_tupletree(element)
+
+        self.mock_object(xml_api_parser, 'element_to_tupletree',
+                         mock.Mock(side_effect=fake_element_to_tupletree))
+
+        result = xml_api_parser.parse_xml_api_stream(TD.resp_get_mover_ref())
+
+        self.assertEqual(3, len(result))
+        self.assertEqual([None, ({}, None), ({}, None)], previous)
@@ -14,7 +14,10 @@
 #    under the License.
 
 import contextlib
+import os
 import re
+import shutil
+import tempfile
 
 import mock
 from oslo_serialization import jsonutils
@@ -521,3 +524,120 @@ class GaneshaManagerTestCase(test.TestCase):
             'sh', '-c', 'rm -f /fakedir0/export.d/*.conf')
         self._manager._mkindex.assert_called_once_with()
         self.assertEqual(None, ret)
+
+
+class NativeGaneshaManagerTestCase(test.TestCase):
+    """Tests NativeGaneshaManager."""
+
+    def setUp(self):
+        super(NativeGaneshaManagerTestCase, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.export_dir = os.path.join(self.tmpdir, 'export.d')
+        self.db_path = os.path.join(self.tmpdir, 'db', 'fake.db')
+        self._execute = mock.Mock(return_value=('', ''))
+        self._manager = self._get_manager()
+
+    def _get_manager(self):
+        return manager.NativeGaneshaManager(
+            self._execute, 'faketag',
+            ganesha_config_path='/fakedir0/fakeconfig',
+            ganesha_db_path=self.db_path,
+            ganesha_export_dir=self.export_dir,
+            ganesha_service_name='ganesha.fakeservice')
+
+    def _read(self, name):
+        with open(os.path.join(self.export_dir, name)) as f:
+            return f.read()
+
+    def test_init(self):
+        self.assertEqual(['INDEX.conf'], os.listdir(self.export_dir))
+        self.assertEqual('\n', self._read('INDEX.conf'))
+        self.assertEqual(100, self._manager.get_export_id(bump=False))
+        self._execute.assert_called_once_with(
+            'service', 'ganesha.fakeservice', 'restart')
+
+    def test_init_existing_storage(self):
+        self._manager.get_export_id()
+        with open(os.path.join(self.export_dir, 'stale.conf'), 'w') as f:
+            f.write('stale')
+
+        new_manager = self._get_manager()
+
+        self.assertEqual(['INDEX.conf'], os.listdir(self.export_dir))
+        self.assertEqual(101, new_manager.get_export_id(bump=False))
+
+    def test_get_export_id(self):
+        self.assertEqual(101, self._manager.get_export_id())
+        self.assertEqual(102, self._manager.get_export_id())
+        self.assertEqual(102, self._manager.get_export_id(bump=False))
+
+    def test_get_export_id_error_invalid_export_db(self):
+        self._manager.db.execute('delete from ganesha')
+        self.mock_object(manager.LOG, 'error')
+
+        self.assertRaises(exception.InvalidSqliteDB,
+                          self._manager.get_export_id)
+        manager.LOG.error.assert_called_once_with(mock.ANY, mock.ANY)
+
+    def test_add_remove_export(self):
+        self._manager.add_export('fake1', test_dict_str)
+        self._manager.add_export('fake0', test_dict_str)
+
+        self.assertEqual(
+            '%%include %(dir)s/fake0.conf\n%%include %(dir)s/fake1.conf\n\n' %
+            {'dir': self.export_dir},
+            self._read('INDEX.conf'))
+        self.assertEqual(test_dict_unicode,
+                         self._manager._read_export_file('fake1'))
+        self._execute.assert_called_with(
+            'dbus-send', '--print-reply', '--system',
+            '--dest=org.ganesha.nfsd', '/org/ganesha/nfsd/ExportMgr',
+            'org.ganesha.nfsd.exportmgr.AddExport',
+            'string:' + os.path.join(self.export_dir, 'fake0.conf'),
+            'string:EXPORT(Export_Id=101)')
+
+        self._manager.remove_export('fake1')
+
+        self.assertEqual(
+            '%%include %s/fake0.conf\n\n' % self.export_dir,
+            self._read('INDEX.conf'))
+        self.assertEqual(['INDEX.conf', 'fake0.conf'],
+                         sorted(os.listdir(self.export_dir)))
+        self.assertFalse(self._execute.call_args_list.count(
+            mock.call('ls', self.export_dir, run_as_root=False)))
+
+    def test_add_export_error_during_dbus_send_ganesha(self):
+        self._execute.side_effect = exception.ProcessExecutionError
+
+        self.assertRaises(exception.GaneshaCommandFailure,
+                          self._manager.add_export, 'fake1', test_dict_str)
+
+        self.assertEqual(['INDEX.conf'], os.listdir(self.export_dir))
+        self.assertEqual('\n', self._read('INDEX.conf'))
+
+    def test_mkindex_lists_export_dir(self):
+        self.mock_object(manager.utils, 'synchronized',
+                         mock.Mock(return_value=lambda f: f))
+        for fname in ('other.conf', 'fake0.conf', 'fake.txt'):
+            with open(os.path.join(self.export_dir, fname), 'w') as f:
+                f.write('fake')
+
+        self._manager._mkindex()
+
+        manager.utils.synchronized.assert_called_once_with(
+            'ganesha-index-faketag', external=True)
+        self.assertEqual(
+            '%%include %(dir)s/fake0.conf\n%%include %(dir)s/other.conf\n\n' %
+            {'dir': self.export_dir},
+            self._read('INDEX.conf'))
+
+    def test_write_file_error(self):
+        self.mock_object(manager.os, 'rename',
+                         mock.Mock(side_effect=OSError))
+
+        self.assertRaises(OSError, self._manager._write_file,
+                          os.path.join(self.export_dir, 'fake.conf'),
+                          'fakedata')
+
+        self.assertEqual(['INDEX.conf'], os.listdir(self.export_dir))
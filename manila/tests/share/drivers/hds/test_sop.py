@@ -17,6 +17,8 @@
 
 import time
 
+import eventlet
+from eventlet import event
 import httplib2
 import mock
 from oslo_config import cfg
@@ -36,6 +38,20 @@ CONF = cfg.CONF
 fake_authorization = {'Authorization': u'Basic ZmFrZXVzZXI6ZmFrZXBhc3N3b3Jk'}
 
 
+def _fake_job_response(status, resource_name='fakeuuid'):
+    return ({'status': '200',
+             'content-location': 'https://1.2.3.4/sopapi/jobs/fakeuuid',
+             'x-sopapi-version': '1.0.0',
+             'content-type': 'application/json'},
+            json.dumps({'id': 'fakeuuid',
+                        'properties': {
+                            'resource-name': resource_name,
+                            'resource-type': 'share',
+                            'completion-status': status,
+                            'resource-action': 'ADD',
+                            'resource-id': 'fakeuuid'}}))
+
+
 class SopShareDriverTestCase(test.TestCase):
     """Tests SopShareDriver."""
 
@@ -64,9 +80,6 @@ class SopShareDriverTestCase(test.TestCase):
         self._driver.share_backend_name = 'HDS_SOP'
 
     def test_add_file_system_sopapi(self):
-        httpclient = httplib2.Http(disable_ssl_certificate_validation=True,
-                                   timeout=None)
-
         httpretval = ({'status': '202',
                        'content-length': '0',
                        'x-sopapi-version': '1.0.0',
@@ -76,7 +89,7 @@ class SopShareDriverTestCase(test.TestCase):
                        'location': 'https://1.2.3.4/sopapi/jobs/fakeuuid',
                        'date': 'Tue, 20 Jan 2015 22:41:29 GMT'}, '')
 
-        self.mock_object(httpclient, 'request',
+        self.mock_object(httplib2.Http, 'request',
                          mock.Mock(return_value=httpretval))
         self.mock_object(self._driver, '_wait_for_job_completion', mock.Mock())
 
@@ -91,9 +104,9 @@ class SopShareDriverTestCase(test.TestCase):
             'name': 'fakeid',
         }
 
-        fsadd = self._driver._add_file_system_sopapi(httpclient, fakepayload1)
+        fsadd = self._driver._add_file_system_sopapi(fakepayload1)
         self.assertEqual(None, fsadd)
-        httpclient.request.assert_called_once_with(
+        httplib2.Http.request.assert_called_once_with(
             'https://' +
             self.server['backend_details']['ip'] +
             '/sopapi/file-systems/',
@@ -101,13 +114,9 @@ class SopShareDriverTestCase(test.TestCase):
             body=json.dumps(fakepayload1),
             headers=fake_authorization)
         self._driver._wait_for_job_completion.assert_called_once_with(
-            httpclient,
             'https://1.2.3.4/sopapi/jobs/fakeuuid')
 
     def test_add_file_system_sopapi_belowminsize(self):
-        httpclient = httplib2.Http(disable_ssl_certificate_validation=True,
-                                   timeout=None)
-
         httpretval = ({'status': '400',
                        'content-type': 'application/jsson',
                        'transfer-encoding': 'chunked',
@@ -124,7 +133,7 @@ class SopShareDriverTestCase(test.TestCase):
                                      'code': 'schema_number_min_constraint',
                                      'type': 'error'},
                                     ]})
-        self.mock_object(httpclient, 'request',
+        self.mock_object(httplib2.Http, 'request',
                          mock.Mock(return_value=httpretval))
         self.mock_object(self._driver, '_wait_for_job_completion', mock.Mock())
 
@@ -140,8 +149,8 @@ class SopShareDriverTestCase(test.TestCase):
         }
         self.assertRaises(exception.SopAPIError,
                           self._driver._add_file_system_sopapi,
-                          httpclient, fakepayload)
-        httpclient.request.assert_called_once_with(
+                          fakepayload)
+        httplib2.Http.request.assert_called_once_with(
             'https://' +
             self.server['backend_details']['ip'] +
             '/sopapi/file-systems/',
@@ -150,220 +159,142 @@ class SopShareDriverTestCase(test.TestCase):
             headers=fake_authorization)
         self.assertEqual(False, self._driver._wait_for_job_completion.called)
 
-    def test_wait_for_job_completion_simple(self):
-        httpclient = httplib2.Http(disable_ssl_certificate_validation=True,
-                                   timeout=None)
-
-        httpreturn = [
-            ({'status': '200',
-              'content-location': 'https://1.2.3.4/sopapi/jobs/fakeuuid',
-              'transfer-encoding': 'chunked',
-              'set-cookie': 'JSESSIONID=abcdef;Path=/sopapi;Secure',
-              'expires': 'Thu, 01 Jan 1970 00:00:00 GMT',
-              'server': 'Jetty(8.1.3.v20120416)',
-              'x-sopapi-version': '1.0.0',
-              'date': 'Wed, 21 Jan 2015 04:49:51 GMT',
-              'content-type': 'application/json'},
-             '{"id":"fakeuuid","properties":{"'
-             'resource-name":"","resource-type":"share","creation-timestam'
-             'p":1421815791,"completion-status":"PROCESSING","completion-d'
-             'etails":"Saving changes","completion-substatus":"RUNNING","r'
-             'esource-action":"ADD","percent-complete":75,"resource-id":"b'
-             'fakeuuid","target-node-name":"Node005","target-node-id":"fak'
-             'euuid","spawned-jobs":false,"spawned-jobs-list-uri":""}}'),
-            ({'status': '200',
-              'content-location': 'https://1.2.3.4/sopapi/jobs/fakeuuid',
-              'transfer-encoding': 'chunked',
-              'set-cookie': 'JSESSIONID=abcdef;Path=/sopapi;Secure',
-              'expires': 'Thu, 01 Jan 1970 00:00:00 GMT',
-              'server': 'Jetty(8.1.3.v20120416)',
-              'x-sopapi-version': '1.0.0',
-              'date': 'Wed, 21 Jan 2015 04:49:51 GMT',
-              'content-type': 'application/json'},
-             '{"id":"fakeuuid","properties":{"'
-             'resource-name":"fakeuuid","resou'
-             'rce-type":"share","creation-timestamp":1421815791,"completio'
-             'n-status":"COMPLETE","completion-details":"Adding share comp'
-             'leted","completion-substatus":"OK","resource-action":"ADD","'
-             'percent-complete":100,"resource-id":"fakeuuid'
-             '","target-node-name":"Node005","target-node-id"'
-             ':"fakeuuid","spawned-jobs":false'
-             ',"spawned-jobs-list-uri":""}}'),
+    def test_wait_for_job_completion(self):
+        job_event = event.Event()
+        job_event.send({'id': 'fakeuuid'})
+        self.mock_object(self._driver.job_tracker, 'track',
+                         mock.Mock(return_value=job_event))
+
+        job = self._driver._wait_for_job_completion('fakeuri')
+
+        self.assertEqual({'id': 'fakeuuid'}, job)
+        self._driver.job_tracker.track.assert_called_once_with('fakeuri')
+
+    def test_job_tracker(self):
+        httpclient = mock.Mock()
+        httpclient.request.side_effect = [
+            _fake_job_response('PROCESSING'),
+            _fake_job_response('COMPLETE'),
         ]
+        tracker = sop.SopJobTracker(httpclient, lambda: fake_authorization,
+                                    poll_interval=0, max_poll_interval=0)
 
-        self.mock_object(httpclient, 'request',
-                         mock.Mock(side_effect=httpreturn))
-
-        fsadd = self._driver._wait_for_job_completion(httpclient, 'fakeuri')
-
-        expectedresult = {
-            u'id': u'fakeuuid',
-            u'properties': {
-                u'completion-details':
-                u'Adding share completed',
-                u'completion-status': u'COMPLETE',
-                u'completion-substatus': u'OK',
-                u'creation-timestamp': 1421815791,
-                u'percent-complete': 100,
-                u'resource-action': u'ADD',
-                u'resource-id': u'fakeuuid',
-                u'resource-name': u'fakeuuid',
-                u'resource-type': u'share',
-                u'spawned-jobs': False,
-                u'spawned-jobs-list-uri': u'',
-                u'target-node-id': u'fakeuuid',
-                u'target-node-name': u'Node005',
-            },
-        }
-        self.assertEqual(expectedresult, fsadd)
+        job = tracker.track('fakeuri').wait()
+
+        self.assertEqual('COMPLETE', job['properties']['completion-status'])
+        self.assertEqual('fakeuuid', job['properties']['resource-name'])
         httpcalls = [mock.call('fakeuri',
                                'GET',
                                body='',
                                headers=fake_authorization) for x in xrange(2)]
         self.assertEqual(httpcalls, httpclient.request.call_args_list)
-
-    def test_wait_for_job_completion_notimeout(self):
-        httpclient = httplib2.Http(disable_ssl_certificate_validation=True,
-                                   timeout=None)
-
-        httpreturn = [({'status': '200',
-                        'content-location':
-                            'https://1.2.3.4/sopapi/jobs/fakeuuid',
-                        'transfer-encoding': 'chunked',
-                        'set-cookie': 'JSESSIONID=abcdef;Path=/sopapi;Secure',
-                        'expires': 'Thu, 01 Jan 1970 00:00:00 GMT',
-                        'server': 'Jetty(8.1.3.v20120416)',
-                        'x-sopapi-version': '1.0.0',
-                        'date': 'Wed, 21 Jan 2015 04:49:51 GMT',
-                        'content-type': 'application/json'},
-                       '{"id":"fakeuuid","properties":{"resource-name":"","re'
-                       'source-type":"share","creation-timestamp":1421815791,'
-                       '"completion-status":"PROCESSING","completion-details"'
-                       ':"Saving changes","completion-substatus":"RUNNING","r'
-                       'esource-action":"ADD","percent-complete":75,"resource'
-                       '-id":"fakeuuid","target-node-name":"Node005","target-'
-                       'node-id":"fakeuuid","spawned-jobs":false,"spawned-job'
-                       's-list-uri":""}}') for x in xrange(200)
-                      ]
-
-        httpreturn.append(({'status': '200',
-                            'content-location':
-                                'https://1.2.3.4/sopapi/jobs/fakeuuid',
-                            'transfer-encoding': 'chunked',
-                            'set-cookie':
-                                'JSESSIONID=abcdef;Path=/sopapi;Secure',
-                            'expires': 'Thu, 01 Jan 1970 00:00:00 GMT',
-                            'server': 'Jetty(8.1.3.v20120416)',
-                            'x-sopapi-version': '1.0.0',
-                            'date': 'Wed, 21 Jan 2015 04:49:51 GMT',
-                            'content-type': 'application/json'},
-                           '{"id":"fakeuuid","properties":{"resource-name":"fa'
-                           'keuuid","resource-type":"share","creation-timestam'
-                           'p":1421816291,"completion-status":"COMPLETE","comp'
-                           'letion-details":"Adding share completed","completi'
-                           'on-substatus":"OK","resource-action":"ADD","percen'
-                           't-complete":100,"resource-id":"fakeuuid","target-n'
-                           'ode-name":"Node005","target-node-id":"fakeuuid","s'
-                           'pawned-jobs":false,"spawned-jobs-list-uri":""}}'))
-
-        self.mock_object(httpclient, 'request',
-                         mock.Mock(side_effect=httpreturn))
-        self.mock_object(time, 'sleep', mock.Mock())
-
-        fsadd = self._driver._wait_for_job_completion(httpclient, 'fakeuri')
-
-        expectedresult = {
-            u'id': u'fakeuuid',
-            u'properties': {
-                u'completion-details':
-                u'Adding share completed',
-                u'completion-status': u'COMPLETE',
-                u'completion-substatus': u'OK',
-                u'creation-timestamp': 1421816291,
-                u'percent-complete': 100,
-                u'resource-action': u'ADD',
-                u'resource-id': u'fakeuuid',
-                u'resource-name': u'fakeuuid',
-                u'resource-type': u'share',
-                u'spawned-jobs': False,
-                u'spawned-jobs-list-uri': u'',
-                u'target-node-id': u'fakeuuid',
-                u'target-node-name': u'Node005',
-            },
+        self.assertEqual({}, tracker._jobs)
+        self.assertIsNone(tracker._poller)
+
+    def test_job_tracker_polls_jobs_together(self):
+        responses = {
+            'fakeuri1': [_fake_job_response('COMPLETE', 'fake1')],
+            'fakeuri2': [_fake_job_response('PROCESSING'),
+                         _fake_job_response('COMPLETE', 'fake2')],
         }
-        self.assertEqual(expectedresult, fsadd)
-        httpcalls = [mock.call('fakeuri',
-                               'GET',
-                               body='',
-                               headers=fake_authorization)
-                     for x in xrange(201)]
-        self.assertEqual(httpcalls, httpclient.request.call_args_list)
-        timecalls = [mock.call(1) for x in xrange(200)]
-        self.assertEqual(timecalls, time.sleep.call_args_list)
-
-    def test_wait_for_job_completion_timeout(self):
-        httpclient = httplib2.Http(disable_ssl_certificate_validation=True,
-                                   timeout=None)
-
-        httpret = [({'status': '200',
-                     'content-location': 'https://1.2.3.4/sopapi/jobs/'
-                     'fakeuuid',
-                     'transfer-encoding': 'chunked',
-                     'set-cookie': 'JSESSIONID=abcdef;Path=/sopapi;Secure',
-                     'expires': 'Thu, 01 Jan 1970 00:00:00 GMT',
-                     'server': 'Jetty(8.1.3.v20120416)',
-                     'x-sopapi-version': '1.0.0',
-                     'date': 'Wed, 21 Jan 2015 04:49:51 GMT',
-                     'content-type': 'application/json'},
-                    '{"id":"fakeuuid","properties'
-                    '":{"resource-name":"","resource-type":"share","creation-'
-                    'timestamp":1421815791,"completion-status":"PROCESSING","'
-                    'completion-details":"Saving changes","completion-substat'
-                    'us":"RUNNING","resource-action":"ADD","percent-complete"'
-                    ':75,"resource-id":"fakeuuid"'
-                    ',"target-node-name":"Node005","target-node-id":"fakeuuid'
-                    '","spawned-jobs":false,"spawned-jobs-list-uri":""}}')
-                   for x in xrange(301)]
-
-        httpret.append(({'status': '200',
-                         'content-location':
-                         'https://1.2.3.4/sopapi/jobs/fakeuuid',
-                         'transfer-encoding': 'chunked',
-                         'set-cookie': 'JSESSIONID=abcdef;Path=/sopapi;Secure',
-                         'expires': 'Thu, 01 Jan 1970 00:00:00 GMT',
-                         'server': 'Jetty(8.1.3.v20120416)',
-                         'x-sopapi-version': '1.0.0',
-                         'date': 'Wed, 21 Jan 2015 04:49:51 GMT',
-                         'content-type': 'application/json'},
-                        '{"id":"fakeuuid","propert'
-                        'ies":{"resource-name":"fakeuuid","resource-type":"sha'
-                        're","creation-timestamp":1421815791,"completion-statu'
-                        's":"COMPLETE","completion-details":"Adding share comp'
-                        'leted","completion-substatus":"OK","resource-action"'
-                        ':"ADD","percent-complete": 100,"resource-id":"fakeuui'
-                        'd","target-node-name":"Node005","target-node-id":"fa'
-                        'keuuid","spawned-jobs":false,"spawned-jobs-list-uri"'
-                        ':""}}'))
-
-        self.mock_object(httpclient, 'request', mock.Mock(side_effect=httpret))
-        self.mock_object(time, 'sleep', mock.Mock())
+        httpclient = mock.Mock()
+        httpclient.request.side_effect = (
+            lambda uri, *args, **kwargs: responses[uri].pop(0))
+        self.mock_object(eventlet, 'spawn_n',
+                         mock.Mock(side_effect=eventlet.spawn_n))
+        tracker = sop.SopJobTracker(httpclient, lambda: fake_authorization,
+                                    poll_interval=0, max_poll_interval=0)
+
+        event1 = tracker.track('fakeuri1')
+        event2 = tracker.track('fakeuri2')
+
+        self.assertEqual(event2, tracker.track('fakeuri2'))
+        self.assertEqual('fake2',
+                         event2.wait()['properties']['resource-name'])
+        self.assertEqual('fake1',
+                         event1.wait()['properties']['resource-name'])
+        self.assertEqual(3, httpclient.request.call_count)
+        self.assertEqual(1, eventlet.spawn_n.call_count)
+
+    def test_job_tracker_backoff(self):
+        httpclient = mock.Mock()
+        httpclient.request.return_value = _fake_job_response('PROCESSING')
+        self.mock_object(eventlet, 'spawn_n')
+        self.mock_object(time, 'time', mock.Mock(return_value=100))
+        tracker = sop.SopJobTracker(httpclient, lambda: fake_authorization,
+                                    poll_interval=1, max_poll_interval=4)
+        tracker.track('fakeuri')
+
+        next_polls = []
+        for x in xrange(4):
+            time.time.return_value = tracker._jobs['fakeuri']['next_poll']
+            tracker._poll_once()
+            next_polls.append(tracker._jobs['fakeuri']['next_poll'])
+
+        self.assertEqual([103, 107, 111, 115], next_polls)
+        self.assertEqual(4, httpclient.request.call_count)
+
+    def test_job_tracker_error(self):
+        httpclient = mock.Mock()
+        httpclient.request.return_value = _fake_job_response('ERROR')
+        tracker = sop.SopJobTracker(httpclient, lambda: fake_authorization,
+                                    poll_interval=0)
 
         self.assertRaises(exception.SopAPIError,
-                          self._driver._wait_for_job_completion,
-                          httpclient, 'fakeuri')
-        httpcalls = [mock.call('fakeuri',
-                               'GET',
-                               body='',
-                               headers=fake_authorization)
-                     for x in xrange(301)]
-        self.assertEqual(httpcalls, httpclient.request.call_args_list)
-        timecalls = [mock.call(1) for x in xrange(301)]
-        self.assertEqual(timecalls, time.sleep.call_args_list)
+                          tracker.track('fakeuri').wait)
+        self.assertEqual({}, tracker._jobs)
 
-    def test_add_share_sopapi(self):
-        httpclient = httplib2.Http(disable_ssl_certificate_validation=True,
-                                   timeout=None)
+    def test_job_tracker_bad_status(self):
+        httpclient = mock.Mock()
+        httpclient.request.return_value = ({'status': '500'}, '')
+        tracker = sop.SopJobTracker(httpclient, lambda: fake_authorization,
+                                    poll_interval=0)
+
+        self.assertRaises(exception.SopAPIError,
+                          tracker.track('fakeuri').wait)
+
+    def test_job_tracker_timeout(self):
+        httpclient = mock.Mock()
+        httpclient.request.return_value = _fake_job_response('PROCESSING')
+        tracker = sop.SopJobTracker(httpclient, lambda: fake_authorization,
+                                    poll_interval=0, timeout=0)
+
+        self.assertRaises(exception.SopAPIError,
+                          tracker.track('fakeuri').wait)
+        httpclient.request.assert_called_once_with(
+            'fakeuri', 'GET', body='', headers=fake_authorization)
+
+    def test_get_share_id_by_name_cached(self):
+        self.mock_object(httplib2.Http, 'request', mock.Mock(
+            return_value=({'status': '200'},
+                          json.dumps({'list': [{'id': 'fakeuuid'}]}))))
+
+        self.assertEqual('fakeuuid',
+                         self._driver._get_share_id_by_name('fakeid'))
+        self.assertEqual('fakeuuid',
+                         self._driver._get_share_id_by_name('fakeid'))
 
+        httplib2.Http.request.assert_called_once_with(
+            'https://1.2.3.4/sopapi/shares/list?name=fakeid', 'GET',
+            body='', headers=fake_authorization)
+
+    def test_delete_share(self):
+        self._driver._sop_ids = {('shares', 'fakeid'): 'fakeshareuuid',
+                                 ('file-systems', 'fakeid'): 'fakefsuuid'}
+        self.mock_object(self._driver, '_delete_share_sopapi')
+        self.mock_object(self._driver, '_delete_file_system_sopapi')
+        self.mock_object(httplib2.Http, 'request')
+
+        self._driver.delete_share(self._context, self.share)
+
+        self._driver._delete_share_sopapi.assert_called_once_with(
+            'fakeshareuuid')
+        self._driver._delete_file_system_sopapi.assert_called_once_with(
+            'fakefsuuid')
+        self.assertFalse(httplib2.Http.request.called)
+        self.assertEqual({}, self._driver._sop_ids)
+
+    def test_add_share_sopapi(self):
         httpret = ({'status': '202',
                     'content-length': '0',
                     'x-sopapi-version': '1.0.0',
@@ -372,7 +303,7 @@ class SopShareDriverTestCase(test.TestCase):
                     'server': 'Jetty(8.1.3.v20120416)',
                     'location': 'https://1.2.3.4/sopapi/jobs/fakeuuid',
                     'date': 'Wed, 21 Jan 2015 05:29:35 GMT'}, '')
-        self.mock_object(httpclient, 'request',
+        self.mock_object(httplib2.Http, 'request',
                          mock.Mock(return_value=httpret))
 
         waitforret = json.loads('{"id":"fakeuuid'
@@ -397,7 +328,7 @@ class SopShareDriverTestCase(test.TestCase):
             'name': 'fakeuuid',
             'file-system-id': 'fakeuuid',
         }
-        fsadd = self._driver._add_share_sopapi(httpclient, fakepayload)
+        fsadd = self._driver._add_share_sopapi(fakepayload)
         self.assertEqual('fakeuuid', fsadd)
         httpcalls = [mock.call('https://' +
                                self.server['backend_details']['ip'] +
@@ -405,9 +336,9 @@ class SopShareDriverTestCase(test.TestCase):
                                'POST',
                                body=json.dumps(fakepayload),
                                headers=fake_authorization)]
-        self.assertEqual(httpcalls, httpclient.request.call_args_list)
+        self.assertEqual(httpcalls, httplib2.Http.request.call_args_list)
         self._driver._wait_for_job_completion.assert_called_once_with(
-            httpclient, 'https://' +
+            'https://' +
             self.server['backend_details']['ip'] +
             '/sopapi/jobs/fakeuuid')
 
@@ -444,11 +375,10 @@ class SopShareDriverTestCase(test.TestCase):
             'file-system-id': 'fakeuuid',
         }
         self._driver._add_file_system_sopapi.assert_called_once_with(
-            mock.ANY, fakepayload)
+            fakepayload)
         self._driver._get_file_system_id_by_name.assert_called_once_with(
-            mock.ANY, 'fakeid')
-        self._driver._add_share_sopapi.assert_called_once_with(
-            mock.ANY, fakepayload1)
+            'fakeid')
+        self._driver._add_share_sopapi.assert_called_once_with(fakepayload1)
 
     def test_get_share_stats_refresh_false(self):
         self._driver._stats = {'fake_key': 'fake_value'}
@@ -517,10 +447,9 @@ class SopShareDriverTestCase(test.TestCase):
             'https://1.2.3.4/sopapi/shares/fakeuuid', 'POST',
             body=json.dumps(payload),
             headers=headers)
-        self._driver._get_share_id_by_name.assert_called_once_with(
-            mock.ANY, 'fakeid')
+        self._driver._get_share_id_by_name.assert_called_once_with('fakeid')
         self._driver._wait_for_job_completion.assert_called_once_with(
-            mock.ANY, 'https://' +
+            'https://' +
             self.server['backend_details']['ip'] +
             '/sopapi/jobs/fakeuuid')
 
@@ -567,10 +496,9 @@ class SopShareDriverTestCase(test.TestCase):
             'https://1.2.3.4/sopapi/shares/fakeuuid', 'POST',
             body=json.dumps(payload),
             headers=headers)
-        self._driver._get_share_id_by_name.assert_called_once_with(
-            mock.ANY, 'fakeid')
+        self._driver._get_share_id_by_name.assert_called_once_with('fakeid')
         self._driver._wait_for_job_completion.assert_called_once_with(
-            mock.ANY, 'https://' +
+            'https://' +
             self.server['backend_details']['ip'] +
             '/sopapi/jobs/fakeuuid')
 
@@ -607,9 +535,58 @@ class SopShareDriverTestCase(test.TestCase):
             'https://1.2.3.4/sopapi/shares/fakeuuid', 'POST',
             body=json.dumps(payload),
             headers=headers)
-        self._driver._get_share_id_by_name.assert_called_once_with(
-            mock.ANY, 'fakeid')
+        self._driver._get_share_id_by_name.assert_called_once_with('fakeid')
         self._driver._wait_for_job_completion.assert_called_once_with(
-            mock.ANY, 'https://' +
+            'https://' +
             self.server['backend_details']['ip'] +
             '/sopapi/jobs/fakeuuid')
+
+    def test_deny_access_error_drops_cached_share_id(self):
+        self._driver._sop_ids = {('shares', 'fakeid'): 'fakeuuid',
+                                 ('file-systems', 'fakeid'): 'fakefsuuid'}
+        self.mock_object(self._driver, '_wait_for_job_completion')
+        self.mock_object(httplib2.Http, 'request', mock.Mock(
+            return_value=({'status': '404'}, '')))
+        access = {
+            'access_type': 'ip',
+            'access_to': '1.2.3.4',
+            'access_level': 'rw',
+        }
+
+        self.assertRaises(exception.SopAPIError,
+                          self._driver.deny_access,
+                          self._context, self.share, access)
+        self.assertEqual({('file-systems', 'fakeid'): 'fakefsuuid'},
+                         self._driver._sop_ids)
+        self.assertFalse(self._driver._wait_for_job_completion.called)
+
+    def test_add_share_sopapi_error_drops_cached_file_system_id(self):
+        self._driver._sop_ids = {('file-systems', 'fakeid'): 'fakefsuuid'}
+        self.mock_object(httplib2.Http, 'request', mock.Mock(
+            return_value=({'status': '400'}, '')))
+
+        self.assertRaises(exception.SopAPIError,
+                          self._driver._add_share_sopapi,
+                          {'name': 'fakeid', 'file-system-id': 'fakefsuuid'})
+        self.assertEqual({}, self._driver._sop_ids)
+
+    def test_allow_access_releases_http_client_before_wait(self):
+        pool = self._driver._http_pool
+        self._driver._sop_ids = {('shares', 'fakeid'): 'fakeuuid'}
+        self.mock_object(httplib2.Http, 'request', mock.Mock(
+            return_value=({'status': '202',
+                           'location': 'https://1.2.3.4/sopapi/jobs/fake'},
+                          '')))
+        self.mock_object(self._driver, '_wait_for_job_completion', mock.Mock(
+            side_effect=lambda job_uri: self.assertEqual(pool.max_size,
+                                                         pool.free())))
+        access = {
+            'access_type': 'ip',
+            'access_to': '1.2.3.4',
+            'access_level': 'rw',
+        }
+
+        self._driver.allow_access(self._context, self.share, access)
+
+        self._driver._wait_for_job_completion.assert_called_once_with(
+            'https://1.2.3.4/sopapi/jobs/fake')
@@ -525,6 +525,150 @@ class HuaweiShareDriverTestCase(test.TestCase):
                           self.driver.deny_access, self._context,
                           self.share_cifs, self.access_user, self.share_server)
 
+    def _get_called_urls(self):
+        return [c[0][0].split('/210235G7J20000000000/')[-1]
+                for c in self.driver.helper.call.call_args_list]
+
+    def test_allow_access_uses_share_index(self):
+        self.driver.helper.login()
+        self.mock_object(self.driver.helper, 'call',
+                         mock.Mock(side_effect=self.driver.helper.call))
+
+        self.driver.allow_access(self._context, self.share_nfs,
+                                 self.access_ip, self.share_server)
+        self.driver.allow_access(self._context, self.share_nfs,
+                                 self.access_ip, self.share_server)
+
+        self.assertEqual(["NFSHARE/count",
+                          "NFSHARE?range=[0-100]",
+                          "NFSHARE?range=[100-200]",
+                          "NFS_SHARE_AUTH_CLIENT",
+                          "NFS_SHARE_AUTH_CLIENT"],
+                         self._get_called_urls())
+
+    def test_deny_access_updates_access_index(self):
+        self.driver.helper.login()
+        self.driver.deny_access(self._context, self.share_nfs,
+                                self.access_ip, self.share_server)
+        self.mock_object(self.driver.helper, 'call',
+                         mock.Mock(side_effect=self.driver.helper.call))
+
+        access_id = self.driver.helper._get_access_from_share(
+            "1", "100.112.0.1_fail", "NFS_SHARE_AUTH_CLIENT")
+
+        self.assertEqual("0", access_id)
+        self.assertEqual({"100.112.0.1_fail": "0"},
+                         self.driver.helper._access_index[
+                             ("NFS_SHARE_AUTH_CLIENT", "1")])
+        self.assertEqual([], self._get_called_urls())
+
+    def test_delete_share_updates_share_index(self):
+        self.driver.helper.login()
+        self.driver.delete_share(self._context, self.share_nfs,
+                                 self.share_server)
+
+        self.assertEqual(["/share_fake_uuid_fail/"],
+                         list(self.driver.helper._share_index["NFSHARE"]))
+
+    def _fail_calls_to(self, *urls):
+        fake_call = self.driver.helper.call
+
+        def call(url, data=None, method=None):
+            if url.split('/210235G7J20000000000/')[-1] in urls:
+                return {"error": {"code": 31755596}}
+            return fake_call(url, data, method)
+
+        self.mock_object(self.driver.helper, 'call',
+                         mock.Mock(side_effect=call))
+
+    def test_delete_share_stale_share_index(self):
+        self.driver.helper.login()
+        self.driver.helper._share_index["NFSHARE"] = {
+            "/share_fake_uuid/": {"ID": "9", "FSID": "4"}}
+        self._fail_calls_to("NFSHARE/9")
+        self.driver.helper.delete_flag = False
+
+        self.driver.delete_share(self._context, self.share_nfs,
+                                 self.share_server)
+
+        self.assertTrue(self.driver.helper.delete_flag)
+        self.assertEqual(["NFSHARE/9",
+                          "NFSHARE/count",
+                          "NFSHARE?range=[0-100]",
+                          "NFSHARE?range=[100-200]",
+                          "NFSHARE/1",
+                          "filesystem/4"],
+                         self._get_called_urls())
+
+    def test_delete_share_fail_not_retried(self):
+        self.driver.helper.login()
+        self._fail_calls_to("NFSHARE/1")
+
+        self.assertRaises(exception.InvalidShare,
+                          self.driver.delete_share, self._context,
+                          self.share_nfs, self.share_server)
+        self.assertEqual(1, self._get_called_urls().count("NFSHARE/1"))
+
+    def test_deny_access_stale_access_index(self):
+        self.driver.helper.login()
+        self.driver.helper._share_index["NFSHARE"] = {
+            "/share_fake_uuid/": {"ID": "1", "FSID": "4"}}
+        self.driver.helper._access_index[("NFS_SHARE_AUTH_CLIENT", "1")] = {
+            "100.112.0.1": "7"}
+        self._fail_calls_to("NFS_SHARE_AUTH_CLIENT/7")
+        self.driver.helper.deny_flag = False
+
+        self.driver.deny_access(self._context, self.share_nfs,
+                                self.access_ip, self.share_server)
+
+        self.assertTrue(self.driver.helper.deny_flag)
+        self.assertEqual(["NFS_SHARE_AUTH_CLIENT/7",
+                          "NFS_SHARE_AUTH_CLIENT/count?filter=PARENTID::1",
+                          "NFS_SHARE_AUTH_CLIENT?"
+                          "filter=PARENTID::1&range=[0-100]",
+                          "NFS_SHARE_AUTH_CLIENT?"
+                          "filter=PARENTID::1&range=[100-200]",
+                          "NFS_SHARE_AUTH_CLIENT/5"],
+                         self._get_called_urls())
+        self.assertNotIn("100.112.0.1", self.driver.helper._access_index[
+            ("NFS_SHARE_AUTH_CLIENT", "1")])
+
+    def test_allow_access_stale_share_index(self):
+        self.driver.helper.login()
+        self.driver.helper._share_index["NFSHARE"] = {
+            "/share_fake_uuid/": {"ID": "9", "FSID": "4"}}
+        fake_call = self.driver.helper.call
+
+        def call(url, data=None, method=None):
+            if data and '"PARENTID": "9"' in data:
+                return {"error": {"code": 31755596}}
+            return fake_call(url, data, method)
+
+        self.mock_object(self.driver.helper, 'call',
+                         mock.Mock(side_effect=call))
+
+        self.driver.allow_access(self._context, self.share_nfs,
+                                 self.access_ip, self.share_server)
+
+        self.assertEqual(
+            {"ID": "1", "FSID": "4"},
+            self.driver.helper._share_index["NFSHARE"]["/share_fake_uuid/"])
+        self.assertEqual("NFS_SHARE_AUTH_CLIENT",
+                         self._get_called_urls()[-1])
+
+    def test_read_xml_cached(self):
+        parse = self.mock_object(huawei_helper.ET, 'parse',
+                                 mock.Mock(side_effect=huawei_helper.ET.parse))
+
+        root = self.driver.helper._read_xml()
+        self.assertIs(root, self.driver.helper._read_xml())
+        self.assertEqual(1, parse.call_count)
+
+        mtime = os.path.getmtime(self.fake_conf_file)
+        os.utime(self.fake_conf_file, (mtime + 10, mtime + 10))
+        self.assertIsNot(root, self.driver.helper._read_xml())
+        self.assertEqual(2, parse.call_count)
+
     def test_create_nfs_snapshot_success(self):
         self.driver.helper.login()
         self.driver.helper.create_snapflag = False
@@ -115,6 +115,29 @@ class GPFSShareDriverTestCase(test.TestCase):
         self._driver._get_available_capacity.assert_called_once_with(
             self._driver.configuration.gpfs_mount_point_base)
 
+    def test_get_connection_pool_stats(self):
+        self.assertEqual({}, self._driver.get_connection_pool_stats())
+
+        sshpool = mock.Mock(ip='fake_ip')
+        sshpool.get_stats.return_value = {'acquired': 1}
+        self._driver.sshpools = {'fake_ip': sshpool}
+
+        self.assertEqual({'fake_ip': {'acquired': 1}},
+                         self._driver.get_connection_pool_stats())
+
+    def test__get_sshpool(self):
+        self.mock_object(utils, 'SSHPool',
+                         mock.Mock(side_effect=lambda ip, *a, **kw:
+                                   mock.Mock(ip=ip)))
+
+        pool = self._driver._get_sshpool(self.local_ip)
+        self.assertEqual(pool, self._driver._get_sshpool(self.local_ip))
+        remote_pool = self._driver._get_sshpool(self.remote_ip)
+
+        self.assertEqual(self.local_ip, pool.ip)
+        self.assertEqual(self.remote_ip, remote_pool.ip)
+        self.assertEqual(2, utils.SSHPool.call_count)
+
     def test_do_setup(self):
         self.mock_object(self._driver, '_setup_helpers')
         self._driver.do_setup(self._context)
@@ -233,6 +256,18 @@ class GPFSShareDriverTestCase(test.TestCase):
         )
         self._driver._get_share_path.assert_called_once_with(self.share)
 
+    def test_update_access(self):
+        self._driver._get_share_path = mock.Mock(
+            return_value=self.fakesharepath)
+        self._helper_fake.update_access.return_value = ['fake_failed']
+
+        result = self._driver.update_access(
+            self._context, self.share, [self.access], [], share_server=None)
+
+        self.assertEqual(['fake_failed'], result)
+        self._helper_fake.update_access.assert_called_once_with(
+            self.fakesharepath, self.share, [self.access], [])
+
     def test_deny_access(self):
         self._driver._get_share_path = mock.Mock(return_value=self.
                                                  fakesharepath)
@@ -569,8 +604,116 @@ class GPFSShareDriverTestCase(test.TestCase):
                           self._knfs_helper._publish_access, *cmd)
         self.assertTrue(socket.gethostbyname_ex.called)
         self.assertTrue(socket.gethostname.called)
-        utils.execute.assert_called_once_with(*cmd, run_as_root=True,
+        # The remote server is still updated when the local one fails.
+        utils.execute.assert_has_calls([
+            mock.call(*cmd, run_as_root=True, check_exit_code=True),
+            mock.call('ssh', self.sshlogin + '@' + self.remote_ip, *cmd,
+                      run_as_root=False, check_exit_code=True)],
+            any_order=True)
+
+    def test_knfs__publish_access_caches_local_ips(self):
+        self.mock_object(utils, 'execute')
+
+        self._knfs_helper._publish_access('fakecmd')
+        self._knfs_helper._publish_access('fakecmd')
+
+        socket.gethostbyname_ex.assert_called_once_with('testserver')
+        self.assertEqual(4, utils.execute.call_count)
+
+    def test_knfs__publish_access_ssh_execute(self):
+        self.mock_object(utils, 'execute')
+        ssh_execute = mock.Mock()
+        helper = gpfs.KNFSHelper(self._gpfs_execute, self.fake_conf,
+                                 ssh_execute=ssh_execute)
+
+        helper._publish_access('fakecmd', 'arg')
+
+        utils.execute.assert_called_once_with('fakecmd', 'arg',
+                                              run_as_root=True,
+                                              check_exit_code=True)
+        ssh_execute.assert_called_once_with(self.remote_ip,
+                                            ['fakecmd', 'arg'])
+
+    def test_knfs__publish_commands_batches_remote_commands(self):
+        self.mock_object(utils, 'execute')
+        ssh_execute = mock.Mock()
+        helper = gpfs.KNFSHelper(self._gpfs_execute, self.fake_conf,
+                                 ssh_execute=ssh_execute)
+
+        helper._publish_commands([['exportfs', '-u', 'a:/p'],
+                                  ['exportfs', '-o', 'rw,sync', 'b:/p']])
+
+        utils.execute.assert_has_calls([
+            mock.call('exportfs', '-u', 'a:/p', run_as_root=True,
+                      check_exit_code=True),
+            mock.call('exportfs', '-o', 'rw,sync', 'b:/p', run_as_root=True,
+                      check_exit_code=True)])
+        ssh_execute.assert_called_once_with(
+            self.remote_ip,
+            ['sh', '-c', 'exportfs -u a:/p && exportfs -o rw,sync b:/p'])
+
+    def test_knfs__publish_commands_remote_error(self):
+        self.mock_object(utils, 'execute')
+        ssh_execute = mock.Mock(side_effect=exception.GPFSException('fake'))
+        helper = gpfs.KNFSHelper(self._gpfs_execute, self.fake_conf,
+                                 ssh_execute=ssh_execute)
+
+        self.assertRaises(exception.GPFSException,
+                          helper._publish_commands, [['fakecmd']])
+        utils.execute.assert_called_once_with('fakecmd', run_as_root=True,
                                               check_exit_code=True)
+        self.assertTrue(ssh_execute.called)
+
+    def test_knfs_update_access(self):
+        existing = fake_share.fake_access(access_to='10.0.0.1')
+        new = fake_share.fake_access(access_to='10.0.0.2')
+        user = fake_share.fake_access(access_type='user', access_to='fake')
+        removed = fake_share.fake_access(access_to='10.0.0.3')
+        local_path = self.fakesharepath
+        self._knfs_helper._execute = mock.Mock(
+            return_value=(local_path + '\n\t\t10.0.0.1\n', ''))
+        self._knfs_helper._publish_commands = mock.Mock()
+        self._knfs_helper._get_export_options = mock.Mock(
+            return_value='rw,sync')
+
+        failed = self._knfs_helper.update_access(
+            local_path, self.share, [existing, new, user], [removed])
+
+        self.assertEqual([user], failed)
+        self._knfs_helper._execute.assert_called_once_with('exportfs',
+                                                           run_as_root=True)
+        self._knfs_helper._publish_commands.assert_called_once_with([
+            ['exportfs', '-u', '10.0.0.3:' + local_path],
+            ['exportfs', '-o', 'rw,sync', '10.0.0.2:' + local_path]])
+        self._knfs_helper._get_export_options.assert_called_once_with(
+            self.share)
+
+    def test_knfs_update_access_nothing_to_do(self):
+        existing = fake_share.fake_access(access_to='10.0.0.1')
+        self._knfs_helper._execute = mock.Mock(
+            return_value=(self.fakesharepath + ' 10.0.0.1\n', ''))
+        self._knfs_helper._publish_commands = mock.Mock()
+
+        failed = self._knfs_helper.update_access(
+            self.fakesharepath, self.share, [existing], [])
+
+        self.assertEqual([], failed)
+        self.assertFalse(self._knfs_helper._publish_commands.called)
+
+    def test_knfs_update_access_error(self):
+        new = fake_share.fake_access(access_to='10.0.0.2')
+        removed = fake_share.fake_access(access_to='10.0.0.3')
+        self._knfs_helper._execute = mock.Mock(return_value=('', ''))
+        self._knfs_helper._publish_commands = mock.Mock(
+            side_effect=exception.ProcessExecutionError)
+        self._knfs_helper._get_export_options = mock.Mock(
+            return_value='rw,sync')
+
+        failed = self._knfs_helper.update_access(
+            self.fakesharepath, self.share, [new], [removed])
+
+        self.assertEqual([removed, new], failed)
+        self.assertTrue(self._knfs_helper._publish_commands.called)
 
     def test_gnfs_allow_access(self):
         self._gnfs_helper._ganesha_process_request = mock.Mock()
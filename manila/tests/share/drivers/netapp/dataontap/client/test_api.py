@@ -19,9 +19,45 @@
 Tests for NetApp API layer
 """
 
+import errno
+import httplib
+import socket
+
+import ddt
+import mock
+import six
+
 from manila.share.drivers.netapp.dataontap.client import api
 from manila import test
 
+ITER_RESPONSE = """
+<netapp version="1.15" xmlns="http://www.netapp.com/filer/admin">
+  <results status="passed">
+    <attributes-list>
+      <net-interface-info>
+        <interface-name>lif1</interface-name>
+        <data-protocols>
+          <data-protocol>nfs</data-protocol>
+          <data-protocol>cifs</data-protocol>
+        </data-protocols>
+      </net-interface-info>
+      <net-interface-info>
+        <interface-name>lif2</interface-name>
+        <data-protocols>
+          <data-protocol>nfs</data-protocol>
+        </data-protocols>
+        <vserver/>
+      </net-interface-info>
+    </attributes-list>
+    <next-tag>fake_tag</next-tag>
+    <num-records>2</num-records>
+  </results>
+</netapp>
+"""
+RESPONSE = ('<netapp version="1.15" xmlns="http://www.netapp.com/filer/admin">'
+            '<results status="passed"><num-records>1</num-records></results>'
+            '</netapp>')
+
 
 class NetAppApiElementTransTests(test.TestCase):
     """Test case for NetApp API element translations."""
@@ -154,3 +190,267 @@ class NetAppApiElementTransTests(test.TestCase):
                           api.NaElement('root').__setitem__,
                           None,
                           'value')
+
+
+@ddt.ddt
+class NetAppApiServerTests(test.TestCase):
+    """Test case for NetApp API server connections."""
+
+    def setUp(self):
+        super(NetAppApiServerTests, self).setUp()
+        patcher = mock.patch.dict(api._connection_pools, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.connections = []
+        self.mock_object(api.httplib, 'HTTPConnection',
+                         mock.Mock(side_effect=self._new_connection))
+
+    def _new_connection(self, host, port):
+        conn = mock.Mock(sock=None)
+        conn.getresponse.return_value = self._get_response()
+        self.connections.append(conn)
+        return conn
+
+    def _get_response(self, status=200, will_close=False):
+        response = mock.Mock(spec=httplib.HTTPResponse, status=status,
+                             reason='reason', will_close=will_close)
+        response.read.return_value = RESPONSE
+        return response
+
+    def _mock_streamed_response(self, body):
+        conn = self._new_connection('127.0.0.1', 80)
+        conn.getresponse.return_value.read.side_effect = (
+            six.BytesIO(body).read)
+        self.mock_object(api.httplib, 'HTTPConnection',
+                         mock.Mock(return_value=conn))
+
+    def _get_server(self, **kwargs):
+        server = api.NaServer('127.0.0.1', username='admin',
+                              password='pass', **kwargs)
+        server.set_api_version(1, 15)
+        return server
+
+    def test_invoke_elem(self):
+        server = self._get_server()
+
+        result = server.invoke_successfully(api.NaElement('vserver-get-iter'))
+
+        self.assertEqual('1', result.get_child_content('num-records'))
+        api.httplib.HTTPConnection.assert_called_once_with('127.0.0.1', 80)
+        conn = self.connections[0]
+        url, body, headers = conn.request.call_args[0][1:]
+        self.assertEqual('/servlets/netapp.servlets.admin.XMLrequest_filer',
+                         url)
+        self.assertIn('<vserver-get-iter/>', body)
+        self.assertEqual('Basic YWRtaW46cGFzcw==', headers['Authorization'])
+        self.assertEqual(1, len(server.get_connection_pool()._free))
+
+    def test_invoke_elem_reuses_connection(self):
+        server = self._get_server()
+
+        for i in range(3):
+            server.invoke_elem(api.NaElement('system-get-version'))
+
+        self.assertEqual(1, len(self.connections))
+        self.assertEqual(3, self.connections[0].request.call_count)
+        stats = server.get_connection_pool().get_stats()
+        self.assertEqual(1, stats['created'])
+        self.assertEqual(2, stats['reused'])
+        self.assertNotIn('apis', stats)
+
+    def test_connection_pool_shared_by_servers(self):
+        servers = [self._get_server(pool_size=2) for i in range(3)]
+        servers[1].set_vserver('fake_vserver')
+
+        pools = [server.get_connection_pool() for server in servers]
+        for server in servers:
+            server.invoke_elem(api.NaElement('system-get-version'))
+
+        self.assertIs(pools[0], pools[1])
+        self.assertIs(pools[0], pools[2])
+        self.assertEqual(1, len(self.connections))
+        self.assertIsNot(pools[0], self._get_server(
+            transport_type='https').get_connection_pool())
+
+    def test_connection_pool_size(self):
+        pool = api.get_connection_pool('http', '127.0.0.1', 80, size=1)
+
+        conns = [pool.get()[0] for i in range(3)]
+        for conn in conns:
+            pool.put(conn)
+
+        self.assertEqual([conns[0]], list(pool._free))
+        self.assertFalse(conns[0].close.called)
+        conns[1].close.assert_called_once_with()
+        conns[2].close.assert_called_once_with()
+        self.assertEqual({'created': 3, 'reused': 0, 'discarded': 2,
+                          'size': 1, 'free': 1}, pool.get_stats())
+
+    def test_invoke_elem_reconnects_closed_connection(self):
+        server = self._get_server()
+        server.invoke_elem(api.NaElement('system-get-version'))
+        self.connections[0].getresponse.side_effect = (
+            httplib.BadStatusLine(''))
+
+        result = server.invoke_elem(api.NaElement('system-get-version'))
+
+        self.assertEqual('1', result.get_child_content('num-records'))
+        self.assertEqual(2, len(self.connections))
+        self.connections[0].close.assert_called_once_with()
+        self.assertEqual([self.connections[1]],
+                         list(server.get_connection_pool()._free))
+
+    @ddt.data(errno.ECONNRESET, errno.EPIPE)
+    def test_invoke_elem_reconnects_reset_connection(self, error):
+        server = self._get_server()
+        server.invoke_elem(api.NaElement('system-get-version'))
+        self.connections[0].request.side_effect = socket.error(error, 'fake')
+
+        result = server.invoke_elem(api.NaElement('system-get-version'))
+
+        self.assertEqual('1', result.get_child_content('num-records'))
+        self.assertEqual(2, len(self.connections))
+
+    @ddt.data(socket.timeout('timed out'),
+              socket.error(errno.ECONNRESET, 'fake'),
+              httplib.IncompleteRead(''))
+    def test_invoke_elem_no_retry_after_sending(self, error):
+        server = self._get_server()
+        server.invoke_elem(api.NaElement('system-get-version'))
+        self.connections[0].getresponse.side_effect = error
+
+        self.assertRaises(api.NaApiError, server.invoke_elem,
+                          api.NaElement('system-get-version'))
+
+        self.assertEqual(1, len(self.connections))
+        self.assertEqual(2, self.connections[0].request.call_count)
+        self.connections[0].close.assert_called_once_with()
+
+    def test_invoke_elem_no_retry_on_send_timeout(self):
+        server = self._get_server()
+        server.invoke_elem(api.NaElement('system-get-version'))
+        self.connections[0].request.side_effect = socket.timeout('timed out')
+
+        self.assertRaises(api.NaApiError, server.invoke_elem,
+                          api.NaElement('system-get-version'))
+
+        self.assertEqual(1, len(self.connections))
+
+    def test_invoke_elem_connection_error(self):
+        server = self._get_server()
+        self.mock_object(api.httplib, 'HTTPConnection',
+                         mock.Mock(return_value=mock.Mock(sock=None)))
+        conn = api.httplib.HTTPConnection.return_value
+        conn.request.side_effect = socket.error('refused')
+
+        self.assertRaises(api.NaApiError, server.invoke_elem,
+                          api.NaElement('system-get-version'))
+        conn.close.assert_called_once_with()
+        self.assertEqual(0, len(server.get_connection_pool()._free))
+
+    def test_invoke_elem_http_error(self):
+        server = self._get_server()
+        server.invoke_elem(api.NaElement('system-get-version'))
+        self.connections[0].getresponse.return_value = self._get_response(
+            status=401, will_close=True)
+
+        error = self.assertRaises(api.NaApiError, server.invoke_elem,
+                                  api.NaElement('system-get-version'))
+
+        self.assertEqual(401, error.code)
+        self.connections[0].close.assert_called_once_with()
+
+    def test_invoke_elem_timeout(self):
+        server = self._get_server()
+        server.set_timeout(30)
+        server.invoke_elem(api.NaElement('system-get-version'))
+        self.connections[0].sock = mock.Mock()
+
+        server.invoke_elem(api.NaElement('system-get-version'))
+
+        self.assertEqual(30, self.connections[0].timeout)
+        self.connections[0].sock.settimeout.assert_called_once_with(30)
+
+    def test_api_latency_counters(self):
+        server = self._get_server(trace=True)
+        self.mock_object(api.time, 'time',
+                         mock.Mock(side_effect=[0, 0.5, 1, 2, 2, 2.5]))
+        server.invoke_elem(api.NaElement('volume-get-iter'))
+        server.invoke_elem(api.NaElement('volume-get-iter'))
+        self.connections[0].getresponse.return_value = self._get_response(
+            status=500)
+
+        self.assertRaises(api.NaApiError, server.invoke_elem,
+                          api.NaElement('vserver-get-iter'))
+
+        stats = server.get_connection_pool().get_stats()
+        self.assertEqual({
+            'volume-get-iter': {'calls': 2, 'errors': 0, 'time_total': 1.5,
+                                'time_max': 1.0, 'time_avg': 0.75},
+            'vserver-get-iter': {'calls': 1, 'errors': 1, 'time_total': 0.5,
+                                 'time_max': 0.5, 'time_avg': 0.5},
+        }, stats['apis'])
+
+    def test_invoke_iter(self):
+        server = self._get_server()
+        self._mock_streamed_response(ITER_RESPONSE)
+
+        records, next_tag = server.invoke_iter(
+            api.NaElement('net-interface-get-iter'))
+
+        self.assertEqual([
+            {'interface-name': 'lif1',
+             'data-protocols': {'data-protocol': ['nfs', 'cifs']}},
+            {'interface-name': 'lif2',
+             'data-protocols': {'data-protocol': 'nfs'},
+             'vserver': None},
+        ], records)
+        self.assertEqual('fake_tag', next_tag)
+        self.assertEqual([self.connections[0]],
+                         list(server.get_connection_pool()._free))
+
+    def test_invoke_iter_last_page(self):
+        server = self._get_server()
+        self._mock_streamed_response(RESPONSE)
+
+        records, next_tag = server.invoke_iter(
+            api.NaElement('volume-get-iter'))
+
+        self.assertEqual([], records)
+        self.assertIsNone(next_tag)
+
+    def test_invoke_iter_failed(self):
+        server = self._get_server()
+        self._mock_streamed_response(
+            '<netapp><results status="failed" errno="13005" '
+            'reason="fake_reason"/></netapp>')
+
+        error = self.assertRaises(api.NaApiError, server.invoke_iter,
+                                  api.NaElement('volume-get-iter'))
+
+        self.assertEqual('13005', error.code)
+        self.assertEqual('fake_reason', error.message)
+
+    def test_parse_iter_response_releases_records(self):
+        server = self._get_server()
+        parents = set()
+        original = api._element_to_dict
+
+        def element_to_dict(element):
+            if element.tag == 'vol':
+                parents.add(element.getparent())
+            return original(element)
+
+        self.mock_object(api, '_element_to_dict',
+                         mock.Mock(side_effect=element_to_dict))
+        records = ''.join('<vol><name>vol%d</name></vol>' % i
+                          for i in range(100))
+
+        records, next_tag = server._parse_iter_response(six.BytesIO(
+            '<netapp><results status="passed"><attributes-list>%s'
+            '</attributes-list></results></netapp>' % records))
+
+        self.assertEqual(100, len(records))
+        self.assertEqual({'name': 'vol99'}, records[-1])
+        self.assertEqual(1, len(parents))
+        self.assertEqual(1, len(parents.pop()))
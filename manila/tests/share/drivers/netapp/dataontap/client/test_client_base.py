@@ -98,6 +98,43 @@ class NetAppBaseClientTestCase(test.TestCase):
             self.connection.invoke_successfully.call_args[0][0].to_string())
         self.assertTrue(self.connection.invoke_successfully.call_args[0][1])
 
+    def test_get_iter(self):
+
+        self.connection.invoke_iter.side_effect = [
+            ([{'name': 'r1'}, {'name': 'r2'}], 'tag1'),
+            ([{'name': 'r3'}], None),
+        ]
+
+        result = self.client.get_iter('fake-get-iter', {'query': 'q'},
+                                      max_page_length=2)
+
+        self.assertFalse(self.connection.invoke_iter.called)
+        self.assertEqual([{'name': 'r1'}, {'name': 'r2'}, {'name': 'r3'}],
+                         list(result))
+        requests = [call[0][0] for call in
+                    self.connection.invoke_iter.call_args_list]
+        self.assertEqual(['fake-get-iter', 'fake-get-iter'],
+                         [request.get_name() for request in requests])
+        self.assertEqual(['2', '2'], [request.get_child_content('max-records')
+                                      for request in requests])
+        self.assertEqual(['q', 'q'], [request.get_child_content('query')
+                                      for request in requests])
+        self.assertEqual([None, 'tag1'], [request.get_child_content('tag')
+                                          for request in requests])
+        self.assertTrue(self.connection.invoke_iter.call_args[0][1])
+
+    def test_get_iter_no_records(self):
+
+        self.connection.invoke_iter.return_value = ([], None)
+
+        result = self.client.get_iter('fake-get-iter', enable_tunneling=False)
+
+        self.assertEqual([], list(result))
+        request, enable_tunneling = self.connection.invoke_iter.call_args[0]
+        self.assertEqual(str(client_base.DEFAULT_MAX_PAGE_LENGTH),
+                         request.get_child_content('max-records'))
+        self.assertFalse(enable_tunneling)
+
     def test_get_licenses(self):
 
         api_response = netapp_api.NaElement(fake.LICENSE_V2_LIST_INFO_RESPONSE)
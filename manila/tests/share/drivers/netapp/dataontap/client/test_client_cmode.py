@@ -19,8 +19,10 @@ import hashlib
 import time
 
 import ddt
+from lxml import etree
 import mock
 from oslo_log import log
+import six
 
 from manila import exception
 from manila.share.drivers.netapp.dataontap.client import api as netapp_api
@@ -30,6 +32,13 @@ from manila import test
 from manila.tests.share.drivers.netapp.dataontap.client import fakes as fake
 
 
+def get_records(api_response):
+    """Returns the records of a fake get-iter response as dicts."""
+    records, next_tag = netapp_api.NaServer('localhost')._parse_iter_response(
+        six.BytesIO(etree.tostring(api_response)))
+    return records
+
+
 @ddt.ddt
 class NetAppClientCmodeTestCase(test.TestCase):
 
@@ -520,10 +529,10 @@ class NetAppClientCmodeTestCase(test.TestCase):
 
     def test_list_aggregates(self):
 
-        api_response = netapp_api.NaElement(fake.AGGR_GET_NAMES_RESPONSE)
+        api_response = get_records(fake.AGGR_GET_NAMES_RESPONSE)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         result = self.client.list_aggregates()
 
@@ -531,10 +540,10 @@ class NetAppClientCmodeTestCase(test.TestCase):
 
     def test_list_aggregates_not_found(self):
 
-        api_response = netapp_api.NaElement(fake.NO_RECORDS_RESPONSE)
+        api_response = get_records(fake.NO_RECORDS_RESPONSE)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         self.assertRaises(exception.NetAppException,
                           self.client.list_aggregates)
@@ -727,11 +736,10 @@ class NetAppClientCmodeTestCase(test.TestCase):
 
     def test_list_network_interfaces(self):
 
-        api_response = netapp_api.NaElement(
-            fake.NET_INTERFACE_GET_ITER_RESPONSE)
+        api_response = get_records(fake.NET_INTERFACE_GET_ITER_RESPONSE)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         net_interface_get_args = {
             'desired-attributes': {
@@ -743,16 +751,16 @@ class NetAppClientCmodeTestCase(test.TestCase):
 
         result = self.client.list_network_interfaces()
 
-        self.client.send_request.assert_has_calls([
+        self.client.get_iter.assert_has_calls([
             mock.call('net-interface-get-iter', net_interface_get_args)])
         self.assertSequenceEqual(fake.LIF_NAMES, result)
 
     def test_list_network_interfaces_not_found(self):
 
-        api_response = netapp_api.NaElement(fake.NO_RECORDS_RESPONSE)
+        api_response = get_records(fake.NO_RECORDS_RESPONSE)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         result = self.client.list_network_interfaces()
 
@@ -760,25 +768,23 @@ class NetAppClientCmodeTestCase(test.TestCase):
 
     def test_get_network_interfaces(self):
 
-        api_response = netapp_api.NaElement(
-            fake.NET_INTERFACE_GET_ITER_RESPONSE)
+        api_response = get_records(fake.NET_INTERFACE_GET_ITER_RESPONSE)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         result = self.client.get_network_interfaces()
 
-        self.client.send_request.assert_has_calls([
+        self.client.get_iter.assert_has_calls([
             mock.call('net-interface-get-iter', None)])
         self.assertSequenceEqual(fake.LIFS, result)
 
     def test_get_network_interfaces_filtered_by_protocol(self):
 
-        api_response = netapp_api.NaElement(
-            fake.NET_INTERFACE_GET_ITER_RESPONSE_NFS)
+        api_response = get_records(fake.NET_INTERFACE_GET_ITER_RESPONSE_NFS)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         result = self.client.get_network_interfaces(protocols=['NFS'])
 
@@ -792,20 +798,20 @@ class NetAppClientCmodeTestCase(test.TestCase):
             }
         }
 
-        self.client.send_request.assert_has_calls([
+        self.client.get_iter.assert_has_calls([
             mock.call('net-interface-get-iter', net_interface_get_args)])
         self.assertListEqual(fake.NFS_LIFS, result)
 
     def test_get_network_interfaces_not_found(self):
 
-        api_response = netapp_api.NaElement(fake.NO_RECORDS_RESPONSE)
+        api_response = get_records(fake.NO_RECORDS_RESPONSE)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         result = self.client.get_network_interfaces()
 
-        self.client.send_request.assert_has_calls([
+        self.client.get_iter.assert_has_calls([
             mock.call('net-interface-get-iter', None)])
         self.assertListEqual([], result)
 
@@ -825,9 +831,7 @@ class NetAppClientCmodeTestCase(test.TestCase):
 
     def test_get_cluster_aggregate_capacities(self):
 
-        api_response = netapp_api.NaElement(
-            fake.AGGR_GET_SPACE_RESPONSE).get_child_by_name(
-            'attributes-list').get_children()
+        api_response = get_records(fake.AGGR_GET_SPACE_RESPONSE)
         self.mock_object(self.client,
                          '_get_aggregates',
                          mock.Mock(return_value=api_response))
@@ -867,7 +871,7 @@ class NetAppClientCmodeTestCase(test.TestCase):
 
     def test_get_cluster_aggregate_capacities_not_found(self):
 
-        api_response = netapp_api.NaElement('none').get_children()
+        api_response = []
         self.mock_object(self.client,
                          '_get_aggregates',
                          mock.Mock(return_value=api_response))
@@ -955,26 +959,23 @@ class NetAppClientCmodeTestCase(test.TestCase):
 
     def test_get_aggregates(self):
 
-        api_response = netapp_api.NaElement(fake.AGGR_GET_ITER_RESPONSE)
+        api_response = get_records(fake.AGGR_GET_ITER_RESPONSE)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         result = self.client._get_aggregates()
 
-        self.client.send_request.assert_has_calls([
+        self.client.get_iter.assert_has_calls([
             mock.call('aggr-get-iter', {})])
-        self.assertListEqual(
-            [aggr.to_string() for aggr in api_response.get_child_by_name(
-                'attributes-list').get_children()],
-            [aggr.to_string() for aggr in result])
+        self.assertListEqual(api_response, result)
 
     def test_get_aggregates_with_filters(self):
 
-        api_response = netapp_api.NaElement(fake.AGGR_GET_SPACE_RESPONSE)
+        api_response = get_records(fake.AGGR_GET_SPACE_RESPONSE)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         desired_attributes = {
             'aggr-attributes': {
@@ -999,23 +1000,20 @@ class NetAppClientCmodeTestCase(test.TestCase):
             'desired-attributes': desired_attributes
         }
 
-        self.client.send_request.assert_has_calls([
+        self.client.get_iter.assert_has_calls([
             mock.call('aggr-get-iter', aggr_get_iter_args)])
-        self.assertListEqual(
-            [aggr.to_string() for aggr in api_response.get_child_by_name(
-                'attributes-list').get_children()],
-            [aggr.to_string() for aggr in result])
+        self.assertListEqual(api_response, result)
 
     def test_get_aggregates_not_found(self):
 
-        api_response = netapp_api.NaElement(fake.NO_RECORDS_RESPONSE)
+        api_response = get_records(fake.NO_RECORDS_RESPONSE)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         result = self.client._get_aggregates()
 
-        self.client.send_request.assert_has_calls([
+        self.client.get_iter.assert_has_calls([
             mock.call('aggr-get-iter', {})])
         self.assertListEqual([], result)
 
@@ -2317,11 +2315,11 @@ class NetAppClientCmodeTestCase(test.TestCase):
 
     def test_get_deleted_nfs_export_policies(self):
 
-        api_response = netapp_api.NaElement(
+        api_response = get_records(
             fake.DELETED_EXPORT_POLICY_GET_ITER_RESPONSE)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         result = self.client._get_deleted_nfs_export_policies()
 
@@ -2339,7 +2337,7 @@ class NetAppClientCmodeTestCase(test.TestCase):
             },
         }
         self.assertSequenceEqual(fake.DELETED_EXPORT_POLICIES, result)
-        self.client.send_request.assert_has_calls([
+        self.client.get_iter.assert_has_calls([
             mock.call('export-policy-get-iter', export_policy_get_iter_args)])
 
     def test_get_ems_log_destination_vserver(self):
@@ -2458,10 +2456,10 @@ class NetAppClientCmodeTestCase(test.TestCase):
 
     def test_get_aggregate_raid_types(self):
 
-        api_response = netapp_api.NaElement(fake.AGGR_GET_RAID_TYPE_RESPONSE)
+        api_response = get_records(fake.AGGR_GET_RAID_TYPE_RESPONSE)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         result = self.client.get_aggregate_raid_types(
             fake.SHARE_AGGREGATE_NAMES)
@@ -2489,16 +2487,16 @@ class NetAppClientCmodeTestCase(test.TestCase):
             fake.SHARE_AGGREGATE_RAID_TYPES[1]
         }
 
-        self.client.send_request.assert_has_calls([
+        self.client.get_iter.assert_has_calls([
             mock.call('aggr-get-iter', aggr_get_iter_args)])
         self.assertDictEqual(expected, result)
 
     def test_get_aggregate_raid_types_not_found(self):
 
-        api_response = netapp_api.NaElement(fake.NO_RECORDS_RESPONSE)
+        api_response = get_records(fake.NO_RECORDS_RESPONSE)
         self.mock_object(self.client,
-                         'send_request',
-                         mock.Mock(return_value=api_response))
+                         'get_iter',
+                         mock.Mock(return_value=iter(api_response)))
 
         result = self.client.get_aggregate_raid_types(
             fake.SHARE_AGGREGATE_NAMES)
@@ -1118,6 +1118,22 @@ class NetAppFileStorageLibraryTestCase(test.TestCase):
                           self.library.teardown_server,
                           fake.SHARE_SERVER['backend_details'])
 
+    def test_get_connection_pool_stats(self):
+        pool = mock.Mock(host='127.0.0.1', port=443)
+        pool.get_stats.return_value = {'created': 1}
+        self.library._client = mock.Mock()
+        self.library._client.connection.get_connection_pool.return_value = (
+            pool)
+
+        result = self.library.get_connection_pool_stats()
+
+        self.assertEqual({'127.0.0.1:443': {'created': 1}}, result)
+
+    def test_get_connection_pool_stats_not_set_up(self):
+        self.library._client = None
+
+        self.assertEqual({}, self.library.get_connection_pool_stats())
+
     def test_get_network_allocations_number(self):
         self.assertRaises(NotImplementedError,
                           self.library.get_network_allocations_number)
@@ -57,7 +57,8 @@ CLIENT_KWARGS = {
     'vserver': None,
     'transport_type': 'https',
     'password': 'pass',
-    'port': '443'
+    'port': '443',
+    'pool_size': 4,
 }
 
 SHARE = {
@@ -289,6 +290,7 @@ def get_config_cmode():
     config.netapp_server_hostname = CLIENT_KWARGS['hostname']
     config.netapp_transport_type = CLIENT_KWARGS['transport_type']
     config.netapp_server_port = CLIENT_KWARGS['port']
+    config.netapp_connection_pool_size = CLIENT_KWARGS['pool_size']
     config.netapp_volume_name_template = VOLUME_NAME_TEMPLATE
     config.netapp_aggregate_name_search_pattern = AGGREGATE_NAME_SEARCH_PATTERN
     config.netapp_vserver_name_template = VSERVER_NAME_TEMPLATE
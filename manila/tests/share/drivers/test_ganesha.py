@@ -176,6 +176,24 @@ class GaneshaNASHelperTestCase(test.TestCase):
         self.assertEqual(mock_template, self._helper.export_template)
         self.assertEqual(None, ret)
 
+    def test_init_helper_native_mode(self):
+        self.fake_conf.ganesha_native_mode = True
+        self.mock_object(ganesha.ganesha_manager, 'NativeGaneshaManager')
+        self.mock_object(self._helper, '_load_conf_dir',
+                         mock.Mock(return_value={'fake': 'template'}))
+
+        self._helper.init_helper()
+
+        ganesha.ganesha_manager.NativeGaneshaManager.assert_called_once_with(
+            self._execute, 'faketag',
+            ganesha_config_path='/fakedir0/fakeconfig',
+            ganesha_export_dir='/fakedir0/export.d',
+            ganesha_db_path='/fakedir1/fake.db',
+            ganesha_service_name='ganesha.fakeservice')
+        self.assertEqual(
+            ganesha.ganesha_manager.NativeGaneshaManager.return_value,
+            self._helper.ganesha)
+
     def test_init_helper_conf_dir_empty(self):
         mock_template = mock.Mock()
         mock_ganesha_manager = mock.Mock()
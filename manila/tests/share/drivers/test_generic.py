@@ -913,6 +913,25 @@ class GenericShareDriverTestCase(test.TestCase):
             self.share['share_proto']].deny_access.assert_called_once_with(
                 self.server['backend_details'], self.share['name'], access)
 
+    def test_update_access(self):
+        add_rules = [
+            {'access_type': 'ip', 'access_to': 'fake_dest%d' % i,
+             'access_level': level}
+            for i, level in enumerate((const.ACCESS_LEVEL_RW, 'fakefoobar',
+                                       const.ACCESS_LEVEL_RO))]
+        delete_rules = ['fake_access']
+        helper = self._driver._helpers[self.share['share_proto']]
+        helper.update_access.return_value = ['fake_failed']
+
+        failed = self._driver.update_access(
+            self._context, self.share, add_rules, delete_rules,
+            share_server=self.server)
+
+        self.assertEqual([add_rules[1], 'fake_failed'], failed)
+        helper.update_access.assert_called_once_with(
+            self.server['backend_details'], self.share['name'],
+            [add_rules[0], add_rules[2]], delete_rules)
+
     @ddt.data(fake_share.fake_share(),
               fake_share.fake_share(share_proto='NFSBOGUS'),
               fake_share.fake_share(share_proto='CIFSBOGUS'))
@@ -961,10 +980,9 @@ class GenericShareDriverTestCase(test.TestCase):
         ssh_output = 'fake_ssh_output'
         cmd = ['fake', 'command']
         ssh = mock.Mock()
-        ssh.get_transport = mock.Mock()
-        ssh.get_transport().is_active = mock.Mock(return_value=True)
         ssh_pool = mock.Mock()
-        ssh_pool.create = mock.Mock(return_value=ssh)
+        ssh_pool.item = mock.MagicMock()
+        ssh_pool.item.return_value.__enter__.return_value = ssh
         self.mock_object(utils, 'SSHPool', mock.Mock(return_value=ssh_pool))
         self.mock_object(processutils, 'ssh_execute',
                          mock.Mock(return_value=ssh_output))
@@ -974,13 +992,17 @@ class GenericShareDriverTestCase(test.TestCase):
 
         utils.SSHPool.assert_called_once_with(
             self.server['ip'], 22, None, self.server['username'],
-            self.server['password'], self.server['pk_path'], max_size=1)
-        ssh_pool.create.assert_called_once_with()
+            self.server['password'], self.server['pk_path'],
+            idle_timeout=self._driver.configuration.ssh_idle_timeout,
+            max_lifetime=self._driver.configuration.ssh_max_lifetime,
+            keepalive_interval=(
+                self._driver.configuration.ssh_keepalive_interval),
+            max_size=1)
+        ssh_pool.item.assert_called_once_with()
         processutils.ssh_execute.assert_called_once_with(ssh, 'fake command')
-        ssh.get_transport().is_active.assert_called_once_with()
         self.assertEqual(
             self._driver.ssh_connections,
-            {self.server['instance_id']: (ssh_pool, ssh)}
+            {self.server['instance_id']: ssh_pool}
         )
         self.assertEqual(ssh_output, result)
 
@@ -988,51 +1010,58 @@ class GenericShareDriverTestCase(test.TestCase):
         ssh_output = 'fake_ssh_output'
         cmd = ['fake', 'command']
         ssh = mock.Mock()
-        ssh.get_transport = mock.Mock()
-        ssh.get_transport().is_active = mock.Mock(side_effect=lambda: True)
         ssh_pool = mock.Mock()
+        ssh_pool.item = mock.MagicMock()
+        ssh_pool.item.return_value.__enter__.return_value = ssh
+        self.mock_object(utils, 'SSHPool')
         self.mock_object(processutils, 'ssh_execute',
                          mock.Mock(return_value=ssh_output))
         self._driver.ssh_connections = {
-            self.server['instance_id']: (ssh_pool, ssh)
+            self.server['instance_id']: ssh_pool
         }
 
         result = self._driver._ssh_exec(self.server, cmd)
 
+        self.assertFalse(utils.SSHPool.called)
+        ssh_pool.item.assert_called_once_with()
         processutils.ssh_execute.assert_called_once_with(ssh, 'fake command')
-        ssh.get_transport().is_active.assert_called_once_with()
         self.assertEqual(
             self._driver.ssh_connections,
-            {self.server['instance_id']: (ssh_pool, ssh)}
+            {self.server['instance_id']: ssh_pool}
         )
         self.assertEqual(ssh_output, result)
 
-    def test_ssh_exec_connection_recreation(self):
-        ssh_output = 'fake_ssh_output'
+    def test_ssh_exec_goes_through_pool_get_and_put(self):
         cmd = ['fake', 'command']
         ssh = mock.Mock()
-        ssh.get_transport = mock.Mock()
-        ssh.get_transport().is_active = mock.Mock(side_effect=lambda: False)
-        ssh_pool = mock.Mock()
-        ssh_pool.create = mock.Mock(side_effect=lambda: ssh)
-        ssh_pool.remove = mock.Mock()
+        self.mock_object(utils.SSHPool, 'create',
+                         mock.Mock(return_value=ssh))
+        self.mock_object(utils.SSHPool, '_ensure_usable',
+                         mock.Mock(side_effect=lambda conn: conn))
         self.mock_object(processutils, 'ssh_execute',
-                         mock.Mock(return_value=ssh_output))
+                         mock.Mock(return_value=('', '')))
+        self._driver.ssh_connections = {}
+
+        self._driver._ssh_exec(self.server, cmd)
+        self._driver._ssh_exec(self.server, cmd)
+
+        ssh_pool = self._driver.ssh_connections[self.server['instance_id']]
+        utils.SSHPool.create.assert_called_once_with()
+        utils.SSHPool._ensure_usable.assert_called_once_with(ssh)
+        self.assertEqual(2, ssh_pool.get_stats()['acquired'])
+        self.assertEqual(1, ssh_pool.free())
+
+    def test_get_connection_pool_stats(self):
+        ssh_pool = mock.Mock()
+        ssh_pool.get_stats.return_value = {'acquired': 1}
         self._driver.ssh_connections = {
-            self.server['instance_id']: (ssh_pool, ssh)
+            self.server['instance_id']: ssh_pool
         }
 
-        result = self._driver._ssh_exec(self.server, cmd)
+        result = self._driver.get_connection_pool_stats()
 
-        processutils.ssh_execute.assert_called_once_with(ssh, 'fake command')
-        ssh.get_transport().is_active.assert_called_once_with()
-        ssh_pool.create.assert_called_once_with()
-        ssh_pool.remove.assert_called_once_with(ssh)
-        self.assertEqual(
-            self._driver.ssh_connections,
-            {self.server['instance_id']: (ssh_pool, ssh)}
-        )
-        self.assertEqual(ssh_output, result)
+        self.assertEqual({self.server['instance_id']: {'acquired': 1}},
+                         result)
 
     def test_get_share_stats_refresh_false(self):
         self._driver._stats = {'fake_key': 'fake_value'}
@@ -1358,20 +1387,34 @@ class NFSHelperTestCase(test.TestCase):
                                                    self.share_name)])
         self.assertEqual(ret, expected_location)
 
+    def _get_sync_command(self):
+        return ['&&', 'sudo', 'cp ', const.NFS_EXPORTS_FILE_TEMP,
+                const.NFS_EXPORTS_FILE, '&&', 'sudo', 'exportfs', '-a']
+
     @ddt.data(const.ACCESS_LEVEL_RW, const.ACCESS_LEVEL_RO)
     def test_allow_access(self, data):
-        self.mock_object(self._helper, '_sync_nfs_temp_and_perm_files')
         self._helper.allow_access(
             self.server, self.share_name, 'ip', data, '10.0.0.2')
         local_path = os.path.join(CONF.share_mount_path, self.share_name)
         self._ssh_exec.assert_has_calls([
             mock.call(self.server, ['sudo', 'exportfs']),
-            mock.call(self.server, ['sudo', 'exportfs', '-o',
+            mock.call(self.server, [':', '&&', 'sudo', 'exportfs', '-o',
                                     '%s,no_subtree_check' % data,
-                                    ':'.join(['10.0.0.2', local_path])])
+                                    ':'.join(['10.0.0.2', local_path])] +
+                      self._get_sync_command())
         ])
-        self._helper._sync_nfs_temp_and_perm_files.assert_called_once_with(
-            self.server)
+
+    def test_allow_access_exists(self):
+        local_path = os.path.join(CONF.share_mount_path, self.share_name)
+        self._ssh_exec.return_value = ('%s\n\t\t10.0.0.2' % local_path, '')
+
+        self.assertRaises(
+            exception.ShareAccessExists,
+            self._helper.allow_access,
+            self.server, self.share_name, 'ip', const.ACCESS_LEVEL_RW,
+            '10.0.0.2')
+        self._ssh_exec.assert_called_once_with(self.server,
+                                               ['sudo', 'exportfs'])
 
     def test_allow_access_no_ip(self):
         self.assertRaises(
@@ -1382,20 +1425,114 @@ class NFSHelperTestCase(test.TestCase):
 
     @ddt.data(const.ACCESS_LEVEL_RW, const.ACCESS_LEVEL_RO)
     def test_deny_access(self, data):
-        self.mock_object(self._helper, '_sync_nfs_temp_and_perm_files')
         local_path = os.path.join(CONF.share_mount_path, self.share_name)
         access = dict(
             access_to='10.0.0.2', access_type='ip', access_level=data)
         self._helper.deny_access(self.server, self.share_name, access)
         export_string = ':'.join(['10.0.0.2', local_path])
-        expected_exec = ['sudo', 'exportfs', '-u', export_string]
-        self._ssh_exec.assert_called_once_with(self.server, expected_exec)
-        self._helper._sync_nfs_temp_and_perm_files.assert_called_once_with(
-            self.server)
+        expected_exec = [':', '&&', 'sudo', 'exportfs', '-u', export_string]
+        self._ssh_exec.assert_called_once_with(
+            self.server, expected_exec + self._get_sync_command())
+
+    def test_update_access(self):
+        local_path = os.path.join(CONF.share_mount_path, self.share_name)
+        self._ssh_exec.return_value = (
+            '%s\n\t\t10.0.0.1\n%s\n\t\t10.0.0.3' % (local_path,
+                                                    local_path), '')
+        add_rules = [
+            dict(access_to=ip, access_type=access_type,
+                 access_level=const.ACCESS_LEVEL_RW)
+            for ip, access_type in (('10.0.0.1', 'ip'), ('10.0.0.2', 'ip'),
+                                    ('fake_user', 'user'), ('10.0.0.3', 'ip'),
+                                    ('10.0.0.2', 'ip'))]
+        delete_rules = [
+            dict(access_to=ip, access_type='ip',
+                 access_level=const.ACCESS_LEVEL_RO)
+            for ip in ('10.0.0.3', '10.0.0.4')]
+
+        failed = self._helper.update_access(self.server, self.share_name,
+                                            add_rules, delete_rules)
+
+        self.assertEqual([add_rules[2]], failed)
+        self._ssh_exec.assert_has_calls([
+            mock.call(self.server, ['sudo', 'exportfs']),
+            mock.call(self.server, [
+                ':',
+                '&&', 'sudo', 'exportfs', '-u',
+                ':'.join(['10.0.0.3', local_path]),
+                '&&', 'sudo', 'exportfs', '-o', 'rw,no_subtree_check',
+                ':'.join(['10.0.0.2', local_path]),
+                '&&', 'sudo', 'exportfs', '-o', 'rw,no_subtree_check',
+                ':'.join(['10.0.0.3', local_path])] +
+                self._get_sync_command())])
+        self.assertEqual({}, self._helper._exports)
+
+    def test_update_access_nothing_to_do(self):
+        local_path = os.path.join(CONF.share_mount_path, self.share_name)
+        self._ssh_exec.return_value = ('%s\n\t\t10.0.0.1' % local_path, '')
+        add_rules = [dict(access_to='10.0.0.1', access_type='ip',
+                          access_level=const.ACCESS_LEVEL_RW)]
+
+        failed = self._helper.update_access(self.server, self.share_name,
+                                            add_rules, [])
+
+        self.assertEqual([], failed)
+        self._ssh_exec.assert_called_once_with(self.server,
+                                               ['sudo', 'exportfs'])
+
+    def test_update_access_with_cache(self):
+        self.fake_conf.nfs_exports_cache = True
+        local_path = os.path.join(CONF.share_mount_path, self.share_name)
+        self._ssh_exec.return_value = ('%s 10.0.0.1' % local_path, '')
+        rules = [dict(access_to='10.0.0.%d' % i, access_type='ip',
+                      access_level=const.ACCESS_LEVEL_RW)
+                 for i in range(1, 4)]
+
+        self._helper.update_access(self.server, self.share_name, rules[1:],
+                                   [rules[0]])
+        self._helper.update_access(self.server, self.share_name, rules[1:],
+                                   [])
+        self._helper.deny_access(self.server, self.share_name, rules[1])
+
+        self.assertEqual(1, self._ssh_exec.call_args_list.count(
+            mock.call(self.server, ['sudo', 'exportfs'])))
+        self.assertEqual(3, self._ssh_exec.call_count)
+        self.assertEqual(
+            {local_path: set(['10.0.0.3'])},
+            self._helper._exports[self.server['instance_id']])
 
-    def test_sync_nfs_temp_and_perm_files(self):
-        self._helper._sync_nfs_temp_and_perm_files(self.server)
-        self._helper._ssh_exec.assert_called_once_with(self.server, mock.ANY)
+    def test_update_access_with_cache_error(self):
+        self.fake_conf.nfs_exports_cache = True
+        self._ssh_exec.side_effect = [('', ''),
+                                      exception.ProcessExecutionError]
+        rule = dict(access_to='10.0.0.1', access_type='ip',
+                    access_level=const.ACCESS_LEVEL_RW)
+
+        self.assertRaises(exception.ProcessExecutionError,
+                          self._helper.update_access,
+                          self.server, self.share_name, [rule], [])
+        self.assertEqual({}, self._helper._exports)
+
+    def test_init_helper_drops_cache(self):
+        self._helper._exports[self.server['instance_id']] = {}
+
+        self._helper.init_helper(self.server)
+
+        self.assertEqual({}, self._helper._exports)
+
+    def test_parse_exports(self):
+        out = ('/shares/share-1   10.0.0.1\n'
+               '/shares/share-with-a-very-long-name\n\t\t10.0.0.0/24\n'
+               '/shares/share-1   10.0.0.2\n'
+               '/shares/share-2   <world>\n')
+
+        result = self._helper._parse_exports(out)
+
+        self.assertEqual(
+            {'/shares/share-1': set(['10.0.0.1', '10.0.0.2']),
+             '/shares/share-with-a-very-long-name': set(['10.0.0.0/24']),
+             '/shares/share-2': set(['<world>'])},
+            result)
 
     @ddt.data('/foo/bar', '5.6.7.8:/bar/quuz', '5.6.7.88:/foo/quuz')
     def test_get_exports_for_share(self, export_location):
@@ -1593,6 +1730,41 @@ class CIFSHelperTestCase(test.TestCase):
         self._helper._set_allow_hosts.assert_called_once_with(
             self.server_details, hosts, self.share_name)
 
+    def test_update_access(self):
+        hosts = ['1.1.1.1', '2.2.2.2']
+        self.mock_object(self._helper, '_get_allow_hosts',
+                         mock.Mock(return_value=hosts))
+        self.mock_object(self._helper, '_set_allow_hosts')
+        add_rules = [
+            dict(self.access, access_to='3.3.3.3'),
+            dict(self.access, access_to='4.4.4.4',
+                 access_level=const.ACCESS_LEVEL_RO),
+            dict(self.access, access_to='2.2.2.2')]
+        delete_rules = [
+            self.access,
+            dict(self.access, access_to='2.2.2.2',
+                 access_level=const.ACCESS_LEVEL_RO)]
+
+        failed = self._helper.update_access(
+            self.server_details, self.share_name, add_rules, delete_rules)
+
+        self.assertEqual([add_rules[1]], failed)
+        self._helper._get_allow_hosts.assert_called_once_with(
+            self.server_details, self.share_name)
+        self._helper._set_allow_hosts.assert_called_once_with(
+            self.server_details, ['2.2.2.2', '3.3.3.3'], self.share_name)
+
+    def test_update_access_no_changes(self):
+        self.mock_object(self._helper, '_get_allow_hosts',
+                         mock.Mock(return_value=['1.1.1.1']))
+        self.mock_object(self._helper, '_set_allow_hosts')
+
+        failed = self._helper.update_access(
+            self.server_details, self.share_name, [self.access], [])
+
+        self.assertEqual([], failed)
+        self.assertFalse(self._helper._set_allow_hosts.called)
+
     def test_allow_access_wrong_type(self):
         self.assertRaises(
             exception.InvalidShareAccess,
@@ -52,6 +52,11 @@ fake_remote_server_password = 'fakepassword'
 fake_share_name = 'fakename'
 NFS_EXPORT_DIR = 'nfs.export-dir'
 NFS_EXPORT_VOL = 'nfs.export-volumes'
+fake_ssh_pool_options = {
+    'idle_timeout': 0,
+    'max_lifetime': 0,
+    'keepalive_interval': 0,
+}
 
 
 @ddt.ddt
@@ -146,6 +151,21 @@ class GlusterManagerTestCase(test.TestCase):
         fake_obj.assert_called_once_with(
             *(('gluster',) + fake_args), **fake_kwargs)
 
+    def test_gluster_manager_make_gluster_call_remote_ssh_pool_options(self):
+        ssh_pool_options = {'idle_timeout': 300, 'max_lifetime': 3600,
+                            'keepalive_interval': 60}
+        with mock.patch.object(glusterfs.ganesha_utils, 'SSHExecutor',
+                               mock.Mock()):
+            gluster_manager = glusterfs.GlusterManager(
+                'testuser@127.0.0.1:/testvol', self.fake_execf,
+                fake_path_to_private_key, fake_remote_server_password,
+                ssh_pool_options=ssh_pool_options)
+            glusterfs.ganesha_utils.SSHExecutor.assert_called_once_with(
+                gluster_manager.host, 22, None, gluster_manager.remote_user,
+                password=gluster_manager.remote_server_password,
+                privatekey=gluster_manager.path_to_private_key,
+                idle_timeout=300, max_lifetime=3600, keepalive_interval=60)
+
     def test_get_gluster_vol_option_empty_volinfo(self):
         args = ('--xml', 'volume', 'info', self._gluster_manager.volume)
         self.mock_object(self._gluster_manager, 'gluster_call',
@@ -336,7 +356,8 @@ class GlusterfsShareDriverTestCase(test.TestCase):
         glusterfs.GlusterManager.assert_called_once_with(
             self._driver.configuration.glusterfs_target, self._execute,
             self._driver.configuration.glusterfs_path_to_private_key,
-            self._driver.configuration.glusterfs_server_password)
+            self._driver.configuration.glusterfs_server_password,
+            ssh_pool_options=fake_ssh_pool_options)
         self.assertEqual(expected_exec, fake_utils.fake_execute_get_log())
         self._driver.gluster_manager.gluster_call.assert_called_once_with(
             *args)
@@ -380,7 +401,8 @@ class GlusterfsShareDriverTestCase(test.TestCase):
         glusterfs.GlusterManager.assert_called_once_with(
             self._driver.configuration.glusterfs_target, self._execute,
             self._driver.configuration.glusterfs_path_to_private_key,
-            self._driver.configuration.glusterfs_server_password)
+            self._driver.configuration.glusterfs_server_password,
+            ssh_pool_options=fake_ssh_pool_options)
         self.assertEqual(expected_exec, fake_utils.fake_execute_get_log())
         self._driver.gluster_manager.gluster_call.assert_called_once_with(
             *args)
@@ -410,7 +432,8 @@ class GlusterfsShareDriverTestCase(test.TestCase):
         glusterfs.GlusterManager.assert_called_once_with(
             self._driver.configuration.glusterfs_target, self._execute,
             self._driver.configuration.glusterfs_path_to_private_key,
-            self._driver.configuration.glusterfs_server_password)
+            self._driver.configuration.glusterfs_server_password,
+            ssh_pool_options=fake_ssh_pool_options)
         self.assertEqual(expected_exec, fake_utils.fake_execute_get_log())
         self._driver.gluster_manager.gluster_call.assert_called_once_with(
             *args)
@@ -959,7 +982,8 @@ class GaneshaNFSHelperTestCase(test.TestCase):
             self._execute, self.fake_conf,
             gluster_manager=self.gluster_manager)
         glusterfs.ganesha_utils.SSHExecutor.assert_called_once_with(
-            'fakeip', 22, None, 'root', password=None, privatekey=None)
+            'fakeip', 22, None, 'root', password=None, privatekey=None,
+            **fake_ssh_pool_options)
         glusterfs.ganesha.GaneshaNASHelper.__init__.assert_has_calls(
             [mock.call(ssh_execute, self.fake_conf)])
 
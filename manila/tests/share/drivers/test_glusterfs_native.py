@@ -134,7 +134,9 @@ class GlusterfsNativeShareDriverTestCase(test.TestCase):
             self.glusterfs_target1, self._execute,
             self._driver.configuration.glusterfs_native_path_to_private_key,
             self._driver.configuration.glusterfs_native_server_password,
-            has_volume=has_volume)
+            has_volume=has_volume,
+            ssh_pool_options=glusterfs.ssh_pool_options(
+                self._driver.configuration))
         self.assertEqual(fake_obj, ret)
 
     def test_compile_volume_pattern(self):
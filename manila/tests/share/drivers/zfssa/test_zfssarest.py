@@ -172,6 +172,18 @@ class ZFSSAApiTestCase(test.TestCase):
                           self.share,
                           arg)
 
+    def test_get_shares(self):
+        self.mock_object(self._zfssa.rclient, 'get')
+        response = self._create_response(restclient.Status.OK)
+        response.data = '{"filesystems": [{"name": "fakeshare"}]}'
+        self._zfssa.rclient.get.return_value = response
+        svc = self._zfssa.shares_path % (self.pool, self.project)
+
+        result = self._zfssa.get_shares(self.pool, self.project)
+
+        self.assertEqual([{'name': 'fakeshare'}], result)
+        self._zfssa.rclient.get.assert_called_once_with(svc)
+
     def test_delete_share(self):
         self.mock_object(self._zfssa.rclient, 'delete')
         self._zfssa.rclient.delete.return_value = self._create_response(
@@ -394,3 +406,36 @@ class ZFSSAApiTestCase(test.TestCase):
                                                     self.project,
                                                     self.share,
                                                     data1)
+
+    def test_update_access_nfs(self):
+        self.mock_object(self._zfssa, 'get_share')
+        self.mock_object(self._zfssa, 'modify_share')
+        sharenfs = self._create_entry('off', '10.0.0.1')['sharenfs']
+        self._zfssa.get_share.return_value = {'sharenfs': sharenfs}
+        add_rules = [{'access_type': 'ip', 'access_to': '10.0.0.2'},
+                     {'access_type': 'ip', 'access_to': '10.0.0.0/24'},
+                     {'access_type': 'nonip', 'access_to': 'foo'}]
+        delete_rules = [{'access_type': 'ip', 'access_to': '10.0.0.1'}]
+
+        failed = self._zfssa.update_access_nfs(
+            self.pool, self.project, self.share, add_rules, delete_rules)
+
+        self.assertEqual([add_rules[2]], failed)
+        self._zfssa.get_share.assert_called_once_with(self.pool,
+                                                      self.project,
+                                                      self.share)
+        self._zfssa.modify_share.assert_called_once_with(
+            self.pool, self.project, self.share,
+            {'sharenfs': 'sec=sys,rw=@10.0.0.2/32,rw=@10.0.0.0/24'})
+
+    def test_update_access_nfs_no_changes(self):
+        self.mock_object(self._zfssa, 'get_share')
+        self.mock_object(self._zfssa, 'modify_share')
+        self._zfssa.get_share.return_value = {'sharenfs': 'on'}
+        add_rules = [{'access_type': 'ip', 'access_to': '10.0.0.2'}]
+
+        failed = self._zfssa.update_access_nfs(
+            self.pool, self.project, self.share, add_rules, [])
+
+        self.assertEqual([], failed)
+        self.assertFalse(self._zfssa.modify_share.called)
@@ -192,6 +192,18 @@ class ZFSSAShareDriverTestCase(test.TestCase):
                           self._context,
                           self.share)
 
+    def test_ensure_shares(self):
+        self.mock_object(self._driver.zfssa, 'get_shares', mock.Mock(
+            return_value=[{'name': self.share['id']}, {'name': 'other'}]))
+        lcfg = self.configuration
+        shares = [self.share, dict(self.share, id='missing')]
+
+        result = self._driver.ensure_shares(self._context, shares)
+
+        self.assertEqual({self.share['id']: None}, result)
+        self._driver.zfssa.get_shares.assert_called_once_with(
+            lcfg.zfssa_pool, lcfg.zfssa_project)
+
     def test_allow_access(self):
         self.mock_object(self._driver.zfssa, 'allow_access_nfs')
         lcfg = self.configuration
@@ -213,3 +225,29 @@ class ZFSSAShareDriverTestCase(test.TestCase):
             lcfg.zfssa_project,
             self.share['id'],
             self.access)
+
+    def test_update_access(self):
+        self.mock_object(self._driver.zfssa, 'update_access_nfs',
+                         mock.Mock(return_value=[]))
+        lcfg = self.configuration
+
+        failed = self._driver.update_access(self._context, self.share,
+                                            [self.access], [])
+
+        self.assertEqual([], failed)
+        self._driver.zfssa.update_access_nfs.assert_called_once_with(
+            lcfg.zfssa_pool,
+            lcfg.zfssa_project,
+            self.share['id'],
+            [self.access],
+            [])
+
+    def test_update_access_cifs(self):
+        self.mock_object(self._driver.zfssa, 'update_access_nfs')
+        share = dict(self.share, share_proto='CIFS')
+
+        failed = self._driver.update_access(self._context, share,
+                                            [self.access], [])
+
+        self.assertEqual([], failed)
+        self.assertFalse(self._driver.zfssa.update_access_nfs.called)
@@ -108,24 +108,28 @@ def fake_access(id, **kwargs):
 
 _FAKE_LIST_OF_ALL_SHARES = [
     {
+        'id': 'fake_share_id_1',
         'name': 'foo',
         'status': 'active',
         'project_id': 'fake_pid_1',
         'share_server_id': 'fake_server_1',
     },
     {
+        'id': 'fake_share_id_2',
         'name': 'bar',
         'status': 'error',
         'project_id': 'fake_pid_2',
         'share_server_id': 'fake_server_2',
     },
     {
+        'id': 'fake_share_id_3',
         'name': 'foo',
         'status': 'active',
         'project_id': 'fake_pid_2',
         'share_server_id': 'fake_server_3',
     },
     {
+        'id': 'fake_share_id_4',
         'name': 'bar',
         'status': 'error',
         'project_id': 'fake_pid_2',
@@ -189,7 +193,9 @@ class ShareAPITestCase(test.TestCase):
             ctx, 'share', 'get_all')
         db_driver.share_get_all_by_project.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
-            project_id='fake_pid_1', filters={}, is_public=False
+            project_id='fake_pid_1', filters={}, is_public=False,
+            limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL
         )
         self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[0])
 
@@ -201,7 +207,9 @@ class ShareAPITestCase(test.TestCase):
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share', 'get_all')
         db_driver.share_get_all.assert_called_once_with(
-            ctx, sort_dir='desc', sort_key='created_at', filters={})
+            ctx, sort_dir='desc', sort_key='created_at', filters={},
+            limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL)
         self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES)
 
     def test_get_all_non_admin_filter_by_share_server(self):
@@ -240,7 +248,8 @@ class ShareAPITestCase(test.TestCase):
         ])
         db_driver.share_get_all_by_share_server.assert_called_once_with(
             ctx, 'fake_server_3', sort_dir='desc', sort_key='created_at',
-            filters={},
+            filters={}, limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL,
         )
         db_driver.share_get_all_by_project.assert_has_calls([])
         db_driver.share_get_all.assert_has_calls([])
@@ -256,9 +265,11 @@ class ShareAPITestCase(test.TestCase):
         ])
         db_driver.share_get_all_by_project.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
-            project_id='fake_pid_2', filters={}, is_public=False
+            project_id='fake_pid_2', filters={'name': 'bar'},
+            is_public=False, limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL
         )
-        self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[1::2])
+        self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[1:])
 
     def test_get_all_admin_filter_by_name_and_all_tenants(self):
         ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=True)
@@ -269,8 +280,10 @@ class ShareAPITestCase(test.TestCase):
             mock.call(ctx, 'share', 'get_all'),
         ])
         db_driver.share_get_all.assert_called_once_with(
-            ctx, sort_dir='desc', sort_key='created_at', filters={})
-        self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[::2])
+            ctx, sort_dir='desc', sort_key='created_at',
+            filters={'name': 'foo'}, limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL)
+        self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES)
 
     def test_get_all_admin_filter_by_status(self):
         ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=True)
@@ -282,9 +295,11 @@ class ShareAPITestCase(test.TestCase):
         ])
         db_driver.share_get_all_by_project.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
-            project_id='fake_pid_2', filters={}, is_public=False
+            project_id='fake_pid_2', filters={'status': 'active'},
+            is_public=False, limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL
         )
-        self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[2::4])
+        self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[1:])
 
     def test_get_all_admin_filter_by_status_and_all_tenants(self):
         ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=True)
@@ -295,8 +310,10 @@ class ShareAPITestCase(test.TestCase):
             mock.call(ctx, 'share', 'get_all'),
         ])
         db_driver.share_get_all.assert_called_once_with(
-            ctx, sort_dir='desc', sort_key='created_at', filters={})
-        self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[1::2])
+            ctx, sort_dir='desc', sort_key='created_at',
+            filters={'status': 'error'}, limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL)
+        self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES)
 
     def test_get_all_non_admin_filter_by_all_tenants(self):
         # Expected share list only by project of non-admin user
@@ -309,7 +326,9 @@ class ShareAPITestCase(test.TestCase):
         ])
         db_driver.share_get_all_by_project.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
-            project_id='fake_pid_2', filters={}, is_public=False
+            project_id='fake_pid_2', filters={}, is_public=False,
+            limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL
         )
         self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[1:])
 
@@ -323,25 +342,12 @@ class ShareAPITestCase(test.TestCase):
         ])
         db_driver.share_get_all_by_project.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
-            project_id='fake_pid_2', filters={}, is_public=False
+            project_id='fake_pid_2',
+            filters={'name': 'bar', 'status': 'error'}, is_public=False,
+            limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL
         )
-
-        # two items expected, one filtered
-        self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[1::2])
-
-        # one item expected, two filtered
-        shares = self.api.get_all(ctx, {'name': 'foo', 'status': 'active'})
-        self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[2::4])
-        share_api.policy.check_policy.assert_has_calls([
-            mock.call(ctx, 'share', 'get_all'),
-            mock.call(ctx, 'share', 'get_all'),
-        ])
-        db_driver.share_get_all_by_project.assert_has_calls([
-            mock.call(ctx, sort_dir='desc', sort_key='created_at',
-                      project_id='fake_pid_2', filters={}, is_public=False),
-            mock.call(ctx, sort_dir='desc', sort_key='created_at',
-                      project_id='fake_pid_2', filters={}, is_public=False),
-        ])
+        self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[1:])
 
     @ddt.data('True', 'true', '1', 'yes', 'y', 'on', 't', True)
     def test_get_all_non_admin_public(self, is_public):
@@ -355,7 +361,9 @@ class ShareAPITestCase(test.TestCase):
         ])
         db_driver.share_get_all_by_project.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
-            project_id='fake_pid_2', filters={}, is_public=True
+            project_id='fake_pid_2', filters={}, is_public=True,
+            limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL
         )
         self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[1:], shares)
 
@@ -371,7 +379,9 @@ class ShareAPITestCase(test.TestCase):
         ])
         db_driver.share_get_all_by_project.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
-            project_id='fake_pid_2', filters={}, is_public=False
+            project_id='fake_pid_2', filters={}, is_public=False,
+            limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL
         )
         self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[1:], shares)
 
@@ -394,10 +404,41 @@ class ShareAPITestCase(test.TestCase):
             ctx, 'share', 'get_all')
         db_driver.share_get_all_by_project.assert_called_once_with(
             ctx, sort_dir='asc', sort_key='status',
-            project_id='fake_pid_1', filters={}, is_public=False
+            project_id='fake_pid_1', filters={}, is_public=False,
+            limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL
         )
         self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[0], shares)
 
+    def test_get_all_with_pagination(self):
+        self.mock_object(db_driver, 'share_get_all_by_project',
+                         mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[1:3]))
+        ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=False)
+        shares = self.api.get_all(ctx, limit=2, marker='fake_marker')
+        db_driver.share_get_all_by_project.assert_called_once_with(
+            ctx, sort_dir='desc', sort_key='created_at',
+            project_id='fake_pid_2', filters={}, is_public=False,
+            limit=2, marker='fake_marker',
+            profile=constants.QUERY_PROFILE_DETAIL
+        )
+        self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[1:3], shares)
+
+    def test_get_all_with_pagination_and_search_opts(self):
+        self.mock_object(db_driver, 'share_get_all_by_project',
+                         mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[3:]))
+        ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=False)
+        search_opts = {'name': 'bar', 'metadata': {'k': 'v'}}
+        shares = self.api.get_all(
+            ctx, search_opts, limit=1, marker='fake_marker')
+        db_driver.share_get_all_by_project.assert_called_once_with(
+            ctx, sort_dir='desc', sort_key='created_at',
+            project_id='fake_pid_2',
+            filters={'name': 'bar', 'metadata': {'k': 'v'}},
+            is_public=False, limit=1, marker='fake_marker',
+            profile=constants.QUERY_PROFILE_DETAIL
+        )
+        self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[3:], shares)
+
     def test_get_all_sort_key_invalid(self):
         self.mock_object(db_driver, 'share_get_all_by_project',
                          mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[0]))
@@ -434,7 +475,9 @@ class ShareAPITestCase(test.TestCase):
             ctx, 'share', 'get_all')
         db_driver.share_get_all_by_project.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
-            project_id='fake_pid_1', filters=search_opts, is_public=False)
+            project_id='fake_pid_1', filters=search_opts, is_public=False,
+            limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL)
         self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[0], shares)
 
     def test_get_all_filter_by_metadata(self):
@@ -511,6 +554,130 @@ class ShareAPITestCase(test.TestCase):
         db_driver.share_create.assert_called_once_with(
             self.context, options)
 
+    @mock.patch.object(quota.QUOTAS, 'reserve',
+                       mock.Mock(return_value='reservation'))
+    @mock.patch.object(quota.QUOTAS, 'commit', mock.Mock())
+    def test_create_shares(self):
+        shares = [fake_share('fakeid%d' % i, status='creating', size=i + 1)
+                  for i in range(3)]
+        self.mock_object(db_driver, 'share_create',
+                         mock.Mock(side_effect=shares))
+
+        result = self.api.create_shares(
+            self.context,
+            [dict(share_proto='nfs', size=share['size'], name='fakename',
+                  description='fakedesc') for share in shares])
+
+        self.assertEqual(shares, result)
+        self.assertEqual(3, db_driver.share_create.call_count)
+        quota.QUOTAS.reserve.assert_called_once_with(
+            self.context, shares=3, gigabytes=6)
+        quota.QUOTAS.commit.assert_called_once_with(
+            self.context, 'reservation')
+        self.scheduler_rpcapi.create_shares.assert_called_once_with(
+            self.context, CONF.share_topic, mock.ANY, filter_properties={})
+        request_specs = self.scheduler_rpcapi.create_shares.call_args[0][2]
+        self.assertEqual(['fakeid0', 'fakeid1', 'fakeid2'],
+                         [spec['share_id'] for spec in request_specs])
+        self.assertFalse(self.scheduler_rpcapi.create_share.called)
+
+    @mock.patch.object(quota.QUOTAS, 'reserve',
+                       mock.Mock(return_value='reservation'))
+    @mock.patch.object(quota.QUOTAS, 'commit', mock.Mock())
+    def test_create_shares_from_snapshot_on_source_host(self):
+        CONF.set_default("use_scheduler_creating_share_from_snapshot", False)
+        original_share = fake_share('fake_original_id', status='available')
+        snapshot = fake_snapshot('fakesnapshotid',
+                                 share_id=original_share['id'],
+                                 status='available')
+        shares = [fake_share('fakeid0', status='creating'),
+                  fake_share('fakeid1', status='creating',
+                             snapshot_id=snapshot['id'])]
+        updated_share = dict(shares[1], host=snapshot['share']['host'])
+        self.mock_object(db_driver, 'share_get',
+                         mock.Mock(return_value=original_share))
+        self.mock_object(db_driver, 'share_create',
+                         mock.Mock(side_effect=shares))
+        self.mock_object(db_driver, 'share_update',
+                         mock.Mock(return_value=updated_share))
+
+        result = self.api.create_shares(
+            self.context,
+            [dict(share_proto='nfs', size=1, name='fakename',
+                  description='fakedesc'),
+             dict(share_proto='nfs', size=1, name='fakename',
+                  description='fakedesc', snapshot=snapshot)])
+
+        self.assertEqual([shares[0], updated_share], result)
+        self.share_rpcapi.create_share.assert_called_once_with(
+            self.context, updated_share, snapshot['share']['host'],
+            request_spec=mock.ANY, filter_properties={},
+            snapshot_id=snapshot['id'])
+        request_specs = self.scheduler_rpcapi.create_shares.call_args[0][2]
+        self.assertEqual(['fakeid0'],
+                         [spec['share_id'] for spec in request_specs])
+
+    @mock.patch.object(quota.QUOTAS, 'reserve',
+                       mock.Mock(return_value='reservation'))
+    @mock.patch.object(quota.QUOTAS, 'commit', mock.Mock())
+    def test_create_shares_snapshot_host_error(self):
+        CONF.set_default("use_scheduler_creating_share_from_snapshot", False)
+        snapshot = fake_snapshot('fakesnapshotid', share_id='fake_original_id',
+                                 status='available')
+        shares = [fake_share('fakeid%d' % i, status='creating',
+                             snapshot_id=snapshot['id'] if i < 2 else None)
+                  for i in range(3)]
+        error_share = dict(shares[0], status=constants.STATUS_ERROR)
+        updated_share = dict(shares[1], host=snapshot['share']['host'])
+        original_share = fake_share('fake_original_id', status='available')
+        self.mock_object(db_driver, 'share_get',
+                         mock.Mock(return_value=original_share))
+        self.mock_object(db_driver, 'share_create',
+                         mock.Mock(side_effect=shares))
+        self.mock_object(db_driver, 'share_update', mock.Mock(
+            side_effect=[exception.ManilaException, error_share,
+                         updated_share]))
+
+        result = self.api.create_shares(
+            self.context,
+            [dict(share_proto='nfs', size=1, name='fakename',
+                  description='fakedesc', snapshot=snapshot)] * 2 +
+            [dict(share_proto='nfs', size=1, name='fakename',
+                  description='fakedesc')])
+
+        self.assertEqual([error_share, updated_share, shares[2]], result)
+        db_driver.share_update.assert_any_call(
+            self.context, 'fakeid0', {'status': constants.STATUS_ERROR})
+        self.share_rpcapi.create_share.assert_called_once_with(
+            self.context, updated_share, snapshot['share']['host'],
+            request_spec=mock.ANY, filter_properties={},
+            snapshot_id=snapshot['id'])
+        request_specs = self.scheduler_rpcapi.create_shares.call_args[0][2]
+        self.assertEqual(['fakeid2'],
+                         [spec['share_id'] for spec in request_specs])
+
+    @mock.patch.object(quota.QUOTAS, 'reserve',
+                       mock.Mock(return_value='reservation'))
+    @mock.patch.object(quota.QUOTAS, 'rollback', mock.Mock())
+    def test_create_shares_db_error(self):
+        share = fake_share('fakeid0', status='creating')
+        self.mock_object(
+            db_driver, 'share_create',
+            mock.Mock(side_effect=[share, exception.ManilaException]))
+        self.mock_object(db_driver, 'share_delete')
+
+        self.assertRaises(
+            exception.ManilaException,
+            self.api.create_shares, self.context,
+            [dict(share_proto='nfs', size=1, name='fakename',
+                  description='fakedesc')] * 2)
+
+        db_driver.share_delete.assert_called_once_with(
+            self.context, share['id'])
+        quota.QUOTAS.rollback.assert_called_once_with(
+            self.context, 'reservation')
+        self.assertFalse(self.scheduler_rpcapi.create_shares.called)
+
     @ddt.data(
         None, '', 'fake', 'nfsfake', 'cifsfake', 'glusterfsfake', 'hdfsfake')
     def test_create_share_invalid_protocol(self, proto):
@@ -1127,7 +1294,9 @@ class ShareAPITestCase(test.TestCase):
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share', 'get_all_snapshots')
         db_driver.share_snapshot_get_all_by_project.assert_called_once_with(
-            ctx, 'fakepid', sort_dir='desc', sort_key='share_id', filters={})
+            ctx, 'fakepid', sort_dir='desc', sort_key='share_id', filters={},
+            limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL)
 
     @mock.patch.object(db_driver, 'share_snapshot_get_all', mock.Mock())
     def test_get_all_snapshots_admin_all_tenants(self):
@@ -1136,7 +1305,9 @@ class ShareAPITestCase(test.TestCase):
         share_api.policy.check_policy.assert_called_once_with(
             self.context, 'share', 'get_all_snapshots')
         db_driver.share_snapshot_get_all.assert_called_once_with(
-            self.context, sort_dir='desc', sort_key='share_id', filters={})
+            self.context, sort_dir='desc', sort_key='share_id', filters={},
+            limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL)
 
     @mock.patch.object(db_driver, 'share_snapshot_get_all_by_project',
                        mock.Mock())
@@ -1146,11 +1317,13 @@ class ShareAPITestCase(test.TestCase):
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share', 'get_all_snapshots')
         db_driver.share_snapshot_get_all_by_project.assert_called_once_with(
-            ctx, 'fakepid', sort_dir='desc', sort_key='share_id', filters={})
+            ctx, 'fakepid', sort_dir='desc', sort_key='share_id', filters={},
+            limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL)
 
     def test_get_all_snapshots_not_admin_search_opts(self):
         search_opts = {'size': 'fakesize'}
-        fake_objs = [{'name': 'fakename1'}, search_opts]
+        fake_objs = [search_opts]
         ctx = context.RequestContext('fakeuid', 'fakepid', is_admin=False)
         self.mock_object(db_driver, 'share_snapshot_get_all_by_project',
                          mock.Mock(return_value=fake_objs))
@@ -1162,7 +1335,8 @@ class ShareAPITestCase(test.TestCase):
             ctx, 'share', 'get_all_snapshots')
         db_driver.share_snapshot_get_all_by_project.assert_called_once_with(
             ctx, 'fakepid', sort_dir='desc', sort_key='share_id',
-            filters=search_opts)
+            filters=search_opts, limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL)
 
     def test_get_all_snapshots_with_sorting_valid(self):
         self.mock_object(
@@ -1174,7 +1348,9 @@ class ShareAPITestCase(test.TestCase):
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share', 'get_all_snapshots')
         db_driver.share_snapshot_get_all_by_project.assert_called_once_with(
-            ctx, 'fake_pid_1', sort_dir='asc', sort_key='status', filters={})
+            ctx, 'fake_pid_1', sort_dir='asc', sort_key='status', filters={},
+            limit=None, marker=None,
+            profile=constants.QUERY_PROFILE_DETAIL)
         self.assertEqual(_FAKE_LIST_OF_ALL_SNAPSHOTS[0], snapshots)
 
     def test_get_all_snapshots_sort_key_invalid(self):
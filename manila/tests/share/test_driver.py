@@ -199,3 +199,46 @@ class ShareDriverTestCase(test.TestCase):
             self.assertTrue(callable(getattr(obj, attr)))
 
         assert_is_callable(share_driver, method)
+
+    def test_ensure_shares(self):
+        share_driver = self._instantiate_share_driver(None, False)
+        shares = [{'id': 'fake_id%d' % i} for i in range(3)]
+        self.mock_object(share_driver, 'ensure_share', mock.Mock(
+            side_effect=[['/fake/path'], exception.ManilaException, None]))
+        self.mock_object(driver.LOG, 'error')
+
+        result = share_driver.ensure_shares('fake_context', shares,
+                                            share_server='fake_server')
+
+        self.assertEqual({'fake_id0': ['/fake/path'], 'fake_id2': None},
+                         result)
+        share_driver.ensure_share.assert_has_calls([
+            mock.call('fake_context', share, share_server='fake_server')
+            for share in shares])
+        self.assertEqual(1, driver.LOG.error.call_count)
+
+    def test_update_access(self):
+        share_driver = self._instantiate_share_driver(None, False)
+        share = {'id': 'fake_share_id'}
+        add_rules = [{'id': 'fake_add%d' % i} for i in range(3)]
+        delete_rules = [{'id': 'fake_delete%d' % i} for i in range(2)]
+        access_exists = exception.ShareAccessExists(access_type='ip',
+                                                    access='fake')
+        self.mock_object(share_driver, 'allow_access', mock.Mock(
+            side_effect=[None, access_exists, exception.ManilaException]))
+        self.mock_object(share_driver, 'deny_access', mock.Mock(
+            side_effect=[exception.ManilaException, None]))
+        self.mock_object(driver.LOG, 'error')
+
+        failed = share_driver.update_access(
+            'fake_context', share, add_rules, delete_rules,
+            share_server='fake_server')
+
+        self.assertEqual([delete_rules[0], add_rules[2]], failed)
+        share_driver.deny_access.assert_has_calls([
+            mock.call('fake_context', share, rule, share_server='fake_server')
+            for rule in delete_rules])
+        share_driver.allow_access.assert_has_calls([
+            mock.call('fake_context', share, rule, share_server='fake_server')
+            for rule in add_rules])
+        self.assertEqual(2, driver.LOG.error.call_count)
@@ -17,6 +17,7 @@ import ddt
 import mock
 from oslo_utils import uuidutils
 
+from manila import exception
 from manila.share import drivers_private_data as pd
 from manila import test
 
@@ -119,6 +120,155 @@ class DriverPrivateDataTestCase(test.TestCase):
         )
 
 
+class FakeStorageDriver(object):
+
+    def __init__(self):
+        self.data = {}
+        self.get = mock.Mock(side_effect=self._get)
+        self.update = mock.Mock(side_effect=self._update)
+        self.delete = mock.Mock(side_effect=self._delete)
+
+    def _get(self, entity_id, key, default):
+        data = self.data.get(entity_id, {})
+        if key is None or isinstance(key, list):
+            keys = data if key is None else key
+            return dict((k, data[k]) for k in keys if k in data)
+        return data.get(key, default)
+
+    def _update(self, entity_id, details, delete_existing):
+        if delete_existing:
+            self.data[entity_id] = {}
+        self.data.setdefault(entity_id, {}).update(details)
+        return details
+
+    def _delete(self, entity_id, key):
+        if key is None:
+            self.data.pop(entity_id, None)
+        else:
+            self.data.get(entity_id, {}).pop(key, None)
+
+
+@ddt.ddt
+class DriverPrivateDataCacheTestCase(test.TestCase):
+    """Tests the read cache and the write buffer of DriverPrivateData."""
+
+    def setUp(self):
+        super(DriverPrivateDataCacheTestCase, self).setUp()
+        self.storage = FakeStorageDriver()
+        self.entity_id = uuidutils.generate_uuid()
+        self.storage.data[self.entity_id] = {'foo': 'bar', 'tee': 'too'}
+        pd.CONF.register_opts(pd.private_data_opts)
+        self.flags(drivers_private_data_cache_size=2)
+        self.data = pd.DriverPrivateData(storage=self.storage)
+
+    @ddt.data(('foo', 'bar'),
+              (['foo', 'fake'], {'foo': 'bar'}),
+              (None, {'foo': 'bar', 'tee': 'too'}))
+    @ddt.unpack
+    def test_get_cached(self, key, expected):
+        self.assertEqual(expected, self.data.get(self.entity_id, key))
+        self.assertEqual(expected, self.data.get(self.entity_id, key))
+
+        self.storage.get.assert_called_once_with(self.entity_id, None, None)
+
+    def test_get_default(self):
+        self.assertEqual('def', self.data.get(self.entity_id, 'fake', 'def'))
+
+    def test_get_cache_disabled(self):
+        self.flags(drivers_private_data_cache_size=0)
+        data = pd.DriverPrivateData(storage=self.storage)
+
+        data.get(self.entity_id, 'foo')
+        data.get(self.entity_id, 'foo')
+
+        self.assertEqual(2, self.storage.get.call_count)
+        self.storage.get.assert_called_with(self.entity_id, 'foo', None)
+
+    def test_get_cache_size(self):
+        entity_ids = [uuidutils.generate_uuid() for i in range(3)]
+
+        for entity_id in entity_ids + entity_ids[-1:]:
+            self.data.get(entity_id, 'foo')
+
+        self.assertEqual(3, self.storage.get.call_count)
+        self.assertEqual(1, len(self.data._cache))
+
+    def test_update_invalidates_cache(self):
+        self.data.get(self.entity_id, 'foo')
+
+        self.data.update(self.entity_id, {'foo': 'new_bar'})
+
+        self.assertEqual('new_bar', self.data.get(self.entity_id, 'foo'))
+        self.assertEqual(2, self.storage.get.call_count)
+
+    def test_delete_invalidates_cache(self):
+        self.data.get(self.entity_id, 'foo')
+
+        self.data.delete(self.entity_id, 'foo')
+
+        self.assertIsNone(self.data.get(self.entity_id, 'foo'))
+        self.assertEqual(2, self.storage.get.call_count)
+
+    def test_batch(self):
+        with self.data.batch():
+            self.data.update(self.entity_id, {'foo': 'bar1'})
+            self.data.update(self.entity_id, {'mee': 'moo'})
+
+            self.assertEqual({'foo': 'bar1', 'tee': 'too', 'mee': 'moo'},
+                             self.data.get(self.entity_id))
+            self.assertFalse(self.storage.update.called)
+
+        self.storage.update.assert_called_once_with(
+            self.entity_id, {'foo': 'bar1', 'mee': 'moo'}, False)
+        self.assertEqual({'foo': 'bar1', 'tee': 'too', 'mee': 'moo'},
+                         self.data.get(self.entity_id))
+
+    def test_batch_delete_existing(self):
+        with self.data.batch():
+            self.data.update(self.entity_id, {'foo': 'bar1'})
+            self.data.update(self.entity_id, {'mee': 'moo'},
+                             delete_existing=True)
+
+            self.assertIsNone(self.data.get(self.entity_id, 'foo'))
+
+        self.storage.update.assert_called_once_with(
+            self.entity_id, {'mee': 'moo'}, True)
+
+    def test_batch_delete_writes_pending_updates(self):
+        with self.data.batch():
+            self.data.update(self.entity_id, {'mee': 'moo'})
+            self.data.delete(self.entity_id, 'foo')
+
+            self.storage.update.assert_called_once_with(
+                self.entity_id, {'mee': 'moo'}, False)
+
+        self.assertEqual({'tee': 'too', 'mee': 'moo'},
+                         self.data.get(self.entity_id))
+        self.assertEqual(1, self.storage.update.call_count)
+
+    def test_batch_nested(self):
+        with self.data.batch():
+            with self.data.batch():
+                self.data.update(self.entity_id, {'foo': 'bar1'})
+
+            self.assertFalse(self.storage.update.called)
+
+        self.assertTrue(self.storage.update.called)
+
+    def test_batch_writes_on_error(self):
+        def fail():
+            with self.data.batch():
+                self.data.update(self.entity_id, {'foo': 'bar1'})
+                raise exception.ManilaException()
+
+        self.assertRaises(exception.ManilaException, fail)
+
+        self.storage.update.assert_called_once_with(
+            self.entity_id, {'foo': 'bar1'}, False)
+        self.data.update(self.entity_id, {'foo': 'bar2'})
+        self.assertEqual(2, self.storage.update.call_count)
+
+
 fake_storage_data = {
     "entity_id": "fake_id",
     "details": {"foo": "bar"},
@@ -185,8 +185,8 @@ class ShareManagerTestCase(test.TestCase):
             {'id': 'fake_id_3', 'status': 'in-use', 'name': 'fake_name_3'},
         ]
         rules = [
-            FakeAccessRule(state='active'),
-            FakeAccessRule(state='error'),
+            FakeAccessRule(share_id='fake_id_1', state='active'),
+            FakeAccessRule(share_id='fake_id_1', state='error'),
         ]
         fake_export_locations = ['fake/path/1', 'fake/path']
         share_server = 'fake_share_server_type_does_not_matter'
@@ -203,7 +203,7 @@ class ShareManagerTestCase(test.TestCase):
         self.mock_object(self.share_manager, 'publish_service_capabilities',
                          mock.Mock())
         self.mock_object(self.share_manager.db,
-                         'share_access_get_all_for_share',
+                         'share_access_get_all_for_host',
                          mock.Mock(return_value=rules))
         self.mock_object(self.share_manager.driver, 'allow_access',
                          mock.Mock(side_effect=raise_share_access_exists))
@@ -229,9 +229,10 @@ class ShareManagerTestCase(test.TestCase):
         self.share_manager.driver.ensure_share.assert_called_once_with(
             utils.IsAMatcher(context.RequestContext), shares[0],
             share_server=share_server)
-        self.share_manager.db.share_access_get_all_for_share.\
+        self.share_manager.db.share_access_get_all_for_host.\
             assert_called_once_with(
-                utils.IsAMatcher(context.RequestContext), shares[0]['id'])
+                utils.IsAMatcher(context.RequestContext),
+                self.share_manager.host)
         self.share_manager.publish_service_capabilities.\
             assert_called_once_with(
                 utils.IsAMatcher(context.RequestContext))
@@ -239,6 +240,35 @@ class ShareManagerTestCase(test.TestCase):
             utils.IsAMatcher(context.RequestContext), shares[0], rules[0],
             share_server=share_server)
 
+    def test_init_host_ensures_shares_concurrently(self):
+        self.flags(share_ensure_workers=3)
+        shares = [{'id': 'fake_id_%d' % i, 'status': 'available'}
+                  for i in range(5)]
+        self.mock_object(self.share_manager.db, 'share_get_all_by_host',
+                         mock.Mock(return_value=shares))
+        self.mock_object(self.share_manager.db,
+                         'share_access_get_all_for_host',
+                         mock.Mock(return_value=[]))
+        self.mock_object(self.share_manager, '_ensure_shares_on_init',
+                         mock.Mock(side_effect=[2, 1,
+                                                exception.ManilaException]))
+        self.mock_object(self.share_manager, 'publish_service_capabilities')
+        self.mock_object(manager.eventlet, 'GreenPool',
+                         mock.Mock(wraps=manager.eventlet.GreenPool))
+        self.mock_object(manager.LOG, 'info')
+        self.mock_object(manager.LOG, 'exception')
+
+        self.share_manager.init_host()
+
+        manager.eventlet.GreenPool.assert_called_once_with(3)
+        self.share_manager._ensure_shares_on_init.assert_has_calls([
+            mock.call(utils.IsAMatcher(context.RequestContext), batch, {})
+            for batch in ([shares[0], shares[3]], [shares[1], shares[4]],
+                          [shares[2]])])
+        self.assertEqual(1, manager.LOG.exception.call_count)
+        manager.LOG.info.assert_called_with(
+            mock.ANY, {'done': 5, 'failed': 2, 'time': mock.ANY})
+
     def test_init_host_with_exception_on_ensure_share(self):
         def raise_exception(*args, **kwargs):
             raise exception.ManilaException(message="Fake raise")
@@ -287,7 +317,7 @@ class ShareManagerTestCase(test.TestCase):
         self.share_manager.publish_service_capabilities.\
             assert_called_once_with(
                 utils.IsAMatcher(context.RequestContext))
-        manager.LOG.info.assert_called_once_with(
+        manager.LOG.info.assert_any_call(
             mock.ANY,
             {'name': shares[1]['name'], 'status': shares[1]['status']},
         )
@@ -302,8 +332,9 @@ class ShareManagerTestCase(test.TestCase):
             {'id': 'fake_id_3', 'status': 'available', 'name': 'fake_name_3'},
         ]
         rules = [
-            FakeAccessRule(state='active'),
-            FakeAccessRule(state='error'),
+            FakeAccessRule(share_id='fake_id_1', state='active'),
+            FakeAccessRule(share_id='fake_id_1', state='error'),
+            FakeAccessRule(share_id='fake_id_3', state='active'),
         ]
         share_server = 'fake_share_server_type_does_not_matter'
         self.mock_object(self.share_manager.db,
@@ -318,7 +349,7 @@ class ShareManagerTestCase(test.TestCase):
         self.mock_object(manager.LOG, 'error')
         self.mock_object(manager.LOG, 'info')
         self.mock_object(self.share_manager.db,
-                         'share_access_get_all_for_share',
+                         'share_access_get_all_for_host',
                          mock.Mock(return_value=rules))
         self.mock_object(self.share_manager.driver, 'allow_access',
                          mock.Mock(side_effect=raise_exception))
@@ -349,7 +380,7 @@ class ShareManagerTestCase(test.TestCase):
         self.share_manager.publish_service_capabilities.\
             assert_called_once_with(
                 utils.IsAMatcher(context.RequestContext))
-        manager.LOG.info.assert_called_once_with(
+        manager.LOG.info.assert_any_call(
             mock.ANY,
             {'name': shares[1]['name'], 'status': shares[1]['status']},
         )
@@ -357,7 +388,7 @@ class ShareManagerTestCase(test.TestCase):
             mock.call(utils.IsAMatcher(context.RequestContext), shares[0],
                       rules[0], share_server=share_server),
             mock.call(utils.IsAMatcher(context.RequestContext), shares[2],
-                      rules[0], share_server=share_server),
+                      rules[2], share_server=share_server),
         ])
         manager.LOG.error.assert_has_calls([
             mock.call(mock.ANY, mock.ANY),
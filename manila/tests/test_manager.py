@@ -15,6 +15,8 @@
 
 """Test of Base Manager for Manila."""
 
+import ddt
+import eventlet
 import mock
 from oslo_utils import importutils
 
@@ -68,3 +70,132 @@ class SchedulerDependentManagerTestCase(test.TestCase):
         self.assertEqual(fake_sched_manager.host, host)
         self.assertEqual(fake_sched_manager.service_name, service_name)
         importutils.import_module.assert_called_once_with(db_driver)
+
+
+class FakePeriodicManager(manager.Manager):
+
+    def __init__(self, *args, **kwargs):
+        super(FakePeriodicManager, self).__init__(*args, **kwargs)
+        self.calls = []
+        self.slow_event = eventlet.event.Event()
+
+    @manager.periodic_task
+    def every_tick(self, context):
+        self.calls.append('every_tick')
+
+    @manager.periodic_task(spacing=600)
+    def spaced(self, context):
+        self.calls.append('spaced')
+
+    @manager.periodic_task(ticks_between_runs=1)
+    def every_other_tick(self, context):
+        self.calls.append('every_other_tick')
+
+    @manager.periodic_task(timeout=10)
+    def slow(self, context):
+        self.calls.append('slow')
+        self.slow_event.wait()
+
+
+@ddt.ddt
+class PeriodicTasksTestCase(test.TestCase):
+
+    def setUp(self):
+        super(PeriodicTasksTestCase, self).setUp()
+        self.mock_object(importutils, 'import_module')
+        self.mock_object(manager.LOG, 'warning')
+        self.manager = FakePeriodicManager('fake_host', 'fake_driver')
+        self.addCleanup(self._finish_slow_task, self.manager)
+        self.now = 1000.0
+        self.mock_object(manager.time, 'time',
+                         mock.Mock(side_effect=lambda: self.now))
+
+    def _finish_slow_task(self, manager=None):
+        manager = manager or self.manager
+        if not manager.slow_event.ready():
+            manager.slow_event.send()
+        eventlet.sleep(0)
+
+    def _tick(self, seconds=60):
+        self.manager.periodic_tasks('fake_context')
+        eventlet.sleep(0)
+        self.now += seconds
+
+    def test_tasks_run_concurrently(self):
+        self._tick()
+
+        self.assertEqual(['every_tick', 'spaced', 'every_other_tick', 'slow'],
+                         sorted(self.manager.calls, key=[
+                             'every_tick', 'spaced', 'every_other_tick',
+                             'slow'].index))
+        stats = self.manager.get_periodic_task_stats()
+        self.assertEqual(1, stats['every_tick']['runs'])
+        self.assertEqual(0, stats['slow']['runs'])
+
+    def test_spacing_and_ticks(self):
+        for i in range(10):
+            self._tick(seconds=120)
+
+        self.assertEqual(10, self.manager.calls.count('every_tick'))
+        self.assertEqual(5, self.manager.calls.count('every_other_tick'))
+        self.assertEqual(2, self.manager.calls.count('spaced'))
+
+    def test_running_task_is_skipped(self):
+        for i in range(3):
+            self._tick()
+        self._finish_slow_task()
+        self._tick()
+
+        self.assertEqual(2, self.manager.calls.count('slow'))
+        stats = self.manager.get_periodic_task_stats()['slow']
+        self.assertEqual(2, stats['skipped'])
+        self.assertEqual(2, stats['runs'])
+        self.assertEqual(180, stats['max_duration'])
+        self.assertEqual(0, stats['last_duration'])
+        self.assertEqual(2, manager.LOG.warning.call_count)
+
+    def _fail_task(self, name):
+        def append(task_name):
+            if task_name == name:
+                raise ValueError()
+        self.manager.calls = mock.Mock(append=mock.Mock(side_effect=append))
+
+    def test_error_is_logged(self):
+        self.mock_object(manager.LOG, 'exception')
+        self._fail_task('spaced')
+
+        self._tick()
+
+        self.assertEqual(1, manager.LOG.exception.call_count)
+        stats = self.manager.get_periodic_task_stats()
+        self.assertEqual(1, stats['spaced']['failures'])
+        self.assertEqual(0, stats['every_tick']['failures'])
+
+    def test_raise_on_error(self):
+        self._fail_task('spaced')
+        self.manager.slow_event.send()
+
+        self.assertRaises(ValueError, self.manager.periodic_tasks,
+                          'fake_context', raise_on_error=True)
+        self.assertEqual({}, self.manager._periodic_threads)
+
+    @ddt.data((None, 0, 0), (0.01, 0, 1), (None, 1, 0), (0.01, 1, 1))
+    @ddt.unpack
+    def test_timeout(self, task_timeout, conf_timeout, expected_timeouts):
+        self.flags(periodic_task_timeout=conf_timeout)
+        self.mock_object(manager.LOG, 'error')
+        task = FakePeriodicManager.slow.__func__
+        self.addCleanup(setattr, task, '_periodic_timeout',
+                        task._periodic_timeout)
+        task._periodic_timeout = task_timeout
+        self.manager.slow_event = mock.Mock(
+            wait=mock.Mock(side_effect=lambda: eventlet.sleep(0.05)),
+            ready=mock.Mock(return_value=True))
+
+        self._tick()
+        eventlet.sleep(0.1)
+
+        stats = self.manager.get_periodic_task_stats()['slow']
+        self.assertEqual(1, stats['runs'])
+        self.assertEqual(expected_timeouts, stats['timeouts'])
+        self.assertEqual(expected_timeouts, manager.LOG.error.call_count)
@@ -168,9 +168,24 @@ class FakeDriver(object):
     def destroy_all_by_project(self, context, project_id):
         self.called.append(('destroy_all_by_project', context, project_id))
 
+    def update_quota(self, context, project_id, resource, limit,
+                     user_id=None):
+        self.called.append(('update_quota', context, project_id, resource,
+                            limit, user_id))
+
+    def update_class_quota(self, context, quota_class, resource, limit):
+        self.called.append(('update_class_quota', context, quota_class,
+                            resource, limit))
+
+    def invalidate_limits(self, project_id=None):
+        self.called.append(('invalidate_limits', project_id))
+
     def expire(self, context):
         self.called.append(('expire', context))
 
+    def usage_refresh(self, context):
+        self.called.append(('usage_refresh', context))
+
 
 class BaseResourceTestCase(test.TestCase):
     def test_no_flag(self):
@@ -596,6 +611,41 @@ class QuotaEngineTestCase(test.TestCase):
                            context,
                            'test_project'), ])
 
+    def test_invalidate_limits(self):
+        driver = FakeDriver()
+        quota_obj = self._make_quota_obj(driver)
+        quota_obj.invalidate_limits('test_project')
+
+        self.assertEqual(driver.called,
+                         [('invalidate_limits', 'test_project'), ])
+
+    def test_invalidate_limits_driver_without_cache(self):
+        driver = mock.Mock(spec=['reserve'])
+        quota_obj = self._make_quota_obj(driver)
+
+        quota_obj.invalidate_limits('test_project')
+
+    def test_update_quota(self):
+        context = FakeContext(None, None)
+        driver = FakeDriver()
+        quota_obj = self._make_quota_obj(driver)
+        quota_obj.update_quota(context, 'test_project', 'shares', 5,
+                               user_id='fake_user')
+
+        self.assertEqual(driver.called,
+                         [('update_quota', context, 'test_project', 'shares',
+                           5, 'fake_user'), ])
+
+    def test_update_class_quota(self):
+        context = FakeContext(None, None)
+        driver = FakeDriver()
+        quota_obj = self._make_quota_obj(driver)
+        quota_obj.update_class_quota(context, 'test_class', 'shares', 5)
+
+        self.assertEqual(driver.called,
+                         [('update_class_quota', context, 'test_class',
+                           'shares', 5), ])
+
     def test_expire(self):
         context = FakeContext(None, None)
         driver = FakeDriver()
@@ -604,6 +654,14 @@ class QuotaEngineTestCase(test.TestCase):
 
         self.assertEqual(driver.called, [('expire', context), ])
 
+    def test_usage_refresh(self):
+        context = FakeContext(None, None)
+        driver = FakeDriver()
+        quota_obj = self._make_quota_obj(driver)
+        quota_obj.usage_refresh(context)
+
+        self.assertEqual(driver.called, [('usage_refresh', context), ])
+
     def test_resources(self):
         quota_obj = self._make_quota_obj(None)
 
@@ -1022,6 +1080,125 @@ class DbQuotaDriverTestCase(test.TestCase):
         self.assertEqual(self.calls, ['get_project_quotas'])
         self.assertEqual(result, dict(shares=10, gigabytes=1000, ))
 
+    def test_get_quotas_cached(self):
+        self.flags(quota_limits_cache_ttl=60)
+        self._stub_get_project_quotas()
+        context = FakeContext('test_project', 'test_class')
+
+        for keys in (['shares'], ['shares', 'gigabytes'], ['gigabytes']):
+            result = self.driver._get_quotas(context, quota.QUOTAS._resources,
+                                             keys, True)
+
+        self.assertEqual(self.calls, ['get_project_quotas'])
+        self.assertEqual(result, dict(gigabytes=1000))
+
+    def test_get_quotas_cache_expired(self):
+        self.flags(quota_limits_cache_ttl=60)
+        self._stub_get_project_quotas()
+        context = FakeContext('test_project', 'test_class')
+        self.mock_object(quota, 'time')
+        quota.time.time.return_value = 100
+
+        self.driver._get_quotas(context, quota.QUOTAS._resources,
+                                ['shares'], True)
+        quota.time.time.return_value = 161
+        self.driver._get_quotas(context, quota.QUOTAS._resources,
+                                ['shares'], True)
+
+        self.assertEqual(self.calls, ['get_project_quotas'] * 2)
+
+    def test_get_quotas_cache_disabled(self):
+        self._stub_get_project_quotas()
+        context = FakeContext('test_project', 'test_class')
+
+        for i in range(2):
+            self.driver._get_quotas(context, quota.QUOTAS._resources,
+                                    ['shares'], True)
+
+        self.assertEqual(self.calls, ['get_project_quotas'] * 2)
+        self.assertEqual({}, self.driver._limits)
+
+    def test_get_quotas_cache_invalidated(self):
+        self.flags(quota_limits_cache_ttl=60)
+        self._stub_get_project_quotas()
+        self.mock_object(db, 'quota_destroy_all_by_project')
+        context = FakeContext('test_project', 'test_class')
+        other_context = FakeContext('other_project', 'test_class')
+
+        for ctxt in (context, other_context):
+            self.driver._get_quotas(ctxt, quota.QUOTAS._resources,
+                                    ['shares'], True,
+                                    project_id=ctxt.project_id)
+        self.driver.destroy_all_by_project(context, 'test_project')
+        for ctxt in (context, other_context):
+            self.driver._get_quotas(ctxt, quota.QUOTAS._resources,
+                                    ['shares'], True,
+                                    project_id=ctxt.project_id)
+
+        self.assertEqual(self.calls, ['get_project_quotas'] * 3)
+        self.driver.invalidate_limits()
+        self.assertEqual({}, self.driver._limits)
+
+    def test_update_quota_invalidates_limits(self):
+        self.flags(quota_limits_cache_ttl=60)
+        self._stub_get_project_quotas()
+        self.mock_object(db, 'quota_create')
+        self.mock_object(db, 'quota_update')
+        context = FakeContext('test_project', 'test_class')
+
+        self.driver._get_quotas(context, quota.QUOTAS._resources,
+                                ['shares'], True)
+        self.driver.update_quota(context, 'test_project', 'shares', 5)
+        self.driver._get_quotas(context, quota.QUOTAS._resources,
+                                ['shares'], True)
+
+        db.quota_create.assert_called_once_with(
+            context, 'test_project', 'shares', 5, user_id=None)
+        self.assertFalse(db.quota_update.called)
+        self.assertEqual(self.calls, ['get_project_quotas'] * 2)
+
+    def test_update_quota_existing(self):
+        self.mock_object(db, 'quota_create',
+                         mock.Mock(side_effect=exception.QuotaExists(
+                             project_id='test_project', resource='shares')))
+        self.mock_object(db, 'quota_update')
+        self.mock_object(self.driver, 'invalidate_limits')
+        context = FakeContext('test_project', 'test_class')
+
+        self.driver.update_quota(context, 'test_project', 'shares', 5,
+                                 user_id='fake_user')
+
+        db.quota_update.assert_called_once_with(
+            context, 'test_project', 'shares', 5, user_id='fake_user')
+        self.driver.invalidate_limits.assert_called_once_with('test_project')
+
+    def test_update_class_quota(self):
+        self.mock_object(db, 'quota_class_update')
+        self.mock_object(db, 'quota_class_create')
+        self.mock_object(self.driver, 'invalidate_limits')
+        context = FakeContext('test_project', 'test_class')
+
+        self.driver.update_class_quota(context, 'test_class', 'shares', 5)
+
+        db.quota_class_update.assert_called_once_with(
+            context, 'test_class', 'shares', 5)
+        self.assertFalse(db.quota_class_create.called)
+        self.driver.invalidate_limits.assert_called_once_with()
+
+    def test_update_class_quota_not_found(self):
+        self.mock_object(db, 'quota_class_update',
+                         mock.Mock(side_effect=exception.QuotaClassNotFound(
+                             class_name='test_class')))
+        self.mock_object(db, 'quota_class_create')
+        self.mock_object(self.driver, 'invalidate_limits')
+        context = FakeContext('test_project', 'test_class')
+
+        self.driver.update_class_quota(context, 'test_class', 'shares', 5)
+
+        db.quota_class_create.assert_called_once_with(
+            context, 'test_class', 'shares', 5)
+        self.driver.invalidate_limits.assert_called_once_with()
+
     def _stub_quota_reserve(self):
         def fake_quota_reserve(context, resources, quotas, user_quotas,
                                deltas, expire, until_refresh, max_age,
@@ -1116,6 +1293,48 @@ class DbQuotaDriverTestCase(test.TestCase):
                                       ('quota_reserve', expire, 0, 86400), ])
         self.assertEqual(result, ['resv-1', 'resv-2', 'resv-3'])
 
+    def test_expire_in_batches(self):
+        self.flags(reservation_expire_batch_size=2)
+        self.mock_object(db, 'reservation_expire',
+                         mock.Mock(side_effect=[2, 2, 1]))
+
+        result = self.driver.expire('fake_context')
+
+        self.assertEqual(5, result)
+        db.reservation_expire.assert_has_calls(
+            [mock.call('fake_context', limit=2)] * 3)
+
+    def test_expire_without_batches(self):
+        self.flags(reservation_expire_batch_size=0)
+        self.mock_object(db, 'reservation_expire',
+                         mock.Mock(return_value=5))
+
+        result = self.driver.expire('fake_context')
+
+        self.assertEqual(5, result)
+        db.reservation_expire.assert_called_once_with('fake_context',
+                                                      limit=None)
+
+    def test_expire_time_budget_exhausted(self):
+        self.flags(reservation_expire_batch_size=2,
+                   reservation_expire_time_budget=10)
+        self.mock_object(db, 'reservation_expire',
+                         mock.Mock(return_value=2))
+        self.mock_object(quota, 'time')
+        quota.time.time.side_effect = [100, 105, 110]
+
+        result = self.driver.expire('fake_context')
+
+        self.assertEqual(4, result)
+        self.assertEqual(2, db.reservation_expire.call_count)
+
+    def test_usage_refresh(self):
+        self.mock_object(db, 'quota_usage_refresh_all',
+                         mock.Mock(return_value=3))
+
+        self.assertEqual(3, self.driver.usage_refresh('fake_context'))
+        db.quota_usage_refresh_all.assert_called_once_with('fake_context')
+
     def _stub_quota_delete_all_by_project(self):
         def fake_quota_delete_all_by_project(context, project_id):
             self.calls.append(('quota_destroy_all_by_project', project_id))
@@ -1557,3 +1776,155 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                                        usage_id=self.usages['gigabytes'],
                                        project_id='test_project',
                                        delta=-2 * 1024), ])
+
+
+class AtomicDbQuotaDriverTestCase(test.TestCase):
+
+    def setUp(self):
+        super(AtomicDbQuotaDriverTestCase, self).setUp()
+        self.flags(quota_shares=2, quota_gigabytes=10)
+        self.quotas = quota.QuotaEngine(
+            quota_driver_class=quota.AtomicDbQuotaDriver())
+        self.quotas.register_resources(quota.resources)
+        self.context = context.RequestContext('fake_user', 'fake_project')
+
+    def _get_usages(self, user_id='fake_user'):
+        usages = db.quota_usage_get_all_by_project_and_user(
+            self.context, 'fake_project', user_id)
+        return dict((resource, usage) for resource, usage in usages.items()
+                    if resource in ('shares', 'gigabytes'))
+
+    def test_reserve_and_commit(self):
+        reservations = self.quotas.reserve(self.context, shares=1,
+                                           gigabytes=4)
+
+        self.assertEqual(2, len(reservations))
+        self.assertEqual({'shares': {'in_use': 0, 'reserved': 1},
+                          'gigabytes': {'in_use': 0, 'reserved': 4}},
+                         self._get_usages())
+
+        self.quotas.commit(self.context, reservations)
+
+        self.assertEqual({'shares': {'in_use': 1, 'reserved': 0},
+                          'gigabytes': {'in_use': 4, 'reserved': 0}},
+                         self._get_usages())
+
+    def test_reserve_and_rollback(self):
+        reservations = self.quotas.reserve(self.context, shares=1,
+                                           gigabytes=4)
+
+        self.quotas.rollback(self.context, reservations)
+
+        self.assertEqual({'shares': {'in_use': 0, 'reserved': 0},
+                          'gigabytes': {'in_use': 0, 'reserved': 0}},
+                         self._get_usages())
+
+    def test_reservations_applied_once(self):
+        reservations = self.quotas.reserve(self.context, shares=1,
+                                           gigabytes=4)
+
+        self.quotas.commit(self.context, reservations)
+        self.quotas.rollback(self.context, reservations)
+        self.quotas.commit(self.context, reservations)
+
+        self.assertEqual({'shares': {'in_use': 1, 'reserved': 0},
+                          'gigabytes': {'in_use': 4, 'reserved': 0}},
+                         self._get_usages())
+
+    def test_reserve_over_quota(self):
+        self.quotas.reserve(self.context, shares=1, gigabytes=8)
+
+        exc = self.assertRaises(exception.OverQuota, self.quotas.reserve,
+                                self.context, shares=1, gigabytes=4)
+
+        self.assertEqual(['gigabytes'], exc.kwargs['overs'])
+        self.assertEqual({'in_use': 0, 'reserved': 8},
+                         exc.kwargs['usages']['gigabytes'])
+        self.assertEqual({'shares': {'in_use': 0, 'reserved': 1},
+                          'gigabytes': {'in_use': 0, 'reserved': 8}},
+                         self._get_usages())
+
+    def test_reserve_over_project_quota(self):
+        other_context = context.RequestContext('other_user', 'fake_project')
+        self.quotas.reserve(other_context, shares=2)
+
+        self.assertRaises(exception.OverQuota, self.quotas.reserve,
+                          self.context, shares=1)
+        self.assertEqual({'in_use': 0, 'reserved': 0},
+                         self._get_usages()['shares'])
+
+    def test_reserve_over_project_quota_unlimited_user(self):
+        db.quota_create(self.context.elevated(), 'fake_project', 'shares',
+                        -1, user_id='fake_user')
+        other_context = context.RequestContext('other_user', 'fake_project')
+        self.quotas.reserve(other_context, shares=2)
+
+        self.assertRaises(exception.OverQuota, self.quotas.reserve,
+                          self.context, shares=1)
+        self.assertEqual({'in_use': 0, 'reserved': 0},
+                         self._get_usages()['shares'])
+
+    def _get_project_totals(self):
+        rows = sqa_api.model_query(self.context.elevated(),
+                                   sqa_models.ProjectQuotaUsage).\
+            filter_by(project_id='fake_project').\
+            all()
+        return dict((row.resource, row.total) for row in rows)
+
+    def test_reserve_keeps_project_totals(self):
+        other_context = context.RequestContext('other_user', 'fake_project')
+        reservations = self.quotas.reserve(self.context, shares=1,
+                                           gigabytes=4)
+        other_reservations = self.quotas.reserve(other_context, shares=1,
+                                                 gigabytes=2)
+
+        self.assertEqual({'shares': 2, 'gigabytes': 6},
+                         self._get_project_totals())
+
+        self.quotas.commit(self.context, reservations)
+        self.quotas.rollback(other_context, other_reservations)
+
+        self.assertEqual({'shares': 1, 'gigabytes': 4},
+                         self._get_project_totals())
+
+    def test_reserve_creates_project_totals_from_usages(self):
+        db.quota_usage_create(self.context.elevated(), 'fake_project',
+                              'other_user', 'shares', 2, 0, None)
+
+        self.assertRaises(exception.OverQuota, self.quotas.reserve,
+                          self.context, shares=1)
+        self.assertEqual({'shares': 2}, self._get_project_totals())
+
+    def test_reservation_expire_gives_back_project_totals(self):
+        self.quotas.reserve(self.context, expire=-1, shares=1, gigabytes=4)
+
+        db.reservation_expire(self.context.elevated())
+
+        self.assertEqual({'shares': 0, 'gigabytes': 0},
+                         self._get_project_totals())
+        self.assertEqual({'shares': {'in_use': 0, 'reserved': 0},
+                          'gigabytes': {'in_use': 0, 'reserved': 0}},
+                         self._get_usages())
+
+    def test_reserve_reduction_over_quota(self):
+        self.flags(quota_shares=1)
+        db.quota_usage_create(self.context.elevated(), 'fake_project',
+                              'fake_user', 'shares', 3, 0, None)
+
+        reservations = self.quotas.reserve(self.context, shares=-1)
+        self.quotas.commit(self.context, reservations)
+
+        self.assertEqual({'in_use': 2, 'reserved': 0},
+                         self._get_usages()['shares'])
+
+    def test_reserve_refreshes_negative_usage(self):
+        db.quota_usage_create(self.context.elevated(), 'fake_project',
+                              'fake_user', 'shares', -1, 0, None)
+        db.share_create(self.context, {'user_id': 'fake_user',
+                                       'project_id': 'fake_project',
+                                       'size': 1})
+
+        self.quotas.reserve(self.context, shares=1)
+
+        self.assertEqual({'in_use': 1, 'reserved': 1},
+                         self._get_usages()['shares'])
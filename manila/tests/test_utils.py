@@ -21,9 +21,11 @@ import os
 import os.path
 import socket
 import tempfile
+import time
 import uuid
 
 import ddt
+from eventlet import greenthread
 import mock
 from oslo_config import cfg
 from oslo_utils import timeutils
@@ -416,7 +418,11 @@ class FakeTransport(object):
     def is_active(self):
         return self.active
 
+    def send_ignore(self):
+        pass
+
 
+@ddt.ddt
 class SSHPoolTestCase(test.TestCase):
     """Unit test for SSH Connection Pool."""
 
@@ -505,6 +511,108 @@ class SSHPoolTestCase(test.TestCase):
             self.assertNotEqual(first_id, third_id)
             paramiko.SSHClient.assert_called_once_with()
 
+    def _get_pool(self, **kwargs):
+        self.mock_object(paramiko, "SSHClient",
+                         mock.Mock(side_effect=FakeSSHClient))
+        return utils.SSHPool("127.0.0.1", 22, 10, "test", password="test",
+                             **kwargs)
+
+    def test_remove(self):
+        sshpool = self._get_pool(min_size=2, max_size=2)
+        ssh = sshpool.free_items[1]
+
+        sshpool.remove(ssh)
+
+        self.assertEqual(1, sshpool.current_size)
+        self.assertNotIn(ssh, sshpool.free_items)
+        self.assertEqual(1, len(sshpool.free_items))
+
+    @ddt.data({'idle_timeout': 10}, {'max_lifetime': 10})
+    def test_get_replaces_old_connection(self, kwargs):
+        self.mock_object(time, 'time', mock.Mock(return_value=100))
+        sshpool = self._get_pool(min_size=1, max_size=1, **kwargs)
+        with sshpool.item() as ssh:
+            first_id = ssh.id
+
+        time.time.return_value = 111
+        with sshpool.item() as ssh:
+            second_id = ssh.id
+
+        self.assertNotEqual(first_id, second_id)
+        self.assertEqual(1, sshpool.current_size)
+        self.assertEqual(1, sshpool.get_stats()['evicted'])
+
+    def test_get_keeps_recently_used_connection(self):
+        self.mock_object(time, 'time', mock.Mock(return_value=100))
+        sshpool = self._get_pool(min_size=1, max_size=1, idle_timeout=10,
+                                 max_lifetime=30)
+        ids = []
+        for now in (105, 114, 123):
+            time.time.return_value = now
+            with sshpool.item() as ssh:
+                ids.append(ssh.id)
+
+        self.assertEqual(1, len(set(ids)))
+
+    def test_get_replacement_failure_frees_slot(self):
+        sshpool = self._get_pool(min_size=1, max_size=1)
+        sshpool.free_items[0].get_transport().active = False
+        paramiko.SSHClient.side_effect = None
+        paramiko.SSHClient.return_value = mock.Mock(
+            **{'connect.side_effect': paramiko.SSHException})
+
+        self.assertRaises(exception.SSHException, sshpool.get)
+        self.assertEqual(0, sshpool.current_size)
+        self.assertEqual(1, sshpool.get_stats()['create_failures'])
+
+    def test_maintain(self):
+        sshpool = self._get_pool(min_size=3, max_size=4)
+        broken = sshpool.free_items[0]
+        broken.get_transport().active = False
+        failing = sshpool.free_items[1]
+        self.mock_object(failing.get_transport(), 'send_ignore',
+                         mock.Mock(side_effect=paramiko.SSHException))
+        healthy = sshpool.free_items[2]
+
+        sshpool.maintain()
+
+        self.assertEqual(3, sshpool.current_size)
+        self.assertEqual(3, len(sshpool.free_items))
+        self.assertEqual(healthy, sshpool.free_items[0])
+        self.assertNotIn(broken, sshpool.free_items)
+        self.assertNotIn(failing, sshpool.free_items)
+        self.assertEqual(2, sshpool.get_stats()['evicted'])
+        self.assertEqual(5, sshpool.get_stats()['created'])
+
+    def test_get_stats(self):
+        sshpool = self._get_pool(min_size=1, max_size=2)
+        ssh = sshpool.get()
+        sshpool.get()
+        sshpool.put(ssh)
+
+        stats = sshpool.get_stats()
+
+        self.assertEqual(2, stats['acquired'])
+        self.assertEqual(2, stats['created'])
+        self.assertEqual(2, stats['size'])
+        self.assertEqual(1, stats['free'])
+        self.assertEqual(0, stats['waiting'])
+        self.assertIn('acquire_wait_avg', stats)
+        self.assertIn('create_time_avg', stats)
+
+    def test_keepalive(self):
+        fake_thread = mock.Mock()
+        self.mock_object(greenthread, 'spawn',
+                         mock.Mock(return_value=fake_thread))
+        sshpool = self._get_pool(min_size=1, max_size=1,
+                                 keepalive_interval=30)
+
+        greenthread.spawn.assert_called_once_with(sshpool._keepalive_loop,
+                                                  30)
+        sshpool.stop()
+        fake_thread.kill.assert_called_once_with()
+        self.assertEqual(0, sshpool.current_size)
+
 
 class CidrToNetmaskTestCase(test.TestCase):
     """Unit test for cidr to netmask."""
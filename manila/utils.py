@@ -26,7 +26,9 @@ import shutil
 import socket
 import sys
 import tempfile
+import time
 
+from eventlet import greenthread
 from eventlet import pools
 import netaddr
 from oslo_concurrency import lockutils
@@ -41,6 +43,8 @@ import six
 from manila.db import api as db_api
 from manila import exception
 from manila.i18n import _
+from manila.i18n import _LE
+from manila.i18n import _LW
 
 CONF = cfg.CONF
 LOG = log.getLogger(__name__)
@@ -67,19 +71,60 @@ def trycmd(*args, **kwargs):
 
 
 class SSHPool(pools.Pool):
-    """A simple eventlet pool to hold ssh connections."""
+    """A simple eventlet pool to hold ssh connections.
+
+    Connections are checked before being handed out: closed ones, ones
+    unused for more than idle_timeout seconds and ones older than
+    max_lifetime seconds are replaced. With keepalive_interval set, a
+    greenthread probes free connections periodically, evicts the broken
+    ones and refills the pool up to min_size.
+    """
 
     def __init__(self, ip, port, conn_timeout, login, password=None,
-                 privatekey=None, *args, **kwargs):
+                 privatekey=None, idle_timeout=None, max_lifetime=None,
+                 keepalive_interval=None, *args, **kwargs):
         self.ip = ip
         self.port = port
         self.login = login
         self.password = password
         self.conn_timeout = conn_timeout if conn_timeout else None
         self.path_to_private_key = privatekey
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        # Creation and last use times by connection.
+        self._conn_times = {}
+        self.stats = {
+            'acquired': 0,
+            'acquire_wait_total': 0.0,
+            'acquire_wait_max': 0.0,
+            'created': 0,
+            'create_time_total': 0.0,
+            'create_time_max': 0.0,
+            'create_failures': 0,
+            'evicted': 0,
+        }
         super(SSHPool, self).__init__(*args, **kwargs)
+        self._keepalive_thread = None
+        if keepalive_interval:
+            self._keepalive_thread = greenthread.spawn(
+                self._keepalive_loop, keepalive_interval)
 
     def create(self):
+        start = time.time()
+        try:
+            ssh = self._connect()
+        except Exception:
+            self.stats['create_failures'] += 1
+            raise
+        now = time.time()
+        self.stats['created'] += 1
+        self.stats['create_time_total'] += now - start
+        self.stats['create_time_max'] = max(self.stats['create_time_max'],
+                                            now - start)
+        self._conn_times[ssh] = [now, now]
+        return ssh
+
+    def _connect(self):
         ssh = paramiko.SSHClient()
         ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         look_for_keys = True
@@ -119,32 +164,123 @@ class SSHPool(pools.Pool):
         """Return an item from the pool, when one is available.
 
         This may cause the calling greenthread to block. Check if a
-        connection is active before returning it. For dead connections
-        create and return a new connection.
+        connection is usable before returning it. For dead, idle or
+        expired connections create and return a new connection.
         """
+        start = time.time()
         if self.free_items:
-            conn = self.free_items.popleft()
-            if conn:
-                if conn.get_transport().is_active():
-                    return conn
-                else:
-                    conn.close()
-            return self.create()
-        if self.current_size < self.max_size:
-            created = self.create()
+            conn = self._ensure_usable(self.free_items.popleft())
+        elif self.current_size < self.max_size:
+            conn = self.create()
             self.current_size += 1
-            return created
-        return self.channel.get()
+        else:
+            conn = self._ensure_usable(self.channel.get())
+
+        wait = time.time() - start
+        self.stats['acquired'] += 1
+        self.stats['acquire_wait_total'] += wait
+        self.stats['acquire_wait_max'] = max(self.stats['acquire_wait_max'],
+                                             wait)
+        return conn
+
+    def put(self, item):
+        times = self._conn_times.get(item)
+        if times:
+            times[1] = time.time()
+        super(SSHPool, self).put(item)
 
     def remove(self, ssh):
         """Close an ssh client and remove it from free_items."""
         ssh.close()
-        ssh = None
         if ssh in self.free_items:
-            self.free_items.pop(ssh)
+            self.free_items.remove(ssh)
+        self._conn_times.pop(ssh, None)
         if self.current_size > 0:
             self.current_size -= 1
 
+    def _is_usable(self, conn):
+        if not conn or not conn.get_transport().is_active():
+            return False
+        times = self._conn_times.get(conn)
+        if not times:
+            return True
+        now = time.time()
+        if self.max_lifetime and now - times[0] > self.max_lifetime:
+            return False
+        if self.idle_timeout and now - times[1] > self.idle_timeout:
+            return False
+        return True
+
+    def _ensure_usable(self, conn):
+        """Return conn, or a new connection replacing it if unusable."""
+        if self._is_usable(conn):
+            return conn
+        if conn:
+            conn.close()
+            self._conn_times.pop(conn, None)
+        self.stats['evicted'] += 1
+        try:
+            return self.create()
+        except Exception:
+            # The slot of the replaced connection is free now.
+            self.current_size -= 1
+            raise
+
+    def maintain(self):
+        """Evict unusable free connections and refill up to min_size."""
+        for conn in list(self.free_items):
+            usable = self._is_usable(conn)
+            if usable:
+                try:
+                    conn.get_transport().send_ignore()
+                except Exception:
+                    usable = False
+            # The connection may have been handed out while probing.
+            if not usable and conn in self.free_items:
+                self.remove(conn)
+                self.stats['evicted'] += 1
+
+        while self.current_size < self.min_size:
+            self.current_size += 1
+            try:
+                conn = self.create()
+            except Exception:
+                self.current_size -= 1
+                LOG.warning(_LW("Could not refill SSH pool of %s."), self.ip)
+                break
+            self.put(conn)
+
+    def _keepalive_loop(self, interval):
+        while True:
+            greenthread.sleep(interval)
+            try:
+                self.maintain()
+            except Exception:
+                LOG.exception(_LE("Error probing SSH connections to %s."),
+                              self.ip)
+
+    def get_stats(self):
+        """Return counters of the pool."""
+        stats = dict(self.stats,
+                     size=self.current_size,
+                     free=len(self.free_items),
+                     waiting=self.waiting())
+        if stats['acquired']:
+            stats['acquire_wait_avg'] = (stats['acquire_wait_total'] /
+                                         stats['acquired'])
+        if stats['created']:
+            stats['create_time_avg'] = (stats['create_time_total'] /
+                                        stats['created'])
+        return stats
+
+    def stop(self):
+        """Stop probing and close free connections."""
+        if self._keepalive_thread:
+            self._keepalive_thread.kill()
+            self._keepalive_thread = None
+        while self.free_items:
+            self.remove(self.free_items.popleft())
+
 
 class LazyPluggable(object):
     """A pluggable backend loaded lazily based on some value."""
@@ -0,0 +1,100 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare scheduling latency of the per-host and vectorized scheduler engines.
+
+Builds a number of fake pools and runs CapacityFilter, RetryFilter and
+CapacityWeigher over them with both engines, checking that they choose the
+same pools.
+
+Usage: python tools/scheduler_benchmark.py [--pools 10000] [--runs 20]
+"""
+
+import argparse
+import random
+import time
+
+from oslo_config import cfg
+
+from manila.scheduler import host_manager
+from manila.scheduler import vectorized
+
+CONF = cfg.CONF
+
+FILTERS = ['CapacityFilter', 'RetryFilter']
+
+
+def _make_pools(count):
+    rnd = random.Random(42)
+    pools = []
+    for i in range(count):
+        pool = host_manager.PoolState('host%d@backend' % (i // 4), {},
+                                      'pool%d' % (i % 4))
+        pool.total_capacity_gb = 10240
+        pool.free_capacity_gb = rnd.randint(0, 10240)
+        pool.reserved_percentage = rnd.choice((0, 5, 10))
+        pools.append(pool)
+    return pools
+
+
+def _schedule(manager, pools, properties):
+    hosts = manager.get_filtered_hosts(pools, properties,
+                                       filter_class_names=FILTERS)
+    return manager.get_weighed_hosts(hosts, properties)
+
+
+def _measure(manager, pools, properties, runs):
+    timings = []
+    for i in range(runs):
+        start = time.time()
+        result = _schedule(manager, pools, properties)
+        timings.append(time.time() - start)
+    timings.sort()
+    return result, timings[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--pools', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--size', type=int, default=500)
+    args = parser.parse_args()
+
+    if not vectorized.is_available():
+        parser.error('NumPy is required to run the vectorized engine.')
+
+    pools = _make_pools(args.pools)
+    properties = {'size': args.size,
+                  'retry': {'num_attempts': 1,
+                            'hosts': [p.host for p in pools[::100]]}}
+
+    CONF.set_override('scheduler_use_vectorized_engine', False)
+    result, per_host = _measure(host_manager.HostManager(), pools,
+                                properties, args.runs)
+    CONF.set_override('scheduler_use_vectorized_engine', True)
+    vector_result, vector = _measure(host_manager.HostManager(), pools,
+                                     properties, args.runs)
+
+    same = ([(w.obj.host, w.weight) for w in result] ==
+            [(w.obj.host, w.weight) for w in vector_result])
+    print('pools: %d, passing: %d, same decisions: %s' %
+          (len(pools), len(result), same))
+    print('per-host engine:   %8.2f ms' % (per_host * 1000))
+    print('vectorized engine: %8.2f ms' % (vector * 1000))
+
+
+if __name__ == '__main__':
+    main()